@@ -0,0 +1,151 @@
+import asyncio
+import io
+import logging
+import shutil
+import time
+import zipfile
+from dataclasses import dataclass
+from pathlib import Path
+from typing import AsyncGenerator, BinaryIO, Optional, Sequence
+
+from aiogram.types.input_file import InputFile
+
+logger = logging.getLogger(__name__)
+
+_IO_BUFFER = 4 * 1024 * 1024
+_DEFLATE_SUFFIXES = {".csv", ".json", ".txt", ".log"}
+_STREAM_QUEUE_DEPTH = 8
+
+
+# REGION AI: archive build stats
+@dataclass
+class ArchiveStats:
+    name: str
+    files: int
+    bytes_in: int
+    bytes_written: int
+    seconds: float
+
+    def log_line(self) -> str:
+        return (
+            f"[Archive] {self.name}: files={self.files} in={self.bytes_in}B "
+            f"out={self.bytes_written}B built in {self.seconds:.2f}s"
+        )
+# END REGION AI
+
+
+# REGION AI: zip writer with per-type compression
+def _compress_type(path: Path) -> int:
+    # fix: H.264/PNG не сжимаются deflate — храним как есть, жмём только текстовые отчёты
+    return zipfile.ZIP_DEFLATED if path.suffix.lower() in _DEFLATE_SUFFIXES else zipfile.ZIP_STORED
+
+
+class _CountingWriter(io.RawIOBase):
+    """Неseekable-приёмник: считает байты и отдаёт их в sink (файл или очередь)."""
+
+    def __init__(self, sink) -> None:
+        super().__init__()
+        self._sink = sink
+        self.count = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        chunk = bytes(data)
+        self._sink(chunk)
+        self.count += len(chunk)
+        return len(chunk)
+
+
+def _write_members(target: BinaryIO, media: Sequence[Path], extras: Sequence[Path]) -> tuple[int, int]:
+    files = 0
+    bytes_in = 0
+    with zipfile.ZipFile(target, "w", allowZip64=True) as archive:
+        for path, required in [(p, True) for p in media] + [(p, False) for p in extras]:
+            try:
+                info = zipfile.ZipInfo.from_file(path, arcname=path.name)
+                info.compress_type = _compress_type(path)
+                with path.open("rb", buffering=_IO_BUFFER) as src, archive.open(info, "w", force_zip64=True) as dst:
+                    shutil.copyfileobj(src, dst, _IO_BUFFER)
+            except OSError as exc:
+                if required:
+                    logger.exception("Failed to add %s to archive: %s", path, exc)
+                    raise
+                logger.warning("Failed to add %s to archive: %s", path, exc)
+                continue
+            files += 1
+            bytes_in += info.file_size
+    return files, bytes_in
+
+
+def build_archive(dest: Path, media: Sequence[Path], extras: Sequence[Path] = ()) -> ArchiveStats:
+    """Собирает ZIP: media — STORED (ошибка чтения фатальна), extras — DEFLATE, если текстовые."""
+    started = time.monotonic()
+    with dest.open("wb", buffering=0) as raw:
+        writer = _CountingWriter(raw.write)
+        with io.BufferedWriter(writer, buffer_size=_IO_BUFFER) as buffered:
+            files, bytes_in = _write_members(buffered, media, extras)
+    stats = ArchiveStats(dest.name, files, bytes_in, writer.count, time.monotonic() - started)
+    logger.info(stats.log_line())
+    return stats
+
+
+async def build_archive_async(dest: Path, media: Sequence[Path], extras: Sequence[Path] = ()) -> ArchiveStats:
+    """build_archive в рабочем потоке, чтобы не блокировать event loop aiogram."""
+    return await asyncio.to_thread(build_archive, dest, media, extras)
+# END REGION AI
+
+
+# REGION AI: streaming zip upload
+class StreamingZipInputFile(InputFile):
+    """InputFile, который собирает ZIP на лету прямо в загрузку, без временного файла.
+
+    Каждый read() собирает архив заново, поэтому повторная отправка после
+    flood-control тоже работает.
+    """
+
+    def __init__(self, filename: str, media: Sequence[Path], extras: Sequence[Path] = ()) -> None:
+        super().__init__(filename=filename)
+        self._media = list(media)
+        self._extras = list(extras)
+        self.stats: Optional[ArchiveStats] = None
+
+    async def read(self, bot) -> AsyncGenerator[bytes, None]:  # noqa: ANN001
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue(maxsize=_STREAM_QUEUE_DEPTH)
+        done = object()
+
+        def _sink(chunk: bytes) -> None:
+            asyncio.run_coroutine_threadsafe(queue.put(chunk), loop).result()
+
+        def _produce() -> ArchiveStats:
+            started = time.monotonic()
+            writer = _CountingWriter(_sink)
+            try:
+                with io.BufferedWriter(writer, buffer_size=_IO_BUFFER) as buffered:
+                    files, bytes_in = _write_members(buffered, self._media, self._extras)
+            finally:
+                asyncio.run_coroutine_threadsafe(queue.put(done), loop).result()
+            return ArchiveStats(self.filename or "archive.zip", files, bytes_in, writer.count, time.monotonic() - started)
+
+        producer = loop.run_in_executor(None, _produce)
+        finished = False
+        try:
+            while True:
+                chunk = await queue.get()
+                if chunk is done:
+                    finished = True
+                    break
+                yield chunk
+        finally:
+            if not finished:
+                # fix: загрузка прервана — дочитываем очередь, чтобы поток-сборщик не завис на put()
+                async def _drain() -> None:
+                    while (await queue.get()) is not done:
+                        pass
+
+                loop.create_task(_drain())
+        self.stats = await producer
+        logger.info(self.stats.log_line())
+# END REGION AI
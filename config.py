@@ -100,18 +100,88 @@ def _env_flag(name: str, default: bool = False) -> bool:
         return default
     return raw.strip().lower() in {"1", "true", "yes", "on"}
 
+# fix: токен обязателен только боту (loader.py) — CLI и job API работают без него
 BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN", "").strip()
-if not BOT_TOKEN:
-    raise SystemExit("[ERROR] TELEGRAM_BOT_TOKEN is not set. Put it into .env")
 
 MAX_COPIES = 20
+# REGION AI: batch chunking
+BATCH_CHUNK_SIZE = max(1, int(os.getenv("UNICLON_BATCH_CHUNK", "5") or 5))
+# END REGION AI
 LOG_TAIL_CHARS = 3500
 CLEAN_UP_INPUT = False
 BOT_API_BASE = os.getenv("BOT_API_BASE", "").strip()
+# REGION AI: local Bot API server ingest
+BOT_API_LOCAL = _env_flag("BOT_API_LOCAL", False)
+# "server_prefix=local_prefix;..." — как пути хранилища local-сервера видны боту
+BOT_API_LOCAL_PATH_MAP = [
+    (server.strip(), local.strip())
+    for server, _, local in (
+        item.partition("=") for item in os.getenv("BOT_API_LOCAL_PATH_MAP", "").split(";")
+    )
+    if server.strip() and local.strip()
+]
+# auto: hardlink → reflink → symlink → потоковая копия; copy: только копия
+LOCAL_INGEST_MODE = os.getenv("UNICLON_LOCAL_INGEST_MODE", "auto").strip().lower() or "auto"
+# END REGION AI
 
 NO_DEVICE_INFO = _env_flag("UNICLON_NO_DEVICE_INFO", False)
 FORCE_ZIP_ARCHIVE = _env_flag("UNICLON_FORCE_ZIP", False)
 ECO_MODE = _env_flag("UNICLON_ECO_MODE", False)
 MAX_CONCURRENT_JOBS = 1
+# REGION AI: task queue pool
+QUEUE_WORKERS = max(1, int(os.getenv("UNICLON_QUEUE_WORKERS", "2") or 2))
+QUEUE_PER_USER_LIMIT = max(1, int(os.getenv("UNICLON_QUEUE_PER_USER", "1") or 1))
+# END REGION AI
 ECO_SLEEP = (0.8, 1.6)
 # END REGION AI
+
+# REGION AI: encode resource planner
+ENCODE_MAX_WORKERS = max(1, int(os.getenv("UNICLON_ENCODE_MAX_WORKERS", "2") or 2))
+ENCODE_MEMORY_HEADROOM = min(0.9, max(0.0, float(os.getenv("UNICLON_ENCODE_MEM_HEADROOM", "0.25") or 0.25)))
+# END REGION AI
+
+# REGION AI: deadline-aware job budget
+JOB_BUDGET_PER_COPY = max(30.0, float(os.getenv("UNICLON_JOB_BUDGET_PER_COPY", "240") or 240))
+# 0 — бюджет задачи = JOB_BUDGET_PER_COPY × число копий
+JOB_BUDGET_SECONDS = max(0.0, float(os.getenv("UNICLON_JOB_BUDGET", "0") or 0))
+COPY_TIMEOUT_FLOOR = max(60.0, float(os.getenv("UNICLON_COPY_TIMEOUT_FLOOR", "300") or 300))
+# END REGION AI
+
+# REGION AI: process class policy
+PROCESS_POLICY_ENABLED = _env_flag("UNICLON_PROCESS_POLICY", True)
+# "auto" — при ≥4 ядрах оставляем боту ядро 0; иначе список вида "0" или "0-1"
+BOT_RESERVED_CPUS = os.getenv("UNICLON_BOT_CPUS", "auto").strip() or "auto"
+RENDER_CPUS = os.getenv("UNICLON_RENDER_CPUS", "").strip()
+RENDER_NICE = int(os.getenv("UNICLON_RENDER_NICE", "5") or 5)
+PREVIEW_NICE = int(os.getenv("UNICLON_PREVIEW_NICE", "10") or 10)
+QC_NICE = int(os.getenv("UNICLON_QC_NICE", "15") or 15)
+RENDER_IOCLASS = os.getenv("UNICLON_RENDER_IOCLASS", "best-effort").strip().lower()
+PREVIEW_IOCLASS = os.getenv("UNICLON_PREVIEW_IOCLASS", "idle").strip().lower()
+QC_IOCLASS = os.getenv("UNICLON_QC_IOCLASS", "idle").strip().lower()
+# END REGION AI
+
+# REGION AI: pipelined delivery
+STREAM_DELIVERY = _env_flag("UNICLON_STREAM_DELIVERY", False)
+UPLOAD_CONCURRENCY = max(1, int(os.getenv("UNICLON_UPLOAD_CONCURRENCY", "2") or 2))
+UPLOAD_RATE_PER_SEC = max(0.1, float(os.getenv("UNICLON_UPLOAD_RATE", "1.0") or 1.0))
+UPLOAD_BURST = max(1, int(os.getenv("UNICLON_UPLOAD_BURST", "3") or 3))
+# ZIP собирается прямо в загрузку без временного файла
+ZIP_STREAM_UPLOAD = _env_flag("UNICLON_ZIP_STREAM_UPLOAD", False)
+# END REGION AI
+
+# REGION AI: streaming download settings
+DOWNLOAD_CHUNK_SIZE = max(64, int(os.getenv("UNICLON_DOWNLOAD_CHUNK_KB", "1024") or 1024)) * 1024
+DOWNLOAD_RETRIES = max(1, int(os.getenv("UNICLON_DOWNLOAD_RETRIES", "4") or 4))
+# END REGION AI
+
+# REGION AI: local job API
+JOB_API_ENABLED = _env_flag("UNICLON_JOB_API", False)
+JOB_API_HOST = os.getenv("UNICLON_JOB_API_HOST", "127.0.0.1").strip() or "127.0.0.1"
+JOB_API_PORT = int(os.getenv("UNICLON_JOB_API_PORT", "8787") or 8787)
+# Пустой токен — без авторизации (по умолчанию API слушает только localhost)
+JOB_API_TOKEN = os.getenv("UNICLON_JOB_API_TOKEN", "").strip()
+# Каталоги, из которых разрешено ставить задачи по пути (через os.pathsep)
+JOB_API_PATH_ROOTS = [Path(item).expanduser() for item in os.getenv("UNICLON_JOB_API_ROOTS", str(BASE_DIR)).split(os.pathsep) if item.strip()]
+JOB_API_MAX_UPLOAD = max(1, int(os.getenv("UNICLON_JOB_API_MAX_UPLOAD_MB", "4096") or 4096)) * 1024 * 1024
+JOB_API_HISTORY = max(10, int(os.getenv("UNICLON_JOB_API_HISTORY", "500") or 500))
+# END REGION AI
@@ -1,15 +1,239 @@
-
 from pathlib import Path
 
 import aiohttp
 from aiogram import Bot
 from aiogram.types import Message
 
+# REGION AI: imports
+import asyncio
+import hashlib
+import logging
+import os
+from dataclasses import dataclass
+from typing import Optional
 
-# fix: добавлен HTTPS fallback для скачивания файлов из Telegram
-# REGION AI: download_telegram_file fallback
-async def download_telegram_file(bot: Bot, message: Message, dest_path: Path) -> Path:
-    """Скачивает Video или Document(.mp4) в dest_path, пытается сохранить имя файла."""
+import errno
+
+from config import (
+    BOT_API_LOCAL,
+    BOT_API_LOCAL_PATH_MAP,
+    DOWNLOAD_CHUNK_SIZE,
+    DOWNLOAD_RETRIES,
+    LOCAL_INGEST_MODE,
+)
+# END REGION AI
+
+# REGION AI: streaming download state
+logger = logging.getLogger(__name__)
+
+_PARTIAL_SUFFIX = ".part"
+_RETRY_BACKOFF = 1.5
+
+
+@dataclass
+class DownloadResult:
+    path: Path
+    size: int
+    digest: Optional[str]
+    method: str = "stream"
+
+
+def _is_transient(exc: BaseException) -> bool:
+    """Повторяем только таймауты, сетевые обрывы и 5xx; 4xx (нет файла, истёк токен) не исправится ретраем."""
+    if isinstance(exc, aiohttp.ClientResponseError):
+        return exc.status >= 500
+    return True
+
+
+def _public_file_url(bot: Bot, file_path: str) -> str:
+    return f"https://api.telegram.org/file/bot{bot.token}/{file_path}"
+
+
+def _file_url(bot: Bot, file_path: str) -> str:
+    session = getattr(bot, "session", None)
+    api = getattr(session, "api", None)
+    if api is not None:
+        try:
+            return api.file_url(bot.token, file_path)
+        except Exception:  # noqa: BLE001
+            logger.debug("Custom API server file_url failed, using public endpoint", exc_info=True)
+    return _public_file_url(bot, file_path)
+
+
+def _hash_existing(partial: Path, hasher: "hashlib._Hash") -> int:
+    """Подмешивает в хэш уже скачанную часть файла перед докачкой."""
+    written = 0
+    with partial.open("rb") as fh:
+        while True:
+            chunk = fh.read(DOWNLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            hasher.update(chunk)
+            written += len(chunk)
+    return written
+
+
+async def _stream_to_file(url: str, dest_path: Path) -> DownloadResult:
+    """Скачивает url чанками в <dest>.part с докачкой по Range и атомарным rename."""
+    partial = dest_path.with_name(dest_path.name + _PARTIAL_SUFFIX)
+    partial.unlink(missing_ok=True)
+    timeout = aiohttp.ClientTimeout(total=None, sock_connect=30, sock_read=120)
+    try:
+        return await _stream_attempts(url, dest_path, partial, timeout)
+    finally:
+        # fix: докачка живёт только внутри цикла попыток — после ошибки (rename, отмена) .part не оставляем;
+        # после успешного rename файла уже нет
+        partial.unlink(missing_ok=True)
+
+
+async def _stream_attempts(url: str, dest_path: Path, partial: Path, timeout: aiohttp.ClientTimeout) -> DownloadResult:
+    hasher = hashlib.blake2b(digest_size=32)
+    written = 0
+    last_error: Optional[BaseException] = None
+
+    async with aiohttp.ClientSession(timeout=timeout) as session:
+        for attempt in range(1, DOWNLOAD_RETRIES + 1):
+            headers = {"Range": f"bytes={written}-"} if written else {}
+            try:
+                async with session.get(url, headers=headers) as response:
+                    response.raise_for_status()
+                    if written and response.status != 206:
+                        # fix: сервер проигнорировал Range — начинаем файл заново
+                        logger.warning("Range not honoured for %s, restarting download", dest_path.name)
+                        hasher = hashlib.blake2b(digest_size=32)
+                        written = 0
+                    mode = "ab" if written else "wb"
+                    with partial.open(mode) as fh:
+                        async for chunk in response.content.iter_chunked(DOWNLOAD_CHUNK_SIZE):
+                            fh.write(chunk)
+                            hasher.update(chunk)
+                            written += len(chunk)
+                last_error = None
+                break
+            except (aiohttp.ClientError, asyncio.TimeoutError) as exc:
+                last_error = exc
+                if not _is_transient(exc):
+                    logger.warning("Download of %s failed with non-retryable error: %s", dest_path.name, exc)
+                    break
+                if partial.exists():
+                    size_on_disk = partial.stat().st_size
+                    if size_on_disk != written:
+                        # fix: хэш и файл разошлись — пересчитываем по тому, что реально на диске
+                        hasher = hashlib.blake2b(digest_size=32)
+                        written = _hash_existing(partial, hasher)
+                logger.warning(
+                    "Download attempt %s/%s for %s failed at %s bytes: %s",
+                    attempt,
+                    DOWNLOAD_RETRIES,
+                    dest_path.name,
+                    written,
+                    exc,
+                )
+                if attempt < DOWNLOAD_RETRIES:
+                    await asyncio.sleep(_RETRY_BACKOFF * attempt)
+
+    if last_error is not None:
+        raise last_error
+
+    os.replace(partial, dest_path)
+    return DownloadResult(path=dest_path, size=written, digest=hasher.hexdigest())
+# END REGION AI
+
+
+# REGION AI: local bot api ingest
+_FICLONE = 0x40049409
+
+
+def _map_local_path(server_path: str) -> Optional[Path]:
+    """Переводит путь из хранилища local Bot API сервера в путь, видимый боту."""
+    if not server_path or not os.path.isabs(server_path):
+        return None
+    for server_prefix, local_prefix in BOT_API_LOCAL_PATH_MAP:
+        if server_path == server_prefix or server_path.startswith(server_prefix.rstrip("/") + "/"):
+            return Path(local_prefix) / os.path.relpath(server_path, server_prefix)
+    return Path(server_path)
+
+
+def _try_reflink(src: Path, dst: Path) -> bool:
+    try:
+        import fcntl
+    except ImportError:
+        return False
+    try:
+        with src.open("rb") as fsrc, dst.open("wb") as fdst:
+            fcntl.ioctl(fdst.fileno(), _FICLONE, fsrc.fileno())
+        return True
+    except OSError:
+        dst.unlink(missing_ok=True)
+        return False
+
+
+def _copy_hashed(src: Path, dst: Path) -> DownloadResult:
+    partial = dst.with_name(dst.name + _PARTIAL_SUFFIX)
+    hasher = hashlib.blake2b(digest_size=32)
+    written = 0
+    try:
+        with src.open("rb") as fsrc, partial.open("wb") as fdst:
+            while True:
+                chunk = fsrc.read(DOWNLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                fdst.write(chunk)
+                hasher.update(chunk)
+                written += len(chunk)
+        os.replace(partial, dst)
+    finally:
+        partial.unlink(missing_ok=True)
+    return DownloadResult(path=dst, size=written, digest=hasher.hexdigest(), method="copy")
+
+
+def _ingest_local_sync(src: Path, dest_path: Path) -> DownloadResult:
+    """Забирает файл local-сервера без второй копии: hardlink → reflink → symlink → копия."""
+    size = src.stat().st_size
+    if dest_path.exists() or dest_path.is_symlink():
+        dest_path.unlink()
+    if LOCAL_INGEST_MODE != "copy":
+        try:
+            os.link(src, dest_path)
+            # fix: zero-copy ingest не читает источник — хэш многогигабайтного файла свёл бы выигрыш на нет
+            return DownloadResult(path=dest_path, size=size, digest=None, method="hardlink")
+        except OSError as exc:
+            if exc.errno not in (errno.EXDEV, errno.EPERM, errno.EMLINK, errno.ENOTSUP, errno.EACCES):
+                raise
+        if _try_reflink(src, dest_path):
+            return DownloadResult(path=dest_path, size=size, digest=None, method="reflink")
+        try:
+            dest_path.symlink_to(src)
+            return DownloadResult(path=dest_path, size=size, digest=None, method="in_place")
+        except OSError:
+            pass
+    return _copy_hashed(src, dest_path)
+
+
+async def _try_local_ingest(file_path: str, dest_path: Path) -> Optional[DownloadResult]:
+    if not BOT_API_LOCAL:
+        return None
+    src = _map_local_path(file_path)
+    if src is None or not src.is_file():
+        if src is not None:
+            logger.warning("Local Bot API file %s is not reachable, falling back to HTTP", src)
+        return None
+    try:
+        return await asyncio.to_thread(_ingest_local_sync, src, dest_path)
+    except OSError:
+        logger.warning("Local ingest of %s failed, falling back to HTTP", src, exc_info=True)
+        return None
+
+
+async def ingest_local_file(src: Path, dest_path: Path) -> DownloadResult:
+    """Забирает локальный файл (job API по пути) тем же способом, что и файлы local Bot API."""
+    return await asyncio.to_thread(_ingest_local_sync, src, dest_path)
+# END REGION AI
+
+
+# REGION AI: streaming telegram fetch
+async def fetch_telegram_file(bot: Bot, message: Message, dest_path: Path) -> DownloadResult:
+    """Как download_telegram_file, но дополнительно возвращает размер и BLAKE2b-хэш."""
     if message.video:
         file_id = message.video.file_id
         original_name = message.video.file_name or dest_path.name
@@ -26,14 +250,30 @@ async def download_telegram_file(bot: Bot, message: Message, dest_path: Path) ->
     dest_path.parent.mkdir(parents=True, exist_ok=True)
 
     tg_file = await bot.get_file(file_id)
+    result = await _try_local_ingest(tg_file.file_path, dest_path)
+    if result is not None:
+        logger.info("Ingested %s from local Bot API storage via %s (%s bytes)", result.path.name, result.method, result.size)
+        return result
+
+    # fix: потоковое скачивание вместо буферизации всего видео в памяти
+    url = _file_url(bot, tg_file.file_path)
     try:
-        await bot.download_file(tg_file.file_path, destination=dest_path)
+        result = await _stream_to_file(url, dest_path)
     except Exception:
-        url = f"https://api.telegram.org/file/bot{bot.token}/{tg_file.file_path}"
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url) as response:
-                response.raise_for_status()
-                dest_path.write_bytes(await response.read())
+        public_url = _public_file_url(bot, tg_file.file_path)
+        if url == public_url:
+            raise
+        logger.warning("Download via custom API server failed, retrying via api.telegram.org", exc_info=True)
+        result = await _stream_to_file(public_url, dest_path)
+    logger.info("Downloaded %s (%s bytes, blake2b=%s)", result.path.name, result.size, result.digest[:16])
+    return result
+# END REGION AI
 
-    return dest_path
+
+# fix: добавлен HTTPS fallback для скачивания файлов из Telegram
+# REGION AI: download_telegram_file fallback
+async def download_telegram_file(bot: Bot, message: Message, dest_path: Path) -> Path:
+    """Скачивает Video или Document(.mp4) в dest_path, пытается сохранить имя файла."""
+    result = await fetch_telegram_file(bot, message, dest_path)
+    return result.path
 # END REGION AI
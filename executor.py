@@ -11,7 +11,7 @@ import time
 
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Dict, List, Optional, Sequence, Tuple
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
 
 # REGION AI: imports
 from adaptive_tuner import get_tuned_params, record_render_result
@@ -22,17 +22,27 @@ from config import (
     NO_DEVICE_INFO,
     PLATFORM_PRESETS,
     CHECKS_DIR,
+    QUEUE_WORKERS,
 )
 from report_builder import build_uniqueness_report
-from render_queue import acquire_render_slot
+from render_queue import acquire_render_slot, configure_render_slots
 from orchestrator import add_task as orchestrator_add_task, finish_task as orchestrator_finish_task
 from services.video_processor import run_protective_process_async
 from qc_analyzer import CopyQCResult, QC_MIN_REQUIRED_COPIES, load_qc_report
+from modules.core.job_context import JobContext
+from modules.core.probe_cache import probe_async
+from job_budget import JobBudget
+from resource_planner import parse_resolution, plan_resources
+from process_policy import after_spawn, describe as describe_process_policy, policy_env, preexec_for
 # END REGION AI
 
 
 logger = logging.getLogger(__name__)
 
+# REGION AI: per-copy ready callback
+CopyReadyCallback = Callable[[int, Path], None]
+# END REGION AI
+
 
 ERROR_MAP = {
     1: "FFmpeg generic failure",
@@ -47,9 +57,25 @@ _SAVED_LINE_RE = re.compile(
 )
 
 RUN_LOG_PATH = OUTPUT_DIR / "uniclon_run.log"
-_CPU_CORES = os.cpu_count() or 1
-_BASE_MAX_JOBS = max(1, min(2, (_CPU_CORES // 2) or 1))
-_FFMPEG_LIMITS = {False: asyncio.Semaphore(_BASE_MAX_JOBS), True: asyncio.Semaphore(1)}
+# fix: число параллельных энкодов считается по квоте cgroup и памяти, а не по os.cpu_count()
+RESOURCE_PLAN = plan_resources()
+logger.info("🧮 Resource plan: %s", RESOURCE_PLAN.describe())
+_FFMPEG_LIMITS = {False: asyncio.Semaphore(1), True: asyncio.Semaphore(1)}
+_BASE_MAX_JOBS = 1
+
+
+def set_render_parallelism(workers: int) -> int:
+    """Число одновременных рендеров: слоты render_queue, семафор ffmpeg и бюджет потоков считаются от одного значения."""
+    global _BASE_MAX_JOBS
+    # fix: план ресурсов делит потоки на реальное число слотов, а не на теоретический RESOURCE_PLAN.workers
+    _BASE_MAX_JOBS = configure_render_slots(min(max(1, int(workers)), RESOURCE_PLAN.workers))
+    _FFMPEG_LIMITS[False] = asyncio.Semaphore(_BASE_MAX_JOBS)
+    return _BASE_MAX_JOBS
+
+
+# fix: воркеры UserTaskQueue должны получать по слоту рендера, иначе параллельна только загрузка/отправка
+set_render_parallelism(QUEUE_WORKERS)
+logger.info("🧷 Process classes: %s", describe_process_policy())
 _COPY_SEMAPHORE = asyncio.Semaphore(1)
 _QC_SOFT_RETRY_LIMIT = max(1, int(os.getenv("UNICLON_QC_SOFT_RETRIES", "2")))
 
@@ -132,9 +158,20 @@ def _log_copy_run(
 
 # REGION AI: adaptive tuning bootstrap
 _ADAPTIVE_ENV, _ADAPTIVE_META = get_tuned_params()
-os.environ.update(_ADAPTIVE_ENV)
+# fix: тюнинг не пишется в os.environ — он попадает в env подпроцесса через JobContext
 _avg_text = "-" if _ADAPTIVE_META.get("uniq_avg") is None else f"{_ADAPTIVE_META['uniq_avg']:.1f}"
 logger.info("🎚 Adaptive tuner applied: mode=%s | UniqScore_avg=%s", _ADAPTIVE_META.get("mode", "neutral"), _avg_text)
+
+
+def new_job_context(profile: str = "", quality: str = "", extra_env: Optional[Dict[str, str]] = None) -> JobContext:
+    """Контекст задачи с текущим адаптивным тюнингом."""
+    return JobContext(
+        profile=profile,
+        quality=quality,
+        tuning=dict(_ADAPTIVE_ENV),
+        tuning_mode=str(_ADAPTIVE_META.get("mode", "neutral")),
+        extra_env=dict(extra_env or {}),
+    )
 # END REGION AI
 
 # REGION AI: script path logging
@@ -144,8 +181,17 @@ logger.info("Using processing script: %s", SCRIPT_PATH)
 
 # REGION AI: smart render queue wrapper
 async def run_script_with_logs(
-    input_file: Path, copies: int, cwd: Path, profile: str, quality: str
+    input_file: Path,
+    copies: int,
+    cwd: Path,
+    profile: str,
+    quality: str,
+    on_copy_ready: Optional[CopyReadyCallback] = None,
+    extra_env: Optional[Dict[str, str]] = None,
+    context: Optional[JobContext] = None,
 ) -> Tuple[int, str]:
+    if context is None:
+        context = new_job_context(profile, quality)
     try:
         priority = max(1, int(os.getenv("UNICLON_RENDER_PRIORITY", "1")))
     except ValueError:
@@ -169,6 +215,9 @@ async def run_script_with_logs(
                 profile,
                 quality,
                 orchestrator_ticket=ticket,
+                on_copy_ready=on_copy_ready,
+                extra_env=extra_env,
+                context=context,
             )
         except Exception:
             try:
@@ -200,8 +249,13 @@ async def _run_script_core(
     profile: str,
     quality: str,
     orchestrator_ticket: Optional[Dict[str, object]] = None,
+    on_copy_ready: Optional[CopyReadyCallback] = None,
+    extra_env: Optional[Dict[str, str]] = None,
+    context: Optional[JobContext] = None,
 ) -> Tuple[int, str]:
     """Запускает bash-скрипт и возвращает (returncode, объединённые логи)."""
+    if context is None:
+        context = new_job_context(profile, quality)
     if not SCRIPT_PATH.exists():
         raise FileNotFoundError(f"Script not found: {SCRIPT_PATH}")
 
@@ -289,7 +343,7 @@ async def _run_script_core(
     failure_names: List[str] = []
     saved_meta: Dict[str, Tuple[str, str]] = {}
     # END REGION AI
-    env = os.environ.copy()
+    env = context.build_env(os.environ)
     if orchestrator_ticket:
         env.update({k: str(v) for k, v in orchestrator_ticket.get("env", {}).items()})
         if orchestrator_ticket.get("mode") and orchestrator_ticket.get("mode") != "neutral":
@@ -300,6 +354,19 @@ async def _run_script_core(
             )
     env["OUTPUT_DIR"] = str(OUTPUT_DIR)
     env["PREVIEW_DIR"] = str(OUTPUT_DIR / "previews")
+    # REGION AI: per-render thread budget
+    resolution = parse_resolution((preset_details or {}).get("resolution"))
+    render_plan = plan_resources(resolution).for_workers(1 if eco_active else _BASE_MAX_JOBS)
+    env.update(render_plan.to_env())
+    env.update(policy_env())
+    logger.info("🧮 Thread budget for %s: %s", input_file.name, render_plan.describe())
+    # END REGION AI
+    # REGION AI: deadline-aware job budget
+    budget = JobBudget.for_job(copies, context.budget_seconds)
+    env.update(budget.to_env())
+    # END REGION AI
+    if extra_env:
+        env.update({k: str(v) for k, v in extra_env.items()})
 
     sem = _FFMPEG_LIMITS[eco_active]
     await sem.acquire()
@@ -316,10 +383,13 @@ async def _run_script_core(
             stdout=asyncio.subprocess.PIPE,
             stderr=asyncio.subprocess.STDOUT,
             env=env,
+            preexec_fn=preexec_for("render"),
         )
     except Exception:
         sem.release()
+        budget.close()
         raise
+    after_spawn("render", proc.pid)
 
     lines: List[str] = []
     last_nonempty: Optional[str] = None
@@ -412,10 +482,26 @@ async def _run_script_core(
                 logger.info("🎛 Параметры копии: file=%s | fps=%s | bitrate=%s | ss=%s | duration=%s", target, tokens.get("fps", "-"), tokens.get("br", "-"), ss_value, duration_map[target])
                 last_target = target
                 clip_hint = ""
+                budget.copy_started()
         elif stripped.startswith("✅ done:"):
             target = stripped.split("✅ done:", 1)[1].strip()
             success_files.append(target)
             logger.info("✅ Копия завершена: file=%s | duration=%s", target, duration_map.get(target, "-"))
+            budget.copy_finished()
+            # REGION AI: emit per-copy ready event
+            if on_copy_ready is not None:
+                ready_idx = next(
+                    (idx for idx, info in copy_meta.items() if Path(info.get("file", "")).name == Path(target).name),
+                    len(success_files),
+                )
+                ready_path = Path(target)
+                if not ready_path.is_absolute():
+                    ready_path = Path(cwd) / ready_path
+                try:
+                    on_copy_ready(ready_idx, ready_path)
+                except Exception:
+                    logger.exception("Copy ready callback failed for %s", target)
+            # END REGION AI
         elif stripped.startswith("❌"):
             failure = Path(last_target or input_file.name).name
             if failure not in failure_names:
@@ -423,6 +509,9 @@ async def _run_script_core(
 
     rc = await proc.wait()
     sem.release()
+    budget.close()
+    if budget.decisions:
+        logger.warning("[Deadline] %s: tier decisions %s", input_file.name, "; ".join(budget.decisions))
     logger.info("✅ %s копии успешно", len(success_files))
     if failure_names:
         logger.error("❌ %s копии с ошибкой: %s", len(failure_names), ", ".join(failure_names))
@@ -506,37 +595,12 @@ async def list_new_mp4s(since_ts: float, name_hint: str = "") -> List[Path]:
 
 
 async def probe_video_duration(path: Path) -> Optional[float]:
-    cmd = [
-        "ffprobe",
-        "-v",
-        "error",
-        "-show_entries",
-        "format=duration",
-        "-of",
-        "default=noprint_wrappers=1:nokey=1",
-        str(path),
-    ]
-    try:
-        proc = await asyncio.create_subprocess_exec(
-            *cmd,
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE,
-        )
-    except FileNotFoundError:
-        logger.warning("ffprobe not available to measure duration")
-        return None
-
-    stdout, stderr = await proc.communicate()
-    if proc.returncode != 0:
-        logger.warning(
-            "ffprobe failed for %s: %s", path, stderr.decode(errors="replace").strip()
-        )
-        return None
-
-    try:
-        return float(stdout.decode().strip())
-    except (TypeError, ValueError):
-        return None
+    # REGION AI: cached ffprobe
+    # Общий с bash кэш ffprobe: источник, уже пробованный ботом, скрипт не пробует повторно
+    cache_dir = Path(os.environ.get("UNICLON_CACHE_DIR") or OUTPUT_DIR / "cache") / "probe"
+    probe = await probe_async(path, cache_dir)
+    return probe.duration if probe is not None else None
+    # END REGION AI
 
 
 async def process_copies_sequentially(
@@ -545,13 +609,20 @@ async def process_copies_sequentially(
     profile: str,
     quality: str,
     *,
-    timeout: float = 300.0,
+    timeout: Optional[float] = None,
     retries: int = 1,
+    budget_seconds: Optional[float] = None,
 ) -> List[Dict[str, object]]:
     results = []
+    # REGION AI: deadline-aware job budget
+    # fix: вместо фиксированных 300 с на копию — бюджет задачи; при угрозе дедлайна копии ускоряются, а не убиваются
+    budget = JobBudget.for_job(copies, budget_seconds)
+    # END REGION AI
     for idx in range(1, copies + 1):
         attempt = 0
         while True:
+            copy_timeout = timeout if timeout is not None else budget.copy_timeout()
+            budget.copy_started()
             try:
                 async with _COPY_SEMAPHORE:
                     payload = await asyncio.wait_for(
@@ -560,14 +631,19 @@ async def process_copies_sequentially(
                             1,
                             profile,
                             quality,
+                            new_job_context(profile, quality, extra_env=budget.to_env()),
+                            timeout=copy_timeout,
                         ),
-                        timeout=timeout,
+                        timeout=copy_timeout + 30,
                     )
                 outputs = [Path(p) for p in payload.get("outputs", []) if p]
                 if not outputs:
+                    if str(payload.get("log_tail") or "").startswith("Timed out"):
+                        raise asyncio.TimeoutError
                     raise RuntimeError("no output produced")
                 output_path = outputs[0]
-                results.append({"index": idx, "path": output_path})
+                budget.copy_finished()
+                results.append({"index": idx, "path": output_path, "tier": budget.tier})
                 try:
                     logger.info("[Preview] Marking %s for preview export", output_path.name)
                     (Path(CHECKS_DIR) / "preview_flags").mkdir(parents=True, exist_ok=True)
@@ -577,8 +653,9 @@ async def process_copies_sequentially(
                     logger.exception("Failed to mark %s for preview export", output_path.name)
                 break
             except asyncio.TimeoutError:
-                results.append({"index": idx, "error": "timeout"})
-                break
+                if budget.escalate(f"copy {idx} timed out after {copy_timeout:.0f}s") is None:
+                    results.append({"index": idx, "error": "timeout"})
+                    break
             except Exception as exc:  # noqa: BLE001
                 if attempt >= retries:
                     logger.exception("Copy #%d failed: %s", idx, exc)
@@ -588,6 +665,9 @@ async def process_copies_sequentially(
                 await asyncio.sleep(2)
         if idx < copies:
             await asyncio.sleep(random.uniform(0.5, 1.2))
+    budget.close()
+    if budget.decisions:
+        logger.warning("[Deadline] %s: tier decisions %s", input_path.name, "; ".join(budget.decisions))
     return results
 
 
@@ -597,7 +677,7 @@ async def rerun_ffmpeg_with_soft_retry(
     profile: str,
     quality: str,
     *,
-    timeout: float = 300.0,
+    timeout: Optional[float] = None,
 ) -> List[Path]:
     if copies <= 0:
         return []
@@ -4,7 +4,7 @@ import os
 import re
 import shutil
 import time
-import zipfile
+from dataclasses import dataclass
 from pathlib import Path
 from typing import Dict, Iterable, List, Optional, Set, Tuple, TYPE_CHECKING
 
@@ -33,7 +33,12 @@ from config import (
     CLEAN_UP_INPUT,
     CHECKS_DIR,
     FORCE_ZIP_ARCHIVE,
+    BATCH_CHUNK_SIZE,
+    STREAM_DELIVERY,
+    UPLOAD_CONCURRENCY,
+    ZIP_STREAM_UPLOAD,
 )
+from qc_analyzer import load_copy_qc
 from utils import (
     parse_copies_from_caption,
     parse_filename_and_copies,
@@ -42,6 +47,8 @@ from utils import (
     auto_cleanup_temp_dirs,
 )
 from downloader import download_telegram_file
+from uploader import UploadManager
+from archive_builder import ArchiveStats, StreamingZipInputFile, build_archive_async
 from executor import (
     run_script_with_logs,
     list_new_mp4s,
@@ -49,7 +56,9 @@ from executor import (
     process_copies_sequentially,
     enforce_quality_gate,
     ERROR_MAP,
+    RESOURCE_PLAN,
 )
+from render_queue import render_slots
 # END REGION AI
 from locales import get_text
 
@@ -167,11 +176,158 @@ async def finalize_video(message: Message, output_path: Path) -> None:
     """Send processed video with a document fallback."""
 
     caption = output_path.name
-    try:
-        await message.answer_video(video=FSInputFile(output_path), caption=caption)
-    except Exception:
-        logger.exception("Failed to send video %s; fallback to document", output_path)
-        await message.answer_document(document=FSInputFile(output_path), caption=caption)
+    # fix: через общий лимитер, чтобы не ловить flood-control Telegram
+    if not await _DEFAULT_UPLOADS.send_video(message, output_path, caption):
+        raise RuntimeError(f"Failed to deliver {output_path.name}")
+
+
+_DEFAULT_UPLOADS = UploadManager()
+
+
+def _archive_stats_text(stats: ArchiveStats) -> str:
+    return f"🗜 Архив собран за {stats.seconds:.1f} с, записано {stats.bytes_written / 1024 / 1024:.1f} МБ ({stats.files} файлов)"
+
+
+# REGION AI: pipelined per-copy delivery
+class _StreamingDelivery:
+    """Отправляет каждую копию сразу после её рендера и QC, пока остальные ещё кодируются."""
+
+    # сколько ждать строку метрик копии, прежде чем придержать её до общего QC в конце
+    QC_WAIT_SECONDS = 20.0
+
+    def __init__(
+        self,
+        message: Message,
+        copies: int,
+        uploads: UploadManager,
+        batch: Optional["BatchChunk"] = None,
+        metrics_path: Optional[Path] = None,
+    ) -> None:
+        self._message = message
+        self.metrics_path = metrics_path or CHECKS_DIR / f"copy_metrics_{os.getpid()}_{id(self)}.json"
+        self._copies = batch.total_copies if batch else copies
+        self._offset = batch.offset if batch else 0
+        self._uploads = uploads
+        self._tasks: List[asyncio.Task] = []
+        self._seen: Set[Path] = set()
+        self.delivered: Dict[int, Path] = {}
+        self.rejected: Dict[int, Path] = {}
+        self.held: Dict[int, Path] = {}
+        self.first_sent_at: Optional[float] = None
+
+    def on_copy_ready(self, index: int, path: Path) -> None:
+        resolved = path.resolve()
+        if resolved in self._seen:
+            return
+        self._seen.add(resolved)
+        self._tasks.append(asyncio.create_task(self._deliver(index, resolved)))
+
+    async def _deliver(self, index: int, path: Path) -> None:
+        qc = await asyncio.to_thread(load_copy_qc, path.name, self.metrics_path)
+        waited = 0.0
+        while qc is None and waited < self.QC_WAIT_SECONDS:
+            await asyncio.sleep(1.0)
+            waited += 1.0
+            qc = await asyncio.to_thread(load_copy_qc, path.name, self.metrics_path)
+        if qc is None:
+            # fix: без метрик копию не отправляем вслепую — она пройдёт общий QC-гейт после завершения скрипта
+            logger.warning("[QC] No metrics for streaming copy %s, holding it for the final quality gate", index)
+            self.held[index] = path
+            return
+        if not qc.is_valid():
+            logger.warning("[QC] Streaming copy %s rejected (%s)", index, qc.metrics_for_log())
+            self.rejected[index] = path
+            return
+        if not path.exists():
+            logger.warning("Streaming copy %s vanished before upload: %s", index, path)
+            return
+        caption = f"🎬 {index + self._offset}/{self._copies} · {path.name}"
+        if not await self._uploads.send_video(self._message, path, caption):
+            logger.error("Streaming delivery of %s failed", path)
+            return
+        if self.first_sent_at is None:
+            self.first_sent_at = time.time()
+        self.delivered[index] = path
+
+    @property
+    def env(self) -> Dict[str, str]:
+        return {"UNICLON_COPY_METRICS": str(self.metrics_path)}
+
+    async def drain(self) -> List[Path]:
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        self.metrics_path.unlink(missing_ok=True)
+        return [self.delivered[idx] for idx in sorted(self.delivered)]
+# END REGION AI
+
+# REGION AI: chunked batch mode
+@dataclass
+class BatchChunk:
+    """Чанк большого пакета: свой диапазон номеров копий и общий файл состояния уникальности."""
+
+    index: int
+    total_chunks: int
+    offset: int
+    total_copies: int
+    state_path: Path
+    plan: "_BatchPlan"
+
+    @property
+    def env(self) -> Dict[str, str]:
+        return {
+            "UNICLON_COPY_INDEX_OFFSET": str(self.offset),
+            "UNICLON_BATCH_STATE": str(self.state_path),
+        }
+
+    @property
+    def label(self) -> str:
+        return f"{self.index}/{self.total_chunks}"
+
+
+@dataclass
+class _BatchPlan:
+    state_path: Path
+    remaining: int
+
+    def chunk_done(self) -> None:
+        self.remaining -= 1
+        if self.remaining <= 0:
+            try:
+                self.state_path.unlink(missing_ok=True)
+            except OSError:
+                logger.debug("Failed to remove batch state %s", self.state_path, exc_info=True)
+
+
+def _plan_batch(input_path: Path, copies: int, token: object) -> List[Tuple[int, BatchChunk]]:
+    state_dir = CHECKS_DIR / "batch_state"
+    state_dir.mkdir(parents=True, exist_ok=True)
+    state_path = state_dir / f"{input_path.stem}_{token}.tsv"
+    state_path.unlink(missing_ok=True)
+    sizes = [BATCH_CHUNK_SIZE] * (copies // BATCH_CHUNK_SIZE)
+    if copies % BATCH_CHUNK_SIZE:
+        sizes.append(copies % BATCH_CHUNK_SIZE)
+    plan = _BatchPlan(state_path=state_path, remaining=len(sizes))
+    chunks: List[Tuple[int, BatchChunk]] = []
+    offset = 0
+    for idx, size in enumerate(sizes, start=1):
+        chunks.append((size, BatchChunk(idx, len(sizes), offset, copies, state_path, plan)))
+        offset += size
+    return chunks
+
+
+def _reported_outputs(logs_text: str) -> List[Path]:
+    outputs: List[Path] = []
+    for line in logs_text.splitlines():
+        stripped = line.strip()
+        if not stripped.startswith("✅ done:"):
+            continue
+        candidate = Path(stripped.split("✅ done:", 1)[1].strip())
+        if not candidate.is_absolute():
+            candidate = BASE_DIR / candidate
+        if candidate.exists() and candidate.resolve() not in {p.resolve() for p in outputs}:
+            outputs.append(candidate)
+    return outputs
+# END REGION AI
 
 _task_queue: Optional["UserTaskQueue"] = None
 _user_profiles: Dict[int, str] = {}
@@ -412,14 +568,15 @@ async def handle_status(message: Message) -> None:
     if not message.from_user:
         return
 
+    plan_line = f"🧮 Ресурсы: {RESOURCE_PLAN.describe()} | слотов рендера: {render_slots()}"
     queue = _get_task_queue()
     if queue is None:
-        await message.answer("💤 У вас нет активных задач")
+        await message.answer(f"💤 У вас нет активных задач\n{plan_line}")
         return
 
     tasks = await queue.get_user_tasks(message.from_user.id)
     if not tasks:
-        await message.answer("💤 У вас нет активных задач")
+        await message.answer(f"💤 У вас нет активных задач\n{plan_line}")
         return
 
     status_labels = {"pending": "⏳ В ожидании", "active": "🔄 Обрабатывается"}
@@ -430,7 +587,13 @@ async def handle_status(message: Message) -> None:
         if getattr(task, "profile", None):
             human = _VALID_PROFILES.get(task.profile or "", task.profile)
             profile_label = f" [{human}]"
-        lines.append(f"{idx}. {task.label}{profile_label} — {status}")
+        position_label = ""
+        if task.status == "pending" and hasattr(queue, "get_position"):
+            position = await queue.get_position(message.from_user.id, task.task_id)
+            if position:
+                position_label = f" (позиция {position})"
+        lines.append(f"{idx}. {task.label}{profile_label} — {status}{position_label}")
+    lines.append(plan_line)
 
     await message.answer("\n".join(lines))
 
@@ -831,14 +994,65 @@ async def _enqueue_processing(
     )
     # END REGION AI
 
-    if copies > 5:
-        copies = 5
-        await message.answer("⚠️ Максимум 5 копий за один запуск.")
-
     removed_auto = auto_cleanup_stale_outputs(user_id)
     if removed_auto:
         logger.info("Auto-clean removed %s stale files for user=%s", removed_auto, user_id)
 
+    # REGION AI: chunked batch enqueue
+    # fix: вместо молчаливого обрезания до 5 копий большой запрос режется на чанки очереди
+    if copies > BATCH_CHUNK_SIZE:
+        chunks = _plan_batch(input_path, copies, message.message_id)
+        await message.answer(
+            f"📦 {copies} копий будут сделаны пакетами по {BATCH_CHUNK_SIZE} ({len(chunks)} шт.); результаты придут по мере готовности."
+        )
+        # fix: чанки одного пакета идут строго друг за другом — скрипт читает общий файл уникальности только на старте,
+        # и параллельные чанки (QUEUE_PER_USER_LIMIT > 1) выбрали бы одни и те же варианты
+        acks = [ack] + [await message.answer(f"⏳ Пакет {chunk.label} в очереди…") for _, chunk in chunks[1:]]
+
+        async def submit(position: int) -> Optional[int]:
+            if position >= len(chunks):
+                return None
+            chunk_copies, chunk = chunks[position]
+
+            async def chunk_task() -> None:
+                try:
+                    await _run_and_send(
+                        message,
+                        acks[position],
+                        input_path,
+                        chunk_copies,
+                        profile,
+                        quality,
+                        save_preview,
+                        batch=chunk,
+                    )
+                finally:
+                    chunk.plan.chunk_done()
+                    await submit(position + 1)
+
+            if queue is not None:
+                try:
+                    return await queue.enqueue(
+                        user_id,
+                        chunk_task,
+                        f"{input_path.name} [{chunk.label}]",
+                        profile=profile or None,
+                        copies=chunk_copies,
+                        save_preview=save_preview,
+                        quality=quality,
+                    )
+                except RuntimeError:
+                    pass
+            await chunk_task()
+            return None
+
+        first_position = await submit(0)
+        if first_position is not None:
+            logger.info("Batch queued for user=%s chunks=%s first position=%s", user_id, len(chunks), first_position)
+            await message.answer(f"Пакеты поставлены в очередь (позиция {first_position}), следующие пойдут по очереди.")
+        return
+    # END REGION AI
+
     async def task() -> None:
         await _run_and_send(
             message,
@@ -850,17 +1064,13 @@ async def _enqueue_processing(
             save_preview,
         )
 
-    # REGION AI: linear execution
-    await task()
-    return
-    # END REGION AI
-
     if queue is None:
         await task()
         return
 
     try:
-        await queue.enqueue(
+        # fix: очередь снова основной путь исполнения — хендлер не держит апдейт до конца рендера
+        position = await queue.enqueue(
             user_id,
             task,
             input_path.name,
@@ -873,8 +1083,8 @@ async def _enqueue_processing(
         await task()
         return
 
-    logger.info("Task queued for user=%s", user_id)
-    await message.answer("Видео поставлено в очередь. Ожидайте обработки…")
+    logger.info("Task queued for user=%s position=%s", user_id, position)
+    await message.answer(f"Видео поставлено в очередь (позиция {position}). Ожидайте обработки…")
 
 
 async def _run_and_send(
@@ -885,6 +1095,7 @@ async def _run_and_send(
     profile: str,
     quality: str,
     save_preview: bool,
+    batch: Optional[BatchChunk] = None,
 ) -> None:
     logger.info(f"Starting process for {copies} copies of {input_path.name}")
     before = {p.resolve() for p in OUTPUT_DIR.glob('*.mp4')}
@@ -901,8 +1112,15 @@ async def _run_and_send(
         if duration_val and duration_val > 60.0:
             await message.answer("Видео превышает 60 с, будет укорочено.")
 
-    await message.answer("Начата обработка видео…")
+    if batch is not None:
+        await message.answer(f"Начата обработка пакета {batch.label} (копии {batch.offset + 1}–{batch.offset + copies} из {batch.total_copies})…")
+    else:
+        await message.answer("Начата обработка видео…")
 
+    # REGION AI: pipelined delivery hook
+    uploads = UploadManager(UPLOAD_CONCURRENCY)
+    streaming = _StreamingDelivery(message, copies, uploads, batch) if STREAM_DELIVERY else None
+    # END REGION AI
     try:
         rc, logs_text = await run_script_with_logs(
             input_path,
@@ -910,11 +1128,29 @@ async def _run_and_send(
             BASE_DIR,
             profile,
             quality,
+            on_copy_ready=streaming.on_copy_ready if streaming else None,
+            extra_env={**(batch.env if batch else {}), **(streaming.env if streaming else {})} or None,
         )
     except Exception:
+        if streaming is not None:
+            await streaming.drain()
         await message.answer("Произошла ошибка при обработке. Попробуйте ещё раз.")
         raise
 
+    # REGION AI: pipelined delivery drain
+    streamed_files: List[Path] = []
+    if streaming is not None:
+        streamed_files = await streaming.drain()
+        if streaming.first_sent_at is not None:
+            logger.info(
+                "[Stream] First copy delivered after %.1fs, %s/%s streamed (rejected=%s)",
+                streaming.first_sent_at - start_ts,
+                len(streamed_files),
+                copies,
+                len(streaming.rejected),
+            )
+    # END REGION AI
+
     tail_lines: List[str] = []
     tail_text = ""
     last_log_line = ""
@@ -926,7 +1162,7 @@ async def _run_and_send(
             tail_lines.pop(0)
         tail_text = "\n".join(tail_lines)
 
-    temporary_error = rc != 0 and (
+    temporary_error = rc != 0 and not streamed_files and (
         "RETRY" in logs_text or "UniqScore=0.0" in logs_text
     )
     sequential_delivery = False
@@ -950,7 +1186,7 @@ async def _run_and_send(
             if path and path.exists():
                 delivered_files.append(path)
                 success_count += 1
-                await finalize_video(message, path)
+                await uploads.send_video(message, path)
                 logger.info(
                     "[Copy %s/%s] Done | CPU=%s%% | %s",
                     idx,
@@ -1001,6 +1237,20 @@ async def _run_and_send(
     else:
         ffmpeg_status_text = "✅ Video processed successfully."
 
+    if rc != 0 and streamed_files:
+        logger.warning(
+            "Script exited with %s for %s after streaming %s/%s copies",
+            rc,
+            input_path.name,
+            len(streamed_files),
+            copies,
+        )
+        # fix: код возврата не скрываем — пользователь получил только часть копий
+        ffmpeg_status_text = (
+            f"⚠️ Частичная доставка: отправлено {len(streamed_files)}/{copies} копий, "
+            f"скрипт завершился с кодом {rc}."
+        )
+
     if rc != 0:
         if sequential_delivery and delivered_files:
             logger.warning(
@@ -1055,8 +1305,11 @@ async def _run_and_send(
 
     await ack.edit_text(get_text(lang, "collecting_files"))
 
-    after = {p.resolve() for p in OUTPUT_DIR.glob('*.mp4')}
-    new_files = [p for p in after - before]
+    # fix: при параллельных задачах берём ровно те файлы, о которых отчитался скрипт
+    new_files = _reported_outputs(logs_text)
+    if not new_files:
+        after = {p.resolve() for p in OUTPUT_DIR.glob('*.mp4')}
+        new_files = [p for p in after - before]
     if not new_files:
         new_files = await list_new_mp4s(since_ts=start_ts, name_hint=input_path.name)
     if not new_files:
@@ -1070,6 +1323,11 @@ async def _run_and_send(
     new_files = sorted(new_files)[:copies]
     if sequential_delivery and delivered_files:
         new_files = delivered_files
+    # fix: при потоковой отправке QC уже прошёл по каждой копии — не дублируем отправку
+    streamed_set = {p.resolve() for p in streamed_files}
+    if streamed_files:
+        new_files = streamed_files + [p for p in new_files if p.resolve() not in streamed_set]
+        new_files = [p for p in new_files if p.exists()][:copies]
 
     qc_result = None
     if not sequential_delivery:
@@ -1134,7 +1392,7 @@ async def _run_and_send(
         sent = len(delivered_files)
         archive_sent = True
 
-    should_zip = len(new_files) > 10 or FORCE_ZIP_ARCHIVE
+    should_zip = (len(new_files) > 10 or FORCE_ZIP_ARCHIVE) and not streamed_files
     if should_zip and not sequential_delivery:
         total_size = 0
         total_known = True
@@ -1163,33 +1421,30 @@ async def _run_and_send(
 
         if total_size <= _TELEGRAM_DOCUMENT_LIMIT:
             archive_name = f"uniclon_{int(time.time())}_{message.message_id or 'zip'}"
-            archive_path = OUTPUT_DIR / f"{archive_name}.zip"
-            try:
-                with zipfile.ZipFile(archive_path, "w", compression=zipfile.ZIP_DEFLATED) as archive:
-                    for file_path in new_files:
-                        try:
-                            archive.write(file_path, arcname=file_path.name)
-                        except OSError as exc:
-                            logger.exception("Failed to add %s to archive: %s", file_path, exc)
-                            raise
-                    for extra in extra_files:
-                        try:
-                            archive.write(extra, arcname=extra.name)
-                        except OSError as exc:
-                            logger.warning("Failed to add %s to archive: %s", extra, exc)
-            except Exception:
-                logger.exception("Failed to build archive %s", archive_path)
+            archive_caption = "📦 Архив с уникализированными видео + manifest.csv + uniclon_report.csv"
+            # fix: сборка ZIP вне event loop, STORED для видео
+            if ZIP_STREAM_UPLOAD:
+                stream_file = StreamingZipInputFile(f"{archive_name}.zip", new_files, extra_files)
+                if await uploads.send_stream(message, stream_file, caption=archive_caption):
+                    archive_sent = True
+                    sent = len(new_files)
+                    if stream_file.stats:
+                        await message.answer(_archive_stats_text(stream_file.stats))
+                else:
+                    logger.error("Failed to stream archive %s", stream_file.filename)
             else:
+                archive_path = OUTPUT_DIR / f"{archive_name}.zip"
                 try:
-                    await message.answer_document(
-                        document=FSInputFile(archive_path),
-                        caption="📦 Архив с уникализированными видео + manifest.csv + uniclon_report.csv",
-                    )
+                    archive_stats = await build_archive_async(archive_path, new_files, extra_files)
                 except Exception:
-                    logger.exception("Failed to send archive %s", archive_path)
+                    logger.exception("Failed to build archive %s", archive_path)
                 else:
-                    archive_sent = True
-                    sent = len(new_files)
+                    if await uploads.send_document(message, archive_path, caption=archive_caption):
+                        archive_sent = True
+                        sent = len(new_files)
+                        await message.answer(_archive_stats_text(archive_stats))
+                    else:
+                        logger.error("Failed to send archive %s", archive_path)
 
         if not archive_sent and total_size > _TELEGRAM_DOCUMENT_LIMIT and total_known:
             logger.info(
@@ -1199,27 +1454,24 @@ async def _run_and_send(
             )
 
     if not archive_sent:
-        for p in new_files:
-            await finalize_video(message, p)
-            sent += 1
+        # fix: параллельная отправка альбомами вместо последовательного finalize_video
+        pending = [p for p in new_files if p.resolve() not in streamed_set]
+        sent += len(new_files) - len(pending)
+        sent += await uploads.send_videos(message, pending)
 
     if save_preview and preview_files:
         if len(preview_files) > 10:
             archive_name = f"previews_{int(time.time())}_{message.message_id or 'zip'}"
             preview_archive_path = OUTPUT_DIR / f"{archive_name}.zip"
             try:
-                with zipfile.ZipFile(preview_archive_path, "w", compression=zipfile.ZIP_DEFLATED) as archive:
-                    for preview in preview_files:
-                        archive.write(preview, arcname=preview.name)
-                await message.answer_document(document=FSInputFile(preview_archive_path), caption="📎 PNG-превью (архив)")
+                await build_archive_async(preview_archive_path, preview_files)
+                await uploads.send_document(message, preview_archive_path, caption="📎 PNG-превью (архив)")
             except Exception:
                 logger.exception("Failed to send preview archive %s", preview_archive_path)
         else:
-            for preview in preview_files:
-                try:
-                    await message.answer_photo(photo=FSInputFile(preview), caption=f"Preview: {preview.name}")
-                except Exception:
-                    logger.exception("Failed to send preview %s", preview)
+            await uploads.send_photos(message, preview_files)
+
+    logger.info("[Upload] %s | %s", input_path.name, uploads.stats.summary())
 
     for temp_path in (archive_path, preview_archive_path):
         if temp_path and temp_path.exists():
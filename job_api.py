@@ -0,0 +1,428 @@
+import argparse
+import asyncio
+import json
+import logging
+import time
+import uuid
+import zlib
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+from aiohttp import web
+
+# REGION AI: imports
+from config import (
+    BASE_DIR,
+    JOB_API_HISTORY,
+    JOB_API_HOST,
+    JOB_API_MAX_UPLOAD,
+    JOB_API_PATH_ROOTS,
+    JOB_API_PORT,
+    JOB_API_TOKEN,
+    MAX_COPIES,
+)
+from downloader import ingest_local_file
+from services.job_runner import HeadlessJobResult, run_headless_job
+from task_queue import UserTaskQueue
+# END REGION AI
+
+logger = logging.getLogger(__name__)
+
+JobRunner = Callable[..., Awaitable[HeadlessJobResult]]
+
+_TERMINAL = frozenset({"done", "failed"})
+_UPLOAD_CHUNK = 1024 * 1024
+_HEARTBEAT_SECONDS = 15.0
+_VIDEO_SUFFIXES = (".mp4", ".mov", ".m4v")
+
+
+# REGION AI: job api state
+@dataclass
+class ApiJob:
+    """Задача, поставленная через HTTP: параметры, статус и лента событий для стрима."""
+
+    job_id: str
+    client: str
+    user_id: int
+    source: Path
+    copies: int
+    profile: str = ""
+    quality: str = "std"
+    status: str = "pending"
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    ready: List[str] = field(default_factory=list)
+    events: List[Dict[str, object]] = field(default_factory=list)
+    result: Optional[HeadlessJobResult] = None
+    _signal: asyncio.Event = field(default_factory=asyncio.Event, repr=False)
+
+    @property
+    def label(self) -> str:
+        return f"api:{self.job_id}"
+
+    @property
+    def finished(self) -> bool:
+        return self.status in _TERMINAL
+
+    def emit(self, event: str, **data: object) -> None:
+        self.events.append({"seq": len(self.events) + 1, "ts": round(time.time(), 3), "event": event, "status": self.status, **data})
+        signal, self._signal = self._signal, asyncio.Event()
+        signal.set()
+
+    async def next_events(self, after: int, timeout: float) -> List[Dict[str, object]]:
+        """События с номером > after; пустой список — таймаут ожидания (для heartbeat)."""
+        while len(self.events) <= after and not self.finished:
+            try:
+                await asyncio.wait_for(self._signal.wait(), timeout)
+            except asyncio.TimeoutError:
+                return []
+        return self.events[after:]
+
+    def output_path(self, name: str) -> Optional[Path]:
+        if self.result is None:
+            return None
+        return next((path for path in self.result.outputs if path.name == name), None)
+
+    def to_dict(self, position: Optional[int] = None) -> Dict[str, object]:
+        payload: Dict[str, object] = {
+            "job_id": self.job_id,
+            "client": self.client,
+            "status": self.status,
+            "source": self.source.name,
+            "copies": self.copies,
+            "profile": self.profile,
+            "quality": self.quality,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "ready": list(self.ready),
+        }
+        if position is not None:
+            payload["position"] = position
+        if self.result is not None:
+            payload.update(
+                {
+                    "outputs": [path.name for path in self.result.outputs],
+                    "rejected": dict(self.result.rejected),
+                    "summary": self.result.summary,
+                    "error": self.result.error,
+                    "rc": self.result.rc,
+                }
+            )
+        return payload
+
+
+def client_user_id(client: str) -> int:
+    """Стабильный отрицательный user_id клиента API: не пересекается с Telegram id в общей очереди."""
+    return -1 - (zlib.crc32(client.encode("utf-8")) & 0x7FFFFFFF)
+
+
+def _error(status: int, message: str) -> web.Response:
+    return web.json_response({"error": message}, status=status)
+
+
+def _parse_copies(raw: object) -> Optional[int]:
+    try:
+        copies = int(str(raw if raw is not None else 1).strip())
+    except ValueError:
+        return None
+    return copies if 1 <= copies <= MAX_COPIES else None
+# END REGION AI
+
+
+# REGION AI: job api handlers
+class JobApi:
+    """HTTP-фронт к той же очереди UserTaskQueue, что и у бота (клиент API = отдельный «пользователь»)."""
+
+    def __init__(
+        self,
+        queue: UserTaskQueue,
+        runner: JobRunner = run_headless_job,
+        *,
+        token: str = JOB_API_TOKEN,
+        upload_dir: Path = BASE_DIR,
+        path_roots: Sequence[Path] = tuple(JOB_API_PATH_ROOTS),
+        max_upload: int = JOB_API_MAX_UPLOAD,
+        history: int = JOB_API_HISTORY,
+    ) -> None:
+        self.queue = queue
+        self.runner = runner
+        self.token = token
+        self.upload_dir = Path(upload_dir)
+        self.path_roots = [Path(root).resolve() for root in path_roots]
+        self.max_upload = max_upload
+        self.history = history
+        self.jobs: "OrderedDict[str, ApiJob]" = OrderedDict()
+
+    def routes(self) -> List[web.RouteDef]:
+        return [
+            web.get("/health", self.health),
+            web.get("/jobs", self.list_jobs),
+            web.post("/jobs", self.submit),
+            web.get("/jobs/{job_id}", self.status),
+            web.get("/jobs/{job_id}/events", self.events),
+            web.get("/jobs/{job_id}/outputs", self.list_outputs),
+            web.get("/jobs/{job_id}/outputs/{name}", self.fetch_output),
+            web.get("/jobs/{job_id}/report", self.report),
+        ]
+
+    @web.middleware
+    async def auth_middleware(self, request: web.Request, handler):
+        if self.token and request.path != "/health":
+            if request.headers.get("Authorization", "") != f"Bearer {self.token}":
+                return _error(401, "unauthorized")
+        return await handler(request)
+
+    def _job(self, request: web.Request) -> ApiJob:
+        job = self.jobs.get(request.match_info["job_id"])
+        if job is None:
+            raise web.HTTPNotFound(text=json.dumps({"error": "unknown job"}), content_type="application/json")
+        return job
+
+    async def _position(self, job: ApiJob) -> Optional[int]:
+        if job.status != "pending":
+            return None
+        for info in await self.queue.get_user_tasks(job.user_id):
+            if info.label == job.label:
+                return await self.queue.get_position(job.user_id, info.task_id)
+        return None
+
+    def _remember(self, job: ApiJob) -> None:
+        self.jobs[job.job_id] = job
+        excess = len(self.jobs) - self.history
+        for job_id in [key for key, item in self.jobs.items() if item.finished][:max(0, excess)]:
+            self.jobs.pop(job_id, None)
+
+    async def _receive_upload(self, request: web.Request, job_id: str) -> Tuple[Dict[str, str], Optional[Path]]:
+        params: Dict[str, str] = {}
+        source: Optional[Path] = None
+        reader = await request.multipart()
+        async for part in reader:
+            if part.name == "file" and part.filename:
+                suffix = Path(part.filename).suffix.lower()
+                dest = self.upload_dir / f"api_{job_id}{suffix if suffix in _VIDEO_SUFFIXES else '.mp4'}"
+                partial = dest.with_name(dest.name + ".part")
+                written = 0
+                try:
+                    with partial.open("wb") as handle:
+                        while True:
+                            chunk = await part.read_chunk(_UPLOAD_CHUNK)
+                            if not chunk:
+                                break
+                            written += len(chunk)
+                            if written > self.max_upload:
+                                raise web.HTTPRequestEntityTooLarge(max_size=self.max_upload, actual_size=written)
+                            await asyncio.to_thread(handle.write, chunk)
+                    partial.replace(dest)
+                except BaseException:
+                    partial.unlink(missing_ok=True)
+                    raise
+                source = dest
+            elif part.name:
+                params[part.name] = (await part.text()).strip()
+        return params, source
+
+    async def _ingest_path(self, raw_path: object, job_id: str) -> Path:
+        if not isinstance(raw_path, str) or not raw_path.strip():
+            raise ValueError("path or file is required")
+        src = Path(raw_path).expanduser().resolve()
+        if not any(src.is_relative_to(root) for root in self.path_roots):
+            raise PermissionError(f"{src} is outside UNICLON_JOB_API_ROOTS")
+        if not src.is_file():
+            raise FileNotFoundError(f"{src} not found")
+        dest = self.upload_dir / f"api_{job_id}{src.suffix.lower() or '.mp4'}"
+        result = await ingest_local_file(src, dest)
+        logger.info("[API] Ingested %s → %s (%s)", src, dest.name, result.method)
+        return dest
+
+    async def health(self, request: web.Request) -> web.Response:
+        active = sum(1 for job in self.jobs.values() if job.status == "active")
+        pending = sum(1 for job in self.jobs.values() if job.status == "pending")
+        return web.json_response({"ok": True, "active": active, "pending": pending})
+
+    async def list_jobs(self, request: web.Request) -> web.Response:
+        status_filter = request.query.get("status")
+        jobs = [job.to_dict() for job in self.jobs.values() if not status_filter or job.status == status_filter]
+        return web.json_response({"jobs": jobs})
+
+    async def submit(self, request: web.Request) -> web.Response:
+        job_id = uuid.uuid4().hex[:12]
+        client = (request.headers.get("X-Uniclon-Client") or "api").strip()[:64] or "api"
+        try:
+            if request.content_type.startswith("multipart/"):
+                params, source = await self._receive_upload(request, job_id)
+                if source is None:
+                    source = await self._ingest_path(params.get("path"), job_id)
+            else:
+                try:
+                    params = await request.json()
+                except ValueError:
+                    return _error(400, "body must be JSON or multipart/form-data")
+                if not isinstance(params, dict):
+                    return _error(400, "body must be a JSON object")
+                source = await self._ingest_path(params.get("path"), job_id)
+        except PermissionError as exc:
+            return _error(403, str(exc))
+        except FileNotFoundError as exc:
+            return _error(404, str(exc))
+        except ValueError as exc:
+            return _error(400, str(exc))
+
+        copies = _parse_copies(params.get("copies"))
+        if copies is None:
+            source.unlink(missing_ok=True)
+            return _error(400, f"copies must be 1..{MAX_COPIES}")
+        job = ApiJob(
+            job_id=job_id,
+            client=client,
+            user_id=client_user_id(client),
+            source=source,
+            copies=copies,
+            profile=str(params.get("profile") or "").strip().lower(),
+            quality=str(params.get("quality") or "std").strip().lower(),
+        )
+        self._remember(job)
+        job.emit("queued")
+        try:
+            position = await self.queue.enqueue(
+                job.user_id,
+                lambda: self._execute(job),
+                job.label,
+                profile=job.profile or None,
+                copies=job.copies,
+                save_preview=False,
+                quality=job.quality,
+            )
+        except RuntimeError:
+            self.jobs.pop(job_id, None)
+            source.unlink(missing_ok=True)
+            return _error(503, "queue is shutting down")
+        logger.info("[API] Job %s queued: client=%s video=%s copies=%s position=%s", job_id, client, source.name, copies, position)
+        return web.json_response(job.to_dict(position), status=202)
+
+    async def _execute(self, job: ApiJob) -> None:
+        job.status = "active"
+        job.started_at = time.time()
+        job.emit("started")
+
+        def on_copy_ready(index: int, path: Path) -> None:
+            job.ready.append(path.name)
+            job.emit("copy_ready", index=index, file=path.name)
+
+        try:
+            result = await self.runner(job.source, job.copies, job.profile, job.quality, on_copy_ready=on_copy_ready)
+        except Exception as exc:  # noqa: BLE001
+            logger.exception("[API] Job %s failed", job.job_id)
+            result = HeadlessJobResult(rc=-1, error=str(exc) or exc.__class__.__name__)
+        finally:
+            # fix: входной файл — наша копия/ссылка в BASE_DIR, исходник клиента не трогаем
+            job.source.unlink(missing_ok=True)
+        job.result = result
+        job.finished_at = time.time()
+        job.status = "done" if result.ok else "failed"
+        job.emit(job.status, outputs=[path.name for path in result.outputs], error=result.error)
+        logger.info("[API] Job %s %s in %.1fs (%s outputs)", job.job_id, job.status, job.finished_at - job.started_at, len(result.outputs))
+
+    async def status(self, request: web.Request) -> web.Response:
+        job = self._job(request)
+        return web.json_response(job.to_dict(await self._position(job)))
+
+    async def events(self, request: web.Request) -> web.StreamResponse:
+        """NDJSON-поток событий задачи до завершения (?after=N — продолжить с события N)."""
+        job = self._job(request)
+        try:
+            sent = max(0, int(request.query.get("after", "0")))
+        except ValueError:
+            sent = 0
+        response = web.StreamResponse(headers={"Content-Type": "application/x-ndjson", "Cache-Control": "no-cache"})
+        await response.prepare(request)
+        while True:
+            batch = await job.next_events(sent, _HEARTBEAT_SECONDS)
+            if not batch:
+                if job.finished:
+                    break
+                await response.write(b'{"event": "heartbeat"}\n')
+                continue
+            for event in batch:
+                await response.write((json.dumps(event, ensure_ascii=False) + "\n").encode("utf-8"))
+            sent += len(batch)
+            if job.finished and sent >= len(job.events):
+                break
+        await response.write_eof()
+        return response
+
+    async def list_outputs(self, request: web.Request) -> web.Response:
+        job = self._job(request)
+        if job.result is None:
+            return web.json_response({"job_id": job.job_id, "status": job.status, "outputs": []})
+        outputs = []
+        for path in job.result.outputs:
+            try:
+                size = path.stat().st_size
+            except OSError:
+                continue
+            outputs.append({"name": path.name, "size": size, "url": f"/jobs/{job.job_id}/outputs/{path.name}"})
+        return web.json_response({"job_id": job.job_id, "status": job.status, "outputs": outputs})
+
+    async def fetch_output(self, request: web.Request) -> web.StreamResponse:
+        job = self._job(request)
+        path = job.output_path(request.match_info["name"])
+        if path is None or not path.is_file():
+            return _error(404, "unknown output")
+        return web.FileResponse(path)
+
+    async def report(self, request: web.Request) -> web.Response:
+        job = self._job(request)
+        if job.result is None:
+            return _error(409, f"job is {job.status}")
+        payload = job.result.to_dict()
+        payload["outputs"] = [Path(item).name for item in payload["outputs"]]
+        payload.update({"job_id": job.job_id, "status": job.status, "log_tail": job.result.log_tail})
+        return web.json_response(payload)
+# END REGION AI
+
+
+# REGION AI: job api app
+JOB_API_KEY = web.AppKey("job_api", JobApi)
+
+
+def create_app(queue: Optional[UserTaskQueue] = None, runner: JobRunner = run_headless_job, **options) -> web.Application:
+    """Приложение API; без queue создаёт собственную очередь и закрывает её при остановке."""
+    owns_queue = queue is None
+    api = JobApi(queue or UserTaskQueue(), runner, **options)
+    app = web.Application(middlewares=[api.auth_middleware], client_max_size=api.max_upload)
+    app.add_routes(api.routes())
+    app[JOB_API_KEY] = api
+
+    if owns_queue:
+        async def _close_queue(_: web.Application) -> None:
+            await api.queue.close()
+
+        app.on_cleanup.append(_close_queue)
+    return app
+
+
+async def start_job_api(queue: UserTaskQueue, host: str = JOB_API_HOST, port: int = JOB_API_PORT) -> web.AppRunner:
+    """Запуск API внутри процесса бота поверх его очереди задач."""
+    runner = web.AppRunner(create_app(queue))
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    logger.info("🌐 Job API listening on http://%s:%s", host, port)
+    return runner
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Uniclon local job API")
+    parser.add_argument("--host", default=JOB_API_HOST)
+    parser.add_argument("--port", type=int, default=JOB_API_PORT)
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s | %(levelname)-8s | %(name)s: %(message)s")
+    web.run_app(create_app(), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
+# END REGION AI
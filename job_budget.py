@@ -0,0 +1,140 @@
+import logging
+import os
+import tempfile
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional
+
+# REGION AI: imports
+from config import COPY_TIMEOUT_FLOOR, JOB_BUDGET_PER_COPY, JOB_BUDGET_SECONDS
+# END REGION AI
+
+logger = logging.getLogger(__name__)
+
+TIERS = ("normal", "fast", "ultra")
+# Во сколько раз ускоряется копия на следующем уровне (оценка для прогноза после переключения)
+_TIER_SPEEDUP = {"normal": 1.0, "fast": 2.5, "ultra": 5.0}
+_ETA_MARGIN = 1.1
+
+
+# REGION AI: deadline-aware job budget
+@dataclass
+class JobBudget:
+    """Бюджет времени задачи: прогноз ETA по скорости копий и понижение уровня качества.
+
+    Уровень (и таймаут следующей копии) пишется в tier-файл, который generate_copy.sh читает
+    перед каждой копией, поэтому переключение действует на оставшиеся копии уже запущенного скрипта.
+    """
+
+    copies: int
+    budget_seconds: float
+    started: float = field(default_factory=time.monotonic)
+    tier: str = "normal"
+    decisions: List[str] = field(default_factory=list)
+    copy_seconds: List[float] = field(default_factory=list)
+    tier_file: Optional[Path] = None
+    _copy_started: Optional[float] = None
+    _copy_tier: str = "normal"
+
+    @classmethod
+    def for_job(cls, copies: int, budget_seconds: Optional[float] = None) -> "JobBudget":
+        if budget_seconds is None or budget_seconds <= 0:
+            budget_seconds = JOB_BUDGET_SECONDS or JOB_BUDGET_PER_COPY * max(1, copies)
+        fd, raw_path = tempfile.mkstemp(prefix="uniclon_tier_", suffix=".txt")
+        os.close(fd)
+        budget = cls(copies=max(1, copies), budget_seconds=float(budget_seconds), tier_file=Path(raw_path))
+        budget._write_tier("")
+        return budget
+
+    @property
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started
+
+    @property
+    def remaining(self) -> float:
+        return self.budget_seconds - self.elapsed
+
+    def copy_started(self) -> None:
+        self._copy_started = time.monotonic()
+        self._copy_tier = self.tier
+
+    def copy_finished(self) -> Optional[str]:
+        """Учитывает завершённую копию; возвращает описание решения, если уровень понижен."""
+        if self._copy_started is not None:
+            # нормализуем к уровню normal, чтобы прогноз не путал ускоренные копии с обычными
+            spent = time.monotonic() - self._copy_started
+            self.copy_seconds.append(spent * _TIER_SPEEDUP.get(self._copy_tier, 1.0))
+            self._copy_started = None
+        decision = self._reconsider()
+        if decision is None:
+            # fix: таймаут следующей копии пересчитывается по остатку бюджета, а не берётся из env старта скрипта
+            self._write_tier(self.decisions[-1].split(": ", 1)[-1] if self.decisions else "")
+        return decision
+
+    def predict_total(self, tier: Optional[str] = None) -> Optional[float]:
+        if not self.copy_seconds:
+            return None
+        done = len(self.copy_seconds)
+        left = max(0, self.copies - done)
+        per_copy = sum(self.copy_seconds) / done / _TIER_SPEEDUP.get(tier or self.tier, 1.0)
+        return self.elapsed + per_copy * left * _ETA_MARGIN
+
+    def _reconsider(self) -> Optional[str]:
+        if len(self.copy_seconds) >= self.copies:
+            return None
+        eta = self.predict_total()
+        if eta is None or eta <= self.budget_seconds:
+            return None
+        level = TIERS.index(self.tier)
+        next_tier = self.tier
+        for candidate in TIERS[level + 1:]:
+            next_tier = candidate
+            candidate_eta = self.predict_total(candidate)
+            if candidate_eta is not None and candidate_eta <= self.budget_seconds:
+                break
+        note = f"eta={eta:.0f}s>budget={self.budget_seconds:.0f}s after {len(self.copy_seconds)}/{self.copies}"
+        return self.escalate(note, next_tier)
+
+    def escalate(self, note: str, tier: Optional[str] = None) -> Optional[str]:
+        """Переводит оставшиеся копии на более быстрый уровень (по умолчанию — следующий)."""
+        level = TIERS.index(self.tier)
+        if tier is None:
+            tier = TIERS[min(level + 1, len(TIERS) - 1)]
+        if TIERS.index(tier) <= level:
+            return None
+        self.tier = tier
+        self._write_tier(note)
+        decision = f"{tier}: {note}"
+        self.decisions.append(decision)
+        logger.warning("[Deadline] switching remaining copies to tier %s", decision)
+        return decision
+
+    def copy_timeout(self) -> float:
+        """Таймаут одной копии: не меньше пола, но с учётом оставшегося бюджета."""
+        left = max(1, self.copies - len(self.copy_seconds))
+        return max(COPY_TIMEOUT_FLOOR, self.remaining / left * 2)
+
+    def to_env(self) -> Dict[str, str]:
+        env = {
+            "UNICLON_JOB_TIER": self.tier,
+            "UNICLON_JOB_BUDGET": f"{self.budget_seconds:.0f}",
+            "UNICLON_COPY_TIMEOUT": f"{self.copy_timeout():.0f}",
+        }
+        if self.tier_file is not None:
+            env["UNICLON_TIER_FILE"] = str(self.tier_file)
+        return env
+
+    def _write_tier(self, note: str) -> None:
+        if self.tier_file is None:
+            return
+        try:
+            self.tier_file.write_text(f"{self.tier}\n{note}\n{self.copy_timeout():.0f}\n", encoding="utf-8")
+        except OSError:
+            logger.debug("Tier file write failed: %s", self.tier_file, exc_info=True)
+
+    def close(self) -> None:
+        if self.tier_file is not None:
+            self.tier_file.unlink(missing_ok=True)
+            self.tier_file = None
+# END REGION AI
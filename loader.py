@@ -6,12 +6,15 @@ from aiogram.client.session.aiohttp import AiohttpSession
 from aiogram.client.telegram import TelegramAPIServer
 from aiogram.fsm.storage.memory import MemoryStorage
 
-from config import BOT_API_BASE, BOT_TOKEN
+from config import BOT_API_BASE, BOT_API_LOCAL, BOT_TOKEN
 
 
 def _make_bot() -> Bot:
+    if not BOT_TOKEN:
+        raise SystemExit("[ERROR] TELEGRAM_BOT_TOKEN is not set. Put it into .env")
     if BOT_API_BASE:
-        session = AiohttpSession(api=TelegramAPIServer.from_base(BOT_API_BASE))
+        # fix: is_local — getFile отдаёт абсолютный путь в хранилище local-сервера
+        session = AiohttpSession(api=TelegramAPIServer.from_base(BOT_API_BASE, is_local=BOT_API_LOCAL))
         return Bot(
             BOT_TOKEN,
             default=DefaultBotProperties(parse_mode="HTML"),
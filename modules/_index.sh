@@ -7,7 +7,9 @@ source "${MODULE_ROOT}/rng_utils.sh"
 source "${MODULE_ROOT}/time_utils.sh"
 source "${MODULE_ROOT}/file_ops.sh"
 source "${MODULE_ROOT}/ffmpeg_driver.sh"
+source "${MODULE_ROOT}/segment_encode.sh"
 source "${MODULE_ROOT}/audio_utils.sh"
+source "${MODULE_ROOT}/audio_lane.sh"
 source "${MODULE_ROOT}/combo_engine.sh"
 source "${MODULE_ROOT}/helpers.sh"
 source "${MODULE_ROOT}/creative_utils.sh"
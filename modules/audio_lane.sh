@@ -0,0 +1,116 @@
+#!/bin/bash
+# Отдельная аудиодорожка: звук источника декодируется в PCM один раз, цепочка каждой копии
+# рендерится в AAC параллельно с видео (или берётся из кэша при совпадении цепочки) и
+# подмешивается к видео без перекодирования (-c:a copy).
+
+AUDIO_LANE_MODE=${UNICLON_AUDIO_LANE:-1}
+AUDIO_LANE_TTL_MIN=${UNICLON_AUDIO_LANE_TTL_MIN:-1440}
+AUDIO_LANE_TIMEOUT=${UNICLON_AUDIO_LANE_TIMEOUT:-300}
+
+# REGION AI: audio lane cache
+audio_lane_enabled() {
+  case "$AUDIO_LANE_MODE" in
+    0|off|false|no) return 1 ;;
+  esac
+  return 0
+}
+
+audio_lane_dir() {
+  printf '%s' "${UNICLON_CACHE_DIR:-${OUTPUT_DIR:-.}/cache}/audio"
+}
+
+audio_lane_mtime() {
+  stat -c %Y "$1" 2>/dev/null || stat -f %m "$1" 2>/dev/null || printf '0'
+}
+
+# audio_lane_source_pcm <src> → путь к PCM (wav) звука источника; декодирует один раз на файл
+audio_lane_source_pcm() {
+  local src="$1" dir key pcm tmp
+  dir="$(audio_lane_dir)"
+  mkdir -p "$dir" || return 1
+  find "$dir" -maxdepth 1 -type f \( -name 'lane_*.m4a' -o -name 'src_*.wav' \) -mmin +"$AUDIO_LANE_TTL_MIN" -delete 2>/dev/null || true
+  key=$(deterministic_md5 "$(cd "$(dirname "$src")" && pwd)/$(basename "$src")|$(file_size_bytes "$src")|$(audio_lane_mtime "$src")")
+  pcm="${dir}/src_${key:0:16}.wav"
+  if [ ! -s "$pcm" ]; then
+    tmp="${pcm%.wav}.$$.tmp.wav"
+    # fix: пишем во временный файл — параллельные копии не должны прочитать недописанный PCM
+    if ! timeout "$AUDIO_LANE_TIMEOUT" ffmpeg -y -hide_banner -loglevel error -i "$src" -map 0:a:0 -vn -sn -dn \
+      -c:a pcm_s16le "$tmp" </dev/null; then
+      rm -f "$tmp"
+      return 1
+    fi
+    mv -f "$tmp" "$pcm"
+    echo "[AudioLane] decoded source audio → $(basename "$pcm")" >&2
+  fi
+  touch "$pcm" 2>/dev/null || true
+  printf '%s' "$pcm"
+}
+# END REGION AI
+
+# REGION AI: audio lane render and mux
+# audio_lane_start <pcm> <clip_start> <clip_duration> <af_chain> <bitrate> <sample_rate>
+# Выставляет AUDIO_LANE_FILE и AUDIO_LANE_STATE (cached|rendering); при rendering — AUDIO_LANE_PID.
+audio_lane_start() {
+  local pcm="$1" clip_start="$2" clip_duration="$3" af_chain="$4" bitrate="$5" sample_rate="$6" key
+  key=$(deterministic_md5 "${pcm}|${clip_start}|${clip_duration}|${af_chain}|${bitrate}|${sample_rate}")
+  AUDIO_LANE_FILE="$(audio_lane_dir)/lane_${key:0:16}.m4a"
+  AUDIO_LANE_PID=""
+  AUDIO_LANE_CHAIN="$af_chain"
+  if [ -s "$AUDIO_LANE_FILE" ]; then
+    AUDIO_LANE_STATE="cached"
+    touch "$AUDIO_LANE_FILE" 2>/dev/null || true
+    echo "[AudioLane] reuse $(basename "$AUDIO_LANE_FILE")"
+    return 0
+  fi
+  AUDIO_LANE_STATE="rendering"
+  local -a lane_args=(-y -hide_banner -loglevel error -ss "$clip_start" -i "$pcm" -map 0:a:0 -vn)
+  [ -n "$af_chain" ] && lane_args+=(-af "$af_chain")
+  lane_args+=(-t "$clip_duration" -c:a aac -b:a "$bitrate" -ar "$sample_rate" -ac 2 -map_metadata -1 -f mp4)
+  (
+    tmp="${AUDIO_LANE_FILE%.m4a}.$$.tmp.m4a"
+    if timeout "$AUDIO_LANE_TIMEOUT" ffmpeg "${lane_args[@]}" "$tmp" </dev/null; then
+      mv -f "$tmp" "$AUDIO_LANE_FILE"
+    else
+      rm -f "$tmp"
+      exit 1
+    fi
+  ) &
+  AUDIO_LANE_PID=$!
+  echo "[AudioLane] rendering $(basename "$AUDIO_LANE_FILE") in background (pid $AUDIO_LANE_PID)"
+}
+
+audio_lane_abort() {
+  if [ -n "${AUDIO_LANE_PID:-}" ]; then
+    kill "$AUDIO_LANE_PID" 2>/dev/null || true
+    wait "$AUDIO_LANE_PID" 2>/dev/null || true
+    AUDIO_LANE_PID=""
+  fi
+}
+
+# audio_lane_finish <video_only_mp4> <src> <clip_start> <clip_duration> <bitrate> <sample_rate>
+# Дожидается фоновой дорожки и подмешивает её с -c copy; если дорожка не получилась — кодирует звук в том же проходе.
+audio_lane_finish() {
+  local video="$1" src="$2" clip_start="$3" clip_duration="$4" bitrate="$5" sample_rate="$6"
+  local muxed="${video%.mp4}.lane.mp4" lane_ok=1
+  if [ -n "${AUDIO_LANE_PID:-}" ]; then
+    wait "$AUDIO_LANE_PID" || lane_ok=0
+    AUDIO_LANE_PID=""
+  fi
+  [ -s "$AUDIO_LANE_FILE" ] || lane_ok=0
+  local -a mux_args=(-y -hide_banner -loglevel warning -i "$video")
+  if [ "$lane_ok" -eq 1 ]; then
+    mux_args+=(-i "$AUDIO_LANE_FILE" -map 0:v:0 -map 1:a:0 -c copy)
+  else
+    echo "[AudioLane] background lane failed — encoding audio inline"
+    mux_args+=(-ss "$clip_start" -i "$src" -map 0:v:0 -map "1:a:0?" -c:v copy)
+    [ -n "${AUDIO_LANE_CHAIN:-}" ] && mux_args+=(-af "$AUDIO_LANE_CHAIN")
+    mux_args+=(-t "$clip_duration" -c:a aac -b:a "$bitrate" -ar "$sample_rate" -ac 2)
+  fi
+  mux_args+=(-map_metadata 0 -movflags +faststart "$muxed")
+  if ! timeout "$AUDIO_LANE_TIMEOUT" ffmpeg "${mux_args[@]}" </dev/null; then
+    rm -f "$muxed"
+    return 1
+  fi
+  mv -f "$muxed" "$video"
+}
+# END REGION AI
@@ -21,12 +21,12 @@ apply_audio_fallback() {
 }
 
 pick_audio_chain() {
-  local roll=$(rand_int 1 100)
+  local roll; rand_int_var roll 1 100
   AUDIO_PROFILE="resample"
   local filters=("aresample=${AUDIO_SR}")
   if [ "$roll" -le "$AUDIO_TWEAK_PROB_PERCENT" ]; then
     AUDIO_PROFILE="asetrate"
-    local factor=$(rand_float 0.995 1.005 6)
+    local factor; rand_float_var factor 0.995 1.005 6
     filters=("asetrate=${AUDIO_SR}*${factor}" "aresample=${AUDIO_SR}")
   elif [ "$roll" -ge 85 ]; then
     AUDIO_PROFILE="anull"
@@ -34,8 +34,8 @@ pick_audio_chain() {
   fi
   local tempo_target="$TEMPO_FACTOR"
   if [ "$MUSIC_VARIANT" -eq 1 ]; then
-    local tempo_sign=$(rand_int 0 1)
-    local tempo_delta=$(rand_float 0.010 0.030 3)
+    local tempo_sign; rand_int_var tempo_sign 0 1
+    local tempo_delta; rand_float_var tempo_delta 0.010 0.030 3
     tempo_target=$(awk -v base="$TEMPO_FACTOR" -v sign="$tempo_sign" -v delta="$tempo_delta" '
 BEGIN {
   base+=0; delta+=0;
@@ -58,9 +58,9 @@ BEGIN {
     }
   }')
   # END REGION AI
-  local safe_volume=$(rand_float 0.980 1.000 4)
+  local safe_volume; rand_float_var safe_volume 0.980 1.000 4
   safe_volume=$(awk -v v="$safe_volume" 'BEGIN{printf "%.4f", v+0}')
-  local safe_rate=$(rand_float 1.0002 1.0008 7)
+  local safe_rate; rand_float_var safe_rate 1.0002 1.0008 7
   local safe_tempo
   # fix: ensure tempo filters keep numeric defaults
   # REGION AI: guard safe tempo fallbacks
@@ -86,13 +86,13 @@ BEGIN {
 
 audio_random_jitter_chain() {
   local sample_rate="${1:-$AUDIO_SR}" chance
-  chance=$(rand_int 0 2)
+  rand_int_var chance 0 2
   if [ "$chance" -ne 0 ]; then
     printf 'anull'
     return
   fi
   local jitter_scale
-  jitter_scale=$(rand_int 0 5)
+  rand_int_var jitter_scale 0 5
   printf 'asetrate=%s*1.%d,aresample=%s' "$sample_rate" "$jitter_scale" "$sample_rate"
 }
 
@@ -206,7 +206,7 @@ next_regen_combo() {
 }
 
 generate_dynamic_combo() {
-  local ident=$(rand_int 120 999)
+  local ident; rand_int_var ident 120 999
   local vf_options=(
     "tblend=average"
     "edgedetect=mode=colormix:high=0.10:low=0.04"
@@ -228,16 +228,16 @@ generate_dynamic_combo() {
   local br_pool=(0.85 0.92 1.05 1.12)
   local shift_pool=(-0.08 -0.04 0.05 0.09)
   local level_pool=(4.0 4.2)
-  local vf_idx=$(rand_int 0 $(( ${#vf_options[@]} - 1 )))
-  local af_idx=$(rand_int 0 $(( ${#af_options[@]} - 1 )))
-  local mirror_idx=$(rand_int 0 $(( ${#mirrors[@]} - 1 )))
-  local audio_idx=$(rand_int 0 $(( ${#audios[@]} - 1 )))
-  local soft_idx=$(rand_int 0 $(( ${#softwares[@]} - 1 )))
-  local fps_idx=$(rand_int 0 $(( ${#fps_pool[@]} - 1 )))
-  local br_idx=$(rand_int 0 $(( ${#br_pool[@]} - 1 )))
-  local shift_idx=$(rand_int 0 $(( ${#shift_pool[@]} - 1 )))
-  local level_idx=$(rand_int 0 $(( ${#level_pool[@]} - 1 )))
-  local noise=$(rand_int 0 1)
+  local vf_idx; rand_int_var vf_idx 0 $(( ${#vf_options[@]} - 1 ))
+  local af_idx; rand_int_var af_idx 0 $(( ${#af_options[@]} - 1 ))
+  local mirror_idx; rand_int_var mirror_idx 0 $(( ${#mirrors[@]} - 1 ))
+  local audio_idx; rand_int_var audio_idx 0 $(( ${#audios[@]} - 1 ))
+  local soft_idx; rand_int_var soft_idx 0 $(( ${#softwares[@]} - 1 ))
+  local fps_idx; rand_int_var fps_idx 0 $(( ${#fps_pool[@]} - 1 ))
+  local br_idx; rand_int_var br_idx 0 $(( ${#br_pool[@]} - 1 ))
+  local shift_idx; rand_int_var shift_idx 0 $(( ${#shift_pool[@]} - 1 ))
+  local level_idx; rand_int_var level_idx 0 $(( ${#level_pool[@]} - 1 ))
+  local noise; rand_int_var noise 0 1
   local -a parts=()
   local tmp
   printf -v tmp 'CUR_COMBO_LABEL=%q' "auto_${ident}"
@@ -0,0 +1,394 @@
+"""Audio-chain IR passes: range validation, rate/tempo collapsing and cheapest equivalent filters."""
+from __future__ import annotations
+
+import math
+import sys
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+MODULE_DIR = Path(__file__).resolve().parent
+PROJECT_ROOT = MODULE_DIR.parent.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+# REGION AI: imports
+try:
+    from .filter_graph import Filter, FilterChain, OptimizeReport, _to_float, evaluate, optimize
+except ImportError:  # pragma: no cover - fallback for script execution
+    from modules.core.filter_graph import Filter, FilterChain, OptimizeReport, _to_float, evaluate, optimize
+# END REGION AI
+
+DEFAULT_SAMPLE_RATE = 44100
+
+# Относительная стоимость на сэмпл (≈ операций на канал); soxr/afftdn/superequalizer — самые дорогие
+AUDIO_FILTER_COSTS = {
+    "anull": 0.0,
+    "asetrate": 0.0,
+    "apad": 0.0,
+    "atrim": 0.0,
+    "volume": 0.2,
+    "aformat": 0.5,
+    "highpass": 1.0,
+    "lowpass": 1.0,
+    "bandpass": 1.0,
+    "equalizer": 1.0,
+    "apulsator": 1.0,
+    "aecho": 2.0,
+    "aresample": 2.0,
+    "acompressor": 3.0,
+    "atempo": 4.0,
+    "superequalizer": 18.0,
+    "afftdn": 25.0,
+}
+_SOXR_COST = {28: 12.0, 20: 6.0}
+_DEFAULT_AUDIO_COST = 1.0
+# Для AAC на выходе точность soxr выше 20 бит не даёт слышимой разницы
+_SOXR_OUTPUT_PRECISION = 20
+# Центры полос superequalizer (Гц), 1b…18b
+_SUPEREQ_BANDS = (65, 92, 131, 185, 262, 370, 523, 740, 1047, 1480, 2093, 2960, 4186, 5920, 8372, 11840, 16744, 20000)
+# superequalizer заменяется биквадами equalizer, пока их суммарная стоимость ниже
+_SUPEREQ_MAX_BIQUADS = int(AUDIO_FILTER_COSTS["superequalizer"] // AUDIO_FILTER_COSTS["equalizer"]) - 1
+_TOL = 1e-3
+
+
+# REGION AI: rate tracking and cost
+def _resample_rate(f: Filter) -> Optional[float]:
+    raw = f.get("osr") or f.get("out_sample_rate") or f.get("sample_rate", 0)
+    return _to_float(raw) if raw is not None else None
+
+
+def _setrate(f: Filter, rate: Optional[float]) -> Optional[float]:
+    raw = f.get("r") or f.get("sample_rate", 0)
+    return evaluate(raw, {"r": rate} if rate else {}) if raw is not None else None
+
+
+def _soxr_precision(f: Filter) -> Optional[int]:
+    if (f.get("resampler") or "").strip() != "soxr":
+        return None
+    precision = f.number("precision")
+    return int(precision) if precision is not None else 20
+
+
+def filter_cost(f: Filter) -> float:
+    if f.name == "aresample":
+        precision = _soxr_precision(f)
+        if precision is not None:
+            return _SOXR_COST.get(precision, _SOXR_COST[28] if precision > 20 else _SOXR_COST[20])
+    if f.name == "superequalizer":
+        return AUDIO_FILTER_COSTS["superequalizer"]
+    return AUDIO_FILTER_COSTS.get(f.name, _DEFAULT_AUDIO_COST)
+
+
+def audio_chain_cost(chain: FilterChain, sample_rate: float) -> float:
+    """Стоимость на выходной сэмпл: фильтр на более высокой частоте обрабатывает больше сэмплов."""
+    rate = sample_rate
+    total = 0.0
+    for f in chain.filters:
+        total += filter_cost(f) * rate
+        if f.name == "aresample":
+            rate = _resample_rate(f) or rate
+        elif f.name == "asetrate":
+            rate = _setrate(f, rate) or rate
+    return total / max(1.0, rate)
+# END REGION AI
+
+
+# REGION AI: up-front range validation
+def _clamp(value: float, low: float, high: float) -> float:
+    return max(low, min(high, value))
+
+
+def _split_tempo(tempo: float) -> List[Filter]:
+    """atempo вне 0.5–2.0 раскладывается на цепочку — старые сборки ffmpeg других значений не принимают."""
+    parts: List[Filter] = []
+    while tempo > 2.0 + _TOL:
+        parts.append(Filter("atempo", [(None, "2.0")]))
+        tempo /= 2.0
+    while tempo < 0.5 - _TOL:
+        parts.append(Filter("atempo", [(None, "0.5")]))
+        tempo /= 0.5
+    parts.append(Filter("atempo", [(None, f"{tempo:.6g}")]))
+    return parts
+
+
+def _db_or_linear(raw: str) -> Tuple[Optional[float], bool]:
+    text = raw.strip().lower()
+    if text.endswith("db"):
+        return _to_float(text[:-2]), True
+    return _to_float(text), False
+
+
+def validate_filter(f: Filter, rate: float, notes: List[str]) -> List[Filter]:
+    """Приводит параметры в допустимые ffmpeg диапазоны; [] — фильтр исправить нельзя и он убран."""
+    if f.name == "superequalizer":
+        fixed = Filter(f.name, [])
+        for key, raw in f.args:
+            value = _to_float(raw)
+            if key is None or value is None or not math.isfinite(value):
+                notes.append(f"dropped superequalizer band {key}={raw}")
+                continue
+            fixed.args.append((key, f"{_clamp(value, 0.0, 20.0):.3f}" if not 0.0 <= value <= 20.0 else raw))
+        if fixed.args != f.args:
+            notes.append("clamped superequalizer bands to 0–20")
+            return [fixed]
+        return [f]
+    if f.name == "atempo":
+        tempo = f.number("tempo", 0, 1.0)
+        if tempo is None or tempo <= 0 or not math.isfinite(tempo):
+            notes.append(f"dropped invalid {f.serialize()}")
+            return []
+        if not 0.5 - _TOL <= tempo <= 2.0 + _TOL:
+            notes.append(f"split {f.serialize()} into 0.5–2.0 steps")
+            return _split_tempo(tempo)
+        return [f]
+    if f.name == "asetrate":
+        new_rate = _setrate(f, rate)
+        if new_rate is None or new_rate <= 0:
+            notes.append(f"dropped invalid {f.serialize()}")
+            return []
+        return [f]
+    if f.name in ("highpass", "lowpass"):
+        freq = f.number("f", 0) or f.number("frequency")
+        nyquist = rate / 2.0 * 0.95
+        if freq is None or freq <= 0:
+            notes.append(f"dropped invalid {f.serialize()}")
+            return []
+        if freq > nyquist:
+            fixed = Filter(f.name, [(k, v) for k, v in f.args if k not in (None, "f", "frequency")] + [("f", f"{nyquist:.0f}")])
+            notes.append(f"clamped {f.name} f={freq:g} to {nyquist:.0f}")
+            return [fixed]
+        return [f]
+    if f.name == "volume":
+        level, is_db = _db_or_linear(f.get("volume", 0) or "1")
+        if level is not None and not is_db and level < 0:
+            notes.append(f"dropped invalid {f.serialize()}")
+            return []
+        return [f]
+    if f.name == "aecho":
+        positional = [value for key, value in f.args if key is None]
+        if len(positional) != 4 or len(f.args) != 4:
+            return [f]
+        gains = [_to_float(v) for v in positional[:2]]
+        delays = [_to_float(v) for v in positional[2].split("|")]
+        decays = [_to_float(v) for v in positional[3].split("|")]
+        if None in gains or None in delays or None in decays:
+            return [f]
+        fixed_gains = [_clamp(g, 0.001, 1.0) for g in gains]
+        fixed_delays = [_clamp(d, 1.0, 90000.0) for d in delays]
+        fixed_decays = [_clamp(d, 0.001, 1.0) for d in decays]
+        if fixed_gains == gains and fixed_delays == delays and fixed_decays == decays:
+            return [f]
+        notes.append("clamped aecho parameters")
+        return [Filter("aecho", [
+            (None, f"{fixed_gains[0]:g}"),
+            (None, f"{fixed_gains[1]:g}"),
+            (None, "|".join(f"{d:g}" for d in fixed_delays)),
+            (None, "|".join(f"{d:g}" for d in fixed_decays)),
+        ])]
+    if f.name == "acompressor":
+        fixed = Filter(f.name, [])
+        changed = False
+        for key, raw in f.args:
+            if key == "threshold":
+                level, is_db = _db_or_linear(raw)
+                if level is not None:
+                    linear = 10 ** (level / 20.0) if is_db else level
+                    clamped = _clamp(linear, 0.000976563, 1.0)
+                    if not math.isclose(clamped, linear, rel_tol=1e-6):
+                        raw = f"{20 * math.log10(clamped):.2f}dB"
+                        changed = True
+            elif key == "ratio":
+                ratio = _to_float(raw)
+                if ratio is not None and not 1.0 <= ratio <= 20.0:
+                    raw = f"{_clamp(ratio, 1.0, 20.0):g}"
+                    changed = True
+            fixed.args.append((key, raw))
+        if changed:
+            notes.append("clamped acompressor parameters")
+            return [fixed]
+        return [f]
+    return [f]
+# END REGION AI
+
+
+# REGION AI: rate collapsing and cheaper equivalents
+def _is_plain_resample(f: Filter) -> bool:
+    """aresample только с частотой (и настройками ресемплера) — без async/first_pts и т.п."""
+    allowed = {None, "osr", "out_sample_rate", "sample_rate", "resampler", "precision", "dither_method", "cheby"}
+    return f.name == "aresample" and _resample_rate(f) is not None and all(key in allowed for key, _ in f.args)
+
+
+def _rate_filter(name: str, value: float, template: Optional[Filter] = None) -> Filter:
+    text = f"{value:.6f}".rstrip("0").rstrip(".")
+    if template is None:
+        return Filter(name, [(None, text)])
+    args = [(key, raw) for key, raw in template.args if key not in (None, "osr", "out_sample_rate", "sample_rate", "r")]
+    return Filter(name, [(None, text)] + args)
+
+
+def _same_rate(a: Optional[float], b: Optional[float]) -> bool:
+    return a is not None and b is not None and math.isclose(a, b, rel_tol=1e-9)
+
+
+def collapse_rates(filters: List[Filter], sample_rate: Optional[float], notes: List[str]) -> List[Filter]:
+    """Склеивает цепочки asetrate/aresample: один сдвиг высоты и один ресемплинг вместо нескольких.
+
+    sample_rate — частота входа; если она неизвестна, ведущий aresample всегда сохраняется.
+    """
+    result: List[Filter] = []
+    rates: List[Optional[float]] = []  # частота после каждого элемента result (None — неизвестна)
+    for f in filters:
+        rate = rates[-1] if rates else sample_rate
+        prev = result[-1] if result else None
+        if f.name == "aresample" and _is_plain_resample(f):
+            target = _resample_rate(f) or rate
+            if _same_rate(target, rate):
+                notes.append(f"dropped redundant {f.serialize()}")
+                continue
+            if prev is not None and _is_plain_resample(prev):
+                # двойной ресемплинг подряд — достаточно одного, настройки качества берём у первого, если у второго их нет
+                template = f if any(key in ("resampler", "precision") for key, _ in f.args) else prev
+                result[-1] = _rate_filter("aresample", target, template)
+                rates[-1] = target
+                notes.append("merged aresample+aresample")
+                continue
+        if f.name == "asetrate":
+            new_rate = _setrate(f, rate)
+            if new_rate is None:
+                result.append(f)
+                rates.append(rate)
+                continue
+            if _same_rate(new_rate, rate):
+                notes.append(f"dropped no-op {f.serialize()}")
+                continue
+            if prev is not None and prev.name == "asetrate":
+                # вторая asetrate просто переразмечает частоту — первая теряет смысл
+                before = rates[-2] if len(rates) > 1 else sample_rate
+                result[-1] = _rate_filter("asetrate", new_rate)
+                rates[-1] = new_rate
+                notes.append("merged asetrate+asetrate")
+                if _same_rate(new_rate, before):
+                    result.pop()
+                    rates.pop()
+                continue
+            if (
+                len(result) >= 2
+                and prev is not None
+                and _is_plain_resample(prev)
+                and result[-2].name == "asetrate"
+                and rates[-2] is not None
+                and rate
+            ):
+                # asetrate=a,aresample=R,asetrate=b → asetrate=a·b/R,aresample=b: один сдвиг высоты вместо двух
+                base = rates[-3] if len(rates) > 2 else sample_rate
+                combined = rates[-2] * new_rate / rate
+                resample = result.pop()
+                rates.pop()
+                result[-1] = _rate_filter("asetrate", combined)
+                rates[-1] = combined
+                notes.append("collapsed asetrate/aresample/asetrate into one rate change")
+                if _same_rate(combined, base):
+                    result.pop()
+                    rates.pop()
+                # на выходе частота b, как у исходной цепочки; следующий aresample поглотит этот
+                result.append(_rate_filter("aresample", new_rate, resample))
+                rates.append(new_rate)
+                continue
+        result.append(f)
+        if f.name == "aresample":
+            rates.append(_resample_rate(f) or rate)
+        elif f.name == "asetrate":
+            rates.append(_setrate(f, rate) or rate)
+        else:
+            rates.append(rate)
+    return result
+
+
+def cheaper_equivalents(filters: List[Filter], notes: List[str], *, lossy_output: bool = True) -> List[Filter]:
+    result: List[Filter] = []
+    for f in filters:
+        if f.name == "aresample" and lossy_output:
+            precision = _soxr_precision(f)
+            if precision is not None and precision > _SOXR_OUTPUT_PRECISION:
+                fixed = Filter(f.name, [(k, str(_SOXR_OUTPUT_PRECISION) if k == "precision" else v) for k, v in f.args])
+                notes.append(f"soxr precision {precision}→{_SOXR_OUTPUT_PRECISION} (AAC output)")
+                result.append(fixed)
+                continue
+        if f.name == "afftdn":
+            reduction = f.number("nr") if f.get("nr") is not None else f.number("noise_reduction")
+            if reduction is not None and reduction < 0.01:
+                notes.append(f"dropped no-op {f.serialize()}")
+                continue
+        if f.name == "superequalizer":
+            bands = []
+            for key, raw in f.args:
+                gain = _to_float(raw)
+                index = int(key[:-1]) if key and key.endswith("b") and key[:-1].isdigit() else 0
+                if gain is None or not 1 <= index <= len(_SUPEREQ_BANDS):
+                    bands = None
+                    break
+                if abs(gain - 1.0) > _TOL:
+                    bands.append((index, gain))
+            if bands is not None and len(bands) <= _SUPEREQ_MAX_BIQUADS:
+                if not bands:
+                    notes.append("dropped flat superequalizer")
+                    continue
+                for index, gain in bands:
+                    gain_db = 20 * math.log10(max(gain, 1e-4))
+                    result.append(Filter("equalizer", [("f", str(_SUPEREQ_BANDS[index - 1])), ("t", "o"), ("w", "1"), ("g", f"{gain_db:.2f}")]))
+                notes.append(f"superequalizer → {len(bands)} equalizer band(s)")
+                continue
+        result.append(f)
+    return result
+# END REGION AI
+
+
+# REGION AI: audio optimizer entry point
+def probe_sample_rate(path: str) -> Optional[float]:
+    try:
+        from .probe_cache import probe
+    except ImportError:  # pragma: no cover - fallback for script execution
+        from modules.core.probe_cache import probe
+    # fix: общий кэш ffprobe — источник каждой копии не пробуется заново
+    media = probe(Path(path))
+    return float(media.audio_sample_rate) if media is not None and media.audio_sample_rate else None
+
+
+def optimize_audio(
+    chain: FilterChain,
+    sample_rate: Optional[float] = None,
+    *,
+    lossy_output: bool = True,
+) -> Tuple[FilterChain, OptimizeReport]:
+    """Проверка диапазонов до запуска ffmpeg, общие проходы filter_graph и аудиоспецифичные свёртки.
+
+    Стоимость — операций на выходной сэмпл с учётом частоты, на которой работает каждый фильтр.
+    """
+    rate = float(sample_rate or DEFAULT_SAMPLE_RATE)
+    before = audio_chain_cost(chain, rate)
+    if not chain.is_linear:
+        return chain, OptimizeReport(before, before, ["non-linear graph left as is"], "op/sample")
+    notes: List[str] = []
+    validated: List[Filter] = []
+    current = rate
+    for f in chain.filters:
+        for fixed in validate_filter(f, current, notes):
+            validated.append(fixed)
+            if fixed.name == "aresample":
+                current = _resample_rate(fixed) or current
+            elif fixed.name == "asetrate":
+                current = _setrate(fixed, current) or current
+    filters = validated
+    for _ in range(4):
+        snapshot = [f.serialize() for f in filters]
+        generic, report = optimize(FilterChain(filters, "audio"))
+        notes.extend(report.changes)
+        filters = collapse_rates(list(generic.filters), sample_rate, notes)
+        filters = cheaper_equivalents(filters, notes, lossy_output=lossy_output)
+        if [f.serialize() for f in filters] == snapshot:
+            break
+    if not filters:
+        filters = [Filter("anull")]
+    result = FilterChain(filters, "audio")
+    return result, OptimizeReport(before, audio_chain_cost(result, rate), notes, "op/sample")
+# END REGION AI
@@ -0,0 +1,541 @@
+"""Color-pipeline compiler: folds per-pixel color filters of a -vf chain into one cached lut3d."""
+from __future__ import annotations
+
+import hashlib
+import logging
+import math
+import os
+import random
+import sys
+import tempfile
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+MODULE_DIR = Path(__file__).resolve().parent
+PROJECT_ROOT = MODULE_DIR.parent.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+# REGION AI: imports
+try:
+    from .filter_graph import Filter, FilterChain, _to_float, _unquote
+except ImportError:  # pragma: no cover - fallback for script execution
+    from modules.core.filter_graph import Filter, FilterChain, _to_float, _unquote
+# END REGION AI
+
+logger = logging.getLogger(__name__)
+
+RGB = Tuple[float, float, float]
+ColorFn = Callable[[RGB], RGB]
+
+DEFAULT_LUT_SIZE = 33
+_COMPILER_VERSION = "1"
+# Кэш color_<hash>.cube (~1 МБ на 33³): TTL от последнего использования и потолок размера каталога
+LUT_CACHE_TTL_MIN = float(os.environ.get("UNICLON_LUT_CACHE_TTL_MIN", "1440") or 1440)
+LUT_CACHE_MAX_MB = float(os.environ.get("UNICLON_LUT_CACHE_MAX_MB", "256") or 256)
+# Свежие LUT не удаляем даже сверх потолка — их может как раз открывать параллельная копия
+_LUT_IN_USE_SECONDS = 600.0
+# Фильтры, которые меняют только положение пикселей и не трогают цвет — цвет через них переносится точно.
+# fix: unsharp/gblur/avgblur — барьеры: резкость поверх нелинейной кривой не коммутирует с ней
+_TRANSPARENT = frozenset({"hflip", "vflip", "setsar", "setdar"})
+
+# Пресеты ffmpeg curves (libavfilter/vf_curves.c)
+_CURVES_PRESETS: Dict[str, Dict[str, str]] = {
+    "darker": {"master": "0/0 0.5/0.4 1/1"},
+    "increase_contrast": {"master": "0/0 0.149/0.066 0.831/0.905 0.905/0.98 1/1"},
+    "lighter": {"master": "0/0 0.4/0.5 1/1"},
+    "linear_contrast": {"master": "0/0 0.305/0.286 0.694/0.713 1/1"},
+    "medium_contrast": {"master": "0/0 0.286/0.219 0.639/0.643 1/1"},
+    "negative": {"master": "0/1 1/0"},
+    "strong_contrast": {"master": "0/0 0.301/0.196 0.592/0.6 0.686/0.737 1/1"},
+    "vintage": {"r": "0/0.11 0.42/0.51 1/0.95", "g": "0/0 0.50/0.48 1/1", "b": "0/0.22 0.49/0.44 1/0.8"},
+}
+_PAD_COLORS = {"black": (0.0, 0.0, 0.0), "white": (1.0, 1.0, 1.0)}
+
+
+def _clip(value: float) -> float:
+    return 0.0 if value < 0.0 else 1.0 if value > 1.0 else value
+
+
+# REGION AI: yuv helpers
+def _rgb_to_yuv(rgb: RGB) -> RGB:
+    r, g, b = rgb
+    y = 0.299 * r + 0.587 * g + 0.114 * b
+    return y, (b - y) * 0.564, (r - y) * 0.713
+
+
+def _yuv_to_rgb(yuv: RGB) -> RGB:
+    y, u, v = yuv
+    return _clip(y + 1.403 * v), _clip(y - 0.344 * u - 0.714 * v), _clip(y + 1.773 * u)
+# END REGION AI
+
+
+# REGION AI: filter compilers
+def _numbers(f: Filter, allowed: Sequence[str], positional: Sequence[str] = ()) -> Optional[Dict[str, float]]:
+    """Числовые аргументы фильтра; None, если встретилось выражение или неизвестный ключ."""
+    values: Dict[str, float] = {}
+    index = 0
+    for key, raw in f.args:
+        if key is None:
+            if index >= len(positional):
+                return None
+            key = positional[index]
+            index += 1
+        if key not in allowed:
+            return None
+        number = _to_float(raw)
+        if number is None:
+            return None
+        values[key] = number
+    return values
+
+
+def _compile_eq(f: Filter) -> Optional[ColorFn]:
+    values = _numbers(f, ("brightness", "contrast", "saturation", "gamma"), ("contrast", "brightness", "saturation", "gamma"))
+    if values is None:
+        return None
+    brightness = values.get("brightness", 0.0)
+    contrast = values.get("contrast", 1.0)
+    saturation = values.get("saturation", 1.0)
+    gamma = values.get("gamma", 1.0)
+    if gamma <= 0:
+        return None
+    inv_gamma = 1.0 / gamma
+
+    def apply(rgb: RGB) -> RGB:
+        y, u, v = _rgb_to_yuv(rgb)
+        # eq считает LUT по кодам limited-range Y (16–235), как в yuv420p
+        code = (16.0 + 219.0 * y) / 255.0
+        code = contrast * (code - 0.5) + 0.5 + brightness
+        code = 0.0 if code <= 0.0 else min(1.0, code ** inv_gamma)
+        y = (code * 255.0 - 16.0) / 219.0
+        return _yuv_to_rgb((y, u * saturation, v * saturation))
+
+    return apply
+
+
+def _compile_hue(f: Filter) -> Optional[ColorFn]:
+    values = _numbers(f, ("h", "s"))
+    if values is None:
+        return None
+    angle = math.radians(values.get("h", 0.0))
+    saturation = values.get("s", 1.0)
+    cos_h, sin_h = math.cos(angle) * saturation, math.sin(angle) * saturation
+
+    def apply(rgb: RGB) -> RGB:
+        y, u, v = _rgb_to_yuv(rgb)
+        return _yuv_to_rgb((y, u * cos_h - v * sin_h, u * sin_h + v * cos_h))
+
+    return apply
+
+
+def _compile_colorbalance(f: Filter) -> Optional[ColorFn]:
+    keys = ("rs", "gs", "bs", "rm", "gm", "bm", "rh", "gh", "bh")
+    values = _numbers(f, keys + ("pl",))
+    if values is None or values.get("pl", 0.0):
+        return None
+    shifts = [(values.get(f"{c}s", 0.0), values.get(f"{c}m", 0.0), values.get(f"{c}h", 0.0)) for c in "rgb"]
+
+    def component(v: float, lightness: float, s: float, m: float, h: float) -> float:
+        # как get_component() в vf_colorbalance.c: веса теней/полутонов/светов по светлоте
+        a, b, scale = 4.0, 0.333, 0.7
+        s *= _clip((b - lightness) * a + 0.5) * scale
+        m *= _clip((lightness - b) * a + 0.5) * _clip((1.0 - lightness - b) * a + 0.5) * scale
+        h *= _clip((lightness + b - 1.0) * a + 0.5) * scale
+        return _clip(v + s + m + h)
+
+    def apply(rgb: RGB) -> RGB:
+        lightness = (max(rgb) + min(rgb)) / 2.0
+        return tuple(component(rgb[i], lightness, *shifts[i]) for i in range(3))  # type: ignore[return-value]
+
+    return apply
+
+
+def _compile_colorchannelmixer(f: Filter) -> Optional[ColorFn]:
+    keys = ("rr", "rg", "rb", "ra", "gr", "gg", "gb", "ga", "br", "bg", "bb", "ba")
+    values = _numbers(f, keys)
+    if values is None:
+        return None
+    identity = {"rr": 1.0, "gg": 1.0, "bb": 1.0}
+    matrix = [[values.get(f"{out}{src}", identity.get(f"{out}{src}", 0.0)) for src in "rgb"] for out in "rgb"]
+
+    def apply(rgb: RGB) -> RGB:
+        r, g, b = rgb
+        return tuple(_clip(row[0] * r + row[1] * g + row[2] * b) for row in matrix)  # type: ignore[return-value]
+
+    return apply
+
+
+def _spline(points_text: str) -> Optional[Callable[[float], float]]:
+    """Натуральный кубический сплайн по точкам «x/y x/y …» (интерполяция curves по умолчанию)."""
+    points: List[Tuple[float, float]] = []
+    for token in points_text.split():
+        x_raw, sep, y_raw = token.partition("/")
+        x, y = _to_float(x_raw), _to_float(y_raw) if sep else None
+        if x is None or y is None:
+            return None
+        points.append((x, y))
+    points.sort()
+    if not points:
+        return None
+    if len(points) == 1:
+        level = points[0][1]
+        return lambda _v: level
+    xs = [p[0] for p in points]
+    ys = [p[1] for p in points]
+    n = len(points)
+    h = [xs[i + 1] - xs[i] for i in range(n - 1)]
+    if any(step <= 0 for step in h):
+        return None
+    # трёхдиагональная система для вторых производных, на концах — 0
+    m = [0.0] * n
+    if n > 2:
+        sub = [0.0] * n
+        diag = [1.0] * n
+        sup = [0.0] * n
+        rhs = [0.0] * n
+        for i in range(1, n - 1):
+            sub[i], diag[i], sup[i] = h[i - 1], 2 * (h[i - 1] + h[i]), h[i]
+            rhs[i] = 6 * ((ys[i + 1] - ys[i]) / h[i] - (ys[i] - ys[i - 1]) / h[i - 1])
+        for i in range(1, n):
+            factor = sub[i] / diag[i - 1]
+            diag[i] -= factor * sup[i - 1]
+            rhs[i] -= factor * rhs[i - 1]
+        for i in range(n - 1, -1, -1):
+            m[i] = (rhs[i] - (sup[i] * m[i + 1] if i + 1 < n else 0.0)) / diag[i]
+        m[0] = m[-1] = 0.0
+
+    def curve(value: float) -> float:
+        if value <= xs[0]:
+            return _clip(ys[0])
+        if value >= xs[-1]:
+            return _clip(ys[-1])
+        i = max(0, min(n - 2, next(idx for idx in range(n - 1) if value <= xs[idx + 1])))
+        t = value - xs[i]
+        span = h[i]
+        b = (ys[i + 1] - ys[i]) / span - span * (2 * m[i] + m[i + 1]) / 6
+        return _clip(ys[i] + b * t + m[i] / 2 * t * t + (m[i + 1] - m[i]) / (6 * span) * t ** 3)
+
+    return curve
+
+
+def _compile_curves(f: Filter) -> Optional[ColorFn]:
+    aliases = {"m": "master", "red": "r", "green": "g", "blue": "b"}
+    components: Dict[str, str] = {}
+    preset = None
+    for key, raw in f.args:
+        if key is None:
+            return None
+        key = aliases.get(key, key)
+        value = _unquote(raw)
+        if key == "preset":
+            preset = value
+        elif key == "interp" and value == "natural":
+            continue
+        elif key in ("master", "r", "g", "b", "all"):
+            components[key] = value
+        else:
+            return None
+    merged = dict(_CURVES_PRESETS.get(preset, {})) if preset and preset != "none" else {}
+    if preset and preset != "none" and preset not in _CURVES_PRESETS:
+        return None
+    merged.update(components)
+    for channel in "rgb":
+        if channel not in merged and "all" in merged:
+            merged[channel] = merged["all"]
+    curves: Dict[str, Callable[[float], float]] = {}
+    for name in ("master", "r", "g", "b"):
+        if name in merged:
+            fn = _spline(merged[name])
+            if fn is None:
+                return None
+            curves[name] = fn
+    master = curves.get("master", lambda v: v)
+    per_channel = [curves.get(c, lambda v: v) for c in "rgb"]
+
+    def apply(rgb: RGB) -> RGB:
+        return tuple(master(per_channel[i](rgb[i])) for i in range(3))  # type: ignore[return-value]
+
+    return apply
+
+
+@dataclass
+class CubeLut:
+    size: int
+    table: List[RGB]
+    domain_min: RGB = (0.0, 0.0, 0.0)
+    domain_max: RGB = (1.0, 1.0, 1.0)
+
+    @classmethod
+    def load(cls, path: Path) -> Optional["CubeLut"]:
+        size = 0
+        table: List[RGB] = []
+        low, high = [0.0, 0.0, 0.0], [1.0, 1.0, 1.0]
+        try:
+            lines = path.read_text(encoding="utf-8", errors="replace").splitlines()
+        except OSError:
+            return None
+        for raw in lines:
+            line = raw.strip()
+            if not line or line.startswith("#") or line.startswith("TITLE"):
+                continue
+            head, _, rest = line.partition(" ")
+            if head == "LUT_3D_SIZE":
+                size = int(float(rest))
+            elif head == "LUT_1D_SIZE":
+                return None
+            elif head == "DOMAIN_MIN":
+                low = [float(x) for x in rest.split()]
+            elif head == "DOMAIN_MAX":
+                high = [float(x) for x in rest.split()]
+            else:
+                try:
+                    table.append(tuple(float(x) for x in line.split()[:3]))  # type: ignore[arg-type]
+                except ValueError:
+                    return None
+        if size < 2 or len(table) != size ** 3:
+            return None
+        return cls(size, table, tuple(low), tuple(high))  # type: ignore[arg-type]
+
+    def sample(self, rgb: RGB) -> RGB:
+        """Трилинейная выборка (r меняется быстрее всего, как в .cube)."""
+        n = self.size - 1
+        coords = []
+        for i in range(3):
+            span = (self.domain_max[i] - self.domain_min[i]) or 1.0
+            coords.append(_clip((rgb[i] - self.domain_min[i]) / span) * n)
+        base = [min(int(c), n - 1) for c in coords]
+        frac = [coords[i] - base[i] for i in range(3)]
+        out = [0.0, 0.0, 0.0]
+        for dr in (0, 1):
+            wr = frac[0] if dr else 1 - frac[0]
+            for dg in (0, 1):
+                wg = frac[1] if dg else 1 - frac[1]
+                for db in (0, 1):
+                    weight = wr * wg * (frac[2] if db else 1 - frac[2])
+                    if weight == 0.0:
+                        continue
+                    entry = self.table[(base[0] + dr) + (base[1] + dg) * self.size + (base[2] + db) * self.size * self.size]
+                    for i in range(3):
+                        out[i] += weight * entry[i]
+        return _clip(out[0]), _clip(out[1]), _clip(out[2])
+
+
+def _lut_file(f: Filter) -> Optional[Path]:
+    raw = f.get("file", 0)
+    if raw is None or any(key not in (None, "file", "interp") for key, _ in f.args):
+        return None
+    path = Path(_unquote(raw).replace("\\'", "'").replace("\\:", ":"))
+    return path if path.suffix.lower() == ".cube" and path.is_file() else None
+
+
+def _compile_lut3d(f: Filter) -> Optional[ColorFn]:
+    path = _lut_file(f)
+    lut = CubeLut.load(path) if path else None
+    return lut.sample if lut else None
+
+
+_COMPILERS: Dict[str, Callable[[Filter], Optional[ColorFn]]] = {
+    "eq": _compile_eq,
+    "hue": _compile_hue,
+    "colorbalance": _compile_colorbalance,
+    "colorchannelmixer": _compile_colorchannelmixer,
+    "curves": _compile_curves,
+    "lut3d": _compile_lut3d,
+}
+
+
+def compile_filter(f: Filter) -> Optional[ColorFn]:
+    compiler = _COMPILERS.get(f.name)
+    return compiler(f) if compiler else None
+# END REGION AI
+
+
+# REGION AI: lut baking and chain fusion
+def _compose(functions: Sequence[ColorFn]) -> ColorFn:
+    def apply(rgb: RGB) -> RGB:
+        for fn in functions:
+            rgb = fn(rgb)
+        return rgb
+
+    return apply
+
+
+def bake_cube(transform: ColorFn, size: int, path: Path, title: str = "uniclon fused color") -> CubeLut:
+    table: List[RGB] = []
+    step = 1.0 / (size - 1)
+    for b in range(size):
+        for g in range(size):
+            for r in range(size):
+                table.append(transform((r * step, g * step, b * step)))
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # fix: пишем во временный файл и переименовываем — параллельные копии не увидят недописанный LUT
+    fd, tmp_name = tempfile.mkstemp(prefix=".cube_", dir=str(path.parent))
+    with os.fdopen(fd, "w", encoding="utf-8") as handle:
+        handle.write(f'TITLE "{title}"\nLUT_3D_SIZE {size}\n')
+        handle.writelines(f"{r:.6f} {g:.6f} {b:.6f}\n" for r, g, b in table)
+    os.chmod(tmp_name, 0o644)
+    os.replace(tmp_name, path)
+    return CubeLut(size, table)
+
+
+def prune_lut_cache(
+    cache_dir: Path,
+    ttl_minutes: float = LUT_CACHE_TTL_MIN,
+    max_bytes: float = LUT_CACHE_MAX_MB * 1024 * 1024,
+) -> int:
+    """Удаляет color_*.cube старше TTL, затем самые давние сверх max_bytes; возвращает число удалённых."""
+    now = time.time()
+    entries: List[Tuple[float, int, Path]] = []
+    for path in cache_dir.glob("color_*.cube"):
+        try:
+            stat = path.stat()
+        except OSError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, path))
+    entries.sort()
+    removed = 0
+    total = sum(size for _, size, _ in entries)
+    for mtime, size, path in entries:
+        age = now - mtime
+        if age < _LUT_IN_USE_SECONDS:
+            break
+        if age <= ttl_minutes * 60 and total <= max_bytes:
+            continue
+        try:
+            path.unlink()
+        except OSError:
+            continue
+        total -= size
+        removed += 1
+    if removed:
+        logger.info("[ColorLUT] pruned %s cached LUTs in %s", removed, cache_dir)
+    return removed
+
+
+def max_lut_error(transform: ColorFn, lut: CubeLut, samples: int = 256, seed: int = 7) -> float:
+    """Максимальное отклонение LUT от прямого расчёта на случайных цветах (в долях 0..1)."""
+    rng = random.Random(seed)
+    worst = 0.0
+    for _ in range(samples):
+        rgb = (rng.random(), rng.random(), rng.random())
+        exact, baked = transform(rgb), lut.sample(rgb)
+        worst = max(worst, max(abs(exact[i] - baked[i]) for i in range(3)))
+    return worst
+
+
+def _pad_color(f: Filter) -> Optional[RGB]:
+    raw = _unquote(f.get("color", 4) or "black").split("@", 1)[0].lower()
+    if raw in _PAD_COLORS:
+        return _PAD_COLORS[raw]
+    digits = raw[2:] if raw.startswith("0x") else raw[1:] if raw.startswith("#") else ""
+    if len(digits) == 6 and all(ch in "0123456789abcdef" for ch in digits):
+        return tuple(int(digits[i:i + 2], 16) / 255.0 for i in (0, 2, 4))  # type: ignore[return-value]
+    return None
+
+
+def _recolor_pad(f: Filter, rgb: RGB) -> Filter:
+    hex_color = "0x" + "".join(f"{round(_clip(c) * 255):02X}" for c in rgb)
+    recolored = Filter(f.name, list(f.args))
+    for idx, (key, _) in enumerate(recolored.args):
+        if key == "color":
+            recolored.args[idx] = (key, hex_color)
+            return recolored
+    positional = [idx for idx, (key, _) in enumerate(recolored.args) if key is None]
+    if len(positional) >= 5:
+        recolored.args[positional[4]] = (None, hex_color)
+    else:
+        recolored.args.append(("color", hex_color))
+    return recolored
+
+
+def _lut_filter(path: Path) -> Filter:
+    escaped = str(path).replace("\\", "\\\\").replace("'", "\\'").replace(":", "\\:")
+    return Filter("lut3d", [("file", f"'{escaped}'"), ("interp", "tetrahedral")])
+
+
+def fuse_color_filters(
+    chain: FilterChain,
+    cache_dir: Path,
+    *,
+    lut_size: int = DEFAULT_LUT_SIZE,
+    bake: bool = True,
+) -> Tuple[FilterChain, List[str]]:
+    """Заменяет группы из ≥2 цветовых фильтров одним lut3d из кэша (ключ — хэш параметров).
+
+    Группа собирается вперёд от первого цветового фильтра через фильтры, не меняющие цвет;
+    через pad цвет переносится точно — цвет поля пересчитывается той же функцией.
+    bake=False только строит итоговую цепочку (пути .cube те же), ничего не записывая, — для сравнения стоимости.
+    """
+    if chain.kind != "video" or not chain.is_linear:
+        return chain, []
+    if bake:
+        # fix: без чистки кэш LUT растёт на ~1 МБ за каждую новую комбинацию параметров копии
+        prune_lut_cache(cache_dir)
+    filters = list(chain.filters)
+    notes: List[str] = []
+    start = 0
+    while start < len(filters):
+        first = filters[start]
+        first_fn = compile_filter(first)
+        if first_fn is None:
+            start += 1
+            continue
+        members: List[Tuple[int, Filter, ColorFn]] = [(start, first, first_fn)]
+        pads: List[int] = []
+        idx = start + 1
+        while idx < len(filters):
+            candidate = filters[idx]
+            fn = compile_filter(candidate)
+            if fn is not None:
+                members.append((idx, candidate, fn))
+            elif candidate.name == "pad" and _pad_color(candidate) is not None:
+                pads.append(idx)
+            elif candidate.name not in _TRANSPARENT:
+                break
+            idx += 1
+        if len(members) < 2:
+            start += 1
+            continue
+
+        transform = _compose([fn for _, _, fn in members])
+        key_parts = [_COMPILER_VERSION, str(lut_size)]
+        for _, f, _ in members:
+            key_parts.append(f.serialize())
+            lut_path = _lut_file(f) if f.name == "lut3d" else None
+            if lut_path is not None:
+                stat = lut_path.stat()
+                key_parts.append(f"{stat.st_size}:{int(stat.st_mtime)}")
+        digest = hashlib.sha1("|".join(key_parts).encode("utf-8")).hexdigest()[:16]
+        cube_path = cache_dir / f"color_{digest}.cube"
+        if not bake:
+            notes.append(f"would fuse {len(members)} color filters into {cube_path.name}")
+        elif cube_path.exists():
+            try:
+                os.utime(cube_path)  # TTL считается от последнего использования
+            except OSError:
+                pass
+            notes.append(f"fused {len(members)} color filters into cached {cube_path.name}")
+        else:
+            baked = bake_cube(transform, lut_size, cube_path)
+            error = max_lut_error(transform, baked)
+            notes.append(f"fused {len(members)} color filters into {cube_path.name} ({lut_size}³, max err {error:.4f})")
+
+        member_idx = {i for i, _, _ in members}
+        rebuilt: List[Filter] = filters[:start] + [_lut_filter(cube_path)]
+        for i in range(start + 1, idx):
+            if i in member_idx:
+                continue
+            if i in pads:
+                # поле pad в исходной цепочке проходило через фильтры группы, стоявшие после него
+                later = _compose([fn for j, _, fn in members if j > i])
+                rebuilt.append(_recolor_pad(filters[i], later(_pad_color(filters[i]))))  # type: ignore[arg-type]
+            else:
+                rebuilt.append(filters[i])
+        consumed = len(rebuilt)
+        filters = rebuilt + filters[idx:]
+        start = consumed
+    return FilterChain(filters, chain.kind), notes
+# END REGION AI
@@ -0,0 +1,869 @@
+"""Filter-graph IR for linear ffmpeg -vf/-af chains: parse, optimize, serialize, estimate cost."""
+from __future__ import annotations
+
+import argparse
+import ast
+import json
+import math
+import operator
+import re
+import shlex
+import sys
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Относительная стоимость фильтра на пиксель кадра (≈ операций; окрестностные фильтры дороже)
+FILTER_COSTS: Dict[str, float] = {
+    "fps": 0.0,
+    "setpts": 0.0,
+    "setsar": 0.0,
+    "setdar": 0.0,
+    "null": 0.0,
+    "crop": 0.05,
+    "hflip": 0.3,
+    "vflip": 0.3,
+    "format": 0.5,
+    "pad": 0.4,
+    "drawtext": 0.2,
+    "blend": 1.0,
+    "eq": 1.0,
+    "hue": 1.2,
+    "colorbalance": 1.2,
+    "colorchannelmixer": 1.5,
+    "curves": 0.8,
+    "lutrgb": 0.8,
+    "lutyuv": 0.6,
+    "lut3d": 1.6,
+    "vignette": 1.5,
+    "noise": 2.0,
+    "scale": 3.0,
+    "gblur": 3.0,
+    "avgblur": 2.0,
+    "unsharp": 4.0,
+}
+_DEFAULT_COST = 1.0
+
+# Поточечные цветовые фильтры: не зависят от соседей и координат, поэтому коммутируют с crop/scale/fps
+POINTWISE = frozenset({"eq", "hue", "colorbalance", "colorchannelmixer", "curves", "lutrgb", "lutyuv", "lut3d", "negate"})
+# Что можно пропустить вперёд: crop меняет только рамку, fps только выбирает кадры
+_CROP_COMMUTES = POINTWISE | {"noise"}
+_FPS_COMMUTES = POINTWISE | {"noise", "unsharp", "gblur", "avgblur", "hflip", "vflip", "format", "setsar"}
+# Геометрия кадра тоже не зависит от соседних кадров — fps проходит её, если в выражениях нет n/t
+_FPS_COMMUTES_GEOMETRY = frozenset({"scale", "crop", "pad", "setdar"})
+
+# Фильтры только для RGB: перед ними ffmpeg вставляет yuv→rgb, а перед yuv-фильтром или энкодером — обратно
+_RGB_ONLY = frozenset({"lut3d", "lutrgb", "curves", "colorbalance", "colorchannelmixer"})
+# Фильтры, принимающие кадр в любом формате: через них RGB доходит без конвертации
+_FORMAT_AGNOSTIC = frozenset({"fps", "setpts", "setsar", "setdar", "null", "crop", "hflip", "vflip", "pad"})
+# Стоимость одной конвертации yuv↔rgb (swscale) на пиксель кадра
+_PIXFMT_CONVERT_COST = 1.5
+
+_EQ_DEFAULTS = {"brightness": 0.0, "contrast": 1.0, "saturation": 1.0, "gamma": 1.0}
+_EQ_POSITIONAL = ("contrast", "brightness", "saturation", "gamma")
+_NOOP_TOL = 1e-3
+
+
+# REGION AI: chain parsing
+def split_top_level(text: str, sep: str) -> List[str]:
+    """Делит по sep вне кавычек, скобок и экранирования (\\)."""
+    parts: List[str] = []
+    current: List[str] = []
+    quote: Optional[str] = None
+    depth = 0
+    escaping = False
+    for char in text:
+        if escaping:
+            current.append(char)
+            escaping = False
+            continue
+        if char == "\\":
+            current.append(char)
+            escaping = True
+            continue
+        if quote:
+            current.append(char)
+            if char == quote:
+                quote = None
+            continue
+        if char in ("'", '"'):
+            quote = char
+        elif char in "([":
+            depth += 1
+        elif char in ")]":
+            depth = max(0, depth - 1)
+        elif char == sep and depth == 0:
+            parts.append("".join(current))
+            current = []
+            continue
+        current.append(char)
+    parts.append("".join(current))
+    return parts
+
+
+def _unquote(value: str) -> str:
+    value = value.strip()
+    if len(value) >= 2 and value[0] == value[-1] and value[0] in ("'", '"'):
+        return value[1:-1]
+    return value
+
+
+def _parse_args(text: str) -> List[Tuple[Optional[str], str]]:
+    args: List[Tuple[Optional[str], str]] = []
+    for item in split_top_level(text, ":"):
+        key, eq_sep, value = item.partition("=")
+        if eq_sep and key and all(ch.isalnum() or ch == "_" for ch in key):
+            args.append((key, value))
+        else:
+            args.append((None, item))
+    return args
+
+
+@dataclass
+class Filter:
+    name: str
+    args: List[Tuple[Optional[str], str]] = field(default_factory=list)
+    raw: Optional[str] = None
+
+    @classmethod
+    def parse(cls, text: str) -> "Filter":
+        text = text.strip()
+        name, sep, arg_text = text.partition("=")
+        args = _parse_args(arg_text) if sep else []
+        # fix: crop='w:h:x:y' целиком в кавычках — разворачиваем только для анализа, raw остаётся как был
+        if len(args) == 1 and args[0][0] is None and _unquote(args[0][1]) != args[0][1]:
+            args = _parse_args(_unquote(args[0][1]))
+        return cls(name=name.strip(), args=args, raw=text)
+
+    def get(self, key: str, position: Optional[int] = None) -> Optional[str]:
+        for arg_key, value in self.args:
+            if arg_key == key:
+                return value
+        if position is not None:
+            positional = [value for arg_key, value in self.args if arg_key is None]
+            if position < len(positional):
+                return positional[position]
+        return None
+
+    def number(self, key: str, position: Optional[int] = None, default: Optional[float] = None) -> Optional[float]:
+        value = self.get(key, position)
+        if value is None:
+            return default
+        return _to_float(value)
+
+    def set(self, key: str, value: str) -> None:
+        self.raw = None
+        for idx, (arg_key, _) in enumerate(self.args):
+            if arg_key == key:
+                self.args[idx] = (key, value)
+                return
+        self.args.append((key, value))
+
+    def serialize(self) -> str:
+        if self.raw is not None:
+            return self.raw
+        if not self.args:
+            return self.name
+        return f"{self.name}=" + ":".join(value if key is None else f"{key}={value}" for key, value in self.args)
+
+
+@dataclass
+class FilterChain:
+    filters: List[Filter]
+    kind: str = "video"
+
+    @classmethod
+    def parse(cls, text: str, kind: str = "video") -> "FilterChain":
+        items = [item for item in split_top_level(text or "", ",") if item.strip()]
+        return cls([Filter.parse(item) for item in items], kind)
+
+    @property
+    def is_linear(self) -> bool:
+        """Графы с метками [a] или ';' не трогаем — оптимизатор работает с линейными цепочками."""
+        return all(not f.name.startswith("[") and ";" not in f.serialize() for f in self.filters)
+
+    def serialize(self) -> str:
+        return ",".join(f.serialize() for f in self.filters)
+# END REGION AI
+
+
+# REGION AI: expression evaluation
+_FUNCS: Dict[str, Callable[..., float]] = {
+    "_if": lambda cond, a, b=0.0: a if cond else b,
+    "gt": lambda a, b: float(a > b),
+    "lt": lambda a, b: float(a < b),
+    "gte": lambda a, b: float(a >= b),
+    "lte": lambda a, b: float(a <= b),
+    "eq": lambda a, b: float(a == b),
+    "min": min,
+    "max": max,
+    "trunc": math.trunc,
+    "floor": math.floor,
+    "ceil": math.ceil,
+}
+_BINOPS = {ast.Add: operator.add, ast.Sub: operator.sub, ast.Mult: operator.mul, ast.Div: operator.truediv}
+
+
+def _to_float(value: str) -> Optional[float]:
+    text = _unquote(value)
+    if "/" in text and text.replace("/", "").replace(".", "").isdigit():
+        num, _, den = text.partition("/")
+        try:
+            return float(num) / float(den)
+        except (ValueError, ZeroDivisionError):
+            return None
+    try:
+        return float(text)
+    except ValueError:
+        return None
+
+
+def evaluate(expr: str, names: Dict[str, float]) -> Optional[float]:
+    """Безопасно считает простое ffmpeg-выражение (iw, ih, if/gt/min/max, арифметика)."""
+    text = _unquote(expr).replace("if(", "_if(")
+    try:
+        tree = ast.parse(text, mode="eval")
+    except SyntaxError:
+        return None
+
+    def walk(node: ast.AST) -> float:
+        if isinstance(node, ast.Expression):
+            return walk(node.body)
+        if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)):
+            return float(node.value)
+        if isinstance(node, ast.Name) and node.id in names:
+            return float(names[node.id])
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.USub):
+            return -walk(node.operand)
+        if isinstance(node, ast.BinOp) and type(node.op) in _BINOPS:
+            return _BINOPS[type(node.op)](walk(node.left), walk(node.right))
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id in _FUNCS:
+            return float(_FUNCS[node.func.id](*(walk(arg) for arg in node.args)))
+        raise ValueError(ast.dump(node))
+
+    try:
+        return walk(tree)
+    except (ValueError, TypeError, ZeroDivisionError):
+        return None
+# END REGION AI
+
+
+# REGION AI: geometry and cost model
+@dataclass
+class StreamState:
+    width: float
+    height: float
+    rate: float
+    stretch: float = 1.0
+
+    @property
+    def pixels(self) -> float:
+        return max(1.0, self.width) * max(1.0, self.height)
+
+    @property
+    def frames_per_source_second(self) -> float:
+        return self.rate * self.stretch
+
+
+def _dims(f: Filter, state: StreamState, keys: Tuple[Tuple[str, ...], Tuple[str, ...]]) -> Tuple[Optional[float], Optional[float]]:
+    names = {"iw": state.width, "ih": state.height, "in_w": state.width, "in_h": state.height}
+    raw_w = next((f.get(k) for k in keys[0] if f.get(k) is not None), None) or f.get("", 0)
+    raw_h = next((f.get(k) for k in keys[1] if f.get(k) is not None), None) or f.get("", 1)
+    w = evaluate(raw_w, names) if raw_w is not None else None
+    h = evaluate(raw_h, names) if raw_h is not None else None
+    return w, h
+
+
+def setpts_factor(f: Filter) -> Optional[float]:
+    """Множитель линейного setpts (X*PTS, PTS*X, PTS); None — выражение не сводится к растяжению."""
+    expr = (f.get("expr", 0) or "").replace(" ", "")
+    if expr == "PTS":
+        return 1.0
+    if expr.endswith("*PTS"):
+        factor = _to_float(expr[: -len("*PTS")])
+    elif expr.startswith("PTS*"):
+        factor = _to_float(expr[len("PTS*"):])
+    else:
+        factor = None
+    return factor if factor and factor > 0 else None
+
+
+def apply_filter(f: Filter, state: StreamState) -> StreamState:
+    """Состояние потока (размер, частота, растяжение) после фильтра."""
+    if f.name == "scale":
+        w, h = _dims(f, state, (("w", "width"), ("h", "height")))
+        if w is not None and w < 0 and h and h > 0:
+            w = state.width * h / state.height
+        elif h is not None and h < 0 and w and w > 0:
+            h = state.height * w / state.width
+        return StreamState(w if w and w > 0 else state.width, h if h and h > 0 else state.height, state.rate, state.stretch)
+    if f.name == "crop":
+        w, h = _dims(f, state, (("w", "out_w"), ("h", "out_h")))
+        w = min(state.width, w) if w and w > 0 else state.width
+        h = min(state.height, h) if h and h > 0 else state.height
+        return StreamState(w, h, state.rate, state.stretch)
+    if f.name == "pad":
+        w, h = _dims(f, state, (("w", "width"), ("h", "height")))
+        return StreamState(max(state.width, w or 0), max(state.height, h or 0), state.rate, state.stretch)
+    if f.name == "fps":
+        rate = f.number("fps", 0)
+        return StreamState(state.width, state.height, rate if rate and rate > 0 else state.rate, state.stretch)
+    if f.name == "setpts":
+        factor = setpts_factor(f)
+        if factor:
+            return StreamState(state.width, state.height, state.rate / factor, state.stretch * factor)
+    return state
+
+
+def chain_cost(chain: FilterChain, start: StreamState) -> float:
+    """Оценка стоимости в мегапиксель-операциях на выходной кадр."""
+    state = start
+    total = 0.0
+    in_rgb = False
+    for f in chain.filters:
+        per_frame = state.pixels * state.frames_per_source_second
+        # fix: lut3d и прочие RGB-фильтры стоят ещё и конвертацию yuv→rgb на входе и rgb→yuv на выходе
+        if f.name in _RGB_ONLY:
+            if not in_rgb:
+                total += _PIXFMT_CONVERT_COST * per_frame
+            in_rgb = True
+        elif in_rgb and f.name not in _FORMAT_AGNOSTIC:
+            total += _PIXFMT_CONVERT_COST * per_frame
+            in_rgb = False
+        total += FILTER_COSTS.get(f.name, _DEFAULT_COST) * per_frame
+        state = apply_filter(f, state)
+    if in_rgb:
+        # энкодеру нужен yuv420p
+        total += _PIXFMT_CONVERT_COST * state.pixels * state.frames_per_source_second
+    out_fps = max(1e-6, state.frames_per_source_second)
+    return total / out_fps / 1e6
+# END REGION AI
+
+
+# REGION AI: optimizer passes
+@dataclass
+class OptimizeReport:
+    cost_before: float
+    cost_after: float
+    changes: List[str] = field(default_factory=list)
+    unit: str = "Mpx·op/frame"
+
+    def describe(self) -> str:
+        saved = 0.0 if self.cost_before <= 0 else (1 - self.cost_after / self.cost_before) * 100
+        details = "; ".join(self.changes) if self.changes else "no changes"
+        return f"cost {self.cost_before:.2f}→{self.cost_after:.2f} {self.unit} (-{saved:.0f}%) | {details}"
+
+    def to_dict(self) -> Dict[str, object]:
+        return {"cost_before": round(self.cost_before, 4), "cost_after": round(self.cost_after, 4), "changes": list(self.changes)}
+
+
+def _eq_values(f: Filter) -> Optional[Dict[str, float]]:
+    """Числовые brightness/contrast/saturation/gamma eq или None (выражения, каналы gamma_r…)."""
+    values = dict(_EQ_DEFAULTS)
+    positional = 0
+    for key, raw in f.args:
+        if key is None:
+            if positional >= len(_EQ_POSITIONAL):
+                return None
+            key = _EQ_POSITIONAL[positional]
+            positional += 1
+        if key not in _EQ_DEFAULTS:
+            return None
+        number = _to_float(raw)
+        if number is None:
+            return None
+        values[key] = number
+    return values
+
+
+def _is_noop(f: Filter, kind: str) -> bool:
+    if f.name in ("null", "anull"):
+        return True
+    if kind == "video":
+        if f.name == "eq":
+            values = _eq_values(f)
+            return values is not None and all(abs(values[k] - v) < _NOOP_TOL for k, v in _EQ_DEFAULTS.items())
+        if f.name == "hue" and all(key in ("h", "s") for key, _ in f.args):
+            return abs(f.number("h", default=0.0) or 0.0) < _NOOP_TOL and abs((f.number("s", default=1.0) or 1.0) - 1.0) < _NOOP_TOL
+        if f.name == "setpts":
+            factor = setpts_factor(f)
+            return factor is not None and abs(factor - 1.0) < _NOOP_TOL
+        return False
+    if f.name == "atempo":
+        tempo = f.number("tempo", 0, 1.0)
+        return tempo is not None and abs(tempo - 1.0) < _NOOP_TOL
+    if f.name == "volume":
+        raw = (f.get("volume", 0) or "1").strip().lower()
+        if raw.endswith("db"):
+            level = _to_float(raw[:-2])
+            return level is not None and abs(level) < _NOOP_TOL
+        level = _to_float(raw)
+        return level is not None and abs(level - 1.0) < _NOOP_TOL and len(f.args) <= 1
+    return False
+
+
+def _merge_pair(a: Filter, b: Filter, kind: str) -> Optional[List[Filter]]:
+    """Слияние соседей a→b; [] — пара взаимно гасится, None — не сливаются."""
+    if a.serialize() == b.serialize() and a.name in ("format", "setsar", "setdar", "fps", "aformat", "aresample"):
+        return [b]
+    if a.name == "fps" and b.name == "fps":
+        # fix: fps из комбо после fps копии — кадры прореживаются один раз, сразу до меньшей частоты
+        rate_a, rate_b = a.number("fps", 0), b.number("fps", 0)
+        if rate_a and rate_b and rate_b <= rate_a and len(a.args) <= 1 and len(b.args) <= 1:
+            return [b]
+        return None
+    if a.name == b.name and a.name in ("hflip", "vflip") and not a.args and not b.args:
+        return []
+    if a.name == "eq" and b.name == "eq":
+        first, second = _eq_values(a), _eq_values(b)
+        if first is None or second is None:
+            return None
+        # eq: v' = c·(v−0.5)+0.5+b, затем gamma; gamma сливается только если второй eq не двигает уровни
+        if abs(first["gamma"] - 1.0) > _NOOP_TOL and (abs(second["contrast"] - 1.0) > _NOOP_TOL or abs(second["brightness"]) > _NOOP_TOL):
+            return None
+        merged = Filter("eq")
+        merged.raw = None
+        merged.set("brightness", f"{second['contrast'] * first['brightness'] + second['brightness']:.4f}")
+        merged.set("contrast", f"{first['contrast'] * second['contrast']:.4f}")
+        merged.set("saturation", f"{first['saturation'] * second['saturation']:.4f}")
+        gamma = first["gamma"] * second["gamma"]
+        if abs(gamma - 1.0) > _NOOP_TOL:
+            merged.set("gamma", f"{gamma:.4f}")
+        return [merged]
+    if a.name == "hue" and b.name == "hue" and all(k in ("h", "s") for k, _ in a.args + b.args):
+        h = (a.number("h", default=0.0) or 0.0) + (b.number("h", default=0.0) or 0.0)
+        s = (a.number("s", default=1.0) or 1.0) * (b.number("s", default=1.0) or 1.0)
+        if None in (a.number("h", default=0.0), b.number("h", default=0.0), a.number("s", default=1.0), b.number("s", default=1.0)):
+            return None
+        merged = Filter("hue")
+        merged.set("h", f"{h:.4f}")
+        merged.set("s", f"{s:.4f}")
+        return [merged]
+    if kind == "audio" and a.name == "atempo" and b.name == "atempo":
+        ta, tb = a.number("tempo", 0), b.number("tempo", 0)
+        if ta and tb and 0.5 <= ta * tb <= 2.0:
+            merged = Filter("atempo")
+            merged.args = [(None, f"{ta * tb:.6g}")]
+            return [merged]
+    if kind == "audio" and a.name == "volume" and b.name == "volume" and len(a.args) == 1 and len(b.args) == 1:
+        va, vb = a.number("volume", 0), b.number("volume", 0)
+        if va is not None and vb is not None:
+            merged = Filter("volume")
+            merged.args = [(None, f"{va * vb:.6g}")]
+            return [merged]
+    return None
+
+
+def _drop_noops(filters: List[Filter], kind: str, changes: List[str]) -> List[Filter]:
+    kept = []
+    for f in filters:
+        if _is_noop(f, kind):
+            changes.append(f"dropped {f.serialize()}")
+            continue
+        kept.append(f)
+    return kept
+
+
+def _merge_adjacent(filters: List[Filter], kind: str, changes: List[str]) -> List[Filter]:
+    result: List[Filter] = []
+    for f in filters:
+        if result:
+            merged = _merge_pair(result[-1], f, kind)
+            if merged is not None:
+                prev = result.pop()
+                changes.append(f"merged {prev.name}+{f.name}" if merged else f"cancelled {prev.name}+{f.name}")
+                result.extend(merged)
+                continue
+        result.append(f)
+    return result
+
+
+def _dedupe_format(filters: List[Filter], changes: List[str]) -> List[Filter]:
+    """Повторный format=X: важен только последний, промежуточные форматы ffmpeg согласует сам."""
+    last_seen: Dict[str, int] = {}
+    for idx, f in enumerate(filters):
+        if f.name == "format":
+            last_seen[f.serialize()] = idx
+    result = []
+    for idx, f in enumerate(filters):
+        if f.name == "format" and last_seen.get(f.serialize(), idx) != idx:
+            changes.append(f"dropped duplicate {f.serialize()}")
+            continue
+        result.append(f)
+    return result
+
+
+def _hoist(filters: List[Filter], start: StreamState, changes: List[str]) -> List[Filter]:
+    """Поднимает crop, уменьшающий scale и прореживающий fps выше поточечных фильтров."""
+    filters = list(filters)
+    moved = True
+    while moved:
+        moved = False
+        state = start
+        states = []
+        for f in filters:
+            states.append(state)
+            state = apply_filter(f, state)
+        for idx in range(1, len(filters)):
+            f, prev = filters[idx], filters[idx - 1]
+            before = states[idx]
+            after = apply_filter(f, before)
+            if f.name == "crop":
+                ok = prev.name in _CROP_COMMUTES
+            elif f.name == "scale":
+                ok = prev.name in POINTWISE and after.pixels < before.pixels
+            elif f.name == "fps":
+                ok = after.rate < before.rate and (
+                    prev.name in _FPS_COMMUTES or (prev.name in _FPS_COMMUTES_GEOMETRY and not _frame_dependent(prev))
+                )
+            else:
+                ok = False
+            if ok:
+                filters[idx - 1], filters[idx] = f, prev
+                changes.append(f"moved {f.name} before {prev.name}")
+                moved = True
+                break
+    return filters
+
+
+def optimize(chain: FilterChain, start: Optional[StreamState] = None) -> Tuple[FilterChain, OptimizeReport]:
+    start = start or StreamState(1080, 1920, 30.0)
+    # для аудио стоимость считаем в числе фильтров: на сэмпл они сопоставимы
+    unit = "Mpx·op/frame" if chain.kind == "video" else "filters"
+    before = chain_cost(chain, start) if chain.kind == "video" else float(len(chain.filters))
+    if not chain.is_linear:
+        return chain, OptimizeReport(before, before, ["non-linear graph left as is"], unit)
+    changes: List[str] = []
+    filters = list(chain.filters)
+    for _ in range(8):
+        snapshot = [f.serialize() for f in filters]
+        filters = _drop_noops(filters, chain.kind, changes)
+        filters = _merge_adjacent(filters, chain.kind, changes)
+        if chain.kind == "video":
+            filters = _dedupe_format(filters, changes)
+            filters = _hoist(filters, start, changes)
+        if [f.serialize() for f in filters] == snapshot:
+            break
+    if not filters:
+        filters = [Filter("anull" if chain.kind == "audio" else "null")]
+    result = FilterChain(filters, chain.kind)
+    after = chain_cost(result, start) if chain.kind == "video" else float(len(filters))
+    return result, OptimizeReport(before, after, changes, unit)
+# END REGION AI
+
+
+# REGION AI: segment safety
+# Фильтры с состоянием между кадрами или зависимостью от номера кадра: при кодировании частями
+# они стартуют заново на каждой склейке (сиды шума, fade, tmix, петля movie), поэтому части не совпадут с одним проходом
+_TEMPORAL_FILTERS = frozenset(
+    {"noise", "tmix", "tblend", "fade", "movie", "amovie", "minterpolate", "framerate", "zoompan", "deflicker",
+     "select", "trim", "loop", "tpad", "random", "framestep", "deshake", "vidstabtransform", "hqdn3d", "atadenoise"}
+)
+_FRAME_VARS = re.compile(r"(?<![\w.])(?:t|n|T|N|pos|random)(?![\w])")
+
+
+def _frame_dependent(f: Filter) -> bool:
+    """Выражения фильтра зависят от номера/времени кадра (n, t, enable=, eval=frame)."""
+    return any(
+        key == "enable" or (key == "eval" and value.strip() == "frame") or bool(_FRAME_VARS.search(value)) for key, value in f.args
+    )
+
+
+def segment_safety(chain: FilterChain) -> Tuple[Optional[float], str]:
+    """(итоговый множитель setpts, причина) — множитель None, если цепочку нельзя кодировать частями.
+
+    Части режутся по времени выхода и переводятся во время источника делением на множитель,
+    поэтому допустимы только линейные setpts и фильтры без состояния между кадрами.
+    """
+    if not chain.is_linear:
+        return None, "filter graph is not a linear chain"
+    stretch = 1.0
+    for f in chain.filters:
+        if f.name in _TEMPORAL_FILTERS:
+            return None, f"temporal filter {f.name}"
+        if f.name == "setpts":
+            factor = setpts_factor(f)
+            if factor is None:
+                return None, f"non-linear setpts {f.get('expr', 0)}"
+            stretch *= factor
+            continue
+        if any(key == "eval" and value.strip() == "frame" for key, value in f.args):
+            return None, f"per-frame expression in {f.name}"
+        if any(key == "enable" or _FRAME_VARS.search(value) for key, value in f.args):
+            return None, f"time-dependent expression in {f.name}"
+    return stretch, "ok"
+# END REGION AI
+
+
+# REGION AI: source probe
+def probe_stream_state(path: str) -> Optional[StreamState]:
+    try:
+        from .probe_cache import probe
+    except ImportError:  # pragma: no cover - fallback for script execution
+        from probe_cache import probe
+    # fix: общий кэш ffprobe — источник каждой копии не пробуется заново
+    media = probe(Path(path))
+    if media is None or not media.width or not media.height:
+        return None
+    return StreamState(float(media.width), float(media.height), media.frame_rate or 30.0)
+
+
+def optimize_text(
+    text: str,
+    kind: str = "video",
+    start: Optional[StreamState] = None,
+    *,
+    color_lut_dir: Optional[str] = None,
+    color_lut_size: Optional[int] = None,
+    sample_rate: Optional[float] = None,
+) -> Tuple[str, OptimizeReport]:
+    if kind == "audio":
+        try:
+            from .audio_graph import optimize_audio
+        except ImportError:  # pragma: no cover - fallback for script execution
+            from audio_graph import optimize_audio
+        optimized, report = optimize_audio(FilterChain.parse(text, kind), sample_rate)
+        return optimized.serialize(), report
+    optimized, report = optimize(FilterChain.parse(text, kind), start)
+    if color_lut_dir and kind == "video":
+        try:
+            from .color_pipeline import DEFAULT_LUT_SIZE, fuse_color_filters
+        except ImportError:  # pragma: no cover - fallback for script execution
+            from color_pipeline import DEFAULT_LUT_SIZE, fuse_color_filters
+        lut_dir, lut_size = Path(color_lut_dir), color_lut_size or DEFAULT_LUT_SIZE
+        # fix: сначала стоимость слитой цепочки без записи .cube — LUT запекается, только если слияние выгодно
+        fused, notes = fuse_color_filters(optimized, lut_dir, lut_size=lut_size, bake=False)
+        if notes:
+            fused_cost = chain_cost(fused, start or StreamState(1080, 1920, 30.0))
+            if fused_cost < report.cost_after:
+                optimized, notes = fuse_color_filters(optimized, lut_dir, lut_size=lut_size)
+                report.changes.extend(notes)
+                report.cost_after = fused_cost
+            else:
+                # lut3d дороже исходных yuv-фильтров с учётом конвертаций — цепочку не меняем
+                report.changes.append(f"kept color filters unfused (lut3d {fused_cost:.2f} >= {report.cost_after:.2f})")
+    return optimized.serialize(), report
+
+
+@dataclass
+class PreparedGraphs:
+    """Итог одного вызова на копию: оптимизированные -vf/-af, граф с пластиной зерна и множитель для сегментов."""
+
+    vf: str
+    af: str = ""
+    vf_grain: str = ""
+    segment_stretch: Optional[float] = None
+    notes: List[str] = field(default_factory=list)
+
+    def shell_fields(self) -> Dict[str, str]:
+        return {
+            "vf": self.vf,
+            "vf_grain": self.vf_grain,
+            "af": self.af,
+            "segment_stretch": f"{self.segment_stretch:.6f}" if self.segment_stretch is not None else "",
+        }
+
+
+def prepare_graphs(
+    vf: str,
+    af: str = "",
+    start: Optional[StreamState] = None,
+    *,
+    optimize_chains: bool = True,
+    color_lut_dir: Optional[str] = None,
+    color_lut_size: Optional[int] = None,
+    sample_rate: Optional[float] = None,
+    grain_cache_dir: Optional[str] = None,
+    grain_seed: str = "",
+    grain_strength: float = 0.0,
+    grain_plates: Optional[int] = None,
+    grain_ref_scale: bool = False,
+) -> PreparedGraphs:
+    """Все per-copy проходы над графами в одном процессе: оптимизация -vf/-af, зерно, проверка сегментов.
+
+    fix: раньше это были отдельные запуски python3 на копию (optimize video/audio, grain, segment-safe).
+    Каждый шаг при ошибке оставляет свою цепочку как есть — рендер не должен ломаться из-за оптимизатора.
+    """
+    start = start or StreamState(1080, 1920, 30.0)
+    result = PreparedGraphs(vf=vf, af=af)
+    if optimize_chains:
+        try:
+            result.vf, report = optimize_text(vf, "video", start, color_lut_dir=color_lut_dir, color_lut_size=color_lut_size)
+            result.notes.append(f"[VFGraph] {report.describe()}")
+        except Exception as exc:  # noqa: BLE001
+            result.notes.append(f"[VFGraph] optimize failed ({exc}); chain left unchanged")
+        if af:
+            try:
+                result.af, report = optimize_text(af, "audio", sample_rate=sample_rate)
+                result.notes.append(f"[AFGraph] {report.describe()}")
+            except Exception as exc:  # noqa: BLE001
+                result.notes.append(f"[AFGraph] optimize failed ({exc}); chain left unchanged")
+    try:
+        result.segment_stretch, reason = segment_safety(FilterChain.parse(result.vf, "video"))
+    except Exception as exc:  # noqa: BLE001
+        result.segment_stretch, reason = None, f"parse failed ({exc})"
+    if result.segment_stretch is None:
+        result.notes.append(f"[FilterGraph] segment mode unsafe: {reason}")
+    if grain_cache_dir:
+        try:
+            from .grain import DEFAULT_PLATES, estimated_cost, plan_grain
+        except ImportError:  # pragma: no cover - fallback for script execution
+            from grain import DEFAULT_PLATES, estimated_cost, plan_grain
+        try:
+            chain, plan = plan_grain(
+                FilterChain.parse(result.vf, "video"),
+                seed=grain_seed,
+                strength=grain_strength,
+                cache_dir=Path(grain_cache_dir),
+                start=start,
+                plates=grain_plates or DEFAULT_PLATES,
+            )
+        except Exception as exc:  # noqa: BLE001
+            result.notes.append(f"[Grain] plate blend unavailable ({exc}); noise chain kept")
+            plan = None
+        if plan is not None:
+            result.vf_grain = plan.graph(chain.serialize(), ref_scale=grain_ref_scale)
+            noise_cost, grain_cost = estimated_cost(plan.width, plan.height)
+            result.notes.append(
+                f"[Grain] plate={plan.plate.name} strength={plan.strength:g} opacity={plan.opacity:.3f} "
+                f"cost {noise_cost:.2f}→{grain_cost:.2f} Mpx·op/frame"
+            )
+    return result
+
+
+def parse_size(value: Optional[str]) -> Optional[Tuple[float, float]]:
+    if not value or "x" not in value:
+        return None
+    w, _, h = value.partition("x")
+    try:
+        return float(w), float(h)
+    except ValueError:
+        return None
+
+
+def start_state(size: Optional[str] = None, fps: Optional[float] = None, source: Optional[str] = None) -> StreamState:
+    state = probe_stream_state(source) if source else None
+    if state is None:
+        w, h = parse_size(size) or (1080.0, 1920.0)
+        state = StreamState(w, h, 30.0)
+    if fps and fps > 0 and not source:
+        state.rate = float(fps)
+    return state
+
+# END REGION AI
+
+
+# REGION AI: cli
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Uniclon filter-graph optimizer")
+    sub = parser.add_subparsers(dest="command", required=True)
+    opt = sub.add_parser("optimize", help="Optimize a linear -vf/-af chain and report per-frame cost")
+    opt.add_argument("--kind", choices=("video", "audio"), default="video")
+    opt.add_argument("--chain", required=True)
+    opt.add_argument("--size", help="Source frame size WxH for the cost model")
+    opt.add_argument("--fps", type=float, help="Source frame rate for the cost model")
+    opt.add_argument("--source", help="Probe size/frame rate from this file with ffprobe")
+    opt.add_argument("--json", action="store_true", help="Print report as JSON to stderr")
+    opt.add_argument("--color-lut-dir", help="Fuse color filters into a cached lut3d stored in this directory")
+    opt.add_argument("--color-lut-size", type=int, help="Fused lut3d grid size (default 33)")
+    opt.add_argument("--rate", type=float, help="Input audio sample rate (audio kind; probed from --source when omitted)")
+    seg = sub.add_parser("segment-safe", help="Check that a -vf chain can be encoded in parallel segments; print its setpts factor")
+    seg.add_argument("--chain", required=True)
+    prep = sub.add_parser("prepare", help="All per-copy graph passes in one call; prints GRAPH_* shell assignments")
+    prep.add_argument("--vf", required=True)
+    prep.add_argument("--af", default="")
+    prep.add_argument("--size", help="Source frame size WxH for the cost model")
+    prep.add_argument("--fps", type=float, help="Source frame rate for the cost model")
+    prep.add_argument("--source", help="Source file: frame size, frame rate and audio rate from the cached probe")
+    prep.add_argument("--no-optimize", action="store_true", help="Skip the -vf/-af optimizer (grain and segment check still run)")
+    prep.add_argument("--color-lut-dir", help="Fuse color filters into a cached lut3d stored in this directory")
+    prep.add_argument("--color-lut-size", type=int, help="Fused lut3d grid size (default 33)")
+    prep.add_argument("--rate", type=float, help="Input audio sample rate (probed from --source when omitted)")
+    prep.add_argument("--grain-cache-dir", help="Replace noise with a cached grain plate blend (plates stored here)")
+    prep.add_argument("--grain-seed", default="")
+    prep.add_argument("--grain-strength", type=float, default=0.0)
+    prep.add_argument("--grain-plates", type=int)
+    prep.add_argument("--grain-ref-scale", action="store_true", help="Fit the plate to the filtered frame with scale2ref")
+    return parser
+
+
+def _cli_segment_safe(args: argparse.Namespace) -> int:
+    try:
+        stretch, reason = segment_safety(FilterChain.parse(args.chain, "video"))
+    except Exception as exc:  # noqa: BLE001
+        stretch, reason = None, f"parse failed ({exc})"
+    if stretch is None:
+        print(f"[FilterGraph] segment mode unsafe: {reason}", file=sys.stderr)
+        return 1
+    sys.stdout.write(f"{stretch:.6f}")
+    return 0
+
+
+def _cli_prepare(args: argparse.Namespace) -> int:
+    try:
+        start = start_state(args.size, args.fps, args.source)
+    except Exception as exc:  # noqa: BLE001
+        print(f"[FilterGraph] source probe failed ({exc}); default frame used", file=sys.stderr)
+        start = None
+    sample_rate = args.rate
+    if args.af and not sample_rate and args.source:
+        try:
+            from .audio_graph import probe_sample_rate
+        except ImportError:  # pragma: no cover - fallback for script execution
+            from audio_graph import probe_sample_rate
+        sample_rate = probe_sample_rate(args.source)
+    prepared = prepare_graphs(
+        args.vf, args.af, start,
+        optimize_chains=not args.no_optimize,
+        color_lut_dir=args.color_lut_dir,
+        color_lut_size=args.color_lut_size,
+        sample_rate=sample_rate,
+        grain_cache_dir=args.grain_cache_dir,
+        grain_seed=args.grain_seed,
+        grain_strength=args.grain_strength,
+        grain_plates=args.grain_plates,
+        grain_ref_scale=args.grain_ref_scale,
+    )
+    for note in prepared.notes:
+        print(note, file=sys.stderr)
+    for key, value in prepared.shell_fields().items():
+        print(f"GRAPH_{key.upper()}={shlex.quote(value)}")
+    return 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    if args.command == "segment-safe":
+        return _cli_segment_safe(args)
+    if args.command == "prepare":
+        return _cli_prepare(args)
+    try:
+        start = start_state(args.size, args.fps, args.source) if args.kind == "video" else None
+        sample_rate = args.rate
+        if args.kind == "audio" and not sample_rate and args.source:
+            try:
+                from .audio_graph import probe_sample_rate
+            except ImportError:  # pragma: no cover - fallback for script execution
+                from audio_graph import probe_sample_rate
+            sample_rate = probe_sample_rate(args.source)
+        optimized, report = optimize_text(
+            args.chain, args.kind, start, color_lut_dir=args.color_lut_dir, color_lut_size=args.color_lut_size,
+            sample_rate=sample_rate,
+        )
+    except Exception as exc:  # noqa: BLE001
+        # fix: оптимизатор не должен ломать рендер — при любой ошибке отдаём цепочку как есть
+        print(f"[FilterGraph] optimize failed ({exc}); chain left unchanged", file=sys.stderr)
+        sys.stdout.write(args.chain)
+        return 0
+    sys.stdout.write(optimized)
+    label = "VFGraph" if args.kind == "video" else "AFGraph"
+    if args.json:
+        print(json.dumps(report.to_dict(), ensure_ascii=False), file=sys.stderr)
+    else:
+        print(f"[{label}] {report.describe()}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
+# END REGION AI
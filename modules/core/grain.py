@@ -0,0 +1,238 @@
+"""Grain plates: cached seamless noise textures blended per copy instead of per-frame noise."""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import logging
+import os
+import random
+import struct
+import sys
+import tempfile
+import zlib
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+MODULE_DIR = Path(__file__).resolve().parent
+PROJECT_ROOT = MODULE_DIR.parent.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+# REGION AI: imports
+try:
+    from .filter_graph import FILTER_COSTS, FilterChain, StreamState, apply_filter, start_state
+except ImportError:  # pragma: no cover - fallback for script execution
+    from modules.core.filter_graph import FILTER_COSTS, FilterChain, StreamState, apply_filter, start_state
+# END REGION AI
+
+logger = logging.getLogger(__name__)
+
+# Амплитуда пластины в кодах 8 бит; сила копии = opacity · амплитуда, как alls у noise
+PLATE_AMPLITUDE = 24
+# Запас по краям пластины под покадровый сдвиг кадрирования
+PLATE_MARGIN = 64
+DEFAULT_PLATES = 4
+_PLATE_VERSION = "1"
+
+
+# REGION AI: plate library
+def _write_gray_png(path: Path, width: int, height: int, pixels: bytes) -> None:
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data) & 0xFFFFFFFF)
+
+    rows = b"".join(b"\x00" + pixels[y * width:(y + 1) * width] for y in range(height))
+    payload = (
+        b"\x89PNG\r\n\x1a\n"
+        + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 0, 0, 0, 0))
+        + chunk(b"IDAT", zlib.compress(rows, 1))
+        + chunk(b"IEND", b"")
+    )
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # fix: атомарная запись — параллельные копии не должны прочитать недописанную пластину
+    fd, tmp_name = tempfile.mkstemp(prefix=".plate_", dir=str(path.parent))
+    with os.fdopen(fd, "wb") as handle:
+        handle.write(payload)
+    os.chmod(tmp_name, 0o644)
+    os.replace(tmp_name, path)
+
+
+def render_plate(path: Path, width: int, height: int, seed: int, amplitude: int = PLATE_AMPLITUDE) -> None:
+    """Равномерный шум вокруг 128 (±amplitude): бесшовен по построению — соседние пиксели независимы."""
+    table = bytes(128 + round((value / 255.0 * 2.0 - 1.0) * amplitude) for value in range(256))
+    pixels = random.Random(seed).randbytes(width * height).translate(table)
+    _write_gray_png(path, width, height, pixels)
+
+
+def plate_path(cache_dir: Path, width: int, height: int, index: int) -> Path:
+    return cache_dir / f"plate_v{_PLATE_VERSION}_{width}x{height}_a{PLATE_AMPLITUDE}_{index}.png"
+
+
+def ensure_plate(cache_dir: Path, width: int, height: int, index: int) -> Path:
+    """Пластина для разрешения width×height (с запасом PLATE_MARGIN); рендерится один раз и кэшируется."""
+    plate_w, plate_h = width + PLATE_MARGIN, height + PLATE_MARGIN
+    path = plate_path(cache_dir, plate_w, plate_h, index)
+    if not path.exists():
+        render_plate(path, plate_w, plate_h, seed=int(hashlib.sha1(path.name.encode()).hexdigest()[:8], 16))
+        logger.info("[Grain] rendered plate %s", path.name)
+    return path
+# END REGION AI
+
+
+# REGION AI: per-copy grain graph
+@dataclass
+class GrainPlan:
+    plate: Path
+    width: int
+    height: int
+    strength: float
+    offset_x: int
+    offset_y: int
+    step_x: int
+    step_y: int
+    fps: float
+
+    @property
+    def opacity(self) -> float:
+        return min(1.0, max(0.0, self.strength / PLATE_AMPLITUDE))
+
+    def graph(self, chain: str, ref_scale: bool = False) -> str:
+        """-vf граф: основная цепочка + пластина; ref_scale — подогнать пластину к фактическому кадру через scale2ref."""
+        escaped = str(self.plate).replace("\\", "\\\\").replace("'", "\\'").replace(":", "\\:")
+        jitter_x = f"mod({self.offset_x}+n*{self.step_x}\\,{PLATE_MARGIN})"
+        jitter_y = f"mod({self.offset_y}+n*{self.step_y}\\,{PLATE_MARGIN})"
+        grain = (
+            f"movie=filename='{escaped}',loop=loop=-1:size=1:start=0,setpts=N/({self.fps:g}*TB),"
+            f"crop={self.width}:{self.height}:{jitter_x}:{jitter_y},format=yuv420p"
+        )
+        blend = f"blend=all_mode=grain_merge:all_opacity={self.opacity:.4f}:shortest=1"
+        if ref_scale:
+            # fix: размер кадра после scale=w=-2/crop-выражений считается приблизительно — blend требует точного совпадения,
+            # поэтому пластина подгоняется к основному потоку (neighbor не размывает зерно)
+            return (
+                f"{chain}[uc_main];{grain}[uc_grain];"
+                f"[uc_grain][uc_main]scale2ref=w=main_w:h=main_h:flags=neighbor[uc_grain_fit][uc_main_ref];"
+                f"[uc_main_ref][uc_grain_fit]{blend}"
+            )
+        return f"{chain}[uc_main];{grain}[uc_grain];[uc_main][uc_grain]{blend}"
+
+
+def strip_noise(chain: FilterChain) -> Tuple[FilterChain, float]:
+    """Убирает noise-фильтры (в т.ч. из combo) и возвращает максимальную их силу."""
+    strength = 0.0
+    kept = []
+    for f in chain.filters:
+        if f.name != "noise":
+            kept.append(f)
+            continue
+        for key in ("alls", "c0s", "all_strength", "c0_strength"):
+            value = f.number(key)
+            if value is not None:
+                strength = max(strength, value)
+    return FilterChain(kept, chain.kind), strength
+
+
+def plan_grain(
+    chain: FilterChain,
+    *,
+    seed: str,
+    strength: float,
+    cache_dir: Path,
+    start: StreamState,
+    plates: int = DEFAULT_PLATES,
+) -> Tuple[FilterChain, Optional[GrainPlan]]:
+    stripped, chain_strength = strip_noise(chain)
+    # fix: пластина только заменяет noise копии — без noise в цепочке зерно не добавляется
+    if len(stripped.filters) == len(chain.filters):
+        return chain, None
+    strength = max(strength, chain_strength)
+    if strength <= 0 or not stripped.is_linear:
+        return chain, None
+    state = start
+    for f in stripped.filters:
+        state = apply_filter(f, state)
+    width, height = int(round(state.width)), int(round(state.height))
+    rng = random.Random(int(hashlib.sha1(f"grain|{seed}".encode()).hexdigest()[:12], 16))
+    plate = ensure_plate(cache_dir, width, height, rng.randrange(max(1, plates)))
+    # нечётные шаги по взаимно простой с запасом сетке — соседние кадры не повторяют сдвиг
+    plan = GrainPlan(
+        plate=plate,
+        width=width,
+        height=height,
+        strength=strength,
+        offset_x=rng.randrange(PLATE_MARGIN),
+        offset_y=rng.randrange(PLATE_MARGIN),
+        step_x=rng.randrange(7, PLATE_MARGIN, 2),
+        step_y=rng.randrange(11, PLATE_MARGIN, 2),
+        fps=max(1.0, state.rate),
+    )
+    return stripped, plan
+
+
+def estimated_cost(width: int, height: int) -> Tuple[float, float]:
+    """Оценка (noise, grain) в Mpx·op/кадр по таблице filter_graph: noise против crop+format+blend."""
+    pixels = width * height / 1e6
+    grain = FILTER_COSTS["crop"] + FILTER_COSTS["format"] + FILTER_COSTS["blend"]
+    return FILTER_COSTS["noise"] * pixels, grain * pixels
+# END REGION AI
+
+
+# REGION AI: cli
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Uniclon grain plates")
+    sub = parser.add_subparsers(dest="command", required=True)
+    apply_cmd = sub.add_parser("apply", help="Replace noise filters with a cached grain plate blend")
+    apply_cmd.add_argument("--chain", required=True)
+    apply_cmd.add_argument("--seed", required=True)
+    apply_cmd.add_argument("--strength", type=float, default=0.0)
+    apply_cmd.add_argument("--cache-dir", required=True)
+    apply_cmd.add_argument("--size", help="Source frame size WxH")
+    apply_cmd.add_argument("--fps", type=float)
+    apply_cmd.add_argument("--source", help="Probe the source frame size/rate (cached ffprobe) instead of --size/--fps")
+    apply_cmd.add_argument("--ref-scale", action="store_true", help="Fit the plate to the filtered frame with scale2ref")
+    apply_cmd.add_argument("--plates", type=int, default=DEFAULT_PLATES)
+    plates_cmd = sub.add_parser("plates", help="Pre-render the plate library for a resolution")
+    plates_cmd.add_argument("--cache-dir", required=True)
+    plates_cmd.add_argument("--size", required=True)
+    plates_cmd.add_argument("--plates", type=int, default=DEFAULT_PLATES)
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    if args.command == "plates":
+        width, _, height = args.size.partition("x")
+        for index in range(max(1, args.plates)):
+            print(ensure_plate(Path(args.cache_dir), int(width), int(height), index))
+        return 0
+    try:
+        start = start_state(args.size, args.fps, args.source)
+        chain, plan = plan_grain(
+            FilterChain.parse(args.chain),
+            seed=args.seed,
+            strength=args.strength,
+            cache_dir=Path(args.cache_dir),
+            start=start,
+            plates=args.plates,
+        )
+    except Exception as exc:  # noqa: BLE001
+        # fix: без пластины рендер идёт со старым noise — цепочку возвращаем как есть
+        print(f"[Grain] plate blend unavailable ({exc}); chain left unchanged", file=sys.stderr)
+        sys.stdout.write(args.chain)
+        return 0
+    if plan is None:
+        sys.stdout.write(args.chain)
+        return 0
+    sys.stdout.write(plan.graph(chain.serialize(), ref_scale=args.ref_scale))
+    noise_cost, grain_cost = estimated_cost(plan.width, plan.height)
+    print(
+        f"[Grain] plate={plan.plate.name} strength={plan.strength:g} opacity={plan.opacity:.3f} "
+        f"cost {noise_cost:.2f}→{grain_cost:.2f} Mpx·op/frame",
+        file=sys.stderr,
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
+# END REGION AI
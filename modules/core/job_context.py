@@ -0,0 +1,92 @@
+"""Per-job render context passed explicitly instead of mutating os.environ."""
+from __future__ import annotations
+
+import datetime as _dt
+import itertools
+from dataclasses import dataclass, field, replace
+from typing import Dict, Mapping, Optional
+
+_JOB_IDS = itertools.count(1)
+
+ENV_CROP_BACKOFF = "UNICLON_CROP_BACKOFF"
+ENV_META_CREATION_TIME = "UNICLON_META_CREATION_TIME"
+ENV_TARGET_DURATION = "UNICLON_TARGET_DURATION"
+ENV_AUDIO_EQ_OVERRIDE = "UNICLON_AUDIO_EQ_OVERRIDE"
+# ключи, которыми управляет контекст задачи: значение процесса в подпроцесс не наследуется
+_CONTEXT_ENV_KEYS = (ENV_CROP_BACKOFF, ENV_META_CREATION_TIME, ENV_TARGET_DURATION, ENV_AUDIO_EQ_OVERRIDE)
+
+
+# REGION AI: per-job context
+@dataclass
+class JobContext:
+    """Состояние одной задачи рендера: тюнинг, глубина crop-backoff, метки времени, профиль, бюджет времени.
+
+    Контекст живёт в пределах задачи и превращается в env только при запуске
+    подпроцесса (to_env), поэтому параллельные задачи не делят os.environ.
+    """
+
+    profile: str = ""
+    quality: str = ""
+    tuning: Dict[str, str] = field(default_factory=dict)
+    tuning_mode: str = "neutral"
+    crop_backoff: int = 0
+    meta_creation_time: Optional[str] = None
+    target_duration: Optional[float] = None
+    audio_eq_override: Optional[str] = None
+    extra_env: Dict[str, str] = field(default_factory=dict)
+    budget_seconds: Optional[float] = None
+    job_id: int = field(default_factory=lambda: next(_JOB_IDS))
+
+    @classmethod
+    def from_env(cls, environ: Mapping[str, str]) -> "JobContext":
+        """Восстанавливает контекст из env дочернего процесса (CLI video_tools.py)."""
+        backoff_raw = (environ.get(ENV_CROP_BACKOFF) or "").strip()
+        duration_raw = (environ.get(ENV_TARGET_DURATION) or "").strip()
+        try:
+            target_duration = float(duration_raw) if duration_raw else None
+        except ValueError:
+            target_duration = None
+        tuning = {k: v for k, v in environ.items() if k.startswith("ADAPTIVE_")}
+        return cls(
+            tuning=tuning,
+            crop_backoff=int(backoff_raw) if backoff_raw.isdigit() else 0,
+            meta_creation_time=(environ.get(ENV_META_CREATION_TIME) or "").strip() or None,
+            target_duration=target_duration,
+            audio_eq_override=(environ.get(ENV_AUDIO_EQ_OVERRIDE) or "").strip() or None,
+        )
+
+    def derive(self, **changes) -> "JobContext":
+        """Копия контекста для повтора/под-задачи; исходный контекст не меняется."""
+        changes.setdefault("tuning", dict(self.tuning))
+        changes.setdefault("extra_env", dict(self.extra_env))
+        return replace(self, **changes)
+
+    def refresh_creation_time(self, shift_seconds: float = 0.0) -> str:
+        stamp = _dt.datetime.now(_dt.timezone.utc) + _dt.timedelta(seconds=shift_seconds)
+        self.meta_creation_time = stamp.strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3] + "Z"
+        return self.meta_creation_time
+
+    def to_env(self) -> Dict[str, str]:
+        """Переменные окружения для подпроцесса этой задачи (поверх базового env)."""
+        env: Dict[str, str] = {k: str(v) for k, v in self.tuning.items()}
+        if self.crop_backoff > 0:
+            env[ENV_CROP_BACKOFF] = str(self.crop_backoff)
+        if self.meta_creation_time:
+            env[ENV_META_CREATION_TIME] = self.meta_creation_time
+        if self.target_duration is not None:
+            env[ENV_TARGET_DURATION] = f"{self.target_duration:g}"
+        if self.audio_eq_override:
+            env[ENV_AUDIO_EQ_OVERRIDE] = self.audio_eq_override
+        env.update({k: str(v) for k, v in self.extra_env.items()})
+        return env
+
+    def build_env(self, base: Mapping[str, str]) -> Dict[str, str]:
+        """base (обычно снимок os.environ) + to_env(); base не модифицируется.
+
+        Ключи, которыми управляет контекст, из base убираются, чтобы устаревшее
+        значение процесса (например, crop-backoff или целевая длительность) не протекало в чужую задачу.
+        """
+        env = {k: v for k, v in base.items() if k not in _CONTEXT_ENV_KEYS}
+        env.update(self.to_env())
+        return env
+# END REGION AI
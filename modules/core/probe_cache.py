@@ -0,0 +1,296 @@
+"""Cached ffprobe: one ``-show_format -show_streams`` JSON per file, shared by bash and Python."""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+PROBE_TIMEOUT = int(os.environ.get("UNICLON_PROBE_TIMEOUT", "60"))
+_PROBE_CMD = ["ffprobe", "-v", "error", "-show_format", "-show_streams", "-of", "json"]
+_KEYFRAMES_CMD = ["ffprobe", "-v", "error", "-select_streams", "v:0", "-skip_frame", "nokey", "-show_entries", "frame=pts_time", "-of", "csv=p=0"]
+
+
+# REGION AI: typed probe accessors
+def _number(value: object) -> Optional[float]:
+    try:
+        number = float(value)  # type: ignore[arg-type]
+    except (TypeError, ValueError):
+        return None
+    return number if number == number else None
+
+
+def _rate(value: object) -> Optional[float]:
+    num, _, den = str(value or "").partition("/")
+    numerator, denominator = _number(num), _number(den or "1")
+    if numerator is None or not denominator:
+        return None
+    return numerator / denominator
+
+
+@dataclass
+class MediaProbe:
+    """Результат ffprobe с типизированными полями; raw — исходный JSON."""
+
+    raw: Dict[str, object] = field(default_factory=dict)
+
+    @property
+    def format(self) -> Dict[str, object]:
+        return self.raw.get("format") or {}  # type: ignore[return-value]
+
+    @property
+    def streams(self) -> List[Dict[str, object]]:
+        return self.raw.get("streams") or []  # type: ignore[return-value]
+
+    def stream(self, codec_type: str) -> Optional[Dict[str, object]]:
+        return next((s for s in self.streams if s.get("codec_type") == codec_type), None)
+
+    @property
+    def duration(self) -> Optional[float]:
+        return _number(self.format.get("duration"))
+
+    @property
+    def format_bit_rate(self) -> Optional[int]:
+        value = _number(self.format.get("bit_rate"))
+        return int(value) if value else None
+
+    @property
+    def video_bit_rate(self) -> Optional[int]:
+        value = _number((self.stream("video") or {}).get("bit_rate"))
+        return int(value) if value else None
+
+    @property
+    def width(self) -> Optional[int]:
+        value = _number((self.stream("video") or {}).get("width"))
+        return int(value) if value else None
+
+    @property
+    def height(self) -> Optional[int]:
+        value = _number((self.stream("video") or {}).get("height"))
+        return int(value) if value else None
+
+    @property
+    def frame_rate(self) -> Optional[float]:
+        video = self.stream("video") or {}
+        return _rate(video.get("avg_frame_rate")) or _rate(video.get("r_frame_rate"))
+
+    @property
+    def has_audio(self) -> bool:
+        return self.stream("audio") is not None
+
+    @property
+    def audio_codec(self) -> str:
+        return str((self.stream("audio") or {}).get("codec_name") or "").lower()
+
+    @property
+    def audio_sample_rate(self) -> Optional[int]:
+        value = _number((self.stream("audio") or {}).get("sample_rate"))
+        return int(value) if value else None
+
+    def shell_fields(self) -> Dict[str, str]:
+        """Плоские поля для bash (media_probe_get_var). Пустая строка — значения нет (как N/A у ffprobe)."""
+
+        def text(value: object) -> str:
+            return "" if value is None else str(value)
+
+        return {
+            "duration": text(self.format.get("duration")),
+            "format_bit_rate": text(self.format_bit_rate),
+            "v_bit_rate": text(self.video_bit_rate),
+            "width": text(self.width),
+            "height": text(self.height),
+            "fps": f"{self.frame_rate:.6f}" if self.frame_rate else "",
+            "has_audio": "1" if self.has_audio else "0",
+            "a_codec": self.audio_codec,
+            "a_sample_rate": text(self.audio_sample_rate),
+        }
+# END REGION AI
+
+
+# REGION AI: probe store
+def default_cache_dir() -> Path:
+    base = os.environ.get("UNICLON_CACHE_DIR") or os.path.join(os.environ.get("OUTPUT_DIR", "output"), "cache")
+    return Path(base) / "probe"
+
+
+def _shell_abspath(path: Union[str, Path]) -> str:
+    """Абсолютный путь так же, как его строит media_probe_key_var: "$PWD/<путь без ./>" без нормализации.
+
+    fix: os.path.abspath схлопывал ".." и брал физический cwd — ключ расходился с bash-ключом,
+    и media_probe_get_var не находил записанный .env.
+    """
+    text = os.fspath(path)
+    if text.startswith("/"):
+        return text
+    cwd = os.environ.get("PWD") or ""
+    try:
+        if not cwd.startswith("/") or not os.path.samefile(cwd, "."):
+            cwd = os.getcwd()
+    except OSError:
+        cwd = os.getcwd()
+    return f"{cwd}/{text[2:] if text.startswith('./') else text}"
+
+
+def probe_key(path: Union[str, Path]) -> Optional[str]:
+    """Ключ как у bash-помощника: md5("<$PWD/путь>|<размер>|<mtime, с>")."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    identity = f"{_shell_abspath(path)}|{stat.st_size}|{int(stat.st_mtime)}"
+    return hashlib.md5(os.fsencode(identity)).hexdigest()[:16]
+
+
+def _write_atomic(target: Path, payload: str) -> None:
+    # fix: атомарная запись — параллельные копии не должны прочитать недописанный JSON
+    fd, tmp_name = tempfile.mkstemp(prefix=".probe_", dir=str(target.parent))
+    with os.fdopen(fd, "w", encoding="utf-8") as handle:
+        handle.write(payload)
+    os.replace(tmp_name, target)
+
+
+def _store(cache_dir: Path, key: str, raw: Dict[str, object]) -> MediaProbe:
+    probe = MediaProbe(raw)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    env_text = "".join(f"{name}={value}\n" for name, value in probe.shell_fields().items())
+    for suffix, payload in ((".json", json.dumps(raw)), (".env", env_text)):
+        _write_atomic(cache_dir / f"probe_{key}{suffix}", payload)
+    return probe
+
+
+def _cached(cache_dir: Path, key: str) -> Optional[MediaProbe]:
+    cache_path = cache_dir / f"probe_{key}.json"
+    try:
+        cached = MediaProbe(json.loads(cache_path.read_text(encoding="utf-8")))
+        if not (cache_dir / f"probe_{key}.env").exists():
+            # JSON записан без плоского .env (например, прерванная запись) — досоздаём для bash
+            _store(cache_dir, key, cached.raw)
+        return cached
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as exc:
+        logger.warning("[Probe] broken cache %s (%s), re-probing", cache_path.name, exc)
+        return None
+
+
+def probe(path: Union[str, Path], cache_dir: Optional[Path] = None, *, refresh: bool = False) -> Optional[MediaProbe]:
+    """ffprobe файла из кэша или одним вызовом; None, если файла нет или ffprobe не справился."""
+    cache_dir = cache_dir or default_cache_dir()
+    key = probe_key(path)
+    if key is None:
+        return None
+    if not refresh:
+        cached = _cached(cache_dir, key)
+        if cached is not None:
+            return cached
+    try:
+        result = subprocess.run(
+            [*_PROBE_CMD, str(path)], stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=PROBE_TIMEOUT, check=True
+        )
+        raw = json.loads(result.stdout.decode("utf-8", errors="replace") or "{}")
+    except (OSError, subprocess.SubprocessError, ValueError) as exc:
+        logger.warning("[Probe] ffprobe failed for %s: %s", path, exc)
+        return None
+    return _store(cache_dir, key, raw)
+
+
+def keyframes(path: Union[str, Path], cache_dir: Optional[Path] = None, *, refresh: bool = False) -> Optional[List[float]]:
+    """Времена ключевых кадров видеодорожки (с): один проход ffprobe на источник, общий для всех копий."""
+    cache_dir = cache_dir or default_cache_dir()
+    key = probe_key(path)
+    if key is None:
+        return None
+    cache_path = cache_dir / f"probe_{key}.keyframes"
+    if not refresh:
+        try:
+            return [float(line) for line in cache_path.read_text(encoding="utf-8").split()]
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as exc:
+            logger.warning("[Probe] broken keyframe cache %s (%s), re-probing", cache_path.name, exc)
+    try:
+        result = subprocess.run(
+            [*_KEYFRAMES_CMD, str(path)], stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=PROBE_TIMEOUT, check=True
+        )
+    except (OSError, subprocess.SubprocessError) as exc:
+        logger.warning("[Probe] keyframe probe failed for %s: %s", path, exc)
+        return None
+    times = []
+    for line in result.stdout.decode("utf-8", errors="replace").splitlines():
+        value = _number(line.split(",")[0].strip())
+        if value is not None:
+            times.append(value)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    _write_atomic(cache_path, "".join(f"{t:.6f}\n" for t in times))
+    return times
+
+
+async def probe_async(path: Union[str, Path], cache_dir: Optional[Path] = None) -> Optional[MediaProbe]:
+    """Асинхронный вариант probe() для обработчиков бота: тот же кэш и ключ."""
+    cache_dir = cache_dir or default_cache_dir()
+    key = probe_key(path)
+    if key is None:
+        return None
+    cached = _cached(cache_dir, key)
+    if cached is not None:
+        return cached
+    try:
+        proc = await asyncio.create_subprocess_exec(
+            *_PROBE_CMD, str(path), stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+        )
+    except FileNotFoundError:
+        logger.warning("ffprobe not available to probe %s", path)
+        return None
+    stdout, stderr = await proc.communicate()
+    if proc.returncode != 0:
+        logger.warning("ffprobe failed for %s: %s", path, stderr.decode(errors="replace").strip())
+        return None
+    try:
+        raw = json.loads(stdout.decode("utf-8", errors="replace") or "{}")
+    except ValueError:
+        return None
+    return _store(cache_dir, key, raw)
+# END REGION AI
+
+
+# REGION AI: cli
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Uniclon cached ffprobe")
+    parser.add_argument("path")
+    parser.add_argument("--cache-dir", help="Probe cache directory (default: $UNICLON_CACHE_DIR/probe)")
+    parser.add_argument("--refresh", action="store_true", help="Ignore the cached probe")
+    parser.add_argument("--format", choices=["env", "json"], default="env")
+    parser.add_argument("--keyframes", action="store_true", help="Print cached keyframe times (one per line) instead of fields")
+    args = parser.parse_args(argv)
+    if args.keyframes:
+        times = keyframes(args.path, Path(args.cache_dir) if args.cache_dir else None, refresh=args.refresh)
+        if times is None:
+            return 1
+        sys.stdout.write("".join(f"{t:.6f}\n" for t in times))
+        return 0
+    # путь передаётся как есть: Path() убрал бы "./" и "//", и ключ разошёлся бы с bash
+    result = probe(args.path, Path(args.cache_dir) if args.cache_dir else None, refresh=args.refresh)
+    if result is None:
+        return 1
+    if args.format == "json":
+        json.dump(result.raw, sys.stdout)
+        sys.stdout.write("\n")
+    else:
+        for name, value in result.shell_fields().items():
+            print(f"{name}={value}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
+# END REGION AI
@@ -0,0 +1,295 @@
+"""Source analysis: scene cuts, motion and luma sampled once per source and cached by file identity."""
+from __future__ import annotations
+
+import argparse
+import base64
+import hashlib
+import json
+import logging
+import operator
+import os
+import random
+import subprocess
+import sys
+import tempfile
+from array import array
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Кадр анализа: серый 64×36 — достаточно для средней яркости, разности кадров и склеек
+ANALYSIS_WIDTH = 64
+ANALYSIS_HEIGHT = 36
+# fix: частота сэмплов читается один раз — CLI analyze и планировщик должны давать один ключ кэша профиля
+DEFAULT_SAMPLE_FPS = float(os.environ.get("UNICLON_SCENE_FPS") or 8.0)
+ANALYSIS_TIMEOUT = int(os.environ.get("UNICLON_SCENE_TIMEOUT", "120"))
+# Средняя яркость ниже порога — «чёрный» кадр (limited range: чёрный = 16)
+BLACK_LUMA = 22
+WHITE_LUMA = 235
+# Склейка: средняя разность кадров выше порога и в CUT_RATIO раз выше предыдущей
+CUT_DIFF = 28.0
+CUT_RATIO = 3.0
+# Старт за CUT_GUARD до склейки даёт «мигающий» первый кадр
+CUT_GUARD = 0.25
+_PROFILE_VERSION = "1"
+
+
+# REGION AI: source profile
+@dataclass
+class SourceProfile:
+    """Посэмпловые (sample_fps) яркость и движение источника.
+
+    Массивы хранятся компактно через ``array``: luma — 'B' (0–255), motion — 'H'
+    (средняя абсолютная разность с предыдущим сэмплом ×100).
+    """
+
+    sample_fps: float
+    luma: array = field(default_factory=lambda: array("B"))
+    motion: array = field(default_factory=lambda: array("H"))
+    cuts: List[float] = field(default_factory=list)
+
+    @property
+    def duration(self) -> float:
+        return len(self.luma) / self.sample_fps if self.sample_fps > 0 else 0.0
+
+    @property
+    def step(self) -> float:
+        return 1.0 / self.sample_fps if self.sample_fps > 0 else 1.0
+
+    def index_at(self, t: float) -> int:
+        if not self.luma:
+            return 0
+        return min(len(self.luma) - 1, max(0, int(t * self.sample_fps)))
+
+    def luma_at(self, t: float) -> int:
+        return self.luma[self.index_at(t)] if self.luma else 0
+
+    def motion_at(self, t: float) -> float:
+        return self.motion[self.index_at(t)] / 100.0 if self.motion else 0.0
+
+    def is_black(self, t: float) -> bool:
+        return bool(self.luma) and self.luma_at(t) < BLACK_LUMA
+
+    def cut_within(self, start: float, end: float) -> bool:
+        return any(start < cut <= end for cut in self.cuts)
+
+    def distance_to_cut(self, t: float) -> float:
+        return min((abs(t - cut) for cut in self.cuts), default=float("inf"))
+
+    def per_second(self) -> Tuple[List[float], List[float]]:
+        """Средние яркость и движение по секундам."""
+        per = max(1, int(round(self.sample_fps)))
+        luma: List[float] = []
+        motion: List[float] = []
+        for offset in range(0, len(self.luma), per):
+            chunk_l = self.luma[offset:offset + per]
+            chunk_m = self.motion[offset:offset + per]
+            luma.append(round(sum(chunk_l) / len(chunk_l), 2))
+            motion.append(round(sum(chunk_m) / len(chunk_m) / 100.0, 2))
+        return luma, motion
+
+    def to_dict(self) -> dict:
+        return {
+            "version": _PROFILE_VERSION,
+            "sample_fps": self.sample_fps,
+            "luma": base64.b64encode(self.luma.tobytes()).decode("ascii"),
+            "motion": base64.b64encode(self.motion.tobytes()).decode("ascii"),
+            "cuts": self.cuts,
+        }
+
+    @classmethod
+    def from_dict(cls, payload: dict) -> "SourceProfile":
+        luma = array("B")
+        luma.frombytes(base64.b64decode(payload["luma"]))
+        motion = array("H")
+        motion.frombytes(base64.b64decode(payload["motion"]))
+        return cls(float(payload["sample_fps"]), luma, motion, [float(c) for c in payload.get("cuts", [])])
+# END REGION AI
+
+
+# REGION AI: one-pass analysis and cache
+def analyze_source(path: Path, sample_fps: float = DEFAULT_SAMPLE_FPS, timeout: int = ANALYSIS_TIMEOUT) -> SourceProfile:
+    """Один проход ffmpeg: уменьшенные серые кадры с частотой sample_fps → яркость, движение, склейки."""
+    frame_size = ANALYSIS_WIDTH * ANALYSIS_HEIGHT
+    cmd = [
+        "ffmpeg", "-v", "error", "-nostdin", "-i", str(path), "-an", "-sn", "-dn",
+        "-vf", f"fps={sample_fps:g},scale={ANALYSIS_WIDTH}:{ANALYSIS_HEIGHT}:flags=area,format=gray",
+        "-f", "rawvideo", "-",
+    ]
+    raw = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, timeout=timeout, check=True).stdout
+    profile = SourceProfile(sample_fps)
+    prev: Optional[bytes] = None
+    prev_diff = 0.0
+    for offset in range(0, len(raw) - frame_size + 1, frame_size):
+        frame = raw[offset:offset + frame_size]
+        diff = 0.0
+        if prev is not None:
+            diff = sum(map(abs, map(operator.sub, frame, prev))) / frame_size
+            if diff >= CUT_DIFF and diff >= CUT_RATIO * max(prev_diff, 1.0):
+                profile.cuts.append(round(len(profile.luma) / sample_fps, 3))
+        profile.luma.append(int(round(sum(frame) / frame_size)))
+        profile.motion.append(min(0xFFFF, int(round(diff * 100))))
+        prev, prev_diff = frame, diff
+    return profile
+
+
+def source_key(path: Path, sample_fps: float = DEFAULT_SAMPLE_FPS) -> str:
+    stat = path.stat()
+    identity = f"{path.resolve()}|{stat.st_size}|{stat.st_mtime_ns}|{sample_fps:g}|v{_PROFILE_VERSION}"
+    return hashlib.sha1(identity.encode("utf-8")).hexdigest()
+
+
+def load_or_analyze(path: Path, cache_dir: Path, sample_fps: float = DEFAULT_SAMPLE_FPS) -> Optional[SourceProfile]:
+    """Профиль источника из кэша или один проход анализа; None, если анализ невозможен."""
+    try:
+        cache_path = cache_dir / f"scene_{source_key(path, sample_fps)[:16]}.json"
+    except OSError as exc:
+        logger.warning("[Scene] source unavailable: %s", exc)
+        return None
+    if cache_path.exists():
+        try:
+            return SourceProfile.from_dict(json.loads(cache_path.read_text(encoding="utf-8")))
+        except (OSError, ValueError, KeyError) as exc:
+            logger.warning("[Scene] broken cache %s (%s), re-analyzing", cache_path.name, exc)
+    try:
+        profile = analyze_source(path, sample_fps)
+    except (OSError, subprocess.SubprocessError) as exc:
+        logger.warning("[Scene] analysis failed for %s: %s", path.name, exc)
+        return None
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    # fix: атомарная запись — параллельные копии не должны прочитать недописанный профиль
+    fd, tmp_name = tempfile.mkstemp(prefix=".scene_", dir=str(cache_dir))
+    with os.fdopen(fd, "w", encoding="utf-8") as handle:
+        json.dump(profile.to_dict(), handle)
+    os.replace(tmp_name, cache_path)
+    logger.info("[Scene] analyzed %s: %.1fs, %d cuts", path.name, profile.duration, len(profile.cuts))
+    return profile
+# END REGION AI
+
+
+# REGION AI: window and preview selection
+def _spread_order(candidates: Sequence[float], first: float, limit: Optional[int] = None) -> List[float]:
+    """Порядок «самая дальняя точка»: каждая следующая копия получает кандидата дальше всех от уже выданных."""
+    order = [first]
+    rest = [c for c in candidates if c != first]
+    while rest and (limit is None or len(order) < limit):
+        best = max(rest, key=lambda c: (min(abs(c - o) for o in order), -c))
+        order.append(best)
+        rest.remove(best)
+    return order
+
+
+def _start_ok(profile: SourceProfile, t: float) -> bool:
+    return not profile.is_black(t) and not profile.cut_within(t, t + CUT_GUARD)
+
+
+def pick_clip_start(profile: SourceProfile, cap: float, copy_index: int, rng: random.Random) -> Optional[float]:
+    """Старт окна в [0, cap]: не на чёрном кадре и не прямо перед склейкой, разнесённый между копиями.
+
+    Если вся зона [0, cap] чёрная (затемнение в начале), зона расширяется до первого
+    нечёрного сэмпла, но не дальше 15% длительности и 1.5 с.
+    """
+    if not profile.luma or cap < 0:
+        return None
+    step = profile.step
+    grid = [round(i * step, 3) for i in range(int(cap / step) + 1)]
+    candidates = [t for t in grid if _start_ok(profile, t)]
+    if not candidates:
+        limit = min(1.5, profile.duration * 0.15)
+        t = 0.0
+        while t <= limit and not _start_ok(profile, t):
+            t = round(t + step, 3)
+        if t > limit:
+            return None
+        candidates = [t]
+    first = max(candidates, key=lambda t: (profile.motion_at(t), -t))
+    base = _spread_order(candidates, first)[copy_index % len(candidates)]
+    jittered = base + rng.uniform(0.0, step * 0.5)
+    upper = max(cap, base)
+    return round(min(upper, jittered) if _start_ok(profile, jittered) else base, 3)
+
+
+def nudge_start(profile: SourceProfile, start: float, limit: float) -> float:
+    """Сдвигает старт (после комбо-сдвига) на ближайший допустимый сэмпл в пределах [0, limit]."""
+    if not profile.luma or _start_ok(profile, start):
+        return start
+    step = profile.step
+    for k in range(1, int(max(limit, 0.0) / step) + 2):
+        for t in (start + k * step, start - k * step):
+            if 0.0 <= t <= limit and _start_ok(profile, t):
+                return round(t, 3)
+    return start
+
+
+def _preview_score(profile: SourceProfile, t: float) -> float:
+    luma = profile.luma_at(t)
+    # середина диапазона яркости и умеренное движение — резкий и читаемый кадр
+    return -abs(luma - 128) / 128.0 - min(profile.motion_at(t), 20.0) / 40.0 + min(profile.distance_to_cut(t), 2.0) / 4.0
+
+
+def pick_preview_time(
+    profile: SourceProfile,
+    clip_start: float,
+    clip_duration: float,
+    stretch: float,
+    copy_index: int,
+    tolerance: float = 0.15,
+) -> Optional[float]:
+    """Время превью в секундах выходного ролика: нечёрный, непересвеченный кадр вдали от склеек.
+
+    Среди кандидатов не хуже лучшего на ``tolerance`` копии получают разнесённые по времени кадры.
+    """
+    if not profile.luma or clip_duration <= 1.0:
+        return None
+    stretch = stretch if stretch > 0 else 1.0
+    step = profile.step
+    candidates = []
+    t_out = 0.5
+    while t_out <= clip_duration - 0.5:
+        t_src = clip_start + t_out / stretch
+        luma = profile.luma_at(t_src)
+        if BLACK_LUMA <= luma <= WHITE_LUMA and profile.distance_to_cut(t_src) >= 0.3:
+            candidates.append((round(t_out, 3), _preview_score(profile, t_src)))
+        t_out += step
+    if not candidates:
+        return None
+    first, best_score = max(candidates, key=lambda item: (item[1], -item[0]))
+    good = [t for t, score in candidates if score >= best_score - tolerance]
+    slot = copy_index % len(good)
+    return _spread_order(good, first, limit=slot + 1)[slot]
+# END REGION AI
+
+
+# REGION AI: cli
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Uniclon source scene analysis")
+    sub = parser.add_subparsers(dest="command", required=True)
+    analyze = sub.add_parser("analyze", help="Analyze the source once and cache its profile")
+    analyze.add_argument("--source", required=True)
+    analyze.add_argument("--cache-dir", required=True)
+    analyze.add_argument("--sample-fps", type=float, default=DEFAULT_SAMPLE_FPS)
+    analyze.add_argument("--format", choices=["summary", "json"], default="summary")
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    profile = load_or_analyze(Path(args.source), Path(args.cache_dir), args.sample_fps)
+    if profile is None:
+        print("[Scene] analysis unavailable; content-blind clip windows will be used", file=sys.stderr)
+        return 1
+    if args.format == "json":
+        luma, motion = profile.per_second()
+        json.dump({"duration": round(profile.duration, 3), "cuts": profile.cuts, "luma": luma, "motion": motion}, sys.stdout)
+        sys.stdout.write("\n")
+        return 0
+    black = sum(1 for value in profile.luma if value < BLACK_LUMA)
+    print(f"[Scene] {Path(args.source).name}: {profile.duration:.1f}s, {len(profile.cuts)} cuts, {black} black samples @ {profile.sample_fps:g}fps")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
+# END REGION AI
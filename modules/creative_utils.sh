@@ -155,7 +155,9 @@ creative_pick_mirror() {
     return
   fi
   MIRROR_ACTIVE=1
-  if [ "$(rand_int 0 1)" -eq 0 ]; then
+  local flip_roll
+  rand_int_var flip_roll 0 1
+  if [ "$flip_roll" -eq 0 ]; then
     local vf_safe
     vf_safe=$(safe_vf "hflip")
     MIRROR_FILTER=$(creative_unwrap_vf "$vf_safe")
@@ -183,7 +185,7 @@ creative_pick_lut() {
   LUT_ACTIVE=1
   if [ ${#lut_array[@]} -gt 0 ]; then
     local lut_choice
-    lut_choice=$(rand_choice "$array_name")
+    rand_choice_var lut_choice "$array_name"
     LUT_DESC="$(basename "$lut_choice")"
     LUT_DESC="${LUT_DESC//,/ _}"
     local lut_filter="lut3d=file='$(escape_single_quotes "$lut_choice")':interp=tetrahedral"
@@ -216,8 +218,8 @@ creative_pick_intro() {
     return
   fi
   INTRO_ACTIVE=1
-  INTRO_SOURCE=$(rand_choice "$array_name")
-  INTRO_DURATION=$(rand_float 1.0 2.0 2)
+  rand_choice_var INTRO_SOURCE "$array_name"
+  rand_float_var INTRO_DURATION 1.0 2.0 2
   INTRO_DESC="$(basename "$INTRO_SOURCE")"
   INTRO_DESC="${INTRO_DESC//,/ _}"
 }
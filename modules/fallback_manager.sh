@@ -178,7 +178,7 @@ fallback_low_uniqueness() {
 
   local regen_count=2
   if [ "$total" -ge 3 ]; then
-    regen_count=$(rand_int 2 3)
+    rand_int_var regen_count 2 3
   fi
   if [ "$regen_count" -gt "$total" ]; then
     regen_count="$total"
@@ -23,10 +23,65 @@ ffprobe_exec() {
   _ffmpeg_retry "$attempts" "$delay" ffprobe "$@"
 }
 
+# REGION AI: ffmpeg capability table
+# Таблица фильтров ffmpeg загружается один раз за процесс (из манифеста в кэше или одним probe),
+# после этого каждая проверка — поиск в хэше без запуска ffmpeg.
+# fix: модуль подключается повторно (bootstrap_compat) — уже загруженную таблицу не сбрасываем
+FFMPEG_CAPS_LOADED=${FFMPEG_CAPS_LOADED:-0}
+FFMPEG_CAPS_SOURCE=${FFMPEG_CAPS_SOURCE:-}
+if ! declare -p FFMPEG_CAPS >/dev/null 2>&1; then
+  declare -gA FFMPEG_CAPS=()
+fi
+
+ffmpeg_caps_manifest_path() {
+  if [ -n "${UNICLON_FFMPEG_CAPS_FILE:-}" ]; then
+    printf '%s' "$UNICLON_FFMPEG_CAPS_FILE"
+    return 0
+  fi
+  local bin key
+  bin=$(command -v ffmpeg 2>/dev/null) || return 1
+  key=$(deterministic_md5 "${bin}|$(file_size_bytes "$bin" 2>/dev/null)|$(stat -c %Y "$bin" 2>/dev/null || stat -f %m "$bin" 2>/dev/null)")
+  printf '%s/ffmpeg_caps_%s.txt' "${UNICLON_CACHE_DIR:-${OUTPUT_DIR:-.}/cache}" "${key:0:16}"
+}
+
+# ffmpeg_caps_load — заполняет FFMPEG_CAPS; вызывается в основном процессе до подоболочек $(...)
+ffmpeg_caps_load() {
+  [ "$FFMPEG_CAPS_LOADED" -eq 1 ] && return 0
+  local manifest="" listing="" flags name io rest count=0
+  manifest=$(ffmpeg_caps_manifest_path) || manifest=""
+  if [ -n "$manifest" ] && [ -s "$manifest" ]; then
+    while IFS= read -r name; do
+      [ -n "$name" ] && FFMPEG_CAPS["$name"]=1 && count=$((count + 1))
+    done <"$manifest"
+    FFMPEG_CAPS_SOURCE="manifest"
+  elif listing=$(ffmpeg_exec -hide_banner -filters 2>/dev/null) && [ -n "$listing" ]; then
+    # строки вида " T.C acompressor       A->A       Audio compressor."; легенда без "->" пропускается
+    while IFS=$' \t' read -r flags name io rest; do
+      case "$io" in
+        *"->"*) FFMPEG_CAPS["$name"]=1; count=$((count + 1)) ;;
+      esac
+    done <<<"$listing"
+    FFMPEG_CAPS_SOURCE="probe"
+    if [ -n "$manifest" ] && [ "$count" -gt 0 ] && mkdir -p "$(dirname "$manifest")" 2>/dev/null; then
+      # fix: атомарная запись — параллельные прогоны не должны прочитать неполный манифест
+      printf '%s\n' "$listing" | awk '$3 ~ /->/ {print $2}' >"${manifest}.$$.tmp" \
+        && mv -f "${manifest}.$$.tmp" "$manifest" || rm -f "${manifest}.$$.tmp"
+    fi
+  else
+    # ffmpeg недоступен — таблица пуста, повторно не пробуем
+    FFMPEG_CAPS_SOURCE="unavailable"
+  fi
+  FFMPEG_CAPS_LOADED=1
+  echo "[Caps] ${count} ffmpeg filters loaded (${FFMPEG_CAPS_SOURCE})" >&2
+}
+
 ffmpeg_supports_filter() {
-  local filter="$1"
-  ffmpeg_exec -hide_banner -filters 2>/dev/null | grep -qF "$filter"
+  local filter="${1:-}"
+  [ -n "$filter" ] || return 1
+  [ "$FFMPEG_CAPS_LOADED" -eq 1 ] || ffmpeg_caps_load
+  [ -n "${FFMPEG_CAPS[$filter]+x}" ]
 }
+# END REGION AI
 
 ffmpeg_command_preview() {
   local -a args=("$@")
@@ -36,9 +91,82 @@ ffmpeg_command_preview() {
   printf '%s' "$preview"
 }
 
+# REGION AI: cached ffprobe
+# Один ffprobe -show_format -show_streams на файл: JSON и плоский .env лежат в $UNICLON_CACHE_DIR/probe
+# под ключом md5("<$PWD/путь>|<размер>|<mtime>") — тем же, что у modules/core/probe_cache.py.
+MEDIA_PROBE_TTL_MIN=${UNICLON_PROBE_TTL_MIN:-1440}
+
+media_probe_dir() {
+  printf '%s' "${UNICLON_CACHE_DIR:-${OUTPUT_DIR:-.}/cache}/probe"
+}
+
+media_probe_prune() {
+  find "$(media_probe_dir)" -maxdepth 1 -type f -name 'probe_*' -mmin +"$MEDIA_PROBE_TTL_MIN" -delete 2>/dev/null || true
+}
+
+# media_probe_key_var <out_var> <path>
+# Путь не нормализуется ("$PWD/<путь без ./>"): probe_cache.probe_key хэширует ту же строку.
+media_probe_key_var() {
+  local _mpk_path="$2" _mpk_stat="" _mpk_key=""
+  case "$_mpk_path" in
+    /*) ;;
+    *) _mpk_path="${PWD}/${_mpk_path#./}" ;;
+  esac
+  _mpk_stat=$(stat -c '%s|%Y' "$2" 2>/dev/null || stat -f '%z|%m' "$2" 2>/dev/null) || return 1
+  deterministic_md5_var _mpk_key "${_mpk_path}|${_mpk_stat}"
+  printf -v "$1" '%s' "${_mpk_key:0:16}"
+}
+
+# media_probe_get_var <out_var> <path> <field>
+# Поля: duration, format_bit_rate, v_bit_rate, width, height, fps, has_audio, a_codec, a_sample_rate.
+# Попадание в кэш — чтение файла без процессов; промах — один вызов probe_cache.py (ffprobe + запись кэша).
+media_probe_get_var() {
+  local _mp_out="$1" _mp_src="$2" _mp_field="$3" _mp_key="" _mp_dir _mp_env _mp_name _mp_value _mp_text=""
+  printf -v "$_mp_out" '%s' ""
+  media_probe_key_var _mp_key "$_mp_src" || return 1
+  _mp_dir="${UNICLON_CACHE_DIR:-${OUTPUT_DIR:-.}/cache}/probe"
+  _mp_env="${_mp_dir}/probe_${_mp_key}.env"
+  if [ -s "$_mp_env" ]; then
+    _mp_text=$(<"$_mp_env")
+  else
+    # fix: поля берутся из вывода probe_cache.py, а не перечитываются по ключу — промах не даёт пустых значений
+    _mp_text=$(_ffmpeg_retry "${FFMPEG_RETRY_COUNT:-3}" "${FFMPEG_RETRY_DELAY:-1}" \
+      python3 "$BASE_DIR/modules/core/probe_cache.py" "$_mp_src" --cache-dir "$_mp_dir" 2>/dev/null) || return 1
+  fi
+  while IFS='=' read -r _mp_name _mp_value; do
+    if [ "$_mp_name" = "$_mp_field" ]; then
+      printf -v "$_mp_out" '%s' "$_mp_value"
+      return 0
+    fi
+  done <<<"$_mp_text"
+  return 1
+}
+
+media_probe_get() {
+  local value=""
+  media_probe_get_var value "$1" "$2" || return 1
+  printf '%s' "$value"
+}
+
+# media_probe_keyframes <path> → времена ключевых кадров (по одному на строку) из кэша probe_<key>.keyframes
+media_probe_keyframes() {
+  local _mpf_key="" _mpf_dir _mpf_file
+  media_probe_key_var _mpf_key "$1" || return 1
+  _mpf_dir="${UNICLON_CACHE_DIR:-${OUTPUT_DIR:-.}/cache}/probe"
+  _mpf_file="${_mpf_dir}/probe_${_mpf_key}.keyframes"
+  if [ -f "$_mpf_file" ]; then
+    printf '%s\n' "$(<"$_mpf_file")"
+    return 0
+  fi
+  _ffmpeg_retry "${FFMPEG_RETRY_COUNT:-3}" "${FFMPEG_RETRY_DELAY:-1}" \
+    python3 "$BASE_DIR/modules/core/probe_cache.py" "$1" --cache-dir "$_mpf_dir" --keyframes 2>/dev/null
+}
+# END REGION AI
+
 ffmpeg_media_duration_raw() {
-  local source="$1"
-  ffprobe_exec -v error -show_entries format=duration -of default=noprint_wrappers=1:nokey=1 "$source" 2>/dev/null || true
+  local source="$1" raw=""
+  media_probe_get_var raw "$source" duration || true
+  printf '%s' "$raw"
 }
 
 ffmpeg_media_duration_seconds() {
@@ -53,15 +181,9 @@ ffmpeg_media_duration_seconds() {
 }
 
 ffmpeg_audio_stream_info() {
-  local source="$1" codec
-  codec=$(ffprobe_exec -v error -select_streams a:0 -show_entries stream=codec_name -of csv=p=0 "$source" 2>/dev/null || true)
-  codec=$(printf '%s' "$codec" | tr '[:upper:]' '[:lower:]')
-  if [ -n "$codec" ]; then
-    printf '%s' "$codec"
-    return 0
-  fi
-  if ffprobe_exec -v error -select_streams a:0 -show_entries stream=index -of csv=p=0 "$source" >/dev/null 2>&1; then
-    return 0
-  fi
-  return 1
+  local source="$1" codec="" present=""
+  media_probe_get_var present "$source" has_audio || return 1
+  [ "$present" = "1" ] || return 1
+  media_probe_get_var codec "$source" a_codec || true
+  printf '%s' "$codec"
 }
@@ -73,10 +73,10 @@ file_size_bytes() {
 touch_randomize_mtime() {
   local target="$1"
   local days hours minutes seconds touch_stamp
-  days=$(rand_int 2 9)
-  hours=$(rand_int 0 23)
-  minutes=$(rand_int 0 59)
-  seconds=$(rand_int 0 59)
+  rand_int_var days 2 9
+  rand_int_var hours 0 23
+  rand_int_var minutes 0 59
+  rand_int_var seconds 0 59
   touch_stamp=$(format_past_timestamp "%Y%m%d%H%M.%S" "$days" "$hours" "$minutes" "$seconds")
   if [ -n "$touch_stamp" ]; then
     touch -t "$touch_stamp" "$target" 2>/dev/null || true
@@ -74,10 +74,10 @@ prepare_output_name() {
     local -a default_pool=("VID" "VID" "IMG" "PXL")
     local -a ios_pool=("IMG" "IMG" "VID")
     local -a pixel_pool=("PXL" "PXL" "VID")
-    days=$(rand_int 3 10)
-    hours=$(rand_int 0 23)
-    minutes=$(rand_int 0 59)
-    seconds=$(rand_int 0 59)
+    rand_int_var days 3 10
+    rand_int_var hours 0 23
+    rand_int_var minutes 0 59
+    rand_int_var seconds 0 59
     stamp=$(format_past_timestamp "%Y%m%d_%H%M%S" "$days" "$hours" "$minutes" "$seconds")
     if [ -z "$stamp" ]; then
       stamp=$(date -u +"%Y%m%d_%H%M%S")
@@ -111,6 +111,14 @@ prepare_output_name() {
     fi
 
     OUT_NAME="${prefix}_${stamp}_${seed_hash}.mp4"
+    # REGION AI: planned output name
+    # Имя из плана используется, пока оно свободно; при коллизии — прежний цикл перебора.
+    if [ -n "${PLAN_OUTPUT_NAME:-}" ] && [ ! -e "${OUTPUT_DIR}/${PLAN_OUTPUT_NAME}" ]; then
+      OUT_NAME="$PLAN_OUTPUT_NAME"
+      seed_hash="${OUT_NAME##*_}"
+      seed_hash="${seed_hash%.*}"
+    fi
+    # END REGION AI
     OUT="${OUTPUT_DIR}/${OUT_NAME}"
     [ -e "$OUT" ] || break
   done
@@ -130,7 +138,9 @@ rand_description() {
     "Personal draft"
     "Travel vertical"
   )
-  local idx=$(( $(rng_next_chunk) % ${#choices[@]} ))
+  local idx
+  rng_next_chunk_var idx
+  idx=$((idx % ${#choices[@]}))
   echo "${choices[$idx]}"
 }
 rand_title() {
@@ -142,7 +152,9 @@ rand_title() {
     "Daily snap"
     "Phone capture"
   )
-  local idx=$(( $(rng_next_chunk) % ${#titles[@]} ))
+  local idx
+  rng_next_chunk_var idx
+  idx=$((idx % ${#titles[@]}))
   echo "${titles[$idx]}"
 }
 pick_qt_combo() {
@@ -189,7 +201,9 @@ pick_qt_combo() {
       )
       ;;
   esac
-  local idx=$(( $(rng_next_chunk) % ${#combos[@]} ))
+  local idx
+  rng_next_chunk_var idx
+  idx=$((idx % ${#combos[@]}))
   echo "${combos[$idx]}"
 }
 select_fps() {
@@ -197,8 +211,9 @@ select_fps() {
     echo "$PROFILE_FORCE_FPS"
     return
   fi
-  local use_rare=0
-  if [ ${#FPS_RARE[@]} -gt 0 ] && [ "$(rand_int 1 100)" -le 22 ]; then
+  local use_rare=0 rare_roll
+  rand_int_var rare_roll 1 100
+  if [ ${#FPS_RARE[@]} -gt 0 ] && [ "$rare_roll" -le 22 ]; then
     use_rare=1
   fi
   if [ "$use_rare" -eq 1 ]; then
@@ -208,9 +223,10 @@ select_fps() {
   fi
 }
 compute_duration_profile() {
-  local delta=$(rand_float 0.10 0.35 3)
-  local sign=1
-  if [ "$(rand_int 0 1)" -eq 0 ]; then
+  local delta; rand_float_var delta 0.10 0.35 3
+  local sign=1 sign_roll
+  rand_int_var sign_roll 0 1
+  if [ "$sign_roll" -eq 0 ]; then
     sign=-1
   fi
 read TARGET_DURATION STRETCH_FACTOR TEMPO_FACTOR <<EOF
@@ -237,10 +253,10 @@ compute_clip_window() {
   start_cap=$(awk -v orig="$ORIG_DURATION" 'BEGIN{orig+=0; cap=orig*0.08; if(cap>0.35) cap=0.35; if(cap<0.0) cap=0.0; print cap}')
   local shift="0.000"
   if awk -v cap="$start_cap" 'BEGIN{exit (cap>0.05?0:1)}'; then
-    shift=$(rand_float 0.00 "$start_cap" 3)
+    rand_float_var shift 0.00 "$start_cap" 3
   fi
-  local dur_delta=$(rand_float 0.10 0.35 3)
-  local dur_sign=$(rand_int 0 1)
+  local dur_delta; rand_float_var dur_delta 0.10 0.35 3
+  local dur_sign; rand_int_var dur_sign 0 1
   read CLIP_START CLIP_DURATION STRETCH_FACTOR TEMPO_FACTOR <<EOF
 $(awk -v orig="$ORIG_DURATION" -v base="$base_target" -v shift="$shift" -v delta="$dur_delta" -v sign="$dur_sign" 'BEGIN {
   orig+=0; base+=0; shift+=0; delta+=0;
@@ -289,17 +305,19 @@ EOF
 }
 
 pick_crop_offsets() {
-  CROP_W=$(rand_int 0 "$CROP_MAX_PX")
-  CROP_H=$(rand_int 0 "$CROP_MAX_PX")
+  rand_int_var CROP_W 0 "$CROP_MAX_PX"
+  rand_int_var CROP_H 0 "$CROP_MAX_PX"
   CROP_X=0; CROP_Y=0
-  if [ "$CROP_W" -gt 0 ]; then CROP_X=$(rand_int 0 "$CROP_W"); fi
-  if [ "$CROP_H" -gt 0 ]; then CROP_Y=$(rand_int 0 "$CROP_H"); fi
+  if [ "$CROP_W" -gt 0 ]; then rand_int_var CROP_X 0 "$CROP_W"; fi
+  if [ "$CROP_H" -gt 0 ]; then rand_int_var CROP_Y 0 "$CROP_H"; fi
 }
 pick_music_variant_track() {
   MUSIC_VARIANT_TRACK=""
   local total=${#MUSIC_VARIANT_TRACKS[@]}
   if [ "$total" -gt 0 ]; then
-    local idx=$(( $(rng_next_chunk) % total ))
+    local idx
+    rng_next_chunk_var idx
+    idx=$((idx % total))
     MUSIC_VARIANT_TRACK="${MUSIC_VARIANT_TRACKS[$idx]}"
   fi
 }
@@ -375,7 +393,7 @@ next_combo() {
 pick_software_encoder() {
   local profile_key="${1:-default}" attempt=0
   while :; do
-    local prefer=$(rand_int 0 99)
+    local prefer; rand_int_var prefer 0 99
     local family="CapCut"
     if [ -n "${CSOFT:-}" ]; then
       family="$CSOFT"
@@ -387,38 +405,40 @@ pick_software_encoder() {
       esac
     fi
 
-    local variant_roll=$(rand_int 0 99)
+    local variant_roll; rand_int_var variant_roll 0 99
     local minor patch
     if [ "$family" = "CapCut" ]; then
-      minor=$(rand_int 10 28)
+      rand_int_var minor 10 28
       if [ "$variant_roll" -lt 40 ]; then
-        patch=$(rand_int 0 9)
+        rand_int_var patch 0 9
         SOFTWARE_TAG=$(printf "CapCut 12.%d.%d" "$minor" "$patch")
       else
         SOFTWARE_TAG=$(printf "CapCut 12.%d" "$minor")
       fi
     else
-      minor=$(rand_int 5 18)
+      rand_int_var minor 5 18
       if [ "$variant_roll" -lt 55 ]; then
-        patch=$(rand_int 0 9)
+        rand_int_var patch 0 9
         SOFTWARE_TAG=$(printf "VN 2.%d.%d" "$minor" "$patch")
       else
         SOFTWARE_TAG=$(printf "VN 2.%d" "$minor")
       fi
     fi
 
-    local enc_minor=$(rand_int 2 5)
+    local enc_minor; rand_int_var enc_minor 2 5
     ENCODER_TAG=$(printf "Lavf62.%d.100" "$enc_minor")
 
-    if [ "$(rand_int 0 1)" -eq 0 ]; then
+    local brand_roll
+    rand_int_var brand_roll 0 1
+    if [ "$brand_roll" -eq 0 ]; then
       MAJOR_BRAND_TAG="mp42"
     else
       MAJOR_BRAND_TAG="isom"
     fi
-    MINOR_VERSION_TAG=$(rand_int 0 512)
+    rand_int_var MINOR_VERSION_TAG 0 512
     local compat_list=("isommp42" "mp42isom" "iso6mp42")
     local compat_idx
-    compat_idx=$(rand_int 0 $(( ${#compat_list[@]} - 1 )))
+    rand_int_var compat_idx 0 $(( ${#compat_list[@]} - 1 ))
     COMPAT_BRANDS_TAG="${compat_list[$compat_idx]}"
 
     local combo_key="${SOFTWARE_TAG}|${ENCODER_TAG}"
@@ -436,7 +456,31 @@ duration_bucket() {
 
 generate_copy() {
   local copy_index="$1"
+  # REGION AI: batch chunk copy offset
+  # Глобальный номер копии в пакетном режиме: сиды и варианты не повторяются между чанками
+  local seed_index="$copy_index"
+  if [[ "${UNICLON_COPY_INDEX_OFFSET:-0}" =~ ^[0-9]+$ ]]; then
+    seed_index=$((copy_index + ${UNICLON_COPY_INDEX_OFFSET:-0}))
+  fi
+  # END REGION AI
+  # REGION AI: deadline tier
+  # Уровень читается перед каждой копией: executor понижает его, если задача не укладывается в бюджет
+  local COPY_TIER COPY_TIER_NOTE ENCODE_PRESET="slow"
+  COPY_TIER=$(job_tier_current)
+  COPY_TIER_NOTE=$(job_tier_note)
+  case "$COPY_TIER" in
+    fast) ENCODE_PRESET="${UNICLON_FAST_PRESET:-veryfast}" ;;
+    ultra) ENCODE_PRESET="${UNICLON_ULTRA_PRESET:-ultrafast}" ;;
+  esac
+  if [ "$COPY_TIER" != "normal" ]; then
+    echo "[Deadline] copy=$copy_index tier=$COPY_TIER preset=$ENCODE_PRESET ${COPY_TIER_NOTE}"
+  fi
+  # END REGION AI
   local regen_tag="${2:-0}"
+  # REGION AI: per-copy fork metric
+  local copy_forks_start copy_rng_draws_start="$RNG_DRAWS" copy_rng_forks_start="$RNG_FORKS"
+  metrics_fork_count_var copy_forks_start || true
+  # END REGION AI
   local CFPS="" CNOISE="" CMIRROR="" CAUDIO="" CSHIFT="" CBR="" CSOFT="" CLEVEL="" CUR_VF_EXTRA="" CUR_AF_EXTRA="" CUR_COMBO_LABEL="" CUR_COMBO_STRING="" regen_combo=""
   local combo_idx=-1
   combo_engine_autofill
@@ -446,7 +490,7 @@ generate_copy() {
     CUR_COMBO_STRING="$regen_combo"
   fi
   if [ -z "$CUR_COMBO_STRING" ] && [ "${#RUN_COMBOS[@]}" -gt 0 ]; then
-    combo_idx=$(rand_int 0 $(( ${#RUN_COMBOS[@]} - 1 )))
+    rand_int_var combo_idx 0 $(( ${#RUN_COMBOS[@]} - 1 ))
     CUR_COMBO_STRING="${RUN_COMBOS[$combo_idx]}"
   fi
   local attempt=0
@@ -466,11 +510,20 @@ generate_copy() {
       combo_applied=1
       combo_preview="${CUR_COMBO_LABEL:-$CUR_COMBO_STRING}"
       CUR_VF_EXTRA="$(build_filter "${CUR_VF_EXTRA:-}")"
+      # fix: fps= из комбо становится частотой копии (CFPS) — в цепочке остаётся один fps в начале,
+      # а не второй после setpts, который оптимизатор не может слить с первым
+      if [[ ",${CUR_VF_EXTRA}," =~ ,fps=([0-9]+(\.[0-9]+)?), ]]; then
+        printf -v CFPS '%.0f' "${BASH_REMATCH[1]}"
+        CUR_VF_EXTRA=",${CUR_VF_EXTRA},"
+        CUR_VF_EXTRA="${CUR_VF_EXTRA/,fps=${BASH_REMATCH[1]},/,}"
+        CUR_VF_EXTRA="${CUR_VF_EXTRA#,}"
+        CUR_VF_EXTRA="${CUR_VF_EXTRA%,}"
+      fi
       CUR_AF_EXTRA="$(build_filter "${CUR_AF_EXTRA:-}")"
       CUR_AF_EXTRA=$(ensure_superequalizer_bounds "${CUR_AF_EXTRA:-}")
       echo "[Strategy] Using combo #${copy_index} → ${combo_preview}"
     fi
-    SEED_HEX=$(deterministic_md5 "${SRC}_${copy_index}_соль_${regen_tag}_${attempt}")
+    SEED_HEX=$(deterministic_md5 "${SRC}_${seed_index}_соль_${regen_tag}_${attempt}")
     init_rng "$SEED_HEX"
 # REGION AI: reset variant descriptor per attempt
     CURRENT_VARIANT_KEY=""
@@ -481,15 +534,35 @@ generate_copy() {
     local variant_audio_sr="${AUDIO_SR_OPTIONS[0]:-44100}"
     variant_input_basename="$(basename "$SRC")"
     local variant_fs_epoch=""
-    if variant_payload=$(python3 "$BASE_DIR/modules/utils/video_tools.py" generate \
+    # REGION AI: render planner
+    # Один вызов video_tools.py plan отдаёт и RAND_* варианта, и итоговые PLAN_* параметры копии;
+    # UNICLON_PLANNER=0 возвращает прежний generate + расчёт в shell.
+    local plan_var
+    for plan_var in $(compgen -v PLAN_); do unset -v "$plan_var"; done
+    local -a variant_cli_args=(generate --audio-sample-rate "$variant_audio_sr")
+    if [ "${UNICLON_PLANNER:-1}" != "0" ]; then
+      local plan_fps_base="" plan_fps_rare="" plan_audio_rates=""
+      printf -v plan_fps_base '%s,' "${FPS_BASE[@]}"
+      [ ${#FPS_RARE[@]} -gt 0 ] && printf -v plan_fps_rare '%s,' "${FPS_RARE[@]}"
+      [ ${#AUDIO_SR_OPTIONS[@]} -gt 0 ] && printf -v plan_audio_rates '%s,' "${AUDIO_SR_OPTIONS[@]}"
+      variant_cli_args=(plan --seed "$SEED_HEX" --orig-duration "${ORIG_DURATION:-0}" --max-duration "${PROFILE_MAX_DURATION:-0}"
+        --fps-base "$plan_fps_base" --fps-rare "$plan_fps_rare" --audio-rates "${plan_audio_rates:-44100}"
+        --noise-percent "${NOISE_PROB_PERCENT:-30}" --crop-max-px "${CROP_MAX_PX:-6}"
+        --force-fps "${PROFILE_FORCE_FPS:-}" --target-fps "${TARGET_FPS_ENV:-}" --combo-fps "${CFPS:-}"
+        --combo-bitrate-scale "${CBR:-}" --combo-shift "${CSHIFT:-}" --combo-noise "${CNOISE:-}")
+      if [ "${SCENE_PROFILE_READY:-0}" -eq 1 ]; then
+        variant_cli_args+=(--source "$SRC" --scene-cache-dir "$SCENE_CACHE_DIR")
+      fi
+    fi
+    # END REGION AI
+    if variant_payload=$(python3 "$BASE_DIR/modules/utils/video_tools.py" "${variant_cli_args[@]}" \
       --input "$variant_input_basename" \
-      --copy-index "$copy_index" \
+      --copy-index "$seed_index" \
       --salt "$RANDOMIZATION_SALT" \
       --profile-br-min "$BR_MIN" \
       --profile-br-max "$BR_MAX" \
       --base-width "$TARGET_W" \
       --base-height "$TARGET_H" \
-      --audio-sample-rate "$variant_audio_sr" \
       --format shell 2>&1); then
       while IFS= read -r variant_line; do
         local variant_line_trimmed="${variant_line#"${variant_line%%[![:space:]]*}"}"
@@ -521,6 +594,10 @@ generate_copy() {
     fi
 
     # параметры видео
+    if [ -n "${PLAN_FPS:-}" ]; then
+      FPS="$PLAN_FPS"
+      TARGET_FPS="$FPS"
+    else
     local default_fps
     default_fps=$(select_fps)
     FPS="$default_fps"
@@ -540,17 +617,22 @@ generate_copy() {
     FPS="$TARGET_FPS"
     FPS=$(validate_fps "$FPS")
     TARGET_FPS="$FPS"
+    fi
 
     local base_br
-    base_br=$(rand_int "$BR_MIN" "$BR_MAX")
+    if [ -n "${PLAN_BITRATE_KBPS:-}" ]; then
+      BR="$PLAN_BITRATE_KBPS"
+    else
+    rand_int_var base_br "$BR_MIN" "$BR_MAX"
     if [ -z "${RAND_BITRATE_KBPS:-}" ]; then
       BR="$base_br"
       if [ "$BR_MIN" -le 4600 ] && [ "$BR_MAX" -ge 3200 ]; then
-        local mid_min mid_max
+        local mid_min mid_max mid_roll
         mid_min=$(( BR_MIN > 3200 ? BR_MIN : 3200 ))
         mid_max=$(( BR_MAX < 4600 ? BR_MAX : 4600 ))
-        if [ "$mid_min" -le "$mid_max" ] && [ "$(rand_int 1 100)" -le 72 ]; then
-          BR=$(rand_int "$mid_min" "$mid_max")
+        rand_int_var mid_roll 1 100
+        if [ "$mid_min" -le "$mid_max" ] && [ "$mid_roll" -le 72 ]; then
+          rand_int_var BR "$mid_min" "$mid_max"
         fi
       fi
     else
@@ -560,7 +642,17 @@ generate_copy() {
       BR=$(awk -v b="$BR" -v m="$CBR" 'BEGIN{b+=0;m+=0;if(m<=0)m=1;printf "%.0f",b*m}')
     fi
     BR=$(validate_bitrate "$BR")
+    fi
 
+    unset -v clip_start clip_duration CLIP_START CLIP_DURATION
+    local CLIP_START="0.000" CLIP_DURATION=""
+    if [ -n "${PLAN_CLIP_DURATION:-}" ]; then
+      TARGET_DURATION="$PLAN_TARGET_DURATION"
+      STRETCH_FACTOR="$PLAN_STRETCH_FACTOR"
+      TEMPO_FACTOR="$PLAN_TEMPO_FACTOR"
+      CLIP_START="$PLAN_CLIP_START"
+      CLIP_DURATION="$PLAN_CLIP_DURATION"
+    else
     compute_duration_profile
 
     if [ -n "$PROFILE_MAX_DURATION" ] && [ "$PROFILE_MAX_DURATION" -gt 0 ]; then
@@ -585,10 +677,10 @@ EOF
       fi
     fi
 
-    unset -v clip_start clip_duration CLIP_START CLIP_DURATION
-    local CLIP_START="0.000" CLIP_DURATION="$TARGET_DURATION"
-    local clip_duration_fallback="$TARGET_DURATION"
+    CLIP_DURATION="$TARGET_DURATION"
     compute_clip_window "$TARGET_DURATION"
+    fi
+    local clip_duration_fallback="$TARGET_DURATION"
 # REGION AI: sanitize clip window timings
     CLIP_DURATION=$(duration "$CLIP_DURATION" "$clip_duration_fallback" "clip_duration" "copy ${copy_index}")
     TARGET_DURATION="$CLIP_DURATION"
@@ -597,20 +689,25 @@ EOF
       CLIP_START="0.000"
       echo "[WARN] clip_start fallback to 0.000s"
     fi
-    if [ -n "$CSHIFT" ]; then
+    if [ -n "$CSHIFT" ] && [ -z "${PLAN_CLIP_START:-}" ]; then
       CLIP_START=$(creative_apply_text_shift "$CLIP_START" "$CSHIFT" "$clip_duration_fallback")
     fi
 # END REGION AI
 
     local NOISE_STRENGTH=0
     NOISE=0
-    if [ -n "${RAND_NOISE_STRENGTH:-}" ] && awk -v v="${RAND_NOISE_STRENGTH}" 'BEGIN{exit (v+0>0)?0:1}'; then
+    if [ -n "${PLAN_NOISE_STRENGTH:-}" ]; then
+      NOISE_STRENGTH="$PLAN_NOISE_STRENGTH"
+      [ "$NOISE_STRENGTH" -gt 0 ] && NOISE=1
+    elif [ -n "${RAND_NOISE_STRENGTH:-}" ] && awk -v v="${RAND_NOISE_STRENGTH}" 'BEGIN{exit (v+0>0)?0:1}'; then
       NOISE=1
       NOISE_STRENGTH=$(awk -v v="${RAND_NOISE_STRENGTH}" 'BEGIN{printf "%.0f", v+0}')
     else
-      if [ "$(rand_int 1 100)" -le "$NOISE_PROB_PERCENT" ]; then
+      local noise_roll
+      rand_int_var noise_roll 1 100
+      if [ "$noise_roll" -le "$NOISE_PROB_PERCENT" ]; then
         NOISE=1
-        NOISE_STRENGTH=$(rand_int 1 2)
+        rand_int_var NOISE_STRENGTH 1 2
       fi
       [ -n "$CNOISE" ] && NOISE="$CNOISE"
       if [ "$NOISE" -gt 0 ] && { [ -z "$NOISE_STRENGTH" ] || [ "$NOISE_STRENGTH" -le 0 ]; }; then
@@ -618,7 +715,12 @@ EOF
       fi
     fi
 
-    if [ -n "${RAND_CROP_MARGIN_W:-}" ] || [ -n "${RAND_CROP_MARGIN_H:-}" ]; then
+    if [ -n "${PLAN_CROP_W:-}" ]; then
+      CROP_W="$PLAN_CROP_W"
+      CROP_H="$PLAN_CROP_H"
+      CROP_X="$PLAN_CROP_X"
+      CROP_Y="$PLAN_CROP_Y"
+    elif [ -n "${RAND_CROP_MARGIN_W:-}" ] || [ -n "${RAND_CROP_MARGIN_H:-}" ]; then
       CROP_W=$(( ${RAND_CROP_MARGIN_W:-0} ))
       CROP_H=$(( ${RAND_CROP_MARGIN_H:-0} ))
       CROP_X=$(( ${RAND_CROP_OFFSET_X:-0} ))
@@ -630,17 +732,17 @@ EOF
     else
       pick_crop_offsets
       if [ "$TARGET_W" -gt 0 ] && [ "$TARGET_H" -gt 0 ]; then
-        local crop_roll=$(rand_int 0 99)
+        local crop_roll; rand_int_var crop_roll 0 99
         if [ "$crop_roll" -lt 78 ]; then
-          local crop_pct=$(rand_float 0.010 0.020 3)
+          local crop_pct; rand_float_var crop_pct 0.010 0.020 3
           local crop_w_side
           crop_w_side=$(awk -v w="$TARGET_W" -v pct="$crop_pct" 'BEGIN{v=int(w*pct/2); if(v<1)v=1; print v}')
           local crop_h_side
           crop_h_side=$(awk -v h="$TARGET_H" -v pct="$crop_pct" 'BEGIN{v=int(h*pct/2); if(v<1)v=1; print v}')
           CROP_W="$crop_w_side"
           CROP_H="$crop_h_side"
-          if [ "$CROP_W" -gt 0 ]; then CROP_X=$(rand_int 0 "$CROP_W"); else CROP_X=0; fi
-          if [ "$CROP_H" -gt 0 ]; then CROP_Y=$(rand_int 0 "$CROP_H"); else CROP_Y=0; fi
+          if [ "$CROP_W" -gt 0 ]; then rand_int_var CROP_X 0 "$CROP_W"; else CROP_X=0; fi
+          if [ "$CROP_H" -gt 0 ]; then rand_int_var CROP_Y 0 "$CROP_H"; else CROP_Y=0; fi
         else
           CROP_W=0
           CROP_H=0
@@ -651,8 +753,11 @@ EOF
     fi
 
     # REGION AI: platform audio sample rate selection
-    if [ ${#AUDIO_SR_OPTIONS[@]} -gt 0 ]; then
-      AUDIO_SR=$(rand_choice AUDIO_SR_OPTIONS)
+    # fix: планировщик выбирает только частоту; профиль и цепочки — всегда pick_audio_chain (с учётом возможностей ffmpeg)
+    if [ -n "${PLAN_AUDIO_SR:-}" ]; then
+      AUDIO_SR="$PLAN_AUDIO_SR"
+    elif [ ${#AUDIO_SR_OPTIONS[@]} -gt 0 ]; then
+      rand_choice_var AUDIO_SR AUDIO_SR_OPTIONS
     fi
     pick_audio_chain
     AFILTER="${AFILTER_CORE:-}"
@@ -712,7 +817,11 @@ EOF
     fi
 
     local audio_br_val
-    audio_br_val=$(rand_int 96 160)
+    if [ -n "${PLAN_AUDIO_BR:-}" ]; then
+      audio_br_val="${PLAN_AUDIO_BR%k}"
+    else
+      rand_int_var audio_br_val 96 160
+    fi
     audio_br_val=$(( (audio_br_val / 4) * 4 ))
     if [ "$audio_br_val" -lt 96 ]; then
       audio_br_val=96
@@ -736,6 +845,16 @@ EOF
     local INTRO_SOURCE="${INTRO_SOURCE}"
     local INTRO_DURATION="${INTRO_DURATION}"
     local INTRO_DESC="${INTRO_DESC}"
+    # REGION AI: deadline tier creative skip
+    # fix: выбор LUT/интро уже сделан (RNG потреблён), поэтому последовательность сидов не сдвигается
+    if [ "$COPY_TIER" != "normal" ]; then
+      [ "$LUT_ACTIVE" -eq 1 ] && LUT_DESC="skipped:${COPY_TIER}"
+      [ "$INTRO_ACTIVE" -eq 1 ] && INTRO_DESC="skipped:${COPY_TIER}"
+      LUT_ACTIVE=0
+      LUT_FILTER=""
+      INTRO_ACTIVE=0
+    fi
+    # END REGION AI
 
     combo_key="${FPS}|${BR}|${TARGET_DURATION}"
 
@@ -775,14 +894,14 @@ EOF
   if [ -n "${RAND_MAXRATE_KBPS:-}" ]; then
     MAXRATE="${RAND_MAXRATE_KBPS}"
   else
-    RATE_PAD=$(rand_int 250 650)
+    rand_int_var RATE_PAD 250 650
     MAXRATE=$((BR + RATE_PAD))
   fi
   if [ -n "${RAND_BUFSIZE_KBPS:-}" ]; then
     BUFSIZE="${RAND_BUFSIZE_KBPS}"
   else
     if [ "$RATE_PAD" -eq 0 ]; then
-      RATE_PAD=$(rand_int 250 650)
+      rand_int_var RATE_PAD 250 650
     fi
     BUFSIZE=$((BR * 2 + RATE_PAD * 2))
   fi
@@ -807,7 +926,11 @@ EOF
     MAJOR_BRAND_TAG="${BRAND_TAGS[$brand_idx]}"
   fi
   CSOFT=""
-  MINOR_VERSION_TAG=$(rand_int 0 512)
+  if [ -n "${PLAN_MINOR_VERSION:-}" ]; then
+    MINOR_VERSION_TAG="$PLAN_MINOR_VERSION"
+  else
+    rand_int_var MINOR_VERSION_TAG 0 512
+  fi
   COMPAT_BRANDS_TAG="mp42isom"
   case "${COMPAT_BRANDS_TAG}" in
     *"${MAJOR_BRAND_TAG}"*) ;;
@@ -847,8 +970,15 @@ PY
     ENCODE_TARGET=$(mktemp "${OUTPUT_DIR}/.intro_main_XXXXXX.${FILE_EXT}")
     INTRO_OUTPUT_PATH=$(mktemp "${OUTPUT_DIR}/.intro_clip_XXXXXX.${FILE_EXT}")
   fi
-  TITLE="$(rand_title) $(rand_int 10 99)"
-  DESCRIPTION="$(rand_description)"
+  if [ -n "${PLAN_TITLE:-}" ]; then
+    TITLE="$PLAN_TITLE"
+    DESCRIPTION="${PLAN_DESCRIPTION:-$(rand_description)}"
+  else
+    local title_suffix
+    rand_int_var title_suffix 10 99
+    TITLE="$(rand_title) ${title_suffix}"
+    DESCRIPTION="$(rand_description)"
+  fi
   local QT_MAKE="" QT_MODEL="" QT_SOFTWARE="" DEVICE_MODEL_CODE=""
   if [ "$QT_META" -eq 1 ]; then
     local qt_choice=""
@@ -865,7 +995,9 @@ PY
       *)
         ;;
     esac
-    if [ -z "$qt_choice" ] || [ "$(rand_int 0 1)" -eq 1 ]; then
+    local qt_roll
+    rand_int_var qt_roll 0 1
+    if [ -z "$qt_choice" ] || [ "$qt_roll" -eq 1 ]; then
       qt_choice=$(pick_qt_combo "$PROFILE_VALUE")
     fi
     if [ -n "$qt_choice" ]; then
@@ -886,11 +1018,13 @@ PY
         *) DEVICE_MODEL_CODE="" ;;
       esac
     fi
-    local sw_major=$(rand_int 2 3)
-    local sw_minor=$(rand_int 0 9)
+    local sw_major; rand_int_var sw_major 2 3
+    local sw_minor; rand_int_var sw_minor 0 9
     QT_SOFTWARE=$(printf "VN %d.%d" "$sw_major" "$sw_minor")
-    if [ "$(rand_int 0 1)" -eq 1 ]; then
-      local sw_patch=$(rand_int 0 9)
+    local sw_patch_roll
+    rand_int_var sw_patch_roll 0 1
+    if [ "$sw_patch_roll" -eq 1 ]; then
+      local sw_patch; rand_int_var sw_patch 0 9
       QT_SOFTWARE=$(printf "VN %d.%d.%d" "$sw_major" "$sw_minor" "$sw_patch")
     fi
   fi
@@ -899,9 +1033,13 @@ PY
   if command -v uuidgen >/dev/null 2>&1; then
     UID_HEX=$(uuidgen | sed 's/-//g' | cut -c1-8)
   else
-    UID_HEX=$(printf "%08X" "$(rand_uint32)")
+    local uid_raw
+    rand_uint32_var uid_raw
+    printf -v UID_HEX '%08X' "$uid_raw"
   fi
-  UID_TAG="UID-${UID_HEX}_$(rand_uint32)"
+  local uid_suffix
+  rand_uint32_var uid_suffix
+  UID_TAG="UID-${UID_HEX}_${uid_suffix}"
 
   CROP_TOTAL_W=$((CROP_W * 2))
   CROP_TOTAL_H=$((CROP_H * 2))
@@ -993,6 +1131,8 @@ PY
   local micro_filter
   local extras_chain=""
   for micro_filter in "${VARIANT_MICRO_FILTERS[@]}"; do
+    # fix: на уровне ultra необязательные микрофильтры пропускаются ради скорости
+    [ "$COPY_TIER" = "ultra" ] && break
     [ -n "$micro_filter" ] && extras_chain=$(compose_vf_chain "$extras_chain" "$micro_filter")
   done
   if [ "$MIRROR_ACTIVE" -eq 1 ]; then
@@ -1179,29 +1319,6 @@ PY
   if [ -z "$VF_CHAIN" ]; then
     VF_CHAIN="null"
   fi
-  echo "[DEBUG] Final VF chain: $VF_CHAIN"
-  if ! ffmpeg -hide_banner -loglevel error -f lavfi -i "color=c=black:s=16x16:d=0.1" -vf "$VF_CHAIN" -f null - 2>/dev/null; then
-    # --- Safe cleanup block (POSIX-compatible, no function calls) ---
-    echo "[WARN] VF chain invalid — performing safe cleanup"
-    find "$OUTPUT_DIR" -maxdepth 1 -type f -name "*.tmp" -delete 2>/dev/null
-    find "$OUTPUT_DIR" -maxdepth 1 -type f -name "*.lock" -delete 2>/dev/null
-    echo "[FATAL] FFmpeg pipeline terminated with code 1"
-    echo "[SAFE] Rebuilding minimal FFmpeg pipeline..."
-    ffmpeg -y -hide_banner -loglevel warning -i "$INPUT_FILE" \
-      -vf "scale=1080:-2,format=yuv420p" \
-      -c:v libx264 -preset medium -crf 23 -c:a aac -b:a 128k \
-      -movflags +faststart "$OUTPUT_DIR/${BASENAME}_safe.mp4"
-    rc=$?
-    if [ $rc -eq 0 ]; then
-      echo "[SAFE] Fallback pipeline succeeded."
-      exit 0
-    else
-      echo "[FATAL] Safe fallback pipeline failed with code $rc."
-      exit $rc
-    fi
-  fi
-  vf_payload="$VF_CHAIN"
-  VF="$VF_CHAIN"
   local af_payload
   af_payload=$(compose_af_chain "$AFILTER" "$CUR_AF_EXTRA")
   af_payload=$(ensure_superequalizer_bounds "$af_payload")
@@ -1224,7 +1341,7 @@ PY
   AUDIO_CODEC=${AUDIO_CODEC:-none}
 
   local audio_profile_chain="anull"
-  if ffprobe -v error -select_streams a:0 -show_entries stream=codec_type -of csv=p=0 "$SRC" | grep -q audio; then
+  if [ "$audio_stream_present" -eq 1 ]; then
     audio_profile_chain="$(generate_audio_chain "$AUDIO_INTENSITY")"
     echo "[AUDIO] Using intensity profile: $AUDIO_INTENSITY → $audio_profile_chain"
   else
@@ -1257,18 +1374,95 @@ PY
   fi
   combined_audio_filters=$(sanitize_audio_filters "$combined_audio_filters")
   combined_audio_filters=$(ensure_superequalizer_bounds "$combined_audio_filters")
+  # REGION AI: per-copy graph passes
+  # fix: оптимизация -vf/-af, пластина зерна и проверка сегментов — один запуск python3 на копию вместо четырёх
+  local GRAPH_VF="" GRAPH_VF_GRAIN="" GRAPH_AF="" GRAPH_SEGMENT_STRETCH="" graph_payload="" graph_line
+  local -a graph_args=(prepare --vf "$VF_CHAIN" --af "$combined_audio_filters" --source "$SRC"
+    --size "${TARGET_W}x${TARGET_H}" --fps "${TARGET_FPS:-30}")
+  if [ "${UNICLON_VF_OPTIMIZE:-1}" = "0" ]; then
+    graph_args+=(--no-optimize)
+  elif [ "${UNICLON_COLOR_LUT:-1}" != "0" ]; then
+    # цветовые микрофильтры, eq, hue и LUT сворачиваются в один lut3d из кэша
+    graph_args+=(--color-lut-dir "${UNICLON_CACHE_DIR:-$OUTPUT_DIR/cache}/luts" --color-lut-size "${UNICLON_COLOR_LUT_SIZE:-33}")
+  fi
+  if [ "${UNICLON_GRAIN:-1}" != "0" ] && [[ ",$VF_CHAIN," == *",noise="* ]] \
+    && ffmpeg_filter_available movie && ffmpeg_filter_available loop && ffmpeg_filter_available blend; then
+    # fix: сила — та же, что выбрал планировщик для noise копии (PLAN_NOISE_STRENGTH → NOISE_STRENGTH)
+    local grain_strength=0
+    [ "${NOISE:-0}" -gt 0 ] && grain_strength="${NOISE_STRENGTH:-0}"
+    graph_args+=(--grain-cache-dir "${UNICLON_CACHE_DIR:-$OUTPUT_DIR/cache}/grain" --grain-seed "$SEED"
+      --grain-strength "$grain_strength" --grain-plates "${UNICLON_GRAIN_PLATES:-4}")
+    # fix: размер пластины — от фактического источника (как у filter_graph), а scale2ref подгоняет её к кадру точно
+    ffmpeg_filter_available scale2ref && graph_args+=(--grain-ref-scale)
+  fi
+  if graph_payload=$(python3 "$BASE_DIR/modules/core/filter_graph.py" "${graph_args[@]}"); then
+    while IFS= read -r graph_line; do
+      case "$graph_line" in
+        GRAPH_*=*) eval "$graph_line" ;;
+      esac
+    done <<<"$graph_payload"
+  fi
+  [ -n "$GRAPH_VF" ] && VF_CHAIN="$GRAPH_VF"
+  [ -n "$GRAPH_AF" ] && [ -n "$combined_audio_filters" ] && combined_audio_filters="$GRAPH_AF"
+  # END REGION AI
+  echo "[DEBUG] Final VF chain: $VF_CHAIN"
+  if ! ffmpeg -hide_banner -loglevel error -f lavfi -i "color=c=black:s=16x16:d=0.1" -vf "$VF_CHAIN" -f null - 2>/dev/null; then
+    # --- Safe cleanup block (POSIX-compatible, no function calls) ---
+    echo "[WARN] VF chain invalid — performing safe cleanup"
+    find "$OUTPUT_DIR" -maxdepth 1 -type f -name "*.tmp" -delete 2>/dev/null
+    find "$OUTPUT_DIR" -maxdepth 1 -type f -name "*.lock" -delete 2>/dev/null
+    echo "[FATAL] FFmpeg pipeline terminated with code 1"
+    echo "[SAFE] Rebuilding minimal FFmpeg pipeline..."
+    ffmpeg -y -hide_banner -loglevel warning -i "$INPUT_FILE" \
+      -vf "scale=1080:-2,format=yuv420p" \
+      -c:v libx264 -preset medium -crf 23 -c:a aac -b:a 128k \
+      -movflags +faststart "$OUTPUT_DIR/${BASENAME}_safe.mp4"
+    rc=$?
+    if [ $rc -eq 0 ]; then
+      echo "[SAFE] Fallback pipeline succeeded."
+      exit 0
+    else
+      echo "[FATAL] Safe fallback pipeline failed with code $rc."
+      exit $rc
+    fi
+  fi
+  # REGION AI: grain plates
+  # fix: noise заменяется смешиванием с кэшированной пластиной после проверки цепочки — проверка идёт на кадре 16x16.
+  # Отдельного пробного ffmpeg на копию нет: если граф с пластиной упадёт, рендер повторяется с цепочкой noise
+  local vf_noise_chain="$VF_CHAIN"
+  [ -n "$GRAPH_VF_GRAIN" ] && VF_CHAIN="$GRAPH_VF_GRAIN"
+  # END REGION AI
+  vf_payload="$VF_CHAIN"
+  VF="$VF_CHAIN"
   if [ "${AUDIO_MODE:-normal}" = "mute" ]; then
     audio_stream_present=0
     combined_audio_filters=""
   fi
 
+  # REGION AI: separate audio lane
+  local AUDIO_LANE_ACTIVE=0 lane_pcm=""
+  AUDIO_LANE_STATE=""
+  if audio_lane_enabled && [ "${AUDIO_MODE:-normal}" != "mute" ] && [ "$audio_stream_present" -eq 1 ] \
+    && ! { [ "$MUSIC_VARIANT" -eq 1 ] && [ -n "$MUSIC_VARIANT_TRACK" ]; }; then
+    if lane_pcm=$(audio_lane_source_pcm "$SRC") \
+      && audio_lane_start "$lane_pcm" "$CLIP_START" "$CLIP_DURATION" "$combined_audio_filters" "$AUDIO_BR" "$AUDIO_SR"; then
+      AUDIO_LANE_ACTIVE=1
+    fi
+  fi
+  # END REGION AI
+
   FFMPEG_ARGS=(
     -y -hide_banner -loglevel warning -ignore_unknown
     -analyzeduration 200M -probesize 200M
     -ss "$CLIP_START" -i "$SRC"
   )
   if [ "${AUDIO_MODE:-normal}" != "mute" ]; then
-    if [ "$MUSIC_VARIANT" -eq 1 ] && [ -n "$MUSIC_VARIANT_TRACK" ]; then
+    if [ "$AUDIO_LANE_ACTIVE" -eq 1 ]; then
+      if [ "$AUDIO_LANE_STATE" = "cached" ]; then
+        FFMPEG_ARGS+=(-i "$AUDIO_LANE_FILE")
+        audio_input_index=1
+      fi
+    elif [ "$MUSIC_VARIANT" -eq 1 ] && [ -n "$MUSIC_VARIANT_TRACK" ]; then
       FFMPEG_ARGS+=(-analyzeduration 200M -probesize 200M -ss "$CLIP_START" -i "$MUSIC_VARIANT_TRACK")
       audio_input_index=1
     elif [ "$audio_stream_present" -eq 0 ]; then
@@ -1276,9 +1470,12 @@ PY
       audio_input_index=1
     fi
   fi
+  local video_map_at=${#FFMPEG_ARGS[@]}
   FFMPEG_ARGS+=(-map 0:v:0)
   if [ "${AUDIO_MODE:-normal}" != "mute" ]; then
-    if [ "$MUSIC_VARIANT" -eq 1 ] && [ -n "$MUSIC_VARIANT_TRACK" ]; then
+    if [ "$AUDIO_LANE_ACTIVE" -eq 1 ]; then
+      [ "$AUDIO_LANE_STATE" = "cached" ] && FFMPEG_ARGS+=(-map "${audio_input_index}:a:0")
+    elif [ "$MUSIC_VARIANT" -eq 1 ] && [ -n "$MUSIC_VARIANT_TRACK" ]; then
       FFMPEG_ARGS+=(-map "${audio_input_index}:a:0?" -shortest)
     elif [ "$audio_stream_present" -eq 1 ]; then
       FFMPEG_ARGS+=(-map "0:a:0?")
@@ -1286,11 +1483,29 @@ PY
       FFMPEG_ARGS+=(-map "${audio_input_index}:a:0" -shortest)
     fi
   fi
-  FFMPEG_ARGS+=(-t "$CLIP_DURATION" -c:v libx264 -preset slow -profile:v "$VIDEO_PROFILE" -level "$CODEC_LEVEL" -crf "$CRF"
+  local -a VIDEO_ENC_ARGS=(-c:v libx264 -preset "$ENCODE_PRESET" -profile:v "$VIDEO_PROFILE" -level "$CODEC_LEVEL" -crf "$CRF"
     -b:v "${BR}k" -maxrate "${MAXRATE}k" -bufsize "${BUFSIZE}k"
     -vf "$vf_payload")
+  # REGION AI: planner thread budget
+  if [[ "${UNICLON_FFMPEG_THREADS:-}" =~ ^[1-9][0-9]*$ ]]; then
+    VIDEO_ENC_ARGS+=(-threads "$UNICLON_FFMPEG_THREADS")
+  fi
+  if [[ "${UNICLON_FILTER_THREADS:-}" =~ ^[1-9][0-9]*$ ]]; then
+    VIDEO_ENC_ARGS+=(-filter_threads "$UNICLON_FILTER_THREADS")
+  fi
+  # END REGION AI
+  FFMPEG_ARGS+=(-t "$CLIP_DURATION")
+  local video_enc_at=${#FFMPEG_ARGS[@]}
+  FFMPEG_ARGS+=("${VIDEO_ENC_ARGS[@]}")
   if [ "${AUDIO_MODE:-normal}" = "mute" ]; then
     FFMPEG_ARGS+=(-an)
+  elif [ "$AUDIO_LANE_ACTIVE" -eq 1 ]; then
+    # готовая дорожка копируется; рендерящаяся подмешивается после видео
+    if [ "$AUDIO_LANE_STATE" = "cached" ]; then
+      FFMPEG_ARGS+=(-c:a copy)
+    else
+      FFMPEG_ARGS+=(-an)
+    fi
   else
     FFMPEG_ARGS+=(-c:a aac -b:a "$AUDIO_BR" -ar "$AUDIO_SR" -ac 2)
     if [ -n "$combined_audio_filters" ]; then
@@ -1356,11 +1571,75 @@ PY
 
   echo "[DEBUG] Input file: $INPUT_FILE ($(du -h "$INPUT_FILE" | cut -f1))"
 
-  if ! timeout 300 ffmpeg "${FFMPEG_ARGS[@]}"; then
-    rc=$?
+  # REGION AI: segment-parallel video encode
+  local -a RUN_ARGS=("${FFMPEG_ARGS[@]}")
+  local SEGMENT_VIDEO="" segment_parts=1
+  local segment_stretch=""
+  segment_parts=$(segment_plan_parts "$CLIP_DURATION")
+  # fix: время частей переводится в источник по итоговому setpts всей цепочки (комбо PTS*0.98 и т.п.);
+  # случайный setpts и фильтры с состоянием между кадрами (шум, fade, tmix) кодируются только одним проходом
+  # множитель посчитан вместе с графами (GRAPH_SEGMENT_STRETCH); пустой — цепочку делить нельзя
+  segment_stretch="$GRAPH_SEGMENT_STRETCH"
+  if [ "${segment_parts:-1}" -gt 1 ] && { [ -z "$segment_stretch" ] || [ "$vf_payload" = "$GRAPH_VF_GRAIN" ]; }; then
+    echo "[Segments] copy=$copy_index: цепочка фильтров не делится на части — кодируем одним проходом"
+    segment_parts=1
+  fi
+  if [ "${segment_parts:-1}" -gt 1 ]; then
+    SEGMENT_VIDEO="${ENCODE_TARGET%.mp4}.segv.mp4"
+    echo "[Segments] copy=$copy_index: кодируем видео в ${segment_parts} частях параллельно"
+    if segment_encode_video "$SRC" "$CLIP_START" "$CLIP_DURATION" "$segment_stretch" "$TARGET_FPS" "$segment_parts" "$BR" "$MAXRATE" \
+      "$SEGMENT_VIDEO" -- "${VIDEO_ENC_ARGS[@]}"; then
+      # Тот же набор аргументов, но видео берётся из склеенных частей (-c:v copy), а аудио/метаданные — как в одном проходе
+      local seg_input=$((audio_input_index + 1)) arg_idx
+      RUN_ARGS=()
+      for ((arg_idx = 0; arg_idx < ${#FFMPEG_ARGS[@]}; arg_idx++)); do
+        if [ "$arg_idx" -eq "$video_map_at" ]; then
+          RUN_ARGS+=(-i "$SEGMENT_VIDEO" -map "${seg_input}:v:0")
+          arg_idx=$((arg_idx + 1))
+          continue
+        fi
+        if [ "$arg_idx" -eq "$video_enc_at" ]; then
+          RUN_ARGS+=(-c:v copy)
+          arg_idx=$((arg_idx + ${#VIDEO_ENC_ARGS[@]} - 1))
+          continue
+        fi
+        RUN_ARGS+=("${FFMPEG_ARGS[$arg_idx]}")
+      done
+    else
+      SEGMENT_VIDEO=""
+    fi
+  fi
+  # END REGION AI
+
+  # fix: код возврата берём до ветвления — после "if !" в $? всегда 0
+  rc=0
+  timeout "$(job_copy_timeout)" ffmpeg "${RUN_ARGS[@]}" || rc=$?
+  # REGION AI: grain plate fallback
+  if [ "$rc" -ne 0 ] && [ "$rc" -ne 124 ] && [ -n "$GRAPH_VF_GRAIN" ] && [ "$vf_payload" = "$GRAPH_VF_GRAIN" ]; then
+    echo "[WARN] Grain plate graph failed (code $rc) — retrying with noise chain"
+    local run_idx
+    for run_idx in "${!RUN_ARGS[@]}"; do
+      [ "${RUN_ARGS[$run_idx]}" = "$GRAPH_VF_GRAIN" ] && RUN_ARGS[$run_idx]="$vf_noise_chain"
+    done
+    vf_payload="$vf_noise_chain"
+    VF="$vf_noise_chain"
+    rc=0
+    timeout "$(job_copy_timeout)" ffmpeg "${RUN_ARGS[@]}" || rc=$?
+  fi
+  # END REGION AI
+  if [ "$rc" -ne 0 ]; then
     echo "[FATAL] FFmpeg failed or timed out (code $rc)"
+    [ -n "$SEGMENT_VIDEO" ] && rm -f "$SEGMENT_VIDEO"
+    audio_lane_abort
     exit $rc
   fi
+  [ -n "$SEGMENT_VIDEO" ] && rm -f "$SEGMENT_VIDEO"
+  if [ "$AUDIO_LANE_ACTIVE" -eq 1 ] && [ "$AUDIO_LANE_STATE" = "rendering" ]; then
+    if ! audio_lane_finish "$ENCODE_TARGET" "$SRC" "$CLIP_START" "$CLIP_DURATION" "$AUDIO_BR" "$AUDIO_SR"; then
+      echo "[FATAL] Audio lane mux failed for $ENCODE_TARGET"
+      exit 1
+    fi
+  fi
 
   if [ ! -s "$OUTPUT_FILE" ]; then
     echo "[FATAL] Output file is empty or missing — FFmpeg pipeline failed"
@@ -1473,8 +1752,10 @@ PY
   FILE_NAME="$(basename "$OUT")"
   local MEDIA_DURATION_RAW=""
   local MEDIA_DURATION_SEC=""
-  MEDIA_DURATION_RAW=$(ffmpeg_media_duration_raw "$OUT")
-  MEDIA_DURATION_SEC=$(ffmpeg_media_duration_seconds "$OUT" 2>/dev/null || true)
+  media_probe_get_var MEDIA_DURATION_RAW "$OUT" duration || true
+  if [ -n "$MEDIA_DURATION_RAW" ] && [ "$MEDIA_DURATION_RAW" != "N/A" ]; then
+    MEDIA_DURATION_SEC=$(awk -v d="$MEDIA_DURATION_RAW" 'BEGIN{d+=0;if(d<0)d=0;printf "%.6f",d}' 2>/dev/null || true)
+  fi
   local PREVIEW_NAME=""
   local PREVIEW_PATH="${PREVIEW_DIR}/${FILE_STEM}.png"
   if [ -n "$MEDIA_DURATION_RAW" ] && [ "$MEDIA_DURATION_RAW" != "N/A" ]; then
@@ -1488,6 +1769,12 @@ PY
   fi
 
   local preview_seek_value="$PREVIEW_SS_NORMALIZED"
+  # REGION AI: scene-aware preview frame
+  # Кадр превью из плана (нечёрный, вдали от склеек) — если PREVIEW_SS не задан явно и интро не сдвигает время.
+  if [ -z "${PREVIEW_SS_USER:-}" ] && [ -n "${PLAN_PREVIEW_SS:-}" ] && [ "${INTRO_ACTIVE:-0}" -ne 1 ]; then
+    preview_seek_value="$PLAN_PREVIEW_SS"
+  fi
+  # END REGION AI
   local preview_seek_seconds=""
   preview_seek_seconds=$(ffmpeg_time_to_seconds "$preview_seek_value" 2>/dev/null || true)
   if [ -z "$preview_seek_seconds" ]; then
@@ -1529,7 +1816,7 @@ PY
     fi
   fi
 
-  if ffmpeg_exec -y -hide_banner -loglevel error -ss "$preview_seek_value" -i "$OUT" -vframes 1 "$PREVIEW_PATH"; then
+  if ( enter_process_class preview; ffmpeg_exec -y -hide_banner -loglevel error -ss "$preview_seek_value" -i "$OUT" -vframes 1 "$PREVIEW_PATH" ); then
     if [ -s "$PREVIEW_PATH" ]; then
       PREVIEW_NAME="previews/${FILE_STEM}.png"
     else
@@ -1542,7 +1829,7 @@ PY
   fi
   DURATION_RAW="$MEDIA_DURATION_RAW"
   if [ -z "$DURATION_RAW" ]; then
-    DURATION_RAW=$(ffprobe_exec -v error -show_entries format=duration -of default=noprint_wrappers=1:nokey=1 "$OUT")
+    media_probe_get_var DURATION_RAW "$OUT" duration || true
   fi
   DURATION=$(awk -v d="$DURATION_RAW" 'BEGIN{if(d==""||d=="N/A") printf "0"; else printf "%.3f", d}')
   SIZE_BYTES=$(file_size_bytes "$OUT")
@@ -1568,6 +1855,7 @@ PY
   RUN_CREATIVE_INTRO+=("$INTRO_DESC")
   RUN_CREATIVE_LUT+=("$LUT_DESC")
   RUN_PREVIEWS+=("$PREVIEW_NAME")
+  RUN_TIERS+=("${COPY_TIER}${COPY_TIER_NOTE:+ (${COPY_TIER_NOTE})}")
   RUN_FS_TIMESTAMPS+=("${variant_fs_epoch:-}")
 # REGION AI: persist variant signature state
   if [ -n "$CURRENT_VARIANT_KEY" ]; then
@@ -1740,6 +2028,12 @@ PY
     echo "[META] Copy $copy_index → software=$SOFTWARE_TAG | creation_time=$CREATION_TIME | encoder=$ENCODER_TAG" >>"$LOG_FILE"
   fi
 
+  # REGION AI: per-copy fork metric
+  local copy_forks_end
+  if metrics_fork_count_var copy_forks_end && [ -n "$copy_forks_start" ]; then
+    echo "[Forks] copy=$copy_index processes=$((copy_forks_end - copy_forks_start)) rng_draws=$((RNG_DRAWS - copy_rng_draws_start)) rng_forks=$((RNG_FORKS - copy_rng_forks_start))"
+  fi
+  # END REGION AI
   echo "✅ done: $OUT"
   printf "[Uniclon v1.7] Saved as: %s  (seed=%s, software=%s)\n" \
     "$OUT_NAME" "${CURRENT_SEED_PRINT:-0.000}" "$SOFTWARE_TAG"
@@ -213,6 +213,7 @@ remove_last_generated() {
     RUN_CREATIVE_INTRO=("${RUN_CREATIVE_INTRO[@]:0:$idx}")
     RUN_CREATIVE_LUT=("${RUN_CREATIVE_LUT[@]:0:$idx}")
     RUN_PREVIEWS=("${RUN_PREVIEWS[@]:0:$idx}")
+    RUN_TIERS=("${RUN_TIERS[@]:0:$idx}")
     if [ ${#LAST_COMBOS[@]} -gt 0 ]; then
       LAST_COMBOS=("${LAST_COMBOS[@]:0:${#LAST_COMBOS[@]}-1}")
     fi
@@ -265,6 +266,7 @@ remove_indices_for_regen() {
     RUN_CREATIVE_INTRO=("${RUN_CREATIVE_INTRO[@]:0:$idx}" "${RUN_CREATIVE_INTRO[@]:$((idx + 1))}")
     RUN_CREATIVE_LUT=("${RUN_CREATIVE_LUT[@]:0:$idx}" "${RUN_CREATIVE_LUT[@]:$((idx + 1))}")
     RUN_PREVIEWS=("${RUN_PREVIEWS[@]:0:$idx}" "${RUN_PREVIEWS[@]:$((idx + 1))}")
+    RUN_TIERS=("${RUN_TIERS[@]:0:$idx}" "${RUN_TIERS[@]:$((idx + 1))}")
     RUN_VARIANT_KEYS=("${RUN_VARIANT_KEYS[@]:0:$idx}" "${RUN_VARIANT_KEYS[@]:$((idx + 1))}")
   done <<<"$sorted"
   LAST_COMBOS=()
@@ -278,3 +280,66 @@ remove_indices_for_regen() {
     done
   fi
 }
+
+# REGION AI: process class priority
+# Понижает приоритет текущего (под)процесса до класса из env: UNICLON_<CLASS>_NICE / UNICLON_<CLASS>_IOCLASS.
+# Вызывать внутри subshell: ( enter_process_class qc; run_self_audit_pipeline )
+enter_process_class() {
+  local cls="${1^^}"
+  local nice_var="UNICLON_${cls}_NICE" io_var="UNICLON_${cls}_IOCLASS"
+  local target="${!nice_var:-}" ioclass="${!io_var:-}"
+  # fix: скрипт требует bash ≥ 4.3 (local -n, declare -A) — BASHPID есть всегда; $$ переприоритизировал бы родителя
+  local pid="$BASHPID"
+  if [[ "$target" =~ ^[0-9]+$ ]] && command -v renice >/dev/null 2>&1; then
+    local current
+    current=$(nice 2>/dev/null || echo 0)
+    if [ "$target" -gt "${current:-0}" ]; then
+      renice -n "$target" -p "$pid" >/dev/null 2>&1 || true
+    fi
+  fi
+  if [ -n "$ioclass" ] && command -v ionice >/dev/null 2>&1; then
+    case "$ioclass" in
+      idle) ionice -c 3 -p "$pid" >/dev/null 2>&1 || true ;;
+      best-effort*)
+        local level="${ioclass#best-effort}"
+        level="${level#:}"
+        ionice -c 2 -n "${level:-4}" -p "$pid" >/dev/null 2>&1 || true
+        ;;
+    esac
+  fi
+  return 0
+}
+# END REGION AI
+
+# REGION AI: deadline tier
+# Уровень задачи (normal|fast|ultra): executor пишет его в UNICLON_TIER_FILE по ходу задачи
+job_tier_current() {
+  local tier=""
+  if [ -n "${UNICLON_TIER_FILE:-}" ] && [ -r "$UNICLON_TIER_FILE" ]; then
+    IFS= read -r tier < "$UNICLON_TIER_FILE" || true
+  fi
+  tier="${tier:-${UNICLON_JOB_TIER:-normal}}"
+  case "$tier" in
+    normal|fast|ultra) printf '%s' "$tier" ;;
+    *) printf 'normal' ;;
+  esac
+}
+
+# Причина последнего понижения уровня (вторая строка tier-файла)
+job_tier_note() {
+  [ -n "${UNICLON_TIER_FILE:-}" ] && [ -r "$UNICLON_TIER_FILE" ] || return 0
+  sed -n '2p' "$UNICLON_TIER_FILE" 2>/dev/null | tr -d '\n'
+}
+
+# Таймаут очередной копии в секундах: третья строка tier-файла (пересчитывается после каждой копии),
+# иначе UNICLON_COPY_TIMEOUT старта задачи
+job_copy_timeout() {
+  local timeout_s=""
+  if [ -n "${UNICLON_TIER_FILE:-}" ] && [ -r "$UNICLON_TIER_FILE" ]; then
+    timeout_s=$(sed -n '3p' "$UNICLON_TIER_FILE" 2>/dev/null | tr -d '\n')
+  fi
+  [[ "$timeout_s" =~ ^[1-9][0-9]*$ ]] || timeout_s="${UNICLON_COPY_TIMEOUT:-300}"
+  [[ "$timeout_s" =~ ^[1-9][0-9]*$ ]] || timeout_s=300
+  printf '%s' "$timeout_s"
+}
+# END REGION AI
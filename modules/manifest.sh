@@ -1,7 +1,7 @@
 #!/bin/bash
 # Manifest helpers (manifest.csv handling)
 
-MANIFEST_HEADER="filename,bitrate,fps,duration,size_kb,encoder,software,creation_time,seed,target_duration,target_bitrate,validated,regen,profile,qt_make,qt_model,qt_software,ssim,psnr,phash,trust_score,quality_pass,quality,fallback_reason,combo_used,attempts,creative_mirror,creative_intro,creative_lut,preview"
+MANIFEST_HEADER="filename,bitrate,fps,duration,size_kb,encoder,software,creation_time,seed,target_duration,target_bitrate,validated,regen,profile,qt_make,qt_model,qt_software,ssim,psnr,phash,trust_score,quality_pass,quality,fallback_reason,combo_used,attempts,creative_mirror,creative_intro,creative_lut,preview,tier"
 
 manifest__escape_csv_field() {
   local value="$1"
@@ -156,6 +156,21 @@ manifest__legacy_upgrade() {
     mv "$tmp" "$manifest_path"
     echo "ℹ️ manifest обновлён: добавлены creative-колонки и preview"
   fi
+  # REGION AI: deadline tier column
+  if ! head -n1 "$manifest_path" | grep -Eq ",tier(,|$)"; then
+    local tmp=$(mktemp)
+    {
+      IFS= read -r header_line
+      echo "${header_line},tier"
+      while IFS= read -r data_line; do
+        [ -z "$data_line" ] && continue
+        echo "${data_line},"
+      done
+    } < "$manifest_path" > "$tmp"
+    mv "$tmp" "$manifest_path"
+    echo "ℹ️ manifest обновлён: добавлена колонка tier"
+  fi
+  # END REGION AI
 }
 
 manifest__rewrite_with_header() {
@@ -203,6 +218,7 @@ manifest_write_entry() {
     "${RUN_QT_MAKES[$idx]:-}" "${RUN_QT_MODELS[$idx]:-}" "${RUN_QT_SOFTWARES[$idx]:-}" "${RUN_SSIM[$idx]:-}" "${RUN_PSNR[$idx]:-}"
     "${RUN_PHASH[$idx]:-}" "${RUN_TRUST_SCORE[$idx]:-}" "${RUN_QPASS[$idx]:-}" "${RUN_QUALITIES[$idx]:-}" "${RUN_FALLBACK_REASON[$idx]:-}" "${RUN_COMBO_USED[$idx]:-}"
     "${RUN_ATTEMPTS[$idx]:-}" "${RUN_CREATIVE_MIRROR[$idx]:-}" "${RUN_CREATIVE_INTRO[$idx]:-}" "${RUN_CREATIVE_LUT[$idx]:-}" "${RUN_PREVIEWS[$idx]:-}"
+    "${RUN_TIERS[$idx]:-}"
   )
   local -a field_names=()
   IFS=, read -r -a field_names <<< "$MANIFEST_HEADER"
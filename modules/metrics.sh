@@ -48,13 +48,46 @@ metrics_calculate_uniqscore() {
   }'
 }
 
+# REGION AI: fork counter
+# metrics_fork_count_var <var> — счётчик созданных процессов из /proc/stat (Linux, общесистемный);
+# читается встроенным read, сам замер процессов не порождает. Без /proc переменная остаётся пустой.
+metrics_fork_count_var() {
+  local _fork_key _fork_value _fork_rest
+  printf -v "$1" '%s' ""
+  [ -r /proc/stat ] || return 1
+  while IFS=' ' read -r _fork_key _fork_value _fork_rest; do
+    if [ "$_fork_key" = "processes" ]; then
+      printf -v "$1" '%s' "$_fork_value"
+      return 0
+    fi
+  done </proc/stat
+  return 1
+}
+# END REGION AI
+
+# REGION AI: deadline tier QC sampling
+# На уровнях fast/ultra SSIM/PSNR считаются по первым UNICLON_QC_SAMPLE_SECONDS секундам
+# Массив бывает пустым: вызывающие раскрывают его как ${qc_sample[@]+"${qc_sample[@]}"} (set -u, bash < 4.4).
+metrics_qc_sample_args() {
+  local -n _qcs_out="$1"
+  _qcs_out=()
+  if [ "$(job_tier_current)" != "normal" ]; then
+    local _qcs_seconds="${UNICLON_QC_SAMPLE_SECONDS:-6}"
+    [[ "$_qcs_seconds" =~ ^[0-9]+([.][0-9]+)?$ ]] || _qcs_seconds=6
+    _qcs_out=(-t "$_qcs_seconds")
+  fi
+}
+# END REGION AI
+
 metrics_compute_copy_metrics() {
   local source_file="$1" compare_file="$2"
+  local -a qc_sample=()
+  metrics_qc_sample_args qc_sample
   local ssim_val psnr_val phash_val metrics_log compare_name
   compare_name="${compare_file##*/}"
   metrics_log="${CHECK_DIR}/metrics_${compare_name%.*}.log"
   {
-    ffmpeg_exec -hide_banner -i "$source_file" -i "$compare_file" \
+    ffmpeg_exec -hide_banner ${qc_sample[@]+"${qc_sample[@]}"} -i "$source_file" ${qc_sample[@]+"${qc_sample[@]}"} -i "$compare_file" \
       -lavfi "[0:v][1:v]ssim;[0:v][1:v]psnr" -f null - 2>&1 || true
   } | tee "$metrics_log" >/dev/null
   ssim_val=$({ grep -o 'SSIM=[0-9\.]*' "$metrics_log" || true; } | tail -1 | cut -d= -f2)
@@ -63,7 +96,7 @@ metrics_compute_copy_metrics() {
   psnr_val=${psnr_val:-35.0}
   local bitrate_val="None"
   local bitrate_probe=""
-  bitrate_probe=$(ffprobe_exec -v error -select_streams v:0 -show_entries stream=bit_rate -of csv=p=0 "$compare_file" 2>/dev/null || true)
+  media_probe_get_var bitrate_probe "$compare_file" v_bit_rate || true
   if [ -n "$bitrate_probe" ] && awk -v val="$bitrate_probe" 'BEGIN{val+=0; exit (val>0 ? 0 : 1)}'; then
     bitrate_val=$(awk -v val="$bitrate_probe" 'BEGIN{printf "%.0f", val/1000}')
   fi
@@ -101,7 +134,8 @@ metrics_compute_copy_metrics() {
   if [ -n "${LOG:-}" ]; then
     echo "[Metrics] Bitrate=${bitrate_log}${bitrate_suffix} | Δ=${delta_log}${delta_suffix} | UniqScore=${uniq_score}" >>"$LOG"
   fi
-  local metrics_manifest="${CHECK_DIR}/copy_metrics.json"
+  # fix: файл метрик на запуск (UNICLON_COPY_METRICS от бота) — записи прошлых запусков не проходят QC-гейт
+  local metrics_manifest="${UNICLON_COPY_METRICS:-${CHECK_DIR}/copy_metrics.json}"
   python3 - "$metrics_manifest" "$compare_name" "$ssim_val" "$psnr_val" "$phash_val" "$bitrate_val" "$delta_bitrate" "$uniq_score" <<'PY'
 import json
 import pathlib
@@ -149,7 +183,10 @@ except Exception:
 
 data = [item for item in data if item.get("copy") != copy_name]
 data.append(entry)
-manifest_path.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+# атомарная запись: бот читает файл, пока скрипт дописывает следующие копии
+tmp_path = manifest_path.with_name(manifest_path.name + ".tmp")
+tmp_path.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+tmp_path.replace(manifest_path)
 PY
   printf '%s|%s|%s|%s|%s|%s' "$ssim_val" "$psnr_val" "$phash_val" "$bitrate_val" "$delta_bitrate" "$uniq_score"
 }
@@ -205,6 +242,8 @@ metrics_warn_similar_copies() {
   [ "$total" -lt 2 ] && return
   local i j pair_ssim pair_psnr pair_log psnr_log
   local -a warnings=()
+  local -a qc_sample=()
+  metrics_qc_sample_args qc_sample
   for ((i=0;i<total;i++)); do
     for ((j=i+1;j<total;j++)); do
       if [ "${RUN_FPS[$i]}" != "${RUN_FPS[$j]}" ]; then
@@ -213,10 +252,10 @@ metrics_warn_similar_copies() {
       if [ "${RUN_BITRATES[$i]}" != "${RUN_BITRATES[$j]}" ]; then
         continue
       fi
-      pair_log=$(ffmpeg_exec -v error -i "${OUTPUT_DIR}/${RUN_FILES[$i]}" -i "${OUTPUT_DIR}/${RUN_FILES[$j]}" -lavfi "ssim" -f null - 2>&1 || true)
+      pair_log=$(ffmpeg_exec -v error ${qc_sample[@]+"${qc_sample[@]}"} -i "${OUTPUT_DIR}/${RUN_FILES[$i]}" ${qc_sample[@]+"${qc_sample[@]}"} -i "${OUTPUT_DIR}/${RUN_FILES[$j]}" -lavfi "ssim" -f null - 2>&1 || true)
       pair_ssim=$(printf '%s\n' "$pair_log" | awk -F'All:' '/All:/{gsub(/^[ \t]+/,"",$2); split($2,a," "); print a[1]; exit}')
       [ -n "$pair_ssim" ] || pair_ssim="0.000"
-      psnr_log=$(ffmpeg_exec -v error -i "${OUTPUT_DIR}/${RUN_FILES[$i]}" -i "${OUTPUT_DIR}/${RUN_FILES[$j]}" -lavfi "psnr" -f null - 2>&1 || true)
+      psnr_log=$(ffmpeg_exec -v error ${qc_sample[@]+"${qc_sample[@]}"} -i "${OUTPUT_DIR}/${RUN_FILES[$i]}" ${qc_sample[@]+"${qc_sample[@]}"} -i "${OUTPUT_DIR}/${RUN_FILES[$j]}" -lavfi "psnr" -f null - 2>&1 || true)
       pair_psnr=$(printf '%s\n' "$psnr_log" | awk -F'average:' '/average:/{gsub(/^[ \t]+/,"",$2); split($2,a," "); print a[1]; exit}')
       [ -n "$pair_psnr" ] || pair_psnr="0.00"
       case "$pair_psnr" in
@@ -2,14 +2,14 @@
 from __future__ import annotations
 
 import logging
-import os
 import time
 
 # REGION AI: metadata reseed imports
-import datetime as _dt; import random
+import random
 # END REGION AI
-from typing import Callable, Iterable, List
+from typing import Callable, Iterable, List, Optional
 
+from .core.job_context import JobContext
 from .executor import sanitize_filter_chain, simplify_filter_chain
 
 _RECOVERY_CODES = {8, 22, 234}
@@ -18,20 +18,26 @@ _RECOVERY_CODES = {8, 22, 234}
 def retry_render(
     run_ffmpeg: Callable[[Iterable[str]], int],
     filter_chain: Iterable[str],
+    context: Optional[JobContext] = None,
 ) -> int:
-    """Retry FFmpeg renders up to three times with filter simplification."""
+    """Retry FFmpeg renders up to three times with filter simplification.
 
+    Backoff depth and creation_time are recorded on ``context``; run_ffmpeg
+    should build its subprocess env from ``context.to_env()``.
+    """
+
+    # fix: состояние повтора живёт в контексте задачи, а не в os.environ
+    context = context if context is not None else JobContext()
     chain: List[str] = sanitize_filter_chain(filter_chain)
     last_code = 0
     for attempt in range(3):
         # REGION AI: refresh metadata timestamp per attempt
-        stamp = _dt.datetime.now(_dt.timezone.utc) + _dt.timedelta(seconds=random.uniform(1.0, 60.0))
-        os.environ["UNICLON_META_CREATION_TIME"] = stamp.strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3] + "Z"; logging.info("[MetaShift] creation_time updated for retry: %s", os.environ["UNICLON_META_CREATION_TIME"])
+        stamp = context.refresh_creation_time(random.uniform(1.0, 60.0)); logging.info("[MetaShift] creation_time updated for retry: %s", stamp)
         # END REGION AI
         result = run_ffmpeg(chain)
         if result == 0:
             logging.info("[Recovery] ✅ Successful retry on attempt %d", attempt + 1)
-            os.environ.pop("UNICLON_CROP_BACKOFF", None)
+            context.crop_backoff = 0
             return 0
         last_code = result
         if result not in _RECOVERY_CODES:
@@ -43,7 +49,7 @@ def retry_render(
             result,
         )
         backoff = attempt + 1
-        os.environ["UNICLON_CROP_BACKOFF"] = str(backoff)
+        context.crop_backoff = backoff
         logging.info("[Recovery] Applying UNICLON_CROP_BACKOFF=%s", backoff)
         chain = sanitize_filter_chain(simplify_filter_chain(chain))
         time.sleep(1)
@@ -3,6 +3,8 @@
 
 RNG_HEX=""
 RNG_POS=0
+RNG_DRAWS=0
+RNG_FORKS=0
 
 random_seed() {
   RNG_HEX="$1"
@@ -13,7 +15,72 @@ init_rng() {
   random_seed "$1"
 }
 
-deterministic_md5() {
+# REGION AI: in-process md5
+# MD5 на арифметике bash (побайтно совпадает с md5sum): RNG и ключи кэша без порождения md5/awk.
+# UNICLON_RNG_NATIVE=0 возвращает внешний md5sum.
+_RNG_MD5_K=(
+  0xd76aa478 0xe8c7b756 0x242070db 0xc1bdceee 0xf57c0faf 0x4787c62a 0xa8304613 0xfd469501
+  0x698098d8 0x8b44f7af 0xffff5bb1 0x895cd7be 0x6b901122 0xfd987193 0xa679438e 0x49b40821
+  0xf61e2562 0xc040b340 0x265e5a51 0xe9b6c7aa 0xd62f105d 0x02441453 0xd8a1e681 0xe7d3fbc8
+  0x21e1cde6 0xc33707d6 0xf4d50d87 0x455a14ed 0xa9e3e905 0xfcefa3f8 0x676f02d9 0x8d2a4c8a
+  0xfffa3942 0x8771f681 0x6d9d6122 0xfde5380c 0xa4beea44 0x4bdecfa9 0xf6bb4b60 0xbebfbc70
+  0x289b7ec6 0xeaa127fa 0xd4ef3085 0x04881d05 0xd9d4d039 0xe6db99e5 0x1fa27cf8 0xc4ac5665
+  0xf4292244 0x432aff97 0xab9423a7 0xfc93a039 0x655b59c3 0x8f0ccc92 0xffeff47d 0x85845dd1
+  0x6fa87e4f 0xfe2ce6e0 0xa3014314 0x4e0811a1 0xf7537e82 0xbd3af235 0x2ad7d2bb 0xeb86d391
+)
+_RNG_MD5_S=(7 12 17 22 7 12 17 22 7 12 17 22 7 12 17 22 5 9 14 20 5 9 14 20 5 9 14 20 5 9 14 20
+  4 11 16 23 4 11 16 23 4 11 16 23 4 11 16 23 6 10 15 21 6 10 15 21 6 10 15 21 6 10 15 21)
+
+_rng_md5_var() {
+  local LC_ALL=C
+  local _md5_msg="$2" _md5_len _md5_i _md5_j _md5_byte _md5_f _md5_g _md5_s _md5_t _md5_bits _md5_total _md5_block
+  local _md5_a _md5_b _md5_c _md5_d _md5_mask=0xFFFFFFFF
+  local _md5_h0=0x67452301 _md5_h1=0xefcdab89 _md5_h2=0x98badcfe _md5_h3=0x10325476 _md5_hex="" _md5_word
+  local -a _md5_bytes=() _md5_w=()
+  _md5_len=${#_md5_msg}
+  for ((_md5_i = 0; _md5_i < _md5_len; _md5_i++)); do
+    printf -v _md5_byte '%d' "'${_md5_msg:_md5_i:1}"
+    _md5_bytes[_md5_i]=$((_md5_byte & 255))
+  done
+  # дополнение: 0x80, нули до 56 mod 64, длина в битах (little-endian)
+  _md5_bytes[_md5_len]=128
+  _md5_i=$((_md5_len + 1))
+  while [ $((_md5_i % 64)) -ne 56 ]; do _md5_bytes[_md5_i]=0; _md5_i=$((_md5_i + 1)); done
+  _md5_bits=$((_md5_len * 8))
+  for ((_md5_j = 0; _md5_j < 8; _md5_j++)); do _md5_bytes[_md5_i + _md5_j]=$(((_md5_bits >> (8 * _md5_j)) & 255)); done
+  _md5_total=$((_md5_i + 8))
+  for ((_md5_block = 0; _md5_block < _md5_total; _md5_block += 64)); do
+    for ((_md5_j = 0; _md5_j < 16; _md5_j++)); do
+      _md5_i=$((_md5_block + 4 * _md5_j))
+      _md5_w[_md5_j]=$((_md5_bytes[_md5_i] | (_md5_bytes[_md5_i + 1] << 8) | (_md5_bytes[_md5_i + 2] << 16) | (_md5_bytes[_md5_i + 3] << 24)))
+    done
+    _md5_a=$_md5_h0 _md5_b=$_md5_h1 _md5_c=$_md5_h2 _md5_d=$_md5_h3
+    for ((_md5_i = 0; _md5_i < 64; _md5_i++)); do
+      if ((_md5_i < 16)); then
+        _md5_f=$(((_md5_b & _md5_c) | (~_md5_b & _md5_d))) _md5_g=$_md5_i
+      elif ((_md5_i < 32)); then
+        _md5_f=$(((_md5_d & _md5_b) | (~_md5_d & _md5_c))) _md5_g=$(((5 * _md5_i + 1) & 15))
+      elif ((_md5_i < 48)); then
+        _md5_f=$((_md5_b ^ _md5_c ^ _md5_d)) _md5_g=$(((3 * _md5_i + 5) & 15))
+      else
+        _md5_f=$((_md5_c ^ ((_md5_b | ~_md5_d) & _md5_mask))) _md5_g=$(((7 * _md5_i) & 15))
+      fi
+      _md5_s=${_RNG_MD5_S[_md5_i]}
+      _md5_t=$(((_md5_f + _md5_a + _RNG_MD5_K[_md5_i] + _md5_w[_md5_g]) & _md5_mask))
+      _md5_a=$_md5_d _md5_d=$_md5_c _md5_c=$_md5_b
+      _md5_b=$(((_md5_b + (((_md5_t << _md5_s) | (_md5_t >> (32 - _md5_s))) & _md5_mask)) & _md5_mask))
+    done
+    _md5_h0=$(((_md5_h0 + _md5_a) & _md5_mask)) _md5_h1=$(((_md5_h1 + _md5_b) & _md5_mask))
+    _md5_h2=$(((_md5_h2 + _md5_c) & _md5_mask)) _md5_h3=$(((_md5_h3 + _md5_d) & _md5_mask))
+  done
+  for _md5_word in "$_md5_h0" "$_md5_h1" "$_md5_h2" "$_md5_h3"; do
+    printf -v _md5_hex '%s%02x%02x%02x%02x' "$_md5_hex" $((_md5_word & 255)) $(((_md5_word >> 8) & 255)) \
+      $(((_md5_word >> 16) & 255)) $(((_md5_word >> 24) & 255))
+  done
+  printf -v "$1" '%s' "$_md5_hex"
+}
+
+_rng_md5_external() {
   if command -v md5 >/dev/null 2>&1; then
     printf "%s" "$1" | md5 | tr -d ' \t\n' | tail -c 32
   else
@@ -21,14 +88,53 @@ deterministic_md5() {
   fi
 }
 
-rng_next_chunk() {
+deterministic_md5_var() {
+  if [ "${UNICLON_RNG_NATIVE:-1}" = "0" ]; then
+    RNG_FORKS=$((RNG_FORKS + 1))
+    printf -v "$1" '%s' "$(_rng_md5_external "$2")"
+    return 0
+  fi
+  _rng_md5_var "$1" "$2"
+}
+
+deterministic_md5() {
+  local _md5_digest
+  deterministic_md5_var _md5_digest "$1"
+  printf '%s' "$_md5_digest"
+}
+# END REGION AI
+
+# REGION AI: in-process draws
+# *_var-варианты пишут результат в переменную и двигают RNG_POS в текущем процессе;
+# обёртки со stdout сохранены для $(...) — в подоболочке позиция вызывающего не меняется.
+# fix: локальные имена с префиксом _rng_, чтобы printf -v не попал в них вместо переменной вызывающего
+rng_next_chunk_var() {
   if [ ${#RNG_HEX} -lt 4 ] || [ $((RNG_POS + 4)) -gt ${#RNG_HEX} ]; then
-    RNG_HEX="$(deterministic_md5 "${RNG_HEX}_${RNG_POS}")"
+    deterministic_md5_var RNG_HEX "${RNG_HEX}_${RNG_POS}"
     RNG_POS=0
   fi
-  local chunk="${RNG_HEX:$RNG_POS:4}"
+  local _rng_chunk="${RNG_HEX:$RNG_POS:4}"
   RNG_POS=$((RNG_POS + 4))
-  printf "%d" $((16#$chunk))
+  RNG_DRAWS=$((RNG_DRAWS + 1))
+  printf -v "$1" '%d' $((16#$_rng_chunk))
+}
+
+rng_next_chunk() {
+  local _rng_value
+  rng_next_chunk_var _rng_value
+  printf "%d" "$_rng_value"
+}
+# END REGION AI
+
+rand_between_var() {
+  if [ $# -lt 3 ]; then
+    printf "rand_between_var requires a variable name and two arguments\n" >&2
+    return 1
+  fi
+  local _rng_a="$2" _rng_b="$3" _rng_span _rng_raw
+  _rng_span=$((_rng_b - _rng_a + 1))
+  rng_next_chunk_var _rng_raw
+  printf -v "$1" '%d' $((_rng_a + _rng_raw % _rng_span))
 }
 
 rand_between() {
@@ -36,41 +142,102 @@ rand_between() {
     printf "rand_between requires two arguments\n" >&2
     return 1
   fi
+  local _rng_value
+  rand_between_var _rng_value "$1" "$2"
+  echo "$_rng_value"
+}
 
-  local A="$1"
-  local B="$2"
-  local span raw
-
-  span=$((B - A + 1))
-  raw=$(rng_next_chunk)
-  echo $((A + raw % span))
+rand_int_var() {
+  rand_between_var "$@"
 }
 
 rand_int() {
   rand_between "$@"
 }
 
+rand_choice_var() {
+  local _rng_arrname=$2[@]
+  local -a _rng_arr=("${!_rng_arrname}")
+  local _rng_raw
+  rng_next_chunk_var _rng_raw
+  printf -v "$1" '%s' "${_rng_arr[$((_rng_raw % ${#_rng_arr[@]}))]}"
+}
+
 rand_choice() {
-  local arrname=$1[@]
-  local arr=("${!arrname}")
-  local idx=$(( $(rng_next_chunk) % ${#arr[@]} ))
-  echo "${arr[$idx]}"
+  local _rng_value
+  rand_choice_var _rng_value "$1"
+  echo "$_rng_value"
+}
+
+# REGION AI: fixed-point rand_float
+# _rng_decimal <var_int> <var_digits> <value> — "1.0005" → 10005 и 4
+_rng_decimal() {
+  local _rng_text="$3" _rng_sign="" _rng_int _rng_frac=""
+  case "$_rng_text" in -*) _rng_sign="-"; _rng_text="${_rng_text#-}" ;; +*) _rng_text="${_rng_text#+}" ;; esac
+  _rng_int="${_rng_text%%.*}"
+  [ "$_rng_int" != "$_rng_text" ] && _rng_frac="${_rng_text#*.}"
+  printf -v "$1" '%d' "${_rng_sign}$((10#${_rng_int:-0}${_rng_frac}))"
+  printf -v "$2" '%d' "${#_rng_frac}"
 }
 
+# min + raw/65535·(max-min) с округлением до scale знаков — целочисленно, без awk
+rand_float_var() {
+  local _rng_scale="${4:-0}" _rng_raw _rng_lo _rng_lo_p _rng_hi _rng_hi_p _rng_p _rng_num _rng_den
+  local _rng_q _rng_rem _rng_frac=0 _rng_sign="" _rng_k
+  rng_next_chunk_var _rng_raw
+  _rng_decimal _rng_lo _rng_lo_p "$2"
+  _rng_decimal _rng_hi _rng_hi_p "$3"
+  _rng_p=$((_rng_lo_p > _rng_hi_p ? _rng_lo_p : _rng_hi_p))
+  for ((_rng_k = _rng_lo_p; _rng_k < _rng_p; _rng_k++)); do _rng_lo=$((_rng_lo * 10)); done
+  for ((_rng_k = _rng_hi_p; _rng_k < _rng_p; _rng_k++)); do _rng_hi=$((_rng_hi * 10)); done
+  _rng_num=$((_rng_lo * 65535 + _rng_raw * (_rng_hi - _rng_lo)))
+  _rng_den=65535
+  for ((_rng_k = 0; _rng_k < _rng_p; _rng_k++)); do _rng_den=$((_rng_den * 10)); done
+  if [ "$_rng_num" -lt 0 ]; then _rng_sign="-"; _rng_num=$((-_rng_num)); fi
+  _rng_q=$((_rng_num / _rng_den)) _rng_rem=$((_rng_num % _rng_den))
+  for ((_rng_k = 0; _rng_k < _rng_scale; _rng_k++)); do
+    _rng_rem=$((_rng_rem * 10))
+    _rng_frac=$((_rng_frac * 10 + _rng_rem / _rng_den))
+    _rng_rem=$((_rng_rem % _rng_den))
+  done
+  if [ $((_rng_rem * 2)) -ge "$_rng_den" ]; then
+    _rng_frac=$((_rng_frac + 1))
+    if [ "$_rng_scale" -eq 0 ] || [ "${#_rng_frac}" -gt "$_rng_scale" ]; then
+      _rng_q=$((_rng_q + 1)) _rng_frac=0
+    fi
+  fi
+  [ "$_rng_q" -eq 0 ] && [ "$_rng_frac" -eq 0 ] && _rng_sign=""
+  if [ "$_rng_scale" -gt 0 ]; then
+    printf -v "$1" '%s%d.%0*d' "$_rng_sign" "$_rng_q" "$_rng_scale" "$_rng_frac"
+  else
+    printf -v "$1" '%s%d' "$_rng_sign" "$_rng_q"
+  fi
+}
+# END REGION AI
+
 rand_float() {
-  local MIN="$1" MAX="$2" SCALE="$3"
-  local raw=$(rng_next_chunk)
-  awk -v min="$MIN" -v max="$MAX" -v r="$raw" -v scale="$SCALE" 'BEGIN {s=r/65535; printf "%.*f", scale, min + s*(max-min)}'
+  local _rng_value
+  rand_float_var _rng_value "$@"
+  printf '%s' "$_rng_value"
+}
+
+rand_uint32_var() {
+  local _rng_hi _rng_lo
+  rng_next_chunk_var _rng_hi
+  rng_next_chunk_var _rng_lo
+  printf -v "$1" '%d' $(( (_rng_hi << 16) | _rng_lo ))
 }
 
 rand_uint32() {
-  local hi=$(rng_next_chunk)
-  local lo=$(rng_next_chunk)
-  echo $(( (hi << 16) | lo ))
+  local _rng_value
+  rand_uint32_var _rng_value
+  echo "$_rng_value"
 }
 
 rand_bool() {
-  if [ "$(rand_between 0 1)" -eq 0 ]; then
+  local _rng_value
+  rand_between_var _rng_value 0 1
+  if [ "$_rng_value" -eq 0 ]; then
     echo 0
   else
     echo 1
@@ -0,0 +1,191 @@
+#!/bin/bash
+# Сегментный режим: окно клипа режется по ключевым кадрам на K частей,
+# части кодируются параллельно с одинаковыми параметрами копии и склеиваются без перекодирования.
+
+SEGMENT_ENCODE_MODE=${UNICLON_SEGMENT_ENCODE:-auto}
+SEGMENT_MIN_SECONDS=${UNICLON_SEGMENT_MIN_SECONDS:-10}
+SEGMENT_MAX_PARTS=${UNICLON_SEGMENT_MAX_PARTS:-8}
+SEGMENT_BITRATE_TOLERANCE=${UNICLON_SEGMENT_BITRATE_TOLERANCE:-1.05}
+# Нижняя граница: склейка не должна «проседать» ниже целевого битрейта больше чем на 20%
+SEGMENT_BITRATE_FLOOR=${UNICLON_SEGMENT_BITRATE_FLOOR:-0.80}
+SEGMENT_TIMEOUT=${UNICLON_SEGMENT_TIMEOUT:-300}
+
+# REGION AI: segment planning
+segment_thread_budget() {
+  if [[ "${UNICLON_FFMPEG_THREADS:-}" =~ ^[1-9][0-9]*$ ]]; then
+    printf '%s' "$UNICLON_FFMPEG_THREADS"
+    return 0
+  fi
+  nproc 2>/dev/null || getconf _NPROCESSORS_ONLN 2>/dev/null || printf '1'
+}
+
+# segment_plan_parts <clip_duration> → число частей (1 — сегментный режим не нужен)
+segment_plan_parts() {
+  local clip_duration="$1"
+  case "$SEGMENT_ENCODE_MODE" in
+    0|off|false|no) printf '1'; return 0 ;;
+  esac
+  local threads
+  threads=$(segment_thread_budget)
+  awk -v d="$clip_duration" -v min="$SEGMENT_MIN_SECONDS" -v cap="$SEGMENT_MAX_PARTS" \
+    -v t="$threads" -v mode="$SEGMENT_ENCODE_MODE" 'BEGIN{
+      d += 0; min += 0; if (min <= 0) min = 10
+      by_len = int(d / min)
+      by_cpu = int((t + 0) / 2)
+      if (mode ~ /^[0-9]+$/ && mode + 0 > 1) { by_cpu = mode + 0 }
+      k = by_len < by_cpu ? by_len : by_cpu
+      if (k > cap + 0) k = cap + 0
+      if (k < 2) k = 1
+      printf "%d", k
+    }'
+}
+
+# segment_keyframes <src> <start> <duration> → времена ключевых кадров источника внутри окна
+# fix: список ключевых кадров источника берётся из кэша проб (один ffprobe на источник, а не на копию)
+segment_keyframes() {
+  local src="$1" start="$2" duration="$3"
+  media_probe_keyframes "$src" | awk -v s="$start" -v d="$duration" 'NF {t = $1 + 0; if (t >= s + 0 && t <= s + d) printf "%.6f\n", t}'
+}
+
+# segment_boundaries <src> <clip_start> <clip_duration> <stretch> <fps> <parts>
+# Печатает «offset length» на строку во времени выхода; границы — ближайшие keyframe, выровненные по сетке кадров.
+segment_boundaries() {
+  local src="$1" clip_start="$2" clip_duration="$3" stretch="$4" fps="$5" parts="$6"
+  local keyframes
+  keyframes=$(segment_keyframes "$src" "$clip_start" "$clip_duration" | tr '\n' ' ')
+  awk -v start="$clip_start" -v dur="$clip_duration" -v stretch="$stretch" -v fps="$fps" \
+    -v parts="$parts" -v kf="$keyframes" 'BEGIN{
+      start += 0; dur += 0; stretch += 0; fps += 0; parts += 0
+      if (stretch <= 0) stretch = 1
+      if (fps <= 0) fps = 30
+      n = split(kf, keys, " ")
+      prev = 0
+      min_gap = dur / parts / 2
+      for (i = 1; i < parts; i++) {
+        ideal = dur * i / parts
+        best = ideal; best_dist = -1
+        for (j = 1; j <= n; j++) {
+          if (keys[j] == "") continue
+          out_t = (keys[j] - start) * stretch
+          if (out_t <= prev + min_gap || out_t >= dur - min_gap) continue
+          dist = out_t - ideal; if (dist < 0) dist = -dist
+          if (best_dist < 0 || dist < best_dist) { best = out_t; best_dist = dist }
+        }
+        cut = int(best * fps + 0.5) / fps
+        if (cut <= prev) continue
+        printf "%.6f %.6f\n", prev, cut - prev
+        prev = cut
+      }
+      printf "%.6f %.6f\n", prev, dur - prev
+    }'
+}
+# END REGION AI
+
+# REGION AI: segment-parallel encode
+# segment_encode_video <src> <clip_start> <clip_duration> <stretch> <fps> <parts> <target_kbps> <maxrate_kbps> <out> -- <video encoder args…>
+# Кодирует только видеодорожку; при сбое или уходе битрейта из допуска возвращает 1 (вызывающий кодирует одним проходом).
+segment_encode_video() {
+  local src="$1" clip_start="$2" clip_duration="$3" stretch="$4" fps="$5" parts="$6" target="$7" maxrate="$8" out="$9"
+  shift 9
+  [ "${1:-}" = "--" ] && shift
+  local -a enc_args=()
+  local skip_next=0 arg
+  for arg in "$@"; do
+    if [ "$skip_next" -eq 1 ]; then
+      skip_next=0
+      continue
+    fi
+    if [ "$arg" = "-threads" ] || [ "$arg" = "-filter_threads" ]; then
+      skip_next=1
+      continue
+    fi
+    enc_args+=("$arg")
+  done
+
+  local -a offsets=() lengths=()
+  local off len
+  while read -r off len; do
+    [ -n "$off" ] || continue
+    offsets+=("$off")
+    lengths+=("$len")
+  done < <(segment_boundaries "$src" "$clip_start" "$clip_duration" "$stretch" "$fps" "$parts")
+  local count=${#offsets[@]}
+  if [ "$count" -lt 2 ]; then
+    return 1
+  fi
+
+  local threads per_threads
+  threads=$(segment_thread_budget)
+  per_threads=$(( threads / count ))
+  [ "$per_threads" -lt 1 ] && per_threads=1
+  local filter_threads=$(( per_threads / 2 ))
+  [ "$filter_threads" -lt 1 ] && filter_threads=1
+
+  local work_dir
+  work_dir=$(mktemp -d "${out%/*}/.segments_XXXXXX") || return 1
+  local list_file="${work_dir}/concat.txt"
+  : > "$list_file"
+  local -a pids=()
+  local i seg_file seg_ss started
+  started=$(date +%s)
+  for ((i = 0; i < count; i++)); do
+    seg_file="${work_dir}/part_$(printf '%03d' "$i").mp4"
+    # fix: смещение выхода переводим обратно во время источника (setpts=STRETCH*PTS растягивает таймлайн)
+    seg_ss=$(awk -v s="$clip_start" -v o="${offsets[$i]}" -v k="$stretch" 'BEGIN{k+=0; if(k<=0)k=1; printf "%.6f", s + o / k}')
+    printf "file '%s'\n" "$seg_file" >> "$list_file"
+    timeout "$SEGMENT_TIMEOUT" ffmpeg -y -hide_banner -loglevel error -ignore_unknown \
+      -analyzeduration 200M -probesize 200M -ss "$seg_ss" -i "$src" -map 0:v:0 -an \
+      -t "${lengths[$i]}" "${enc_args[@]}" -threads "$per_threads" -filter_threads "$filter_threads" "$seg_file" &
+    pids+=("$!")
+  done
+
+  local failed=0 pid
+  for pid in "${pids[@]}"; do
+    if ! wait "$pid"; then
+      failed=1
+    fi
+  done
+  if [ "$failed" -eq 1 ]; then
+    echo "⚠️ [Segments] Параллельное кодирование не удалось — переходим на один проход"
+    rm -rf "$work_dir"
+    return 1
+  fi
+
+  if ! ffmpeg -y -hide_banner -loglevel error -f concat -safe 0 -i "$list_file" -map 0:v:0 -c copy "$out"; then
+    echo "⚠️ [Segments] Склейка частей не удалась — переходим на один проход"
+    rm -rf "$work_dir" "$out"
+    return 1
+  fi
+  rm -rf "$work_dir"
+
+  # fix: склейка обязана совпадать по длительности с одним проходом (-t clip_duration), иначе уезжает звук
+  local joined_duration=""
+  media_probe_get_var joined_duration "$out" duration || joined_duration=""
+  if ! awk -v got="$joined_duration" -v want="$clip_duration" -v fps="$fps" 'BEGIN{
+      got += 0; want += 0; fps += 0; if (fps <= 0) fps = 30
+      d = got - want; if (d < 0) d = -d
+      exit (got > 0 && d <= 1.5 / fps + 0.02 ? 0 : 1)
+    }'; then
+    echo "⚠️ [Segments] Длительность склейки ${joined_duration:-?}s ≠ ${clip_duration}s — перекодируем одним проходом"
+    rm -f "$out"
+    return 1
+  fi
+
+  # Контроль битрейта: VBV каждой части стартует независимо, поэтому проверяем итог по maxrate сверху и по цели снизу
+  local size_bytes actual_kbps
+  size_bytes=$(stat -c %s "$out" 2>/dev/null || stat -f %z "$out" 2>/dev/null || echo 0)
+  actual_kbps=$(awk -v b="$size_bytes" -v d="$clip_duration" 'BEGIN{d+=0; if(d<=0){print 0; exit} printf "%.0f", b * 8 / d / 1000}')
+  if [[ "$maxrate" =~ ^[0-9]+$ ]] && awk -v a="$actual_kbps" -v m="$maxrate" -v tol="$SEGMENT_BITRATE_TOLERANCE" 'BEGIN{exit (a > m * tol ? 0 : 1)}'; then
+    echo "⚠️ [Segments] Битрейт ${actual_kbps}k выше maxrate ${maxrate}k — перекодируем одним проходом"
+    rm -f "$out"
+    return 1
+  fi
+  if [[ "$target" =~ ^[0-9]+$ ]] && awk -v a="$actual_kbps" -v t="$target" -v floor="$SEGMENT_BITRATE_FLOOR" 'BEGIN{exit (a < t * floor ? 0 : 1)}'; then
+    echo "⚠️ [Segments] Битрейт ${actual_kbps}k ниже цели ${target}k — перекодируем одним проходом"
+    rm -f "$out"
+    return 1
+  fi
+  echo "[Segments] ${count} частей × ${per_threads} потоков за $(( $(date +%s) - started ))s, bitrate≈${actual_kbps}k"
+  return 0
+}
+# END REGION AI
@@ -229,9 +229,10 @@ epoch_to_iso() {
 
 jitter_iso_timestamp() {
   local iso="$1"
-  local minutes=$(rand_int 1 5)
-  local seconds=$((minutes * 60))
-  if [ "$(rand_int 0 1)" -eq 0 ]; then
+  local minutes; rand_int_var minutes 1 5
+  local seconds=$((minutes * 60)) sign_roll
+  rand_int_var sign_roll 0 1
+  if [ "$sign_roll" -eq 0 ]; then
     seconds=$((-seconds))
   fi
   local epoch
@@ -242,8 +243,8 @@ jitter_iso_timestamp() {
 
 generate_iso_timestamp() {
   local days_ago seconds_offset
-  days_ago=$(rand_int 3 14)
-  seconds_offset=$(rand_int 0 86399)
+  rand_int_var days_ago 3 14
+  rand_int_var seconds_offset 0 86399
   if date_supports_d_flag; then
     date -u -d "${days_ago} days ago + ${seconds_offset} seconds" +"%Y-%m-%dT%H:%M:%SZ"
   else
@@ -2,7 +2,7 @@ from __future__ import annotations
 
 import datetime as _dt
 from dataclasses import dataclass
-from typing import Tuple
+from typing import Optional, Tuple
 
 ISO_FORMAT = "%Y-%m-%dT%H:%M:%S.%fZ"
 EXIF_FORMAT = "%Y:%m:%d %H:%M:%S"
@@ -29,6 +29,7 @@ def random_past_timestamp(
     min_days: int = 3,
     max_days: int = 14,
     jitter_seconds: Tuple[int, int] = (-6 * 3600, 6 * 3600),
+    now: Optional[_dt.datetime] = None,
 ) -> TimestampBundle:
     """Return correlated timestamps shifted to the past.
 
@@ -37,6 +38,7 @@ def random_past_timestamp(
         min_days: Minimum number of days to go back from ``now``.
         max_days: Maximum number of days to go back from ``now``.
         jitter_seconds: Additional seconds jitter applied after subtracting days.
+        now: Reference time (defaults to the current UTC time); fixed for reproducible plans.
     """
 
     if min_days < 0:
@@ -44,7 +46,7 @@ def random_past_timestamp(
     if max_days < min_days:
         raise ValueError("max_days must be >= min_days")
 
-    now = _dt.datetime.now(tz=_dt.timezone.utc)
+    now = _ensure_timezone(now) if now is not None else _dt.datetime.now(tz=_dt.timezone.utc)
     offset_days = rng.randint(min_days, max_days)
     offset_seconds = rng.randint(0, 24 * 3600 - 1)
     base = now - _dt.timedelta(days=offset_days, seconds=offset_seconds)
@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 import argparse
+import hashlib
 import json
 import logging
 import math
@@ -8,7 +9,8 @@ import os
 import random
 import shlex
 import sys
-from dataclasses import dataclass, field
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
 from typing import Dict, Iterable, List, Optional
 
@@ -32,10 +34,14 @@ try:
     )
     from ..core.audit_manager import compute_trust_score
     from ..core.presets import get_profile
+    from ..core.job_context import JobContext
+    from ..core.scene_analysis import SourceProfile, load_or_analyze, nudge_start, pick_clip_start, pick_preview_time
 except ImportError:  # pragma: no cover - fallback for script execution
     from modules.core.seed_utils import current_rng, generate_seed, seeded_uniform
     from modules.core.audit_manager import compute_trust_score
     from modules.core.presets import get_profile
+    from modules.core.job_context import JobContext
+    from modules.core.scene_analysis import SourceProfile, load_or_analyze, nudge_start, pick_clip_start, pick_preview_time
 
 
 # REGION AI: executor helpers import
@@ -295,8 +301,12 @@ def generate_variant(
     base_height: int,
     audio_sample_rate: int,
     profile_name: str = "tiktok_hightrust",
-
+    context: Optional[JobContext] = None,
+    now: Optional[datetime] = None,
 ) -> VariantConfig:
+    # fix: backoff/длительность берутся из контекста задачи; env читается только как fallback для CLI
+    if context is None:
+        context = JobContext.from_env(os.environ)
     seed = generate_seed(input_name, copy_index, salt)
     rng = current_rng()
 
@@ -329,14 +339,9 @@ def generate_variant(
         bitrate = int(round(seeded_uniform(6500, 9000)))
         maxrate = max(bitrate + 120, int(round(bitrate * seeded_uniform(1.05, 1.15))))
         bufsize = int(round(maxrate * seeded_uniform(1.9, 2.3)))
-    clip_hint_raw = os.environ.get("UNICLON_TARGET_DURATION", "").strip()
     crf_value = 20
-    if clip_hint_raw:
-        try:
-            if float(clip_hint_raw) < 20.0:
-                crf_value = 18
-        except ValueError:
-            pass
+    if context.target_duration is not None and context.target_duration < 20.0:
+        crf_value = 18
     if crf_value != 18 and max_duration is not None and max_duration <= 20:
         crf_value = 18
 # END REGION AI
@@ -351,8 +356,7 @@ def generate_variant(
 
     crop_margin_w = _ensure_even(rng.randint(4, 10))
     crop_margin_h = _ensure_even(rng.randint(4, 10))
-    backoff_raw = os.environ.get("UNICLON_CROP_BACKOFF", "").strip()
-    crop_backoff_depth = int(backoff_raw) if backoff_raw.isdigit() else 0
+    crop_backoff_depth = max(0, context.crop_backoff)
     if crop_backoff_depth:
         reduction_w = _ensure_even(min(crop_margin_w, crop_backoff_depth * 2))
         reduction_h = _ensure_even(min(crop_margin_h, crop_backoff_depth * 2))
@@ -408,7 +412,7 @@ def generate_variant(
 
     qt_make, qt_model, _ = rng.choice(QT_DEVICE_POOL)
 
-    timestamps = random_past_timestamp(rng, min_days=1, max_days=10)
+    timestamps = random_past_timestamp(rng, min_days=1, max_days=10, now=now)
     filesystem_epoch = filesystem_epoch_from(timestamps, rng)
 
     audio_rng = random.Random(rng.getrandbits(31)); audio_tempo = _clamp(audio_rng.uniform(0.96, 1.04), 0.94, 1.06); audio_pitch = _clamp(audio_rng.uniform(0.96, 1.04), 0.94, 1.06)
@@ -461,6 +465,288 @@ def generate_variant(
     )
 
 
+# REGION AI: render planner
+# Один вызов считает скалярные параметры копии (fps, битрейт, окно клипа, кроп, шум, частота и битрейт звука, теги, имя файла),
+# которые раньше собирались в generate_copy.sh из десятков rand_*/awk. Результат детерминирован по seed.
+_TITLE_POOL = ["Vertical clip", "Story highlight", "Quick reel", "Travel moment", "Daily snap", "Phone capture"]
+_DESCRIPTION_POOL = [
+    "Edited on mobile", "Final export", "Quick highlight", "Daily highlights", "Personal draft", "Travel vertical",
+]
+_NAME_PREFIXES = {"ios": ["IMG", "IMG", "VID"], "pixel": ["PXL", "PXL", "VID"], "default": ["VID", "VID", "IMG", "PXL"]}
+
+
+@dataclass
+class PlanInputs:
+    seed: str
+    input_name: str
+    copy_index: int
+    salt: str = "uniclon_v1.7"
+    orig_duration: float = 0.0
+    br_min: int = 3200
+    br_max: int = 5200
+    width: int = 1080
+    height: int = 1920
+    fps_base: List[int] = field(default_factory=lambda: [30])
+    fps_rare: List[int] = field(default_factory=list)
+    force_fps: Optional[int] = None
+    target_fps: Optional[int] = None
+    max_duration: float = 0.0
+    audio_rates: List[int] = field(default_factory=lambda: [44100])
+    noise_percent: int = 30
+    crop_max_px: int = 6
+    profile_name: str = "tiktok_hightrust"
+    combo_fps: Optional[int] = None
+    combo_bitrate_scale: Optional[float] = None
+    combo_shift: Optional[float] = None
+    combo_noise: Optional[int] = None
+
+
+@dataclass
+class RenderSpec:
+    seed: str
+    variant: Dict[str, object]
+    fps: int
+    bitrate_kbps: int
+    maxrate_kbps: int
+    bufsize_kbps: int
+    target_duration: float
+    clip_start: float
+    clip_duration: float
+    stretch_factor: float
+    tempo_factor: float
+    crop: Dict[str, int]
+    noise_strength: int
+    audio: Dict[str, object]
+    metadata: Dict[str, str]
+    output_name: str
+    preview_time: Optional[float] = None
+
+    def to_dict(self) -> Dict[str, object]:
+        return asdict(self)
+
+    def shell_fields(self) -> Dict[str, object]:
+        """Плоские PLAN_* поля для eval в generate_copy.sh (варианту оставлены прежние RAND_*)."""
+        fields: Dict[str, object] = {
+            "fps": self.fps,
+            "bitrate_kbps": self.bitrate_kbps,
+            "maxrate_kbps": self.maxrate_kbps,
+            "bufsize_kbps": self.bufsize_kbps,
+            "target_duration": f"{self.target_duration:.3f}",
+            "clip_start": f"{self.clip_start:.3f}",
+            "clip_duration": f"{self.clip_duration:.3f}",
+            "stretch_factor": f"{self.stretch_factor:.6f}",
+            "tempo_factor": f"{self.tempo_factor:.6f}",
+            "crop_w": self.crop["w"],
+            "crop_h": self.crop["h"],
+            "crop_x": self.crop["x"],
+            "crop_y": self.crop["y"],
+            "noise_strength": self.noise_strength,
+            "audio_sr": self.audio["sample_rate"],
+            "audio_br": self.audio["bitrate"],
+            "title": self.metadata["title"],
+            "description": self.metadata["description"],
+            "minor_version": self.metadata["minor_version"],
+            "output_name": self.output_name,
+        }
+        if self.preview_time is not None:
+            fields["preview_ss"] = f"{self.preview_time:.3f}"
+        return fields
+
+
+def _substream(seed: str, label: str) -> random.Random:
+    """Отдельный поток на каждую группу параметров: новая группа не сдвигает значения остальных."""
+    return random.Random(int(hashlib.sha1(f"{seed}|{label}".encode("utf-8")).hexdigest()[:16], 16))
+
+
+def _plan_fps(inputs: PlanInputs, variant: VariantConfig, rng: random.Random) -> int:
+    fps = inputs.force_fps
+    if fps is None:
+        use_rare = bool(inputs.fps_rare) and rng.randint(1, 100) <= 22
+        fps = rng.choice(inputs.fps_rare if use_rare else (inputs.fps_base or [30]))
+    # приоритет как в generate_copy: комбо → вариант → пул профиля; TARGET_FPS из окружения перекрывает всё
+    if inputs.combo_fps:
+        fps = inputs.combo_fps
+    elif variant.fps:
+        fps = variant.fps
+    if inputs.target_fps:
+        fps = inputs.target_fps
+    if fps < 15:
+        return 24
+    return min(60, int(fps))
+
+
+def _plan_bitrate(inputs: PlanInputs, variant: VariantConfig, rng: random.Random) -> int:
+    bitrate = variant.bitrate_kbps
+    if not bitrate:
+        low, high = sorted((inputs.br_min, inputs.br_max))
+        bitrate = rng.randint(low, high)
+        mid_low, mid_high = max(low, 3200), min(high, 4600)
+        # смещение к середине диапазона, как в shell-ветке без варианта
+        if mid_low <= mid_high and rng.randint(1, 100) <= 72:
+            bitrate = rng.randint(mid_low, mid_high)
+    if inputs.combo_bitrate_scale:
+        bitrate = int(round(bitrate * (inputs.combo_bitrate_scale if inputs.combo_bitrate_scale > 0 else 1.0)))
+    if bitrate < 800:
+        return 1200
+    if bitrate > 20000:
+        return 12000
+    return bitrate
+
+
+def _plan_timing(inputs: PlanInputs, rng: random.Random, scene: Optional[SourceProfile] = None) -> Dict[str, float]:
+    orig = max(0.0, inputs.orig_duration)
+    delta = rng.uniform(0.10, 0.35)
+    target = orig + (delta if rng.randint(0, 1) else -delta)
+    if target < 0.2:
+        target = max(0.2, orig + delta)
+    if inputs.max_duration > 0 and target > inputs.max_duration:
+        target = inputs.max_duration
+    start_cap = min(0.35, max(0.0, orig * 0.08))
+    start = round(rng.uniform(0.0, start_cap), 3) if start_cap > 0.05 else 0.0
+    if scene is not None:
+        # старт по содержимому: не на чёрном кадре, не перед склейкой, разнесён между копиями
+        picked = pick_clip_start(scene, start_cap, inputs.copy_index, rng)
+        if picked is not None:
+            start = picked
+    if orig <= 0.6:
+        start = 0.0
+    avail = orig - start
+    if avail < 0.6:
+        start, avail = 0.0, orig
+    dur_delta = rng.uniform(0.10, 0.35)
+    clip = target + dur_delta if rng.randint(0, 1) else target - dur_delta
+    clip = max(0.30, clip)
+    if clip >= avail:
+        clip = avail - 0.05
+        if clip < 0.30:
+            clip = avail - 0.02 if avail > 0.35 else avail
+    if clip <= 0.0:
+        clip = avail - 0.02 if avail > 0.35 else 0.30
+    if clip <= 0.0:
+        clip = 0.30
+    stretch = clip / avail if avail > 0 and clip > 0 else 1.0
+    if inputs.combo_shift is not None:
+        start = max(0.0, start + inputs.combo_shift)
+        if target > 0 and start > target - 0.2:
+            start = max(0.0, target - 0.2)
+        if scene is not None:
+            start = nudge_start(scene, start, max(start_cap, start))
+    return {
+        "target_duration": round(clip, 3),
+        "clip_start": round(start, 3),
+        "clip_duration": round(clip, 3),
+        "stretch_factor": stretch or 1.0,
+        "tempo_factor": 1.0 / stretch if stretch else 1.0,
+    }
+
+
+def _plan_crop(inputs: PlanInputs, variant: VariantConfig) -> Dict[str, int]:
+    # fix: поля кадрирования ограничены crop_max_px (CROP_MAX_PX профиля), как у rand_int_var CROP_W в shell
+    cap = max(0, inputs.crop_max_px)
+    w, h = min(max(0, variant.crop_margin_w), cap), min(max(0, variant.crop_margin_h), cap)
+    x, y = variant.crop_offset_x, variant.crop_offset_y
+    return {"w": w, "h": h, "x": min(max(0, x), w), "y": min(max(0, y), h)}
+
+
+def _plan_noise(inputs: PlanInputs, variant: VariantConfig, rng: random.Random) -> int:
+    if variant.noise_strength > 0:
+        return int(round(variant.noise_strength))
+    strength = rng.randint(1, 2) if rng.randint(1, 100) <= inputs.noise_percent else 0
+    if inputs.combo_noise is not None:
+        strength = max(1, strength) if inputs.combo_noise > 0 else 0
+    return strength
+
+
+def _plan_audio(inputs: PlanInputs, rng: random.Random) -> Dict[str, object]:
+    """Только частота и битрейт аудио: профиль и цепочки по-прежнему выбирает pick_audio_chain в shell."""
+    sample_rate = rng.choice(inputs.audio_rates or [44100])
+    bitrate = min(160, max(96, (rng.randint(96, 160) // 4) * 4))
+    return {"sample_rate": sample_rate, "bitrate": f"{bitrate}k"}
+
+
+def _plan_output_name(seed: str, software: str, now: datetime, rng: random.Random) -> str:
+    stamp = now - timedelta(days=rng.randint(3, 10), hours=rng.randint(0, 23), minutes=rng.randint(0, 59), seconds=rng.randint(0, 59))
+    digits = "".join(ch for ch in seed.lower() if ch in "0123456789abcdef")
+    digits = (digits or hashlib.md5(seed.encode("utf-8")).hexdigest()).ljust(6, "0")
+    if "iMovie" in software or "Final Cut" in software:
+        pool = _NAME_PREFIXES["ios"]
+    elif "Pixel" in software or "Google" in software:
+        pool = _NAME_PREFIXES["pixel"]
+    else:
+        pool = _NAME_PREFIXES["default"]
+    prefix = pool[int(digits[4:6], 16) % len(pool)]
+    return f"{prefix}_{stamp.strftime('%Y%m%d_%H%M%S')}_{digits[:4]}.mp4"
+
+
+def plan_copy(
+    inputs: PlanInputs,
+    *,
+    now: Optional[datetime] = None,
+    context: Optional[JobContext] = None,
+    scene: Optional[SourceProfile] = None,
+) -> RenderSpec:
+    """Полная спецификация рендера копии. Чистая функция от inputs, now и профиля сцены: ffmpeg не нужен.
+
+    С профилем источника (scene_analysis) старт окна и кадр превью выбираются по содержимому.
+    """
+    now = now or datetime.now(tz=timezone.utc)
+    variant = generate_variant(
+        input_name=inputs.input_name,
+        copy_index=inputs.copy_index,
+        salt=inputs.salt,
+        profile_br_min=inputs.br_min,
+        profile_br_max=inputs.br_max,
+        base_width=inputs.width,
+        base_height=inputs.height,
+        audio_sample_rate=(inputs.audio_rates or [44100])[0],
+        profile_name=inputs.profile_name,
+        context=context,
+        now=now,
+    )
+    fps = _plan_fps(inputs, variant, _substream(inputs.seed, "fps"))
+    bitrate = _plan_bitrate(inputs, variant, _substream(inputs.seed, "bitrate"))
+    timing = _plan_timing(inputs, _substream(inputs.seed, "timing"), scene)
+    crop = _plan_crop(inputs, variant)
+    noise = _plan_noise(inputs, variant, _substream(inputs.seed, "noise"))
+    audio = _plan_audio(inputs, _substream(inputs.seed, "audio"))
+    meta_rng = _substream(inputs.seed, "metadata")
+    metadata = {
+        "software": variant.software,
+        "encoder": variant.encoder,
+        "major_brand": variant.major_brand,
+        "compatible_brands": variant.compatible_brands,
+        "minor_version": str(meta_rng.randint(0, 512)),
+        "creation_time": variant.timestamps.iso if variant.timestamps else now.strftime("%Y-%m-%dT%H:%M:%S.000Z"),
+        "title": f"{meta_rng.choice(_TITLE_POOL)} {meta_rng.randint(10, 99)}",
+        "description": meta_rng.choice(_DESCRIPTION_POOL),
+    }
+    output_name = _plan_output_name(inputs.seed, variant.software, now, _substream(inputs.seed, "name"))
+    # maxrate/bufsize берутся из варианта как есть — так же, как RAND_MAXRATE_KBPS/RAND_BUFSIZE_KBPS в shell
+    maxrate, bufsize = variant.maxrate_kbps, variant.bufsize_kbps
+    return RenderSpec(
+        seed=inputs.seed,
+        variant=variant.to_dict(),
+        fps=fps,
+        bitrate_kbps=bitrate,
+        maxrate_kbps=maxrate,
+        bufsize_kbps=bufsize,
+        target_duration=timing["target_duration"],
+        clip_start=timing["clip_start"],
+        clip_duration=timing["clip_duration"],
+        stretch_factor=timing["stretch_factor"],
+        tempo_factor=timing["tempo_factor"],
+        crop=crop,
+        noise_strength=noise,
+        audio=audio,
+        metadata=metadata,
+        output_name=output_name,
+        preview_time=pick_preview_time(
+            scene, timing["clip_start"], timing["clip_duration"], timing["stretch_factor"], inputs.copy_index
+        ) if scene is not None else None,
+    )
+# END REGION AI
+
+
 def _format_shell_assignments(data: Dict[str, object]) -> str:
     lines: List[str] = []
     for key, value in data.items():
@@ -499,6 +785,64 @@ def _cli_generate(args: argparse.Namespace) -> int:
     return 0
 
 
+# REGION AI: render planner cli
+def _csv_ints(value: Optional[str]) -> List[int]:
+    return [int(float(item)) for item in (value or "").replace(" ", ",").split(",") if item.strip()]
+
+
+def _optional_number(value: Optional[str]) -> Optional[float]:
+    try:
+        return float(value) if value not in (None, "") else None
+    except ValueError:
+        return None
+
+
+def _cli_plan(args: argparse.Namespace) -> int:
+    combo_fps = _optional_number(args.combo_fps)
+    combo_noise = _optional_number(args.combo_noise)
+    force_fps = _optional_number(args.force_fps)
+    target_fps = _optional_number(args.target_fps)
+    inputs = PlanInputs(
+        seed=args.seed,
+        input_name=args.input,
+        copy_index=args.copy_index,
+        salt=args.salt,
+        orig_duration=_optional_number(args.orig_duration) or 0.0,
+        br_min=args.profile_br_min,
+        br_max=args.profile_br_max,
+        width=args.base_width,
+        height=args.base_height,
+        fps_base=_csv_ints(args.fps_base) or [30],
+        fps_rare=_csv_ints(args.fps_rare),
+        force_fps=int(force_fps) if force_fps else None,
+        target_fps=int(target_fps) if target_fps else None,
+        max_duration=_optional_number(args.max_duration) or 0.0,
+        audio_rates=_csv_ints(args.audio_rates) or [44100],
+        noise_percent=args.noise_percent,
+        crop_max_px=args.crop_max_px,
+        profile_name=args.profile_name,
+        combo_fps=int(combo_fps) if combo_fps else None,
+        combo_bitrate_scale=_optional_number(args.combo_bitrate_scale),
+        combo_shift=_optional_number(args.combo_shift),
+        combo_noise=int(combo_noise) if combo_noise is not None else None,
+    )
+    now = datetime.fromtimestamp(args.now, tz=timezone.utc) if args.now is not None else None
+    scene = None
+    if args.source and args.scene_cache_dir:
+        scene = load_or_analyze(Path(args.source), Path(args.scene_cache_dir))
+    spec = plan_copy(inputs, now=now, scene=scene)
+    if args.format == "json":
+        json.dump(spec.to_dict(), sys.stdout, indent=2, ensure_ascii=False)
+        sys.stdout.write("\n")
+        return 0
+    # shell: прежние RAND_* варианта + PLAN_* итоговых параметров одним выводом
+    print(_format_shell_assignments(spec.variant))
+    for key, value in spec.shell_fields().items():
+        print(f"PLAN_{key.upper()}={shlex.quote(str(value))}")
+    return 0
+# END REGION AI
+
+
 def _cli_score(args: argparse.Namespace) -> int:
     # REGION AI: bitrate tolerance for trust score
     bitrate_delta = relaxed_bitrate_delta(args.bitrate_delta)
@@ -539,6 +883,37 @@ def build_parser() -> argparse.ArgumentParser:
     gen.add_argument("--format", choices=["json", "shell"], default="json")
     gen.set_defaults(func=_cli_generate)
 
+    # REGION AI: render planner cli
+    plan = sub.add_parser("plan", help="Compute the complete render spec for one copy")
+    plan.add_argument("--seed", required=True, help="Attempt seed (SEED_HEX)")
+    plan.add_argument("--input", required=True, help="Input filename (basename)")
+    plan.add_argument("--copy-index", type=int, required=True)
+    plan.add_argument("--salt", default="uniclon_v1.7")
+    plan.add_argument("--profile-br-min", type=int, default=3200)
+    plan.add_argument("--profile-br-max", type=int, default=5200)
+    plan.add_argument("--base-width", type=int, default=1080)
+    plan.add_argument("--base-height", type=int, default=1920)
+    plan.add_argument("--profile-name", default="tiktok_hightrust")
+    plan.add_argument("--orig-duration", help="Source duration in seconds")
+    plan.add_argument("--max-duration", help="Profile duration limit in seconds (0 — no limit)")
+    plan.add_argument("--fps-base", default="30", help="Comma-separated FPS pool")
+    plan.add_argument("--fps-rare", default="", help="Comma-separated rare FPS pool")
+    plan.add_argument("--force-fps")
+    plan.add_argument("--target-fps", help="TARGET_FPS override from the environment")
+    plan.add_argument("--audio-rates", default="44100", help="Comma-separated audio sample rates")
+    plan.add_argument("--noise-percent", type=int, default=30)
+    plan.add_argument("--crop-max-px", type=int, default=6)
+    plan.add_argument("--combo-fps")
+    plan.add_argument("--combo-bitrate-scale")
+    plan.add_argument("--combo-shift")
+    plan.add_argument("--combo-noise")
+    plan.add_argument("--source", help="Source path for scene-aware clip and preview selection")
+    plan.add_argument("--scene-cache-dir", help="Scene analysis cache directory (enables --source analysis)")
+    plan.add_argument("--now", type=float, help="Reference UNIX time for timestamps (reproducible plans)")
+    plan.add_argument("--format", choices=["json", "shell"], default="json")
+    plan.set_defaults(func=_cli_plan)
+    # END REGION AI
+
     score = sub.add_parser("score", help="Compute trust score from metrics")
     score.add_argument("--ssim", type=float, required=True)
     score.add_argument("--phash", type=float, required=True)
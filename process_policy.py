@@ -0,0 +1,157 @@
+import logging
+import os
+from dataclasses import dataclass
+from typing import Callable, Dict, FrozenSet, Optional
+
+# REGION AI: imports
+from config import (
+    BOT_RESERVED_CPUS,
+    PREVIEW_IOCLASS,
+    PREVIEW_NICE,
+    PROCESS_POLICY_ENABLED,
+    QC_IOCLASS,
+    QC_NICE,
+    RENDER_CPUS,
+    RENDER_IOCLASS,
+    RENDER_NICE,
+)
+# END REGION AI
+
+logger = logging.getLogger(__name__)
+
+_IOCLASSES = {"realtime": 1, "best-effort": 2, "idle": 3}
+
+
+# REGION AI: process class policy
+def parse_cpu_list(raw: str) -> FrozenSet[int]:
+    """'0-3,6' → {0,1,2,3,6}; некорректные куски пропускаются."""
+    cpus = set()
+    for part in (raw or "").split(","):
+        part = part.strip()
+        if not part:
+            continue
+        first, _, last = part.partition("-")
+        try:
+            lo = int(first)
+            hi = int(last) if last else lo
+        except ValueError:
+            logger.warning("Ignoring bad CPU list item %r", part)
+            continue
+        cpus.update(range(lo, hi + 1))
+    return frozenset(cpus)
+
+
+def _available_cpus() -> FrozenSet[int]:
+    try:
+        return frozenset(os.sched_getaffinity(0))
+    except (AttributeError, OSError):
+        return frozenset(range(os.cpu_count() or 1))
+
+
+@dataclass(frozen=True)
+class ProcessClass:
+    """Класс процесса: набор ядер, nice и ionice-класс (idle / best-effort)."""
+
+    name: str
+    nice: int
+    ioclass: str
+    cpus: Optional[FrozenSet[int]] = None
+
+    def apply_current(self) -> None:
+        """Применяет класс к текущему процессу (для preexec_fn в дочернем процессе)."""
+        if self.cpus and hasattr(os, "sched_setaffinity"):
+            try:
+                os.sched_setaffinity(0, self.cpus)
+            except OSError:
+                pass
+        try:
+            current = os.getpriority(os.PRIO_PROCESS, 0)
+            if self.nice > current:
+                os.setpriority(os.PRIO_PROCESS, 0, self.nice)
+        except (AttributeError, OSError):
+            pass
+
+    def apply_ionice(self, pid: int) -> None:
+        """ionice выставляется из родителя через psutil: в stdlib нет ioprio_set."""
+        ioclass = _IOCLASSES.get(self.ioclass.split(":", 1)[0])
+        if ioclass is None or ioclass == 1:
+            return
+        try:
+            import psutil
+
+            proc = psutil.Process(pid)
+            if ioclass == 3:
+                proc.ionice(psutil.IOPRIO_CLASS_IDLE)
+            else:
+                level = self.ioclass.partition(":")[2]
+                proc.ionice(psutil.IOPRIO_CLASS_BE, int(level) if level.isdigit() else 4)
+        except Exception:  # noqa: BLE001
+            logger.debug("ionice for pid %s failed", pid, exc_info=True)
+
+
+def _render_cpus() -> Optional[FrozenSet[int]]:
+    available = _available_cpus()
+    if RENDER_CPUS:
+        chosen = parse_cpu_list(RENDER_CPUS) & available
+        return chosen or None
+    if BOT_RESERVED_CPUS.lower() == "auto":
+        reserved = frozenset({min(available)}) if len(available) >= 4 else frozenset()
+    else:
+        reserved = parse_cpu_list(BOT_RESERVED_CPUS)
+    chosen = available - reserved
+    if not reserved or not chosen:
+        return None
+    return chosen
+
+
+def _build_policy() -> Dict[str, ProcessClass]:
+    render_cpus = _render_cpus()
+    return {
+        "bot": ProcessClass("bot", 0, "best-effort"),
+        "render": ProcessClass("render", RENDER_NICE, RENDER_IOCLASS, render_cpus),
+        "preview": ProcessClass("preview", PREVIEW_NICE, PREVIEW_IOCLASS, render_cpus),
+        "qc": ProcessClass("qc", QC_NICE, QC_IOCLASS, render_cpus),
+    }
+
+
+POLICY: Dict[str, ProcessClass] = _build_policy()
+
+
+def render_cpu_count() -> Optional[int]:
+    """Сколько ядер отдано рендерам (None — без ограничений по affinity)."""
+    cpus = POLICY["render"].cpus
+    return len(cpus) if PROCESS_POLICY_ENABLED and cpus else None
+
+
+def preexec_for(name: str) -> Optional[Callable[[], None]]:
+    if not PROCESS_POLICY_ENABLED or name not in POLICY:
+        return None
+    return POLICY[name].apply_current
+
+
+def after_spawn(name: str, pid: Optional[int]) -> None:
+    if PROCESS_POLICY_ENABLED and pid and name in POLICY:
+        POLICY[name].apply_ionice(pid)
+
+
+def policy_env() -> Dict[str, str]:
+    """Параметры классов для bash-конвейера (enter_process_class в helpers.sh)."""
+    if not PROCESS_POLICY_ENABLED:
+        return {}
+    env: Dict[str, str] = {}
+    for cls in ("preview", "qc"):
+        item = POLICY[cls]
+        env[f"UNICLON_{cls.upper()}_NICE"] = str(item.nice)
+        env[f"UNICLON_{cls.upper()}_IOCLASS"] = item.ioclass
+    return env
+
+
+def describe() -> str:
+    if not PROCESS_POLICY_ENABLED:
+        return "process policy off"
+    parts = []
+    for item in POLICY.values():
+        cpus = "all" if not item.cpus else ",".join(str(c) for c in sorted(item.cpus))
+        parts.append(f"{item.name}(nice={item.nice},io={item.ioclass},cpus={cpus})")
+    return " ".join(parts)
+# END REGION AI
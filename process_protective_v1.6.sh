@@ -39,6 +39,10 @@ AUDIO_INTENSITY="${AUDIO_INTENSITY:-medium}" # gentle | medium | strong
 chmod +x "$BASE_DIR"/modules/*.sh 2>/dev/null || true
 export OUTPUT_DIR="${OUTPUT_DIR:-$BASE_DIR/output}"
 mkdir -p "$OUTPUT_DIR"
+# REGION AI: shared render cache
+# кэш производных артефактов (LUT и т.п.) переживает запуски и общий для параллельных задач
+export UNICLON_CACHE_DIR="${UNICLON_CACHE_DIR:-$OUTPUT_DIR/cache}"
+# END REGION AI
 LOG_DIR="$OUTPUT_DIR/logs"
 LOG_FILE="$LOG_DIR/last_run.log"
 mkdir -p "$LOG_DIR"
@@ -53,7 +57,7 @@ echo "[INIT] Modular mode active — cleaned and sandboxed"
 echo "[INIT] Modular cleanup complete — orchestrator verified"
 # REGION AI: runtime state arrays
 declare -a RUN_COMBOS=()
-declare -a RUN_COMBO_HISTORY RUN_FILES RUN_BITRATES RUN_FPS RUN_DURATIONS RUN_SIZES RUN_ENCODERS RUN_SOFTWARES RUN_CREATION_TIMES RUN_SEEDS RUN_TARGET_DURS RUN_TARGET_BRS RUN_PROFILES RUN_QT_MAKES RUN_QT_MODELS RUN_QT_SOFTWARES RUN_SSIM RUN_PSNR RUN_PHASH RUN_UNIQ RUN_QPASS RUN_QUALITIES RUN_CREATIVE_MIRROR RUN_CREATIVE_INTRO RUN_CREATIVE_LUT RUN_PREVIEWS
+declare -a RUN_COMBO_HISTORY RUN_FILES RUN_BITRATES RUN_FPS RUN_DURATIONS RUN_SIZES RUN_ENCODERS RUN_SOFTWARES RUN_CREATION_TIMES RUN_SEEDS RUN_TARGET_DURS RUN_TARGET_BRS RUN_PROFILES RUN_QT_MAKES RUN_QT_MODELS RUN_QT_SOFTWARES RUN_SSIM RUN_PSNR RUN_PHASH RUN_UNIQ RUN_QPASS RUN_QUALITIES RUN_CREATIVE_MIRROR RUN_CREATIVE_INTRO RUN_CREATIVE_LUT RUN_PREVIEWS RUN_TIERS
 RUN_COMBO_HISTORY=()
 # REGION AI: fallback status tracker
 fallback_status=""
@@ -89,8 +93,12 @@ set -- "${POSITIONAL_ARGS[@]}"
 : "${AFILTER_CORE:=}"
 : "${AFILTER:=anull}"
 : "${UNICLON_AUDIO_EQ_OVERRIDE:=}"
+: "${PREVIEW_SS_USER:=${PREVIEW_SS:-}}"
 : "${PREVIEW_SS:=00:00:01.000}"
 # END REGION AI
+# REGION AI: load ffmpeg capability table once per run
+ffmpeg_caps_load
+# END REGION AI
 audio_init_filter_caps
 
 PREVIEW_SS_FALLBACK="00:00:01.000"
@@ -208,23 +216,12 @@ need ffprobe
 need exiftool
 need bc
 
-FFMPEG_FILTER_CACHE=""
-
+# REGION AI: ffmpeg capability table
+# fix: проверки фильтров идут через общую таблицу ffmpeg_driver.sh вместо отдельного кэша вывода -filters
 ffmpeg_filter_available() {
-  local filter_name="${1:-}"
-  if [ -z "$filter_name" ]; then
-    return 1
-  fi
-  if [ -z "${FFMPEG_FILTER_CACHE:-}" ]; then
-    if ! FFMPEG_FILTER_CACHE="$(ffmpeg -hide_banner -filters 2>/dev/null)"; then
-      FFMPEG_FILTER_CACHE=""
-    fi
-  fi
-  if [ -z "$FFMPEG_FILTER_CACHE" ]; then
-    return 1
-  fi
-  printf '%s\n' "$FFMPEG_FILTER_CACHE" | grep -E "[[:space:]]${filter_name}([[:space:]]|$)" >/dev/null 2>&1
+  ffmpeg_supports_filter "${1:-}"
 }
+# END REGION AI
 
 usage() { echo "Usage: $0 <input_video> [count]"; exit 1; }
 [ "${1:-}" ] || usage
@@ -239,7 +236,12 @@ FAILED_COUNT=0
 TRUST_SCORE=1.00
 
 SRC_BITRATE="None"
-SRC_BITRATE_RAW=$(ffprobe_exec -v error -select_streams v:0 -show_entries stream=bit_rate -of csv=p=0 "$SRC" 2>/dev/null || true)
+# REGION AI: cached source probe
+# Источник пробуется один раз (media_probe_get_var): битрейт, длительность и наличие звука берутся из одного JSON.
+media_probe_prune
+SRC_BITRATE_RAW=""
+media_probe_get_var SRC_BITRATE_RAW "$SRC" v_bit_rate || true
+# END REGION AI
 if [ -n "$SRC_BITRATE_RAW" ] && awk -v val="$SRC_BITRATE_RAW" 'BEGIN{val+=0; exit (val>0 ? 0 : 1)}'; then
   SRC_BITRATE=$(awk -v val="$SRC_BITRATE_RAW" 'BEGIN{printf "%.0f", val/1000}')
 fi
@@ -270,13 +272,14 @@ validate_audio() {
     AUDIO_MODE="mute"
     return
   fi
-  local audio_present
-  if ffprobe -v error -select_streams a:0 -show_entries stream=codec_type -of csv=p=0 "$input_file" 2>/dev/null | grep -q audio; then
-    audio_present=1
-  else
-    audio_present=0
+  local audio_present=""
+  # fix: неудачный probe — не «нет звука»: оставляем normal, копии не глушатся
+  if ! media_probe_get_var audio_present "$input_file" has_audio || [ -z "$audio_present" ]; then
+    echo "[WARN] Audio probe failed for $(basename "$input_file") — keeping audio mode normal."
+    AUDIO_MODE="normal"
+    return
   fi
-  if [ "$audio_present" -eq 0 ]; then
+  if [ "$audio_present" != "1" ]; then
     echo "[WARN] No audio stream detected — switching to silent mode."
     AUDIO_MODE="mute"
   else
@@ -287,6 +290,11 @@ validate_audio() {
 validate_audio "$INPUT_FILE"
 
 manifest_init "$MANIFEST_PATH"
+# REGION AI: per-run copy metrics
+# fix: метрики копий пишутся с чистого листа — устаревшая запись прошлого запуска не должна пройти QC-гейт
+ensure_dir "$CHECK_DIR"
+printf '[]' >"${UNICLON_COPY_METRICS:-${CHECK_DIR}/copy_metrics.json}"
+# END REGION AI
 
 CURRENT_COPY_INDEX=0
  
@@ -319,12 +327,25 @@ base="$(basename "$SRC")"
 name="${base%.*}"
 BASENAME="$name"
 
-ORIG_DURATION=$(ffprobe_exec -v error -show_entries format=duration -of default=noprint_wrappers=1:nokey=1 "$SRC")
+ORIG_DURATION=""
+media_probe_get_var ORIG_DURATION "$SRC" duration || true
 if [ -z "$ORIG_DURATION" ] || [ "$ORIG_DURATION" = "N/A" ]; then
   echo "❌ Не удалось получить длительность входного видео"
   exit 1
 fi
 
+# REGION AI: one-pass source scene analysis
+# Склейки, яркость и движение источника считаются один раз (кэш по пути+размеру+mtime);
+# планировщик выбирает по ним старт окна и кадр превью. UNICLON_SCENE_ANALYSIS=0 — выбор вслепую.
+SCENE_CACHE_DIR="${UNICLON_CACHE_DIR}/scenes"
+SCENE_PROFILE_READY=0
+if [ "${UNICLON_SCENE_ANALYSIS:-1}" != "0" ]; then
+  if python3 "$BASE_DIR/modules/core/scene_analysis.py" analyze --source "$SRC" --cache-dir "$SCENE_CACHE_DIR"; then
+    SCENE_PROFILE_READY=1
+  fi
+fi
+# END REGION AI
+
 if [ "$MUSIC_VARIANT" -eq 1 ]; then
   collect_music_variants
 fi
@@ -370,6 +391,7 @@ declare -a RUN_CREATIVE_MIRROR=()
 declare -a RUN_CREATIVE_INTRO=()
 declare -a RUN_CREATIVE_LUT=()
 declare -a RUN_PREVIEWS=()
+declare -a RUN_TIERS=()
 declare -a RUN_FS_TIMESTAMPS=()
 declare -a QUALITY_ISSUES=()
 declare -a QUALITY_COPY_IDS=()
@@ -386,6 +408,32 @@ USED_VARIANT_KEYS_LIST=""
 CURRENT_VARIANT_KEY=""
 # END REGION AI
 
+# REGION AI: batch chunk shared uniqueness state
+# Ключи вариантов/комбо предыдущих чанков пакета, чтобы уникальность держалась на весь пакет
+BATCH_STATE_FILE="${UNICLON_BATCH_STATE:-}"
+if [ -n "$BATCH_STATE_FILE" ] && [ -f "$BATCH_STATE_FILE" ]; then
+  while IFS=$'\t' read -r batch_kind batch_key; do
+    [ -z "$batch_key" ] && continue
+    case "$batch_kind" in
+      variant) mark_variant_key "$batch_key" ;;
+      combo) mark_combo_key "$batch_key" ;;
+    esac
+  done <"$BATCH_STATE_FILE"
+  echo "[Batch] Loaded shared uniqueness state (offset=${UNICLON_COPY_INDEX_OFFSET:-0})"
+fi
+
+batch_state_flush() {
+  [ -n "$BATCH_STATE_FILE" ] || return 0
+  local idx
+  {
+    for idx in "${!RUN_FILES[@]}"; do
+      [ -n "${RUN_VARIANT_KEYS[$idx]:-}" ] && printf 'variant\t%s\n' "${RUN_VARIANT_KEYS[$idx]}"
+      printf 'combo\t%s|%s\n' "${RUN_SOFTWARES[$idx]:-}" "${RUN_ENCODERS[$idx]:-}"
+    done
+  } >>"$BATCH_STATE_FILE"
+}
+# END REGION AI
+
 REGEN_ITER=0
 REGEN_OCCURRED=0
 LOW_UNIQUENESS_TRIGGERED=0
@@ -530,7 +578,9 @@ run_self_audit_pipeline() {
   fi
 }
 
-run_self_audit_pipeline
+# fix: QC/аудит идут с пониженным nice/ionice, чтобы не отнимать ядра у рендера и бота
+( enter_process_class qc; run_self_audit_pipeline )
+batch_state_flush
 
 SUCCESS_COUNT=${#RUN_FILES[@]}
 echo "✅ Успешно: $SUCCESS_COUNT/$TOTAL_COPIES"
@@ -1,4 +1,5 @@
 import csv
+import json
 import logging
 import os
 from dataclasses import dataclass
@@ -109,3 +110,33 @@ def load_qc_report(report_path: Optional[Path] = None) -> Dict[str, CopyQCResult
         return {}
 
     return results
+
+
+# REGION AI: per-copy QC from streaming metrics
+def load_copy_qc(copy_name: str, metrics_path: Optional[Path] = None) -> Optional[CopyQCResult]:
+    """QC одной копии по CHECKS_DIR/copy_metrics.json, который пишется сразу после её рендера."""
+    target_path = metrics_path or (CHECKS_DIR / "copy_metrics.json")
+    if not target_path.exists():
+        return None
+    try:
+        entries = json.loads(target_path.read_text(encoding="utf-8"))
+    except Exception:  # noqa: BLE001
+        logger.debug("Failed to parse copy metrics %s", target_path, exc_info=True)
+        return None
+    if not isinstance(entries, list):
+        return None
+    name = Path(copy_name).name
+    for entry in entries:
+        if not isinstance(entry, dict) or entry.get("copy") != name:
+            continue
+        result = CopyQCResult(
+            name=name,
+            ssim=_parse_float(entry.get("ssim")),
+            psnr=_parse_float(entry.get("psnr")),
+            phash=_parse_float(entry.get("phash")),
+            bitrate=_parse_float(entry.get("bitrate")),
+        )
+        result.normalize_status()
+        return result
+    return None
+# END REGION AI
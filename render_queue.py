@@ -19,6 +19,24 @@ def _cpu_percent() -> float:
         except Exception:
             return 0.0
 
+# fix: число одновременных рендеров задаётся снаружи (пул воркеров очереди), а не одним глобальным слотом
+_SLOTS = threading.Condition()
+_SLOT_STATE = {"limit": max(1, int(os.getenv("UNICLON_RENDER_SLOTS", "1") or 1)), "active": 0}
+
+def configure_render_slots(slots: int) -> int:
+    with _SLOTS:
+        _SLOT_STATE["limit"] = max(1, int(slots)); _SLOTS.notify_all()
+    logging.info("🎚 Render slots: %s", _SLOT_STATE["limit"])
+    return _SLOT_STATE["limit"]
+
+def render_slots() -> int:
+    return _SLOT_STATE["limit"]
+
+def _release_slot(video: str) -> None:
+    with _SLOTS:
+        _SLOT_STATE["active"] = max(0, _SLOT_STATE["active"] - 1); _SLOTS.notify_all()
+    logging.info("✅ Completed: %s", video)
+
 def _worker() -> None:
     import heapq
     heap = []
@@ -27,23 +45,46 @@ def _worker() -> None:
         while heap:
             _, _, payload = heapq.heappop(heap)
             video = payload["video"]
+            with _SLOTS:
+                while _SLOT_STATE["active"] >= _SLOT_STATE["limit"]:
+                    _SLOTS.wait()
             while True:
                 load = _cpu_percent()
-                if load <= 85.0:
+                # нагрузку от собственных рендеров план ресурсов уже учёл — ждём только внешнюю
+                if load <= 85.0 or _SLOT_STATE["active"] > 0:
                     break
                 logging.info("🕐 Waiting: CPU overloaded (%s%%)", int(load))
                 time.sleep(5)
-            logging.info("🚀 Start render: %s | CPU load=%s%%", video, int(load))
+            with _SLOTS:
+                # fix: ожидание слота отменено (wait_for/cancel) — не занимаем слот за ушедшую задачу
+                if payload["cancelled"]:
+                    logging.info("⏭ Skipped cancelled render: %s", video)
+                    continue
+                _SLOT_STATE["active"] += 1; payload["granted"] = True
+            logging.info("🚀 Start render: %s | CPU load=%s%% | slots=%s/%s", video, int(load), _SLOT_STATE["active"], _SLOT_STATE["limit"])
             payload["loop"].call_soon_threadsafe(payload["event"].set)
-            payload["done"].wait()
-            logging.info("✅ Completed: %s", video)
+            while not render_queue.empty():
+                heapq.heappush(heap, render_queue.get_nowait())
 
 async def acquire_render_slot(video: str, copies: int, priority: int):
     loop = asyncio.get_running_loop()
     _ensure_worker(loop)
-    start_event, done = asyncio.Event(), threading.Event()
+    start_event, released = asyncio.Event(), threading.Event()
     logging.info("🧩 Added to render queue: %s (priority=%s)", video, priority)
-    render_queue.put((priority, time.monotonic(), {"video": video, "copies": copies, "loop": loop, "event": start_event, "done": done}))
-    await start_event.wait()
-    return done.set
+    payload = {"video": video, "copies": copies, "loop": loop, "event": start_event, "cancelled": False, "granted": False}
+    render_queue.put((priority, time.monotonic(), payload))
+    try:
+        await start_event.wait()
+    except asyncio.CancelledError:
+        with _SLOTS:
+            granted = payload["granted"]; payload["cancelled"] = True
+        if granted:
+            # слот выдан, но задача отменена раньше, чем успела его забрать — возвращаем сразу
+            _release_slot(video)
+        raise
+
+    def release() -> None:
+        if not released.is_set():
+            released.set(); _release_slot(video)
+    return release
 # END REGION AI
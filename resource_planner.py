@@ -0,0 +1,164 @@
+import logging
+import math
+import os
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+# REGION AI: imports
+from config import ENCODE_MAX_WORKERS, ENCODE_MEMORY_HEADROOM
+from process_policy import render_cpu_count
+# END REGION AI
+
+logger = logging.getLogger(__name__)
+
+_CGROUP_ROOT = Path("/sys/fs/cgroup")
+_DEFAULT_RESOLUTION = (1080, 1920)
+# libx264 -preset slow: ~50 кадров lookahead + refs + буферы фильтров на кадр yuv420p
+_ENCODE_FRAMES_IN_FLIGHT = 80
+_ENCODE_BASE_BYTES = 160 * 1024 * 1024
+
+
+# REGION AI: cgroup v2 limits
+def _read_text(path: Path) -> Optional[str]:
+    try:
+        return path.read_text(encoding="utf-8").strip()
+    except OSError:
+        return None
+
+
+def _cgroup_dir() -> Path:
+    """Каталог cgroup v2 текущего процесса (или корень, если путь не найден)."""
+    raw = _read_text(Path("/proc/self/cgroup")) or ""
+    for line in raw.splitlines():
+        if line.startswith("0::"):
+            candidate = _CGROUP_ROOT / line[3:].lstrip("/")
+            if (candidate / "cpu.max").exists() or (candidate / "memory.max").exists():
+                return candidate
+    return _CGROUP_ROOT
+
+
+def read_cgroup_limits() -> Tuple[Optional[float], Optional[int]]:
+    """(CPU-квота в ядрах, memory.max в байтах) из cgroup v2; None — лимита нет."""
+    base = _cgroup_dir()
+    cpus: Optional[float] = None
+    memory: Optional[int] = None
+    cpu_raw = _read_text(base / "cpu.max")
+    if cpu_raw:
+        quota, _, period = cpu_raw.partition(" ")
+        if quota != "max":
+            try:
+                cpus = int(quota) / int(period or "100000")
+            except (ValueError, ZeroDivisionError):
+                cpus = None
+    mem_raw = _read_text(base / "memory.max")
+    if mem_raw and mem_raw != "max":
+        try:
+            memory = int(mem_raw)
+        except ValueError:
+            memory = None
+    return cpus, memory
+
+
+def _host_cpus() -> int:
+    pinned = render_cpu_count()
+    if pinned:
+        return pinned
+    try:
+        return len(os.sched_getaffinity(0)) or 1
+    except (AttributeError, OSError):
+        return os.cpu_count() or 1
+
+
+def _host_memory() -> Optional[int]:
+    try:
+        import psutil
+
+        return int(psutil.virtual_memory().total)
+    except Exception:  # noqa: BLE001
+        return None
+# END REGION AI
+
+
+# REGION AI: encode resource plan
+def estimate_encode_memory(width: int, height: int) -> int:
+    """Грубая оценка RSS одного libx264-энкода по разрешению."""
+    frame_bytes = max(1, width) * max(1, height) * 3 // 2
+    return _ENCODE_BASE_BYTES + frame_bytes * _ENCODE_FRAMES_IN_FLIGHT
+
+
+@dataclass(frozen=True)
+class ResourcePlan:
+    cpus: float
+    memory_bytes: Optional[int]
+    per_encode_bytes: int
+    workers: int
+    threads: int
+    filter_threads: int
+    source: str
+    resolution: Tuple[int, int]
+
+    def to_env(self) -> Dict[str, str]:
+        return {
+            "UNICLON_FFMPEG_THREADS": str(self.threads),
+            "UNICLON_FILTER_THREADS": str(self.filter_threads),
+        }
+
+    def for_workers(self, workers: int) -> "ResourcePlan":
+        """Тот же бюджет, поделённый на другое число одновременных энкодов (eco → 1)."""
+        return _split(self.cpus, self.memory_bytes, self.per_encode_bytes, workers, self.source, self.resolution)
+
+    def describe(self) -> str:
+        mem = "∞" if self.memory_bytes is None else f"{self.memory_bytes / 1024 ** 3:.1f}G"
+        return (
+            f"cpus={self.cpus:g} ({self.source}) mem={mem} "
+            f"encode≈{self.per_encode_bytes / 1024 ** 2:.0f}M@{self.resolution[0]}x{self.resolution[1]} "
+            f"workers={self.workers} threads={self.threads} filter_threads={self.filter_threads}"
+        )
+
+
+def _split(
+    cpus: float,
+    memory: Optional[int],
+    per_encode: int,
+    workers: int,
+    source: str,
+    resolution: Tuple[int, int],
+) -> ResourcePlan:
+    workers = max(1, workers)
+    threads = max(1, int(math.floor(cpus / workers)))
+    filter_threads = max(1, threads // 2)
+    return ResourcePlan(cpus, memory, per_encode, workers, threads, filter_threads, source, resolution)
+
+
+def plan_resources(resolution: Optional[Tuple[int, int]] = None, max_workers: int = ENCODE_MAX_WORKERS) -> ResourcePlan:
+    """Сколько энкодов запускать параллельно и сколько потоков дать каждому."""
+    width, height = resolution or _DEFAULT_RESOLUTION
+    quota_cpus, cgroup_memory = read_cgroup_limits()
+    host_cpus = _host_cpus()
+    if quota_cpus is not None:
+        cpus = max(1.0, min(float(host_cpus), quota_cpus))
+        source = "cgroup"
+    else:
+        cpus = float(host_cpus)
+        source = "host"
+    memory = cgroup_memory if cgroup_memory is not None else _host_memory()
+    per_encode = estimate_encode_memory(width, height)
+    # fix: не меньше 2 потоков на энкод, иначе libx264 теряет больше, чем выигрывает параллелизм
+    cpu_workers = max(1, int(cpus // 2))
+    workers = min(max(1, max_workers), cpu_workers)
+    if memory is not None:
+        budget = int(memory * (1.0 - ENCODE_MEMORY_HEADROOM))
+        workers = min(workers, max(1, budget // per_encode))
+    return _split(cpus, memory, per_encode, workers, source, (width, height))
+
+
+def parse_resolution(value: object) -> Optional[Tuple[int, int]]:
+    if not isinstance(value, str) or "x" not in value:
+        return None
+    w, _, h = value.partition("x")
+    try:
+        return int(w), int(h)
+    except ValueError:
+        return None
+# END REGION AI
@@ -1,5 +1,7 @@
 """Service helpers for Uniclon bot."""
 
 __all__ = [
+    "batch_runner",
+    "job_runner",
     "video_processor",
 ]
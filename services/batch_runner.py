@@ -0,0 +1,219 @@
+import asyncio
+import csv
+import hashlib
+import json
+import logging
+import os
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence
+
+from config import BASE_DIR, MAX_COPIES, OUTPUT_DIR
+from downloader import ingest_local_file
+from services.job_runner import HeadlessJobResult, run_headless_job
+
+logger = logging.getLogger(__name__)
+
+_VIDEO_SUFFIXES = (".mp4", ".mov", ".m4v")
+_REPORT_COLUMNS = ("source", "job_status", "output", "qc_status", "ssim", "psnr", "phash", "bitrate", "uniq_score", "error")
+
+
+# REGION AI: batch sources and journal
+def collect_sources(target: Path) -> List[Path]:
+    """Каталог (видео внутри, без рекурсии) или файл-список: путь на строку, # — комментарий."""
+    target = target.expanduser()
+    if target.is_dir():
+        return sorted(p.resolve() for p in target.iterdir() if p.is_file() and p.suffix.lower() in _VIDEO_SUFFIXES)
+    sources: List[Path] = []
+    for raw in target.read_text(encoding="utf-8").splitlines():
+        line = raw.strip()
+        if not line or line.startswith("#"):
+            continue
+        path = Path(line).expanduser()
+        if not path.is_absolute():
+            path = target.parent / path
+        sources.append(path.resolve())
+    return sources
+
+
+@dataclass
+class BatchItem:
+    source: Path
+    copies: int
+    profile: str
+    quality: str
+
+    @property
+    def key(self) -> str:
+        """Ключ журнала: тот же файл с теми же параметрами повторно не рендерится."""
+        try:
+            size = self.source.stat().st_size
+        except OSError:
+            size = -1
+        raw = f"{self.source}|{size}|{self.copies}|{self.profile}|{self.quality}"
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:16]
+
+
+class BatchJournal:
+    """Append-only JSONL: started/done/failed по ключу задачи; последняя запись по ключу главная."""
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self.entries: Dict[str, Dict[str, object]] = {}
+        if path.exists():
+            for line in path.read_text(encoding="utf-8").splitlines():
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    logger.warning("Skipping broken journal line in %s", path)
+                    continue
+                if isinstance(entry, dict) and entry.get("key"):
+                    self.entries[str(entry["key"])] = entry
+
+    def status(self, key: str) -> Optional[str]:
+        entry = self.entries.get(key)
+        return str(entry.get("status")) if entry else None
+
+    def record(self, key: str, status: str, **data: object) -> None:
+        entry = {"key": key, "status": status, "ts": round(time.time(), 3), **data}
+        self.entries[key] = entry
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self.path.open("a", encoding="utf-8") as handle:
+            handle.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            handle.flush()
+            os.fsync(handle.fileno())
+# END REGION AI
+
+
+# REGION AI: batch execution
+@dataclass
+class BatchSummary:
+    total: int
+    skipped: int = 0
+    done: int = 0
+    failed: int = 0
+    report_csv: Optional[Path] = None
+    report_json: Optional[Path] = None
+    failures: List[str] = field(default_factory=list)
+
+
+async def _run_item(item: BatchItem, key: str, journal: BatchJournal) -> HeadlessJobResult:
+    staged = BASE_DIR / f"batch_{key}{item.source.suffix.lower() or '.mp4'}"
+    journal.record(key, "started", source=str(item.source), copies=item.copies, profile=item.profile, quality=item.quality)
+    try:
+        # fix: скрипт принимает имя файла относительно cwd — кладём ссылку/копию в BASE_DIR, как бот
+        await ingest_local_file(item.source, staged)
+        result = await run_headless_job(staged, item.copies, item.profile, item.quality)
+    except Exception as exc:  # noqa: BLE001
+        logger.exception("[Batch] %s failed", item.source.name)
+        result = HeadlessJobResult(rc=-1, error=str(exc) or exc.__class__.__name__)
+    finally:
+        staged.unlink(missing_ok=True)
+    payload = result.to_dict()
+    payload.pop("rc", None)
+    journal.record(key, "done" if result.ok else "failed", source=str(item.source), rc=result.rc, **payload)
+    return result
+
+
+def write_batch_report(journal: BatchJournal, keys: Sequence[str], csv_path: Path, json_path: Path) -> None:
+    """Сводный отчёт по всем задачам пакета (включая сделанные до прерывания)."""
+    rows: List[Dict[str, object]] = []
+    jobs: List[Dict[str, object]] = []
+    for key in keys:
+        entry = journal.entries.get(key)
+        if not entry:
+            continue
+        jobs.append(entry)
+        qc = entry.get("qc") or {}
+        uniq = (entry.get("report") or {}).get("uniq_score") if isinstance(entry.get("report"), dict) else None
+        outputs = entry.get("outputs") or []
+        if not outputs:
+            rows.append({"source": entry.get("source"), "job_status": entry.get("status"), "error": entry.get("error") or ""})
+            continue
+        for output in outputs:
+            metrics = qc.get(Path(str(output)).name, {}) if isinstance(qc, dict) else {}
+            rows.append(
+                {
+                    "source": entry.get("source"),
+                    "job_status": entry.get("status"),
+                    "output": output,
+                    "qc_status": metrics.get("status", ""),
+                    "ssim": metrics.get("ssim", ""),
+                    "psnr": metrics.get("psnr", ""),
+                    "phash": metrics.get("phash", ""),
+                    "bitrate": metrics.get("bitrate", ""),
+                    "uniq_score": uniq if uniq is not None else "",
+                    "error": entry.get("error") or "",
+                }
+            )
+    csv_path.parent.mkdir(parents=True, exist_ok=True)
+    with csv_path.open("w", encoding="utf-8", newline="") as handle:
+        writer = csv.DictWriter(handle, fieldnames=_REPORT_COLUMNS, extrasaction="ignore")
+        writer.writeheader()
+        for row in rows:
+            writer.writerow({column: row.get(column, "") for column in _REPORT_COLUMNS})
+    summary = {
+        "jobs": len(jobs),
+        "done": sum(1 for job in jobs if job.get("status") == "done"),
+        "failed": sum(1 for job in jobs if job.get("status") == "failed"),
+        "copies": sum(len(job.get("outputs") or []) for job in jobs),
+    }
+    json_path.write_text(json.dumps({"summary": summary, "jobs": jobs}, ensure_ascii=False, indent=2), encoding="utf-8")
+
+
+async def run_batch(
+    sources: Iterable[Path],
+    *,
+    copies: int,
+    profile: str = "",
+    quality: str = "std",
+    parallel: int = 1,
+    journal_path: Optional[Path] = None,
+    report_path: Optional[Path] = None,
+    retry_failed: bool = False,
+) -> BatchSummary:
+    """Пакетный прогон с журналом: повторный запуск пропускает готовые задачи и доделывает прерванные."""
+    copies = max(1, min(int(copies), MAX_COPIES))
+    items = [BatchItem(Path(src), copies, profile, quality) for src in sources]
+    journal = BatchJournal(journal_path or OUTPUT_DIR / "batch" / "journal.jsonl")
+    csv_path = report_path or journal.path.with_name(f"{journal.path.stem}_report.csv")
+    summary = BatchSummary(total=len(items))
+
+    keyed = [(item, item.key) for item in items]
+    pending = []
+    for item, key in keyed:
+        state = journal.status(key)
+        if state == "done" or (state == "failed" and not retry_failed):
+            summary.skipped += 1
+            continue
+        if not item.source.is_file():
+            journal.record(key, "failed", source=str(item.source), error="source not found")
+            summary.failed += 1
+            summary.failures.append(item.source.name)
+            continue
+        pending.append((item, key))
+    logger.info("[Batch] %s sources: %s to run, %s skipped from journal %s", len(items), len(pending), summary.skipped, journal.path)
+
+    gate = asyncio.Semaphore(max(1, parallel))
+
+    async def worker(item: BatchItem, key: str) -> None:
+        async with gate:
+            logger.info("[Batch] ▶ %s (copies=%s)", item.source.name, item.copies)
+            result = await _run_item(item, key, journal)
+        if result.ok:
+            summary.done += 1
+            logger.info("[Batch] ✅ %s → %s copies in %.1fs", item.source.name, len(result.outputs), result.elapsed)
+        else:
+            summary.failed += 1
+            summary.failures.append(item.source.name)
+            logger.error("[Batch] ❌ %s: %s", item.source.name, result.error)
+
+    try:
+        await asyncio.gather(*(worker(item, key) for item, key in pending))
+    finally:
+        summary.report_csv = csv_path
+        summary.report_json = csv_path.with_suffix(".json")
+        write_batch_report(journal, [key for _, key in keyed], summary.report_csv, summary.report_json)
+    return summary
+# END REGION AI
@@ -0,0 +1,121 @@
+import logging
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from config import BASE_DIR
+from executor import (
+    CopyReadyCallback,
+    ERROR_MAP,
+    enforce_quality_gate,
+    list_new_mp4s,
+    run_script_with_logs,
+)
+from report_builder import build_uniqueness_report
+
+logger = logging.getLogger(__name__)
+
+_LOG_TAIL_LINES = 20
+
+
+# REGION AI: headless job pipeline
+@dataclass
+class HeadlessJobResult:
+    """Итог задачи без Telegram: файлы после QC, отклонённые копии и отчёт уникальности."""
+
+    rc: int
+    outputs: List[Path] = field(default_factory=list)
+    rejected: Dict[str, str] = field(default_factory=dict)
+    qc: Dict[str, Dict[str, object]] = field(default_factory=dict)
+    report: Optional[Dict[str, object]] = None
+    summary: str = ""
+    log_tail: str = ""
+    error: Optional[str] = None
+    elapsed: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None and bool(self.outputs)
+
+    def to_dict(self) -> Dict[str, object]:
+        return {
+            "rc": self.rc,
+            "outputs": [str(p) for p in self.outputs],
+            "rejected": dict(self.rejected),
+            "qc": dict(self.qc),
+            "report": self.report,
+            "summary": self.summary,
+            "error": self.error,
+            "elapsed": round(self.elapsed, 2),
+        }
+
+
+def reported_outputs(logs_text: str, cwd: Path = BASE_DIR) -> List[Path]:
+    """Файлы, о которых скрипт отчитался строкой «✅ done:» (без чужих параллельных задач)."""
+    outputs: List[Path] = []
+    seen = set()
+    for line in logs_text.splitlines():
+        stripped = line.strip()
+        if not stripped.startswith("✅ done:"):
+            continue
+        candidate = Path(stripped.split("✅ done:", 1)[1].strip())
+        if not candidate.is_absolute():
+            candidate = cwd / candidate
+        if candidate.exists() and candidate.resolve() not in seen:
+            seen.add(candidate.resolve())
+            outputs.append(candidate)
+    return outputs
+
+
+async def run_headless_job(
+    input_path: Path,
+    copies: int,
+    profile: str = "",
+    quality: str = "std",
+    *,
+    cwd: Path = BASE_DIR,
+    on_copy_ready: Optional[CopyReadyCallback] = None,
+    extra_env: Optional[Dict[str, str]] = None,
+) -> HeadlessJobResult:
+    """Тот же путь, что и у бота (run_script_with_logs → QC gate → отчёт), но без отправки в Telegram."""
+    started = time.monotonic()
+    start_ts = time.time()
+    rc, logs_text = await run_script_with_logs(
+        input_path,
+        copies,
+        cwd,
+        profile,
+        quality,
+        on_copy_ready=on_copy_ready,
+        extra_env=extra_env,
+    )
+    tail = "\n".join(logs_text.strip().splitlines()[-_LOG_TAIL_LINES:])
+    result = HeadlessJobResult(rc=rc, log_tail=tail)
+
+    candidates = reported_outputs(logs_text, cwd)
+    if not candidates and rc == 0:
+        candidates = await list_new_mp4s(since_ts=start_ts)
+    candidates = sorted(candidates)[:copies]
+    if not candidates:
+        result.error = f"{ERROR_MAP.get(rc, 'no output produced')} (rc={rc})" if rc else "no output produced"
+        result.elapsed = time.monotonic() - started
+        return result
+
+    qc_result = await enforce_quality_gate(input_path, candidates, copies, profile, quality)
+    result.outputs = list(qc_result.valid_files)
+    result.rejected = {name: item.status for name, item in qc_result.invalid.items()}
+    result.qc = {name: asdict(item) for name, item in qc_result.evaluations.items()}
+    if not result.outputs:
+        result.error = "QC rejected all copies"
+
+    try:
+        report_result = build_uniqueness_report([p.name for p in result.outputs], copies)
+    except Exception:  # noqa: BLE001
+        logger.exception("Failed to build uniqueness report for %s", input_path.name)
+        report_result = None
+    if report_result:
+        result.report, result.summary, _ = report_result
+    result.elapsed = time.monotonic() - started
+    return result
+# END REGION AI
@@ -3,14 +3,18 @@ import logging
 import os
 import random
 import re
-import subprocess
+import signal
 import time
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import List, Optional
+from typing import List, Optional, Sequence, Set
 
-from config import BASE_DIR, ECO_SLEEP, MAX_CONCURRENT_JOBS
+from config import BASE_DIR, ECO_MODE, ECO_SLEEP
+from modules.core.job_context import JobContext
 from modules.executor import fix_final_crop_chain
 from modules.utils.video_tools import build_audio_eq
+from render_queue import acquire_render_slot
+from process_policy import after_spawn, policy_env, preexec_for
 
 logger = logging.getLogger(__name__)
 
@@ -20,10 +24,86 @@ OUTPUT_DIR = PROJECT_DIR / "output"
 _SCRIPT_PATH = (PROJECT_DIR / "process_protective_v1.6.sh").resolve()
 # END REGION AI
 
-_SEMAPHORE = asyncio.Semaphore(MAX_CONCURRENT_JOBS)
+_MAX_ATTEMPTS = 5
+_KILL_GRACE_SECONDS = 5.0
+_SCRUB_TIMEOUT_SECONDS = 120.0
+_DONE_RE = re.compile(r"^✅ done:\s*(?P<path>.+?)\s*$")
+_GENERATED_RE = re.compile(r"Generated copy #\d+")
+_FAILED_RE = re.compile(r"Failed copy #\d+")
+_TEMP_FAIL_MARKERS = (
+    "[WARN] Uniqueness low but accepted",
+    "[Fallback] Copy",
+    "[Retry] Similarity low",
+)
 
 
-def _scrub_metadata(target: Path) -> None:
+# REGION AI: process group control
+async def _terminate_group(proc: asyncio.subprocess.Process) -> None:
+    """SIGTERM всей группе процесса (bash + ffmpeg), затем SIGKILL по таймауту."""
+    if proc.returncode is not None:
+        return
+    for sig in (signal.SIGTERM, signal.SIGKILL):
+        try:
+            os.killpg(proc.pid, sig)
+        except ProcessLookupError:
+            return
+        except PermissionError:
+            proc.kill()
+        try:
+            await asyncio.wait_for(proc.wait(), _KILL_GRACE_SECONDS)
+            return
+        except asyncio.TimeoutError:
+            logger.warning("Process group %s ignored %s", proc.pid, sig.name)
+
+
+async def _run_command(
+    cmd: Sequence[str],
+    *,
+    cwd: Path,
+    env: Optional[dict] = None,
+    timeout: Optional[float] = None,
+    on_line=None,
+    process_class: str = "render",
+) -> tuple[int, List[str]]:
+    """Запускает cmd в отдельной группе процессов и построчно читает объединённый вывод.
+
+    При таймауте или отмене задачи вся группа убивается; CancelledError пробрасывается.
+    """
+    proc = await asyncio.create_subprocess_exec(
+        *cmd,
+        cwd=str(cwd),
+        env=env,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.STDOUT,
+        start_new_session=True,
+        preexec_fn=preexec_for(process_class),
+    )
+    after_spawn(process_class, proc.pid)
+    lines: List[str] = []
+
+    async def _pump() -> int:
+        assert proc.stdout is not None
+        async for raw in proc.stdout:
+            line = raw.decode("utf-8", errors="replace").rstrip("\r\n")
+            lines.append(line)
+            if on_line is not None:
+                on_line(line)
+        return await proc.wait()
+
+    try:
+        rc = await asyncio.wait_for(_pump(), timeout) if timeout else await _pump()
+    except asyncio.TimeoutError:
+        logger.error("⏱ Timeout %.0fs for %s, killing process group", timeout, cmd[0])
+        await _terminate_group(proc)
+        raise
+    except asyncio.CancelledError:
+        await asyncio.shield(_terminate_group(proc))
+        raise
+    return rc, lines
+# END REGION AI
+
+
+async def _scrub_metadata(target: Path) -> None:
     temp_path = target.with_suffix(target.suffix + ".tmp")
     cmd = [
         "ffmpeg",
@@ -48,21 +128,18 @@ def _scrub_metadata(target: Path) -> None:
         str(temp_path),
     ]
     try:
-        proc = subprocess.run(
-            cmd,
-            capture_output=True,
-            text=True,
-            check=False,
-        )
+        rc, lines = await _run_command(cmd, cwd=target.parent, timeout=_SCRUB_TIMEOUT_SECONDS, process_class="qc")
     except FileNotFoundError:
         logger.warning("FFmpeg not found for metadata scrub: %s", target)
         return
+    except asyncio.TimeoutError:
+        rc, lines = -1, ["scrub timed out"]
 
-    if proc.returncode != 0:
+    if rc != 0:
         logger.warning(
             "Metadata scrub failed for %s: %s",
             target,
-            (proc.stderr or proc.stdout or "").strip(),
+            "\n".join(lines[-5:]).strip(),
         )
         if temp_path.exists():
             try:
@@ -85,226 +162,227 @@ def _scrub_metadata(target: Path) -> None:
             logger.debug("Cleanup of temporary metadata file failed: %s", temp_path, exc_info=True)
 
 
-# REGION AI: synchronous protective runner
-def run_protective_process(
+def _sanitize_cmd(cmd: List[str]) -> List[str]:
+    if not cmd or cmd[0] != "ffmpeg":
+        return cmd
+    actual_cmd = list(cmd)
+    for flag in ("-vf", "-filter_complex"):
+        if flag in actual_cmd:
+            idx = actual_cmd.index(flag)
+            if idx + 1 < len(actual_cmd):
+                filter_chain = fix_final_crop_chain(actual_cmd[idx + 1])
+                logger.info(f"[CropSanity] Final chain verified: {filter_chain}")
+                actual_cmd[idx + 1] = filter_chain
+    return actual_cmd
+
+
+def _needs_audio_recovery(return_code: int, log_blob: str) -> bool:
+    if return_code not in {8, 234}:
+        return False
+    return any(marker in log_blob for marker in ("Option not found", "Result too large"))
+
+
+def _fail_result(requested: int, log_tail: str, fatal: bool = False) -> dict:
+    result = {
+        "success_count": 0,
+        "failed_count": requested,
+        "temp_fail": False,
+        "temp_error_count": 0,
+        "log_tail": log_tail,
+        "outputs": [],
+    }
+    if fatal:
+        result["fatal"] = True
+    return result
+
+
+# REGION AI: per-call retry state
+@dataclass
+class _RunState:
+    """Состояние повторов одного вызова: контекст попытки и разбор вывода по ходу."""
+
+    context: JobContext
+    audio_recovery_applied: bool = False
+    attempts: int = 0
+    generated: int = 0
+    failed: int = 0
+    reported: List[Path] = field(default_factory=list)
+    logs: List[str] = field(default_factory=list)
+
+    def feed(self, line: str) -> None:
+        self.logs.append(line)
+        match = _DONE_RE.match(line)
+        if match:
+            path = Path(match.group("path"))
+            self.reported.append(path if path.is_absolute() else PROJECT_DIR / path)
+            logger.info("[Protective] copy ready: %s", path.name)
+        elif _GENERATED_RE.search(line):
+            self.generated += 1
+        elif _FAILED_RE.search(line):
+            self.failed += 1
+# END REGION AI
+
+
+# REGION AI: async protective runner
+async def _invoke(
+    full_path: Path,
+    requested: int,
+    context: JobContext,
+    timeout: Optional[float],
+) -> dict:
+    initial_outputs: Set[Path] = {p.resolve() for p in OUTPUT_DIR.glob("*.mp4")}
+    try:
+        mode = _SCRIPT_PATH.stat().st_mode
+        if not mode & 0o111:
+            _SCRIPT_PATH.chmod(mode | 0o111)
+    except OSError:
+        logger.debug("Failed to ensure executable for %s", _SCRIPT_PATH, exc_info=True)
+    cmd = _sanitize_cmd(["./process_protective_v1.6.sh", str(full_path), str(int(requested))])
+    state = _RunState(context=context.derive())
+    start_ts = time.monotonic()
+    rc = 0
+    last_lines: List[str] = []
+    try:
+        while state.attempts < _MAX_ATTEMPTS:
+            state.attempts += 1
+            try:
+                rc, last_lines = await _run_command(
+                    cmd,
+                    cwd=PROJECT_DIR,
+                    env={**state.context.build_env(os.environ), **policy_env()},
+                    timeout=timeout,
+                    on_line=state.feed,
+                )
+            except FileNotFoundError:
+                logger.error("❌ Unable to execute %s", _SCRIPT_PATH, exc_info=True)
+                return _fail_result(requested, f"Unable to execute {_SCRIPT_PATH}", fatal=True)
+            except asyncio.TimeoutError:
+                return _fail_result(requested, f"Timed out after {timeout:.0f}s", fatal=True)
+            except OSError as exc:
+                logger.error("❌ Failed to spawn process_protective_v1.6.sh: %s", exc)
+                return _fail_result(requested, str(exc), fatal=True)
+
+            combined_log = "\n".join(state.logs)
+            if not state.audio_recovery_applied and _needs_audio_recovery(rc, combined_log):
+                override_chain = build_audio_eq(ffmpeg_log=combined_log)
+                if override_chain.startswith("equalizer="):
+                    state.context.audio_eq_override = override_chain
+                    state.audio_recovery_applied = True
+                    continue
+
+            if rc == -22 and state.context.crop_backoff < 3:
+                state.context.crop_backoff += 1
+                logger.warning("[CropGuard] FFmpeg error -22 detected, retrying with crop backoff=%s", state.context.crop_backoff)
+                continue
+
+            break
+    finally:
+        duration = time.monotonic() - start_ts
+
+    combined = "\n".join(state.logs)
+    # fix: берём пути из «✅ done:», а glob-разницу — только как запасной вариант (параллельные задачи)
+    if state.reported:
+        new_outputs = [str(p.resolve()) for p in dict.fromkeys(state.reported) if p.exists()]
+    else:
+        after_outputs = {p.resolve() for p in OUTPUT_DIR.glob("*.mp4")}
+        new_outputs = [str(path) for path in sorted(after_outputs - initial_outputs)]
+    for item in new_outputs:
+        try:
+            await _scrub_metadata(Path(item))
+        except asyncio.CancelledError:
+            raise
+        except Exception:  # noqa: BLE001
+            logger.debug("Metadata scrub skipped for %s", item, exc_info=True)
+    lines = state.logs
+    tail20 = "\n".join(lines[-20:]) if lines else combined
+    success_count = max(state.generated, len(new_outputs) if state.reported else 0)
+    failed_count = state.failed
+    temp_fail = False
+    fatal = False
+    if rc != 0:
+        tail10 = "\n".join(lines[-10:]) if lines else combined
+        temp_fail = any(marker in tail10 for marker in _TEMP_FAIL_MARKERS)
+        if temp_fail:
+            logger.warning("⚠️ Зафиксирована временная ошибка (rc=%s).", rc)
+        else:
+            fatal = True
+            logger.error(
+                "⚠️ Скрипт завершился с кодом %s: %s",
+                rc,
+                "\n".join(last_lines[-10:]).strip() or "no output",
+            )
+    else:
+        logger.info("✅ Скрипт успешно завершён: %s (%.2fs, attempts=%s)", full_path, duration, state.attempts)
+        logger.info("📂 Готовые файлы доступны в %s", OUTPUT_DIR)
+        logger.info("[CleanMeta] udta and directory metadata wiped")
+        if any(marker in combined for marker in _TEMP_FAIL_MARKERS):
+            temp_fail = True
+            logger.warning(
+                "⚠️ Зафиксирована временная ошибка: обнаружены предупреждения об уникальности."
+            )
+    if not tail20.strip():
+        tail20 = f"Process exited with code {rc}"
+    remaining_failed = max(0, requested - success_count)
+    return {
+        "success_count": success_count,
+        "failed_count": failed_count or remaining_failed,
+        "temp_fail": temp_fail,
+        "temp_error_count": remaining_failed if temp_fail else 0,
+        "log_tail": tail20,
+        "fatal": fatal,
+        "outputs": new_outputs,
+    }
+
+
+async def run_protective_process_async(
     filename: str,
     copies: int,
     profile: str = "",
     quality: str = "",
+    context: Optional[JobContext] = None,
+    *,
+    timeout: Optional[float] = None,
+    priority: int = 1,
 ) -> dict:
+    """Асинхронный запуск protective-скрипта с потоковым разбором вывода.
+
+    Слот берётся у общего планировщика рендера (render_queue), а не у
+    модульного семафора; timeout и отмена задачи убивают всю группу процессов.
+    """
     if copies < 1:
         raise ValueError("copies must be >= 1")
     full_path = (BASE_DIR / filename).resolve()
     if not full_path.exists():
         logger.error("❌ Файл не найден: %s", full_path)
-        return {
-            "success_count": 0,
-            "failed_count": copies,
-            "temp_fail": False,
-            "temp_error_count": 0,
-            "log_tail": f"File not found: {full_path}",
-            "outputs": [],
-        }
+        return _fail_result(copies, f"File not found: {full_path}")
     if not _SCRIPT_PATH.exists():
         logger.error("❌ Script not found: %s", _SCRIPT_PATH)
-        return {
-            "success_count": 0,
-            "failed_count": copies,
-            "temp_fail": False,
-            "temp_error_count": 0,
-            "log_tail": f"Script not found: {_SCRIPT_PATH}",
-            "outputs": [],
-        }
-
-    
-    def _invoke(requested: int) -> dict:
-        initial_outputs = {p.resolve() for p in OUTPUT_DIR.glob("*.mp4")}
-        try:
-            mode = _SCRIPT_PATH.stat().st_mode
-            if not mode & 0o111:
-                _SCRIPT_PATH.chmod(mode | 0o111)
-        except OSError:
-            logger.debug("Failed to ensure executable for %s", _SCRIPT_PATH, exc_info=True)
-        cmd = ["./process_protective_v1.6.sh", str(full_path), str(int(requested))]
-        start_ts = time.monotonic()
-
-        def _needs_audio_recovery(return_code: int, log_blob: str) -> bool:
-            if return_code not in {8, 234}:
-                return False
-            return any(marker in log_blob for marker in ("Option not found", "Result too large"))
-
-        def _run_process(env: Optional[dict] = None) -> subprocess.CompletedProcess[str]:
-            actual_cmd = cmd
-            if isinstance(cmd, str) and "ffmpeg" in cmd:
-                match = re.search(r"-(?:vf|filter_complex)\s+(['\"])(.+?)\1", cmd)
-                if match:
-                    filter_chain = fix_final_crop_chain(match.group(2))
-                    logger.info(f"[CropSanity] Final chain verified: {filter_chain}")
-                    actual_cmd = f"{cmd[:match.start(2)]}{filter_chain}{cmd[match.end(2):]}"
-            elif isinstance(cmd, (list, tuple)) and cmd and cmd[0] == "ffmpeg":
-                actual_cmd = list(cmd)
-                for flag in ("-vf", "-filter_complex"):
-                    if flag in actual_cmd:
-                        idx = actual_cmd.index(flag)
-                        if idx + 1 < len(actual_cmd):
-                            filter_chain = fix_final_crop_chain(actual_cmd[idx + 1])
-                            logger.info(f"[CropSanity] Final chain verified: {filter_chain}")
-                            actual_cmd[idx + 1] = filter_chain
-            return subprocess.run(
-                actual_cmd,
-                cwd=str(PROJECT_DIR),
-                capture_output=True,
-                text=True,
-                check=False,
-                env=env,
-            )
-
-        attempt_outputs = []
-        recovery_env = None
-        audio_recovery_applied = False
-        crop_backoff_depth = 0
-        proc: subprocess.CompletedProcess[str]
-        try:
-            for attempt in range(1, 6):
-                try:
-                    proc = _run_process(recovery_env)
-                except FileNotFoundError:
-                    logger.error("❌ Unable to execute %s", _SCRIPT_PATH, exc_info=True)
-                    return {
-                        "success_count": 0,
-                        "failed_count": requested,
-                        "temp_fail": False,
-                        "temp_error_count": 0,
-                        "log_tail": f"Unable to execute {_SCRIPT_PATH}",
-                        "fatal": True,
-                        "outputs": [],
-                    }
-                except OSError as exc:
-                    logger.error("❌ Failed to spawn process_protective_v1.6.sh: %s", exc)
-                    return {
-                        "success_count": 0,
-                        "failed_count": requested,
-                        "temp_fail": False,
-                        "temp_error_count": 0,
-                        "log_tail": str(exc),
-                        "fatal": True,
-                        "outputs": [],
-                    }
-
-                stdout = proc.stdout or ""
-                stderr = proc.stderr or ""
-                attempt_outputs.append((stdout, stderr))
-                combined_log = "\n".join(
-                    part
-                    for out_stdout, out_stderr in attempt_outputs
-                    for part in (out_stdout, out_stderr)
-                    if part
-                )
-                if not audio_recovery_applied and _needs_audio_recovery(proc.returncode, combined_log):
-                    override_chain = build_audio_eq(ffmpeg_log=combined_log)
-                    if override_chain.startswith("equalizer="):
-                        if recovery_env is None:
-                            recovery_env = os.environ.copy()
-                        recovery_env["UNICLON_AUDIO_EQ_OVERRIDE"] = override_chain
-                        audio_recovery_applied = True
-                        continue
-
-                if proc.returncode == -22 and crop_backoff_depth < 3:
-                    crop_backoff_depth += 1
-                    if recovery_env is None:
-                        recovery_env = os.environ.copy()
-                    recovery_env["UNICLON_CROP_BACKOFF"] = str(crop_backoff_depth)
-                    logger.warning("[CropGuard] FFmpeg error -22 detected, retrying with crop backoff=%s", crop_backoff_depth)
-                    continue
+        return _fail_result(copies, f"Script not found: {_SCRIPT_PATH}")
 
+    job_context = context if context is not None else JobContext(profile=profile, quality=quality)
+    if ECO_MODE:
+        await asyncio.sleep(random.uniform(*ECO_SLEEP))
+    release = await acquire_render_slot(full_path.name, copies, priority)
+    try:
+        total_success = 0
+        total_temp_errors = 0
+        fatal_error = False
+        log_tail_parts = []
+        collected_outputs: List[str] = []
+        while total_success < copies and not fatal_error:
+            requested = copies - total_success
+            result = await _invoke(full_path, requested, job_context, timeout)
+            total_success += result["success_count"]
+            total_temp_errors += result.get("temp_error_count", 0)
+            fatal_error = result.get("fatal", False)
+            log_tail_parts.append(result.get("log_tail", ""))
+            collected_outputs.extend(result.get("outputs", []))
+            if not result.get("temp_fail"):
                 break
-        finally:
-            duration = time.monotonic() - start_ts
-
-        stdout, stderr = attempt_outputs[-1] if attempt_outputs else ("", "")
-        combined = "\n".join(
-            part
-            for out_stdout, out_stderr in attempt_outputs
-            for part in (out_stdout, out_stderr)
-            if part
-        )
-        after_outputs = {p.resolve() for p in OUTPUT_DIR.glob("*.mp4")}
-        new_outputs: List[str] = [
-            str(path)
-            for path in sorted(after_outputs - initial_outputs)
-        ]
-        for item in new_outputs:
-            try:
-                _scrub_metadata(Path(item))
-            except Exception:  # noqa: BLE001
-                logger.debug("Metadata scrub skipped for %s", item, exc_info=True)
-        lines = combined.splitlines()
-        tail20 = "\n".join(lines[-20:]) if lines else combined
-        success_count = len(re.findall(r"Generated copy #\\d+", combined))
-        failed_count = len(re.findall(r"Failed copy #\\d+", combined))
-        temp_fail = False
-        fatal = False
-        rc = proc.returncode
-        markers = (
-            "[WARN] Uniqueness low but accepted",
-            "[Fallback] Copy",
-            "[Retry] Similarity low",
-        )
-        if rc != 0:
-            tail10 = "\n".join(lines[-10:]) if lines else combined
-            temp_fail = any(marker in tail10 for marker in markers)
-            if temp_fail:
-                logger.warning("⚠️ Зафиксирована временная ошибка (rc=%s).", rc)
-            else:
-                fatal = True
-                logger.error(
-                    "⚠️ Скрипт завершился с кодом %s: %s",
-                    rc,
-                    (stderr or stdout).strip() or "no output",
-                )
-        else:
-            if stdout:
-                logger.info("process_protective stdout:\n%s", stdout.rstrip())
-            if stderr:
-                logger.warning("process_protective stderr:\n%s", stderr.rstrip())
-            logger.info("✅ Скрипт успешно завершён: %s (%.2fs)", full_path, duration)
-            logger.info("📂 Готовые файлы доступны в %s", OUTPUT_DIR)
-            logger.info("[CleanMeta] udta and directory metadata wiped")
-            if any(marker in combined for marker in markers):
-                temp_fail = True
-                logger.warning(
-                    "⚠️ Зафиксирована временная ошибка: обнаружены предупреждения об уникальности."
-                )
-        if not tail20.strip():
-            tail20 = (stderr or stdout).strip() or f"Process exited with code {rc}"
-        remaining_failed = max(0, requested - success_count)
-        return {
-            "success_count": success_count,
-            "failed_count": failed_count or remaining_failed,
-            "temp_fail": temp_fail,
-            "temp_error_count": remaining_failed if temp_fail else 0,
-            "log_tail": tail20,
-            "fatal": fatal,
-            "outputs": new_outputs,
-        }
-
-    total_success = 0
-    total_temp_errors = 0
-    fatal_error = False
-    log_tail_parts = []
-    collected_outputs: List[str] = []
-    while total_success < copies and not fatal_error:
-        requested = copies - total_success
-        result = _invoke(requested)
-        total_success += result["success_count"]
-        total_temp_errors += result.get("temp_error_count", 0)
-        fatal_error = result.get("fatal", False)
-        log_tail_parts.append(result.get("log_tail", ""))
-        collected_outputs.extend(result.get("outputs", []))
-        if not result.get("temp_fail"):
-            break
-        if result["success_count"] == 0:
-            break
+            if result["success_count"] == 0:
+                break
+    finally:
+        release()
 
     failed_total = max(0, copies - total_success)
     final_tail = "\n---\n".join([tail for tail in log_tail_parts if tail])
@@ -317,21 +395,15 @@ def run_protective_process(
         "log_tail": final_tail,
         "outputs": collected_outputs,
     }
-# END REGION AI
 
 
-async def run_protective_process_async(
+def run_protective_process(
     filename: str,
     copies: int,
     profile: str = "",
     quality: str = "",
+    context: Optional[JobContext] = None,
 ) -> dict:
-    async with _SEMAPHORE:
-        await asyncio.sleep(random.uniform(*ECO_SLEEP))
-        return await asyncio.to_thread(
-            run_protective_process,
-            filename,
-            copies,
-            profile,
-            quality,
-        )
+    """Синхронная обёртка для вызова вне event loop (скрипты, потоки)."""
+    return asyncio.run(run_protective_process_async(filename, copies, profile, quality, context))
+# END REGION AI
@@ -0,0 +1,173 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+# REGION AI: imports
+from config import QUEUE_PER_USER_LIMIT, QUEUE_WORKERS
+# END REGION AI
+
+
+@dataclass
+class TaskInfo:
+    task_id: int
+    label: str
+    status: str
+    created_at: float
+    started_at: Optional[float] = None
+    profile: Optional[str] = None
+    copies: Optional[int] = None
+    save_preview: Optional[bool] = None
+    quality: Optional[str] = None
+
+
+class UserTaskQueue:
+    """Очередь задач: общий пул воркеров, лимит на пользователя и round-robin между пользователями."""
+
+    def __init__(self, per_user_limit: int = QUEUE_PER_USER_LIMIT, max_workers: int = QUEUE_WORKERS) -> None:
+        self._per_user_limit = max(1, per_user_limit)
+        self._max_workers = max(1, max_workers)
+        self._pending: Dict[int, Deque[Tuple[int, Callable[[], Awaitable[None]]]]] = {}
+        self._active: Dict[int, int] = {}
+        self._rotation: Deque[int] = deque()
+        self._workers: List[asyncio.Task[None]] = []
+        self._tasks: Dict[int, List[TaskInfo]] = {}
+        self._cond = asyncio.Condition()
+        self._closed = False
+        self._task_counter = 0
+
+    async def enqueue(
+        self,
+        user_id: int,
+        task_factory: Callable[[], Awaitable[None]],
+        label: str,
+        *,
+        profile: Optional[str] = None,
+        copies: Optional[int] = None,
+        save_preview: Optional[bool] = None,
+        quality: Optional[str] = None,
+    ) -> int:
+        """Ставит задачу и сразу возвращает её позицию в общей очереди (1 — следующая)."""
+        if self._closed:
+            raise RuntimeError("Task queue is shutting down")
+        async with self._cond:
+            self._task_counter += 1
+            task_id = self._task_counter
+            self._tasks.setdefault(user_id, []).append(
+                TaskInfo(
+                    task_id=task_id,
+                    label=label,
+                    status="pending",
+                    created_at=time.time(),
+                    profile=profile,
+                    copies=copies,
+                    save_preview=save_preview,
+                    quality=quality,
+                )
+            )
+            self._pending.setdefault(user_id, deque()).append((task_id, task_factory))
+            if user_id not in self._rotation:
+                self._rotation.append(user_id)
+            self._workers = [worker for worker in self._workers if not worker.done()]
+            while len(self._workers) < self._max_workers:
+                self._workers.append(asyncio.create_task(self._worker()))
+            position = self._position_locked(user_id, task_id)
+            self._cond.notify_all()
+        return position
+
+    def _position_locked(self, user_id: int, task_id: int) -> int:
+        """Позиция задачи при обходе пользователей по кругу (лимиты не учитываются)."""
+        queues = {uid: [tid for tid, _ in self._pending.get(uid, ())] for uid in self._rotation}
+        position = 0
+        while any(queues.values()):
+            for uid in self._rotation:
+                if not queues.get(uid):
+                    continue
+                position += 1
+                if uid == user_id and queues[uid][0] == task_id:
+                    return position
+                queues[uid].pop(0)
+        return 0
+
+    async def get_position(self, user_id: int, task_id: int) -> int:
+        async with self._cond:
+            return self._position_locked(user_id, task_id)
+
+    def _next_job_locked(self) -> Optional[Tuple[int, int, Callable[[], Awaitable[None]]]]:
+        for _ in range(len(self._rotation)):
+            uid = self._rotation.popleft()
+            pending = self._pending.get(uid)
+            if not pending:
+                self._pending.pop(uid, None)
+                continue
+            if self._active.get(uid, 0) >= self._per_user_limit:
+                self._rotation.append(uid)
+                continue
+            task_id, factory = pending.popleft()
+            self._active[uid] = self._active.get(uid, 0) + 1
+            if pending:
+                self._rotation.append(uid)
+            else:
+                self._pending.pop(uid, None)
+            return uid, task_id, factory
+        return None
+
+    async def close(self) -> None:
+        self._closed = True
+        async with self._cond:
+            self._cond.notify_all()
+            workers = list(self._workers)
+        if workers:
+            await asyncio.gather(*workers, return_exceptions=True)
+        self._tasks.clear()
+
+    async def _worker(self) -> None:
+        while True:
+            async with self._cond:
+                while True:
+                    job = self._next_job_locked()
+                    if job is not None:
+                        break
+                    if self._closed and not self._pending:
+                        return
+                    await self._cond.wait()
+                user_id, task_id, task_factory = job
+                task_info: Optional[TaskInfo] = None
+                for info in self._tasks.get(user_id, []):
+                    if info.task_id == task_id:
+                        info.status = "active"
+                        info.started_at = time.time()
+                        task_info = info
+                        break
+            if task_info:
+                # REGION AI: worker logging
+                logging.info(
+                    "🚀 Исполнение: user=%s | video=%s | copies=%s | profile=%s | q=%s",
+                    user_id,
+                    task_info.label,
+                    task_info.copies if task_info.copies is not None else "-",
+                    task_info.profile or "-",
+                    task_info.quality or "-",
+                )
+                # END REGION AI
+            try:
+                await task_factory()
+            except Exception:  # noqa: BLE001
+                logging.exception("Queued task for user %s failed", user_id)
+            finally:
+                async with self._cond:
+                    self._active[user_id] = max(0, self._active.get(user_id, 1) - 1)
+                    if not self._active[user_id]:
+                        self._active.pop(user_id, None)
+                    remaining = [info for info in self._tasks.get(user_id, []) if info.task_id != task_id]
+                    if remaining:
+                        self._tasks[user_id] = remaining
+                    else:
+                        self._tasks.pop(user_id, None)
+                    self._cond.notify_all()
+
+    async def get_user_tasks(self, user_id: int) -> List[TaskInfo]:
+        async with self._cond:
+            return list(self._tasks.get(user_id, []))
@@ -0,0 +1,7 @@
+import sys
+from pathlib import Path
+
+# тесты импортируют модули проекта из корня репозитория (pytest -q из tests/check_all.sh)
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
@@ -0,0 +1,76 @@
+import pytest
+
+from modules.core.audio_graph import audio_chain_cost, optimize_audio
+from modules.core.filter_graph import FilterChain
+
+
+def _optimized(chain, sample_rate=44100, **kwargs):
+    result, report = optimize_audio(FilterChain.parse(chain, "audio"), sample_rate, **kwargs)
+    return result.serialize(), report
+
+
+@pytest.mark.parametrize(
+    "chain, expected",
+    [
+        ("aresample=44100,volume=0.9", "volume=0.9"),
+        ("aresample=48000,aresample=44100", "anull"),
+        ("aresample=48000,aresample=32000", "aresample=32000"),
+        ("asetrate=44100*1.02,asetrate=48000", "asetrate=48000"),
+        ("asetrate=44100*1.02,asetrate=44100", "anull"),
+    ],
+)
+def test_rate_chains_collapse(chain, expected):
+    assert _optimized(chain)[0] == expected
+
+
+def test_pitch_shift_around_resample_collapses_to_one_rate_change():
+    out, report = _optimized("asetrate=48000,aresample=44100,asetrate=46000")
+    # 48000·46000/44100 — один сдвиг высоты, на выходе та же частота 46000
+    assert out == "asetrate=50068.027211,aresample=46000"
+    assert "collapsed asetrate/aresample/asetrate into one rate change" in report.changes
+
+
+def test_unknown_input_rate_keeps_leading_resample():
+    result, _ = optimize_audio(FilterChain.parse("aresample=44100", "audio"), None)
+    assert result.serialize() == "aresample=44100"
+
+
+@pytest.mark.parametrize(
+    "chain, expected",
+    [
+        ("atempo=1.1,atempo=1.2", "atempo=1.32"),
+        ("atempo=1.0,volume=0.8", "volume=0.8"),
+        ("atempo=3.0", "atempo=2.0,atempo=1.5"),
+        ("atempo=0.2", "atempo=0.5,atempo=0.5,atempo=0.8"),
+    ],
+)
+def test_tempo_merges_and_splits_into_valid_steps(chain, expected):
+    assert _optimized(chain)[0] == expected
+
+
+def test_soxr_precision_lowered_for_lossy_output():
+    chain = "aresample=48000:resampler=soxr:precision=28"
+    out, report = _optimized(chain)
+    assert out == "aresample=48000:resampler=soxr:precision=20"
+    assert "soxr precision 28→20 (AAC output)" in report.changes
+    assert report.cost_after < report.cost_before
+    assert _optimized(chain, lossy_output=False)[0] == chain
+
+
+def test_sparse_superequalizer_becomes_equalizers():
+    out, report = _optimized("superequalizer=1b=1:5b=2:12b=0.5")
+    assert out == "equalizer=f=262:t=o:w=1:g=6.02,equalizer=f=2960:t=o:w=1:g=-6.02"
+    assert "superequalizer → 2 equalizer band(s)" in report.changes
+    assert audio_chain_cost(FilterChain.parse(out, "audio"), 44100) < report.cost_before
+
+
+def test_flat_superequalizer_is_dropped_and_dense_one_kept():
+    assert _optimized("superequalizer=1b=1:2b=1,volume=0.9")[0] == "volume=0.9"
+    dense = ":".join(f"{band}b=1.5" for band in range(1, 19))
+    assert _optimized(f"superequalizer={dense}")[0] == f"superequalizer={dense}"
+
+
+def test_out_of_range_superequalizer_band_is_clamped():
+    out, report = _optimized("superequalizer=1b=25:2b=1")
+    assert "clamped superequalizer bands to 0–20" in report.changes
+    assert out == "equalizer=f=65:t=o:w=1:g=26.02"
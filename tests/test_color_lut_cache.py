@@ -0,0 +1,67 @@
+import os
+import time
+
+import pytest
+
+from modules.core.color_pipeline import fuse_color_filters, prune_lut_cache
+from modules.core.filter_graph import FilterChain, StreamState, chain_cost, optimize_text
+
+START = StreamState(1080, 1920, 30.0)
+
+
+def _cube(path, age_seconds, size=1000):
+    path.write_bytes(b"0" * size)
+    stamp = time.time() - age_seconds
+    os.utime(path, (stamp, stamp))
+    return path
+
+
+def test_prune_drops_expired_then_oldest_over_limit(tmp_path):
+    expired = _cube(tmp_path / "color_old.cube", 3 * 86400)
+    older = _cube(tmp_path / "color_a.cube", 7200)
+    newer = _cube(tmp_path / "color_b.cube", 3600)
+    in_use = _cube(tmp_path / "color_c.cube", 10)
+    other = _cube(tmp_path / "grain.bin", 3 * 86400)
+
+    assert prune_lut_cache(tmp_path, ttl_minutes=1440, max_bytes=1e9) == 1
+    assert not expired.exists() and other.exists()
+
+    assert prune_lut_cache(tmp_path, ttl_minutes=1440, max_bytes=1500) == 2
+    assert not older.exists() and not newer.exists()
+    # свежий LUT остаётся даже сверх потолка
+    assert in_use.exists()
+
+
+def test_cost_model_charges_rgb_conversion_for_lut3d():
+    start = StreamState(1080, 1920, 30.0)
+    yuv_only = chain_cost(FilterChain.parse("eq=contrast=1.05,hue=h=5"), start)
+    lut = chain_cost(FilterChain.parse("lut3d=file=x.cube"), start)
+    lut_then_yuv = chain_cost(FilterChain.parse("lut3d=file=x.cube,hflip,vignette"), start)
+    assert lut > yuv_only
+    # hflip не требует конвертации, vignette — требует обратной в yuv
+    assert lut_then_yuv == pytest.approx(
+        chain_cost(FilterChain.parse("lut3d=file=x.cube,hflip"), start) + chain_cost(FilterChain.parse("vignette"), start)
+    )
+
+
+def test_rejected_fusion_bakes_no_cube(tmp_path):
+    chain = "eq=contrast=1.05,hue=h=5"
+    optimized, report = optimize_text(chain, start=START, color_lut_dir=str(tmp_path))
+    assert optimized == chain
+    assert any(change.startswith("kept color filters unfused") for change in report.changes)
+    assert not list(tmp_path.glob("*.cube"))
+
+
+def test_accepted_fusion_bakes_one_cube(tmp_path):
+    chain = "curves=preset=vintage,colorbalance=rs=0.1,colorchannelmixer=rr=0.9"
+    optimized, report = optimize_text(chain, start=START, color_lut_dir=str(tmp_path), color_lut_size=9)
+    cubes = list(tmp_path.glob("color_*.cube"))
+    assert len(cubes) == 1 and cubes[0].name in optimized
+    assert optimized.startswith("lut3d=") and report.cost_after < report.cost_before
+
+
+@pytest.mark.parametrize("barrier", ["unsharp=3:3:1.5", "gblur=sigma=1"])
+def test_sharpen_and_blur_stop_color_fusion(tmp_path, barrier):
+    chain = FilterChain.parse(f"curves=preset=vintage,{barrier},colorbalance=rs=0.1")
+    fused, notes = fuse_color_filters(chain, tmp_path, bake=False)
+    assert notes == [] and fused.serialize() == chain.serialize()
@@ -0,0 +1,67 @@
+import asyncio
+import hashlib
+import os
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+import downloader
+
+PAYLOAD = os.urandom(256 * 1024)
+
+
+def _serve(tmp_path, scenario):
+    async def handler(request):
+        return web.Response(body=PAYLOAD)
+
+    async def main():
+        app = web.Application()
+        app.router.add_get("/file", handler)
+        async with TestServer(app) as server:
+            await scenario(str(server.make_url("/file")), tmp_path / "clip.mp4")
+
+    asyncio.run(main())
+
+
+def test_stream_download_hashes_and_renames(tmp_path):
+    async def scenario(url, dest):
+        result = await downloader._stream_to_file(url, dest)
+        assert dest.read_bytes() == PAYLOAD
+        assert result.digest == hashlib.blake2b(PAYLOAD, digest_size=32).hexdigest()
+        assert not (tmp_path / "clip.mp4.part").exists()
+
+    _serve(tmp_path, scenario)
+
+
+def _broken_replace(src, dst):
+    raise OSError("disk full")
+
+
+def test_failed_rename_removes_partial(tmp_path, monkeypatch):
+    monkeypatch.setattr(downloader.os, "replace", _broken_replace)
+
+    async def scenario(url, dest):
+        with pytest.raises(OSError):
+            await downloader._stream_to_file(url, dest)
+        assert not (tmp_path / "clip.mp4.part").exists()
+
+    _serve(tmp_path, scenario)
+
+
+def test_failed_local_copy_removes_partial(tmp_path, monkeypatch):
+    src = tmp_path / "src.mp4"
+    src.write_bytes(PAYLOAD)
+    monkeypatch.setattr(downloader.os, "replace", _broken_replace)
+    with pytest.raises(OSError):
+        downloader._copy_hashed(src, tmp_path / "copy.mp4")
+    assert not (tmp_path / "copy.mp4.part").exists()
+
+
+def test_zero_copy_ingest_does_not_read_source(tmp_path, monkeypatch):
+    src = tmp_path / "src.mp4"
+    src.write_bytes(PAYLOAD)
+    monkeypatch.setattr(downloader, "LOCAL_INGEST_MODE", "auto")
+    result = downloader._ingest_local_sync(src, tmp_path / "job.mp4")
+    assert (result.method, result.digest, result.size) == ("hardlink", None, len(PAYLOAD))
+    assert os.path.samefile(result.path, src)
@@ -0,0 +1,102 @@
+import shlex
+
+import pytest
+
+from modules.core.filter_graph import FilterChain, StreamState, main, optimize, prepare_graphs
+
+START = StreamState(1080, 1920, 30.0)
+
+
+def _optimized(chain, kind="video"):
+    result, report = optimize(FilterChain.parse(chain, kind), START)
+    return result.serialize(), report
+
+
+@pytest.mark.parametrize(
+    "chain",
+    [
+        "fps=30,setpts=1.020000*PTS,scale=w=-2:h=1920:flags=lanczos,setsar=1",
+        "crop='iw-10:ih-10:5:5',eq=contrast=1.02:brightness=0.01",
+        "drawtext=text='a\\,b':x=10:y=10,unsharp=3:3:1.5",
+        "[0:v]scale=720:-2[v];[v]null",
+    ],
+)
+def test_parse_serialize_round_trip(chain):
+    assert FilterChain.parse(chain).serialize() == chain
+
+
+def test_quoted_crop_args_are_parsed():
+    crop = FilterChain.parse("crop='w=iw-10:h=ih-10'").filters[0]
+    assert (crop.get("w"), crop.get("h")) == ("iw-10", "ih-10")
+
+
+def test_labelled_graph_is_left_as_is():
+    chain = "[0:v]scale=720:-2[v];[v]null"
+    assert not FilterChain.parse(chain).is_linear
+    assert _optimized(chain)[0] == chain
+
+
+@pytest.mark.parametrize(
+    "chain, expected, kind",
+    [
+        ("eq=contrast=1:brightness=0,scale=720:-2", "scale=720:-2", "video"),
+        ("setpts=1.0*PTS,null,hflip", "hflip", "video"),
+        ("atempo=1.0,anull,volume=1.0", "anull", "audio"),
+    ],
+)
+def test_noops_are_dropped(chain, expected, kind):
+    assert _optimized(chain, kind)[0] == expected
+
+
+def test_adjacent_eq_and_hue_merge():
+    out, report = _optimized("eq=contrast=1.1:brightness=0.02,eq=contrast=1.2,hue=h=5,hue=h=-2:s=1.1")
+    assert out == "eq=brightness=0.0240:contrast=1.3200:saturation=1.0000,hue=h=3.0000:s=1.1000"
+    assert "merged eq+eq" in report.changes and "merged hue+hue" in report.changes
+
+
+def test_flips_cancel_and_format_dedupes():
+    out, _ = _optimized("format=yuv420p,hflip,hflip,unsharp=3:3:1,format=yuv420p")
+    assert out == "unsharp=3:3:1,format=yuv420p"
+
+
+def test_crop_and_downscale_move_before_pointwise():
+    out, report = _optimized("eq=contrast=1.1,curves=preset=vintage,crop=1000:1800,scale=720:-2")
+    assert out.split(",")[:2] == ["crop=1000:1800", "scale=720:-2"]
+    assert report.cost_after < report.cost_before
+
+
+def test_chained_fps_collapse_to_lowest_rate_first():
+    out, report = _optimized("fps=30,scale=720:-2,eq=contrast=1.05,fps=24")
+    assert out == "fps=24,scale=720:-2,eq=contrast=1.05"
+    assert "merged fps+fps" in report.changes
+
+
+def test_fps_does_not_move_past_frame_dependent_crop():
+    chain = "crop=w=iw-10:h=ih-10:x='5+sin(t)':y=0,fps=24"
+    assert _optimized(chain)[0] == chain
+
+
+@pytest.mark.parametrize("chain", ["fps=24,fps=30", "fps=30,setpts=1.02*PTS,fps=24"])
+def test_fps_raise_or_retimed_fps_is_not_merged(chain):
+    assert _optimized(chain)[0] == chain
+
+
+def test_prepare_graphs_optimizes_both_chains_and_checks_segments():
+    prepared = prepare_graphs("fps=30,eq=contrast=1:brightness=0,fps=24,setpts=1.02*PTS", "atempo=1.0,volume=0.9", START)
+    assert prepared.vf == "fps=24,setpts=1.02*PTS"
+    assert prepared.af == "volume=0.9"
+    assert prepared.segment_stretch == pytest.approx(1.02)
+    assert prepared.vf_grain == ""
+
+
+def test_prepare_graphs_marks_temporal_chain_unsafe():
+    prepared = prepare_graphs("fps=30,noise=alls=5:allf=t", start=START, optimize_chains=False)
+    assert prepared.vf == "fps=30,noise=alls=5:allf=t"
+    assert prepared.segment_stretch is None
+    assert any("segment mode unsafe" in note for note in prepared.notes)
+
+
+def test_prepare_cli_prints_shell_assignments(capsys):
+    assert main(["prepare", "--vf", "fps=30,fps=24,setpts=1.02*PTS", "--af", "anull", "--size", "1080x1920"]) == 0
+    fields = dict(shlex.split(line)[0].split("=", 1) for line in capsys.readouterr().out.splitlines())
+    assert fields == {"GRAPH_VF": "fps=24,setpts=1.02*PTS", "GRAPH_VF_GRAIN": "", "GRAPH_AF": "anull", "GRAPH_SEGMENT_STRETCH": "1.020000"}
@@ -0,0 +1,33 @@
+import pytest
+
+from modules.core.filter_graph import FilterChain, StreamState, prepare_graphs
+from modules.core.grain import plan_grain
+
+START = StreamState(64, 64, 30.0)
+
+
+def _plan(chain, strength, tmp_path):
+    return plan_grain(FilterChain.parse(chain), seed="abc", strength=strength, cache_dir=tmp_path, start=START, plates=1)
+
+
+def test_chain_without_noise_gets_no_plate(tmp_path):
+    chain, plan = _plan("fps=30,eq=contrast=1.05", 2, tmp_path)
+    assert plan is None and chain.serialize() == "fps=30,eq=contrast=1.05"
+    assert not list(tmp_path.iterdir())
+
+
+@pytest.mark.parametrize("strength, expected", [(0, 1.0), (2, 2.0), (4, 4.0)])
+def test_planned_strength_overrides_weaker_chain_noise(tmp_path, strength, expected):
+    chain, plan = _plan("fps=30,noise=alls=1:allf=t", strength, tmp_path)
+    assert chain.serialize() == "fps=30"
+    assert plan.strength == expected and plan.plate.exists()
+
+
+def test_prepare_graphs_builds_grain_graph_from_noise_chain(tmp_path):
+    prepared = prepare_graphs(
+        "fps=30,noise=alls=2:allf=t", start=START, optimize_chains=False,
+        grain_cache_dir=str(tmp_path), grain_seed="abc", grain_strength=2, grain_plates=1,
+    )
+    assert prepared.vf == "fps=30,noise=alls=2:allf=t"
+    assert prepared.vf_grain.startswith("fps=30[uc_main];movie=filename=")
+    assert "all_opacity=0.0833" in prepared.vf_grain
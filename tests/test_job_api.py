@@ -0,0 +1,90 @@
+import asyncio
+import json
+
+from aiohttp.test_utils import TestClient, TestServer
+
+from job_api import create_app
+from services.job_runner import HeadlessJobResult
+from task_queue import UserTaskQueue
+
+
+def _fake_runner(out_dir):
+    async def runner(source, copies, profile, quality, on_copy_ready=None):
+        outputs = []
+        for index in range(1, copies + 1):
+            path = out_dir / f"copy_{index}.mp4"
+            path.write_bytes(f"{source.name}:{index}".encode("utf-8"))
+            outputs.append(path)
+            if on_copy_ready is not None:
+                on_copy_ready(index, path)
+        return HeadlessJobResult(rc=0, outputs=outputs, summary=f"{copies} copies")
+
+    return runner
+
+
+def _run(tmp_path, scenario, token=""):
+    src_dir, upload_dir, out_dir = (tmp_path / name for name in ("src", "upload", "out"))
+    for folder in (src_dir, upload_dir, out_dir):
+        folder.mkdir()
+    (src_dir / "clip.mp4").write_bytes(b"video")
+
+    async def main():
+        queue = UserTaskQueue(per_user_limit=1, max_workers=1)
+        app = create_app(queue, _fake_runner(out_dir), token=token, upload_dir=upload_dir, path_roots=[src_dir])
+        async with TestClient(TestServer(app)) as client:
+            await scenario(client, src_dir, upload_dir)
+        await queue.close()
+
+    asyncio.run(main())
+
+
+def test_job_lifecycle_streams_events_and_outputs(tmp_path):
+    async def scenario(client, src_dir, upload_dir):
+        resp = await client.post("/jobs", json={"path": str(src_dir / "clip.mp4"), "copies": 2, "profile": "TikTok"})
+        assert resp.status == 202
+        job = await resp.json()
+        assert (job["status"], job["copies"], job["profile"]) == ("pending", 2, "tiktok")
+
+        stream = await client.get(f"/jobs/{job['job_id']}/events")
+        events = [json.loads(line) for line in (await stream.text()).splitlines()]
+        assert [event["event"] for event in events] == ["queued", "started", "copy_ready", "copy_ready", "done"]
+        assert [event["seq"] for event in events] == [1, 2, 3, 4, 5]
+
+        status = await (await client.get(f"/jobs/{job['job_id']}")).json()
+        assert status["status"] == "done"
+        assert status["outputs"] == ["copy_1.mp4", "copy_2.mp4"]
+        assert status["ready"] == ["copy_1.mp4", "copy_2.mp4"]
+
+        output = await client.get(f"/jobs/{job['job_id']}/outputs/copy_2.mp4")
+        assert output.status == 200
+        assert (await output.read()).endswith(b":2")
+        # входная копия в upload_dir удаляется, исходник клиента остаётся
+        assert list(upload_dir.iterdir()) == []
+        assert (src_dir / "clip.mp4").exists()
+
+    _run(tmp_path, scenario)
+
+
+def test_rejects_bad_requests(tmp_path):
+    async def scenario(client, src_dir, upload_dir):
+        outside = tmp_path / "outside.mp4"
+        outside.write_bytes(b"x")
+        assert (await client.post("/jobs", json={"path": str(outside)})).status == 403
+        assert (await client.post("/jobs", json={"path": str(src_dir / "missing.mp4")})).status == 404
+        assert (await client.post("/jobs", json={"path": str(src_dir / "clip.mp4"), "copies": 0})).status == 400
+        assert (await client.post("/jobs", data=b"not json", headers={"Content-Type": "application/json"})).status == 400
+        assert (await client.get("/jobs/unknown")).status == 404
+        assert list(upload_dir.iterdir()) == []
+
+    _run(tmp_path, scenario)
+
+
+def test_token_required_except_health(tmp_path):
+    async def scenario(client, src_dir, upload_dir):
+        assert (await client.get("/health")).status == 200
+        assert (await client.get("/jobs")).status == 401
+        authorized = await client.get("/jobs", headers={"Authorization": "Bearer secret"})
+        assert authorized.status == 200
+        assert (await authorized.json()) == {"jobs": []}
+
+    _run(tmp_path, scenario, token="secret")
@@ -0,0 +1,64 @@
+import json
+import os
+import subprocess
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+
+from modules.utils.video_tools import PlanInputs, plan_copy
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+NOW = datetime.fromtimestamp(1_700_000_000, tz=timezone.utc)
+
+
+def _inputs(**overrides):
+    values = dict(seed="abcdef123456", input_name="clip.mp4", copy_index=2, orig_duration=42.5)
+    values.update(overrides)
+    return PlanInputs(**values)
+
+
+def test_fixed_now_gives_fixed_plan():
+    first = plan_copy(_inputs(), now=NOW).to_dict()
+    second = plan_copy(_inputs(), now=NOW).to_dict()
+    assert first == second
+
+
+def test_cli_plan_matches_in_process_plan():
+    cmd = [
+        sys.executable, str(ROOT_DIR / "modules" / "utils" / "video_tools.py"), "plan",
+        "--seed", "abcdef123456", "--input", "clip.mp4", "--copy-index", "2", "--orig-duration", "42.5",
+        "--now", str(int(NOW.timestamp())),
+    ]
+    runs = [subprocess.run(cmd, capture_output=True, text=True, check=True, cwd=ROOT_DIR).stdout for _ in range(2)]
+    assert runs[0] == runs[1]
+    assert json.loads(runs[0]) == json.loads(json.dumps(plan_copy(_inputs(), now=NOW).to_dict()))
+
+
+def test_now_only_moves_timestamps():
+    base = plan_copy(_inputs(), now=NOW)
+    later = plan_copy(_inputs(), now=NOW.replace(year=2024))
+    assert (base.fps, base.bitrate_kbps, base.clip_start, base.crop) == (later.fps, later.bitrate_kbps, later.clip_start, later.crop)
+    assert (base.stretch_factor, base.noise_strength, base.audio) == (later.stretch_factor, later.noise_strength, later.audio)
+    assert base.output_name != later.output_name
+
+
+def test_crop_respects_crop_max_px():
+    for index in range(1, 9):
+        for cap in (0, 2, 6):
+            crop = plan_copy(_inputs(copy_index=index, crop_max_px=cap), now=NOW).crop
+            assert crop["w"] <= cap and crop["h"] <= cap
+            assert 0 <= crop["x"] <= crop["w"] and 0 <= crop["y"] <= crop["h"]
+    assert plan_copy(_inputs(crop_max_px=0), now=NOW).crop == {"w": 0, "h": 0, "x": 0, "y": 0}
+
+
+def test_scene_fps_env_shared_by_cli_and_planner():
+    code = (
+        "import inspect\n"
+        "from modules.core import scene_analysis as sa\n"
+        "args = sa.build_parser().parse_args(['analyze', '--source', 'a.mp4', '--cache-dir', 'c'])\n"
+        "default = inspect.signature(sa.load_or_analyze).parameters['sample_fps'].default\n"
+        "print(args.sample_fps, default)\n"
+    )
+    env = {**os.environ, "UNICLON_SCENE_FPS": "4"}
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True, cwd=ROOT_DIR, env=env).stdout.split()
+    assert out == ["4.0", "4.0"]
@@ -0,0 +1,74 @@
+import os
+import shutil
+import subprocess
+from pathlib import Path
+
+import pytest
+
+from modules.core.probe_cache import keyframes, probe_key
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+
+pytestmark = pytest.mark.skipif(shutil.which("bash") is None, reason="bash is required")
+
+
+def _bash_key(cwd, path):
+    script = (
+        f'source "{ROOT_DIR}/modules/rng_utils.sh"; source "{ROOT_DIR}/modules/ffmpeg_driver.sh"; '
+        'cd "$1" && media_probe_key_var key "$2" && printf "%s" "$key"'
+    )
+    return subprocess.run(["bash", "-c", script, "bash", str(cwd), path], capture_output=True, text=True, check=True).stdout
+
+
+def _python_key(cwd, path):
+    code = "import sys; from modules.core.probe_cache import probe_key; sys.stdout.write(probe_key(sys.argv[1]) or '')"
+    script = 'cd "$1" && shift && PYTHONPATH="$0" exec python3 -c "$@"'
+    return subprocess.run(
+        ["bash", "-c", script, str(ROOT_DIR), str(cwd), code, path], capture_output=True, text=True, check=True
+    ).stdout
+
+
+@pytest.fixture
+def tree(tmp_path):
+    real = tmp_path / "real"
+    (real / "sub").mkdir(parents=True)
+    (real / "a.mp4").write_bytes(b"\0" * 128)
+    link = tmp_path / "link"
+    link.symlink_to(real, target_is_directory=True)
+    return real, link
+
+
+@pytest.mark.parametrize("path", ["a.mp4", "./a.mp4", "sub/../a.mp4"])
+@pytest.mark.parametrize("through_link", [False, True])
+def test_bash_and_python_keys_match(tree, path, through_link):
+    real, link = tree
+    cwd = link if through_link else real
+    bash_key = _bash_key(cwd, path)
+    assert len(bash_key) == 16
+    assert bash_key == _python_key(cwd, path)
+
+
+def test_absolute_path_key_matches(tree):
+    real, _ = tree
+    absolute = str(real / "a.mp4")
+    assert _bash_key(real, absolute) == probe_key(absolute)
+
+
+def test_missing_file_has_no_key(tmp_path):
+    assert probe_key(os.path.join(tmp_path, "missing.mp4")) is None
+
+
+def test_cached_keyframes_shared_by_python_and_segment_window(tree, tmp_path):
+    real, _ = tree
+    cache_dir = tmp_path / "cache" / "probe"
+    cache_dir.mkdir(parents=True)
+    source = str(real / "a.mp4")
+    (cache_dir / f"probe_{probe_key(source)}.keyframes").write_text("0.000000\n2.000000\n4.500000\n9.000000\n")
+    assert keyframes(source, cache_dir) == [0.0, 2.0, 4.5, 9.0]
+    script = (
+        f'BASE_DIR="{ROOT_DIR}"; source "{ROOT_DIR}/modules/rng_utils.sh"; source "{ROOT_DIR}/modules/ffmpeg_driver.sh"; '
+        f'source "{ROOT_DIR}/modules/segment_encode.sh"; segment_keyframes "$1" 1.5 4'
+    )
+    env = {**os.environ, "UNICLON_CACHE_DIR": str(tmp_path / "cache")}
+    out = subprocess.run(["bash", "-c", script, "bash", source], capture_output=True, text=True, check=True, env=env).stdout
+    assert out.split() == ["2.000000", "4.500000"]
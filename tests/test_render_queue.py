@@ -0,0 +1,42 @@
+import asyncio
+
+import pytest
+
+import render_queue
+
+
+@pytest.fixture(autouse=True)
+def _idle_cpu(monkeypatch):
+    monkeypatch.setattr(render_queue, "_cpu_percent", lambda: 0.0)
+    previous = render_queue.render_slots()
+    render_queue.configure_render_slots(1)
+    yield
+    render_queue.configure_render_slots(previous)
+
+
+def test_cancelled_wait_does_not_block_next_render():
+    async def scenario():
+        release_first = await render_queue.acquire_render_slot("first.mp4", 1, 1)
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(render_queue.acquire_render_slot("cancelled.mp4", 1, 1), timeout=0.2)
+        release_first()
+        release_next = await asyncio.wait_for(render_queue.acquire_render_slot("next.mp4", 1, 1), timeout=5)
+        release_next()
+
+    asyncio.run(scenario())
+    assert render_queue._SLOT_STATE["active"] == 0
+
+
+def test_slots_allow_parallel_renders():
+    render_queue.configure_render_slots(2)
+
+    async def scenario():
+        releases = await asyncio.wait_for(
+            asyncio.gather(*(render_queue.acquire_render_slot(f"copy{i}.mp4", 1, 1) for i in range(2))), timeout=5
+        )
+        for release in releases:
+            release()
+            release()  # повторный вызов не освобождает чужой слот
+
+    asyncio.run(scenario())
+    assert render_queue._SLOT_STATE["active"] == 0
@@ -0,0 +1,33 @@
+import pytest
+
+from modules.core.filter_graph import FilterChain, segment_safety
+
+
+@pytest.mark.parametrize(
+    "chain, stretch",
+    [
+        ("fps=30,setpts=1.020000*PTS,scale=w=-2:h=1920:flags=lanczos,setsar=1,crop=1080:1920:(in_w-out_w)/2:0", 1.02),
+        ("fps=30,setpts=1.02*PTS,unsharp=3:3:1.5,setpts=PTS*0.98", 1.02 * 0.98),
+    ],
+)
+def test_linear_setpts_chains_are_segmentable(chain, stretch):
+    factor, reason = segment_safety(FilterChain.parse(chain))
+    assert reason == "ok"
+    assert factor == pytest.approx(stretch)
+
+
+@pytest.mark.parametrize(
+    "chain",
+    [
+        "fps=30,setpts=1.02*PTS,setpts=(1+(random(0)*0.001))*PTS",
+        "fps=30,noise=alls=5:allf=t",
+        "fps=30,fade=t=in:st=0:d=0.5",
+        "fps=30,tmix=frames=3",
+        "fps=30,crop=w=iw:h=ih:x='(iw-ow)/2+sin(t)'",
+        "fps=30,eq=brightness=0.01:eval=frame",
+        "[0:v]scale=720:-2[v];[v]null",
+    ],
+)
+def test_temporal_or_random_chains_are_not_segmentable(chain):
+    factor, _ = segment_safety(FilterChain.parse(chain))
+    assert factor is None
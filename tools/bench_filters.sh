@@ -0,0 +1,36 @@
+#!/bin/bash
+# tools/bench_filters.sh — замер стоимости вариантов -vf на синтетическом кадре (ffmpeg -benchmark)
+set -euo pipefail
+
+ROOT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")/.." && pwd)"
+BENCH_SIZE="${BENCH_SIZE:-1080x1920}"
+BENCH_FPS="${BENCH_FPS:-30}"
+BENCH_SECONDS="${BENCH_SECONDS:-10}"
+BENCH_OUTPUT="${BENCH_OUTPUT:-$ROOT_DIR/bench_output.txt}"
+BENCH_CACHE="${BENCH_CACHE:-${UNICLON_CACHE_DIR:-$ROOT_DIR/output/cache}}"
+
+command -v ffmpeg >/dev/null 2>&1 || { echo "❌ ffmpeg not found" >&2; exit 1; }
+
+bench_case() {
+  local label="$1" vf="$2" stats utime rtime
+  stats=$(ffmpeg -hide_banner -nostats -benchmark \
+    -f lavfi -i "testsrc2=s=${BENCH_SIZE}:r=${BENCH_FPS}:d=${BENCH_SECONDS}" \
+    -vf "$vf" -f null - 2>&1 | grep -E '^bench: utime' | tail -n 1)
+  utime=$(printf '%s' "$stats" | sed -E 's/.*utime=([0-9.]+)s.*/\1/')
+  rtime=$(printf '%s' "$stats" | sed -E 's/.*rtime=([0-9.]+)s.*/\1/')
+  printf '%-14s utime=%7ss rtime=%7ss\n' "$label" "${utime:-?}" "${rtime:-?}"
+}
+
+# REGION AI: grain vs noise
+base_vf="format=yuv420p"
+grain_vf=$(python3 "$ROOT_DIR/modules/core/grain.py" apply --chain "format=yuv420p,noise=alls=2:allf=t" \
+  --seed bench --cache-dir "$BENCH_CACHE/grain" --size "$BENCH_SIZE" --fps "$BENCH_FPS" 2>/dev/null)
+
+{
+  echo "# filters @ ${BENCH_SIZE} ${BENCH_FPS}fps ${BENCH_SECONDS}s ($(date -u +%Y-%m-%dT%H:%M:%SZ))"
+  bench_case "baseline" "$base_vf"
+  bench_case "noise_t" "${base_vf},noise=alls=2:allf=t"
+  bench_case "noise_t+u" "${base_vf},noise=alls=5:allf=t+u"
+  bench_case "grain_plate" "$grain_vf"
+} | tee "$BENCH_OUTPUT"
+# END REGION AI
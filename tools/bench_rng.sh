@@ -0,0 +1,57 @@
+#!/bin/bash
+# tools/bench_rng.sh — сравнение числа порождённых процессов: прежний RNG ($(...) + md5sum/awk) и in-process *_var
+set -euo pipefail
+
+ROOT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")/.." && pwd)"
+BENCH_DRAWS="${BENCH_DRAWS:-200}"
+BENCH_OUTPUT="${BENCH_OUTPUT:-$ROOT_DIR/bench_rng_output.txt}"
+
+source "$ROOT_DIR/modules/rng_utils.sh"
+source "$ROOT_DIR/modules/metrics.sh"
+
+metrics_fork_count_var _probe || { echo "❌ /proc/stat not available — fork counter needs Linux" >&2; exit 1; }
+
+# REGION AI: legacy reference
+# Прежняя реализация: каждый блок из 8 чанков — md5sum, каждое число — подоболочка, float — awk
+legacy_next_chunk() {
+  if [ ${#RNG_HEX} -lt 4 ] || [ $((RNG_POS + 4)) -gt ${#RNG_HEX} ]; then
+    RNG_HEX="$(printf "%s" "${RNG_HEX}_${RNG_POS}" | md5sum | awk '{print $1}')"
+    RNG_POS=0
+  fi
+  local chunk="${RNG_HEX:$RNG_POS:4}"
+  RNG_POS=$((RNG_POS + 4))
+  printf "%d" $((16#$chunk))
+}
+
+legacy_rand_float() {
+  local raw
+  raw=$(legacy_next_chunk)
+  awk -v min="$1" -v max="$2" -v r="$raw" -v scale="$3" 'BEGIN {s=r/65535; printf "%.*f", scale, min + s*(max-min)}'
+}
+# END REGION AI
+
+bench_case() {
+  local label="$1" mode="$2" before after start_ns end_ns i value
+  init_rng "$(deterministic_md5 bench)"
+  metrics_fork_count_var before
+  start_ns=$(date +%s%N)
+  for ((i = 0; i < BENCH_DRAWS; i++)); do
+    if [ "$mode" = "legacy" ]; then
+      value=$(legacy_rand_float 0.995 1.005 6)
+      value=$(( $(legacy_next_chunk) % 100 ))
+    else
+      rand_float_var value 0.995 1.005 6
+      rand_int_var value 0 99
+    fi
+  done
+  end_ns=$(date +%s%N)
+  metrics_fork_count_var after
+  # date и сам замер дают ещё 2 процесса — вычитаем их
+  printf '%-8s draws=%d forks=%d ms=%d\n' "$label" $((BENCH_DRAWS * 2)) $((after - before - 2)) $(((end_ns - start_ns) / 1000000))
+}
+
+{
+  echo "# rng @ ${BENCH_DRAWS}×(float+int) ($(date -u +%Y-%m-%dT%H:%M:%SZ)); forks are system-wide, run on an idle host"
+  bench_case "legacy" legacy
+  bench_case "native" native
+} | tee "$BENCH_OUTPUT"
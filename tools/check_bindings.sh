@@ -8,6 +8,8 @@ bootstrap_init "${ROOT_DIR}/process_protective_v1.6.sh"
 
 required_functions=(
   random_seed rand_between rand_bool rng_next_chunk rand_choice rand_float rand_uint32
+  rng_next_chunk_var rand_int_var rand_float_var rand_choice_var rand_uint32_var deterministic_md5_var
+  media_probe_get_var media_probe_key_var
   clip_start duration timestamp_offset ffmpeg_time_to_seconds
   ensure_dir ensure_dirs touch_file clear_temp file_size_bytes touch_randomize_mtime
   log_info log_warn log_error log
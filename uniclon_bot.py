@@ -4,12 +4,11 @@ import csv
 import logging
 import os
 import shlex
-import time
 from datetime import datetime
 from dataclasses import dataclass
 from pathlib import Path
 from statistics import mean
-from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
 
 from dotenv import load_dotenv
 
@@ -23,6 +22,7 @@ load_dotenv()
 
 # REGION AI: local imports
 from loader import bot as loader_bot, dp as loader_dp
+from process_policy import after_spawn, preexec_for
 
 
 BASE_DIR = Path(__file__).resolve().parent
@@ -104,7 +104,7 @@ class AuditSummary:
     low_uniqueness_message: Optional[str]
 
 
-async def run_shell(command: str, *, cwd: Optional[Path] = None) -> Tuple[int, str]:
+async def run_shell(command: str, *, cwd: Optional[Path] = None, process_class: str = "qc") -> Tuple[int, str]:
     """Run shell command and capture output without raising on non-zero exit."""
 
     logger = logging.getLogger("uniclon.audit")
@@ -117,7 +117,9 @@ async def run_shell(command: str, *, cwd: Optional[Path] = None) -> Tuple[int, s
         stderr=asyncio.subprocess.STDOUT,
         cwd=str(cwd) if cwd else None,
         env=env,
+        preexec_fn=preexec_for(process_class),
     )
+    after_spawn(process_class, proc.pid)
 
     output_parts: List[str] = []
     assert proc.stdout is not None
@@ -537,145 +539,12 @@ from handlers import (
     set_task_queue,
     handle_video,
 )
+# fix: очередь вынесена в task_queue.py — её делят бот и локальный job API
+from task_queue import TaskInfo, UserTaskQueue  # noqa: F401
+from config import JOB_API_ENABLED
 # END REGION AI
 
 
-@dataclass
-class TaskInfo:
-    task_id: int
-    label: str
-    status: str
-    created_at: float
-    started_at: Optional[float] = None
-    profile: Optional[str] = None
-    copies: Optional[int] = None
-    save_preview: Optional[bool] = None
-    quality: Optional[str] = None
-
-
-class UserTaskQueue:
-    def __init__(self, per_user_limit: int = 1) -> None:
-        self._per_user_limit = max(1, per_user_limit)
-        self._queues: Dict[int, asyncio.Queue[Optional[Tuple[int, Callable[[], Awaitable[None]]]]]] = {}
-        self._workers: Dict[int, List[asyncio.Task[None]]] = {}
-        self._tasks: Dict[int, List[TaskInfo]] = {}
-        self._lock = asyncio.Lock()
-        self._closed = False
-        self._idle_timeout = 5.0
-        self._task_counter = 0
-
-    async def enqueue(
-        self,
-        user_id: int,
-        task_factory: Callable[[], Awaitable[None]],
-        label: str,
-        *,
-        profile: Optional[str] = None,
-        copies: Optional[int] = None,
-        save_preview: Optional[bool] = None,
-        quality: Optional[str] = None,
-    ) -> None:
-        if self._closed:
-            raise RuntimeError("Task queue is shutting down")
-        async with self._lock:
-            queue = self._queues.setdefault(user_id, asyncio.Queue())
-            workers = self._workers.setdefault(user_id, [])
-            self._task_counter += 1
-            task_id = self._task_counter
-            self._tasks.setdefault(user_id, []).append(
-                TaskInfo(
-                    task_id=task_id,
-                    label=label,
-                    status="pending",
-                    created_at=time.time(),
-                    profile=profile,
-                    copies=copies,
-                    save_preview=save_preview,
-                    quality=quality,
-                )
-            )
-            await queue.put((task_id, task_factory))
-            while len(workers) < self._per_user_limit:
-                workers.append(asyncio.create_task(self._worker(user_id, queue)))
-
-    async def close(self) -> None:
-        self._closed = True
-        async with self._lock:
-            snapshot = [
-                (uid, self._queues[uid], list(self._workers.get(uid, []))) for uid in list(self._queues)
-            ]
-        for uid, queue, workers in snapshot:
-            for _ in workers:
-                await queue.put(None)
-            self._tasks.pop(uid, None)
-        tasks = [task for _, _, workers in snapshot for task in workers]
-        if tasks:
-            await asyncio.gather(*tasks, return_exceptions=True)
-
-    async def _worker(
-        self,
-        user_id: int,
-        queue: asyncio.Queue[Optional[Tuple[int, Callable[[], Awaitable[None]]]]],
-    ) -> None:
-        try:
-            while True:
-                try:
-                    payload = await asyncio.wait_for(queue.get(), timeout=self._idle_timeout)
-                except asyncio.TimeoutError:
-                    break
-                if payload is None:
-                    queue.task_done()
-                    break
-                task_id, task_factory = payload
-                task_info: Optional[TaskInfo] = None
-                async with self._lock:
-                    for info in self._tasks.get(user_id, []):
-                        if info.task_id == task_id:
-                            info.status = "active"
-                            info.started_at = time.time()
-                            task_info = info
-                            break
-                if task_info:
-                    # REGION AI: worker logging
-                    logging.info(
-                        "🚀 Исполнение: user=%s | video=%s | copies=%s | profile=%s | q=%s",
-                        user_id,
-                        task_info.label,
-                        task_info.copies if task_info.copies is not None else "-",
-                        task_info.profile or "-",
-                        task_info.quality or "-",
-                    )
-                    # END REGION AI
-                try:
-                    await task_factory()
-                except Exception:  # noqa: BLE001
-                    logging.exception("Queued task for user %s failed", user_id)
-                finally:
-                    queue.task_done()
-                    async with self._lock:
-                        tasks = self._tasks.get(user_id, [])
-                        remaining = [info for info in tasks if info.task_id != task_id]
-                        if remaining:
-                            self._tasks[user_id] = remaining
-                        else:
-                            self._tasks.pop(user_id, None)
-        finally:
-            async with self._lock:
-                workers = self._workers.get(user_id, [])
-                try:
-                    workers.remove(asyncio.current_task())
-                except ValueError:
-                    pass
-                if not workers:
-                    self._workers.pop(user_id, None)
-                    self._queues.pop(user_id, None)
-                    self._tasks.pop(user_id, None)
-
-    async def get_user_tasks(self, user_id: int) -> List[TaskInfo]:
-        async with self._lock:
-            return list(self._tasks.get(user_id, []))
-
-
 _TASK_QUEUE_REF: Optional["UserTaskQueue"] = None
 
 
@@ -734,6 +603,7 @@ async def run_polling() -> None:
     logging.basicConfig(level=logging.INFO, format="%(asctime)s | %(levelname)-8s | %(name)s: %(message)s")
     bot = None
     task_queue: Optional[UserTaskQueue] = None
+    api_runner = None
     try:
         bot = make_bot()
         dp = make_dispatcher()
@@ -743,11 +613,19 @@ async def run_polling() -> None:
         task_queue = UserTaskQueue()
         set_task_queue(task_queue)
         set_task_queue_reference(task_queue)
+        # REGION AI: local job API
+        if JOB_API_ENABLED:
+            from job_api import start_job_api
+
+            api_runner = await start_job_api(task_queue)
+        # END REGION AI
         await dp.start_polling(bot, allowed_updates=dp.resolve_used_update_types())
     except (TelegramAPIError, ClientError, ValueError) as exc:
         logging.exception("Failed to start polling due to invalid token or API configuration: %s", exc)
         raise
     finally:
+        if api_runner is not None:
+            await api_runner.cleanup()
         if bot and bot.session:
             await bot.session.close()
         if task_queue:
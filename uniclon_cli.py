@@ -0,0 +1,88 @@
+import argparse
+import asyncio
+import logging
+import re
+import sys
+from pathlib import Path
+from typing import Optional, Sequence
+
+# REGION AI: imports
+from config import MAX_COPIES, OUTPUT_DIR
+# END REGION AI
+
+
+# REGION AI: uniclon batch command
+def _default_journal(target: Path) -> Path:
+    stem = re.sub(r"[^\w.-]+", "_", target.expanduser().resolve().name or "batch")
+    return OUTPUT_DIR / "batch" / f"{stem}.jsonl"
+
+
+def _cmd_batch(args: argparse.Namespace) -> int:
+    target = Path(args.target)
+    if not target.exists():
+        print(f"❌ {target} не найден", file=sys.stderr)
+        return 2
+    # executor тянет оркестратор и план ресурсов — импортируем только для реального запуска
+    from executor import RESOURCE_PLAN, set_render_parallelism
+    from services.batch_runner import collect_sources, run_batch
+
+    sources = collect_sources(target)
+    if not sources:
+        print(f"❌ В {target} нет видео", file=sys.stderr)
+        return 2
+    # fix: -j задаёт число слотов render_queue, иначе задачи всё равно шли бы по одной
+    requested = args.parallel or RESOURCE_PLAN.workers
+    parallel = set_render_parallelism(requested)
+    if parallel < requested:
+        print(f"⚠️ -j {requested} ограничено планом ресурсов до {parallel} ({RESOURCE_PLAN.describe()})", file=sys.stderr)
+    journal = Path(args.journal) if args.journal else _default_journal(target)
+    summary = asyncio.run(
+        run_batch(
+            sources,
+            copies=args.copies,
+            profile=args.profile,
+            quality=args.quality,
+            parallel=parallel,
+            journal_path=journal,
+            report_path=Path(args.report) if args.report else None,
+            retry_failed=args.retry_failed,
+        )
+    )
+    print(
+        f"📦 Пакет: {summary.total} источников | ✅ {summary.done} | ❌ {summary.failed} | ⏭ {summary.skipped} (журнал {journal})"
+    )
+    print(f"📊 Отчёт: {summary.report_csv} | {summary.report_json}")
+    if summary.failures:
+        print(f"⚠️ С ошибкой: {', '.join(summary.failures)}")
+    return 0 if summary.failed == 0 else 1
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="uniclon", description="Uniclon headless CLI")
+    sub = parser.add_subparsers(dest="command", required=True)
+    batch = sub.add_parser("batch", help="пакетный рендер каталога или списка файлов с журналом и сводным отчётом")
+    batch.add_argument("target", help="каталог с видео или файл-список (путь на строку)")
+    batch.add_argument("-n", "--copies", type=int, default=3, help=f"копий на источник (1..{MAX_COPIES})")
+    batch.add_argument("-p", "--profile", default="", help="профиль платформы (tiktok, instagram, …)")
+    batch.add_argument("-q", "--quality", default="std", help="качество (std, high, …)")
+    batch.add_argument("-j", "--parallel", type=int, default=0, help="одновременных рендеров (0 — по плану ресурсов; не больше, чем позволяют CPU и память)")
+    batch.add_argument("--journal", help="путь журнала (по умолчанию output/batch/<target>.jsonl)")
+    batch.add_argument("--report", help="путь сводного CSV (рядом кладётся .json)")
+    batch.add_argument("--retry-failed", action="store_true", help="повторить задачи, упавшие в прошлых запусках")
+    batch.set_defaults(func=_cmd_batch)
+    return parser
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s | %(levelname)-8s | %(name)s: %(message)s")
+    try:
+        return int(args.func(args))
+    except KeyboardInterrupt:
+        print("⏸ Прервано — повторный запуск продолжит с журнала", file=sys.stderr)
+        return 130
+
+
+if __name__ == "__main__":
+    sys.exit(main())
+# END REGION AI
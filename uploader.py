@@ -0,0 +1,230 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Awaitable, Callable, List, Optional, Sequence, TypeVar
+
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.types import Message
+from aiogram.types import InputMediaPhoto, InputMediaVideo
+from aiogram.types.input_file import FSInputFile, InputFile
+
+# REGION AI: imports
+from config import UPLOAD_BURST, UPLOAD_CONCURRENCY, UPLOAD_RATE_PER_SEC
+# END REGION AI
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+_MEDIA_GROUP_LIMIT = 10
+_MEDIA_GROUP_PHOTO_LIMIT = 10 * 1024 * 1024
+_MEDIA_GROUP_VIDEO_LIMIT = 50 * 1024 * 1024
+_MAX_FLOOD_RETRIES = 5
+
+
+# REGION AI: shared flood-control token bucket
+class TokenBucket:
+    """Общий лимитер запросов к Bot API: токены + пауза по retry_after."""
+
+    def __init__(self, rate: float, burst: int) -> None:
+        self._rate = max(0.01, rate)
+        self._capacity = max(1, burst)
+        self._tokens = float(self._capacity)
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._blocked_until:
+                    await asyncio.sleep(self._blocked_until - now)
+                    continue
+                self._tokens = min(self._capacity, self._tokens + (now - self._updated) * self._rate)
+                self._updated = now
+                if self._tokens >= 1.0:
+                    self._tokens -= 1.0
+                    return
+                await asyncio.sleep((1.0 - self._tokens) / self._rate)
+
+    def penalize(self, retry_after: float) -> None:
+        until = time.monotonic() + max(0.0, retry_after)
+        if until > self._blocked_until:
+            self._blocked_until = until
+        self._tokens = 0.0
+# END REGION AI
+
+
+# REGION AI: upload throughput metrics
+@dataclass
+class UploadStats:
+    uploads: int = 0
+    failures: int = 0
+    flood_waits: int = 0
+    bytes_sent: int = 0
+    seconds: float = 0.0
+    per_file: List[str] = field(default_factory=list)
+
+    def record(self, paths: Sequence[Path], elapsed: float, kind: str) -> None:
+        size = 0
+        for path in paths:
+            try:
+                size += path.stat().st_size
+            except OSError:
+                continue
+        self.record_bytes(", ".join(p.name for p in paths), len(paths), size, elapsed, kind)
+
+    def record_bytes(self, names: str, count: int, size: int, elapsed: float, kind: str) -> None:
+        self.uploads += count
+        self.bytes_sent += size
+        self.seconds += elapsed
+        rate = (size / elapsed / 1024 / 1024) if elapsed > 0 else 0.0
+        self.per_file.append(f"{kind}:{names}:{size}B:{elapsed:.2f}s")
+        logger.info("[Upload] %s %s | %.1f MB in %.2fs (%.2f MB/s)", kind, names, size / 1024 / 1024, elapsed, rate)
+
+    def summary(self) -> str:
+        rate = (self.bytes_sent / self.seconds / 1024 / 1024) if self.seconds > 0 else 0.0
+        return (
+            f"uploads={self.uploads} failures={self.failures} flood_waits={self.flood_waits} "
+            f"bytes={self.bytes_sent} busy={self.seconds:.1f}s avg={rate:.2f}MB/s"
+        )
+# END REGION AI
+
+
+# REGION AI: bounded concurrent upload manager
+class UploadManager:
+    """Параллельная отправка файлов в Telegram с общим лимитом и flood-control."""
+
+    def __init__(self, limit: int = UPLOAD_CONCURRENCY, bucket: Optional[TokenBucket] = None) -> None:
+        self._sem = asyncio.Semaphore(max(1, limit))
+        self._bucket = bucket or _SHARED_BUCKET
+        self.stats = UploadStats()
+
+    async def _call(self, factory: Callable[[], Awaitable[T]]) -> T:
+        for attempt in range(_MAX_FLOOD_RETRIES + 1):
+            await self._bucket.acquire()
+            try:
+                return await factory()
+            except TelegramRetryAfter as exc:
+                self.stats.flood_waits += 1
+                self._bucket.penalize(float(exc.retry_after))
+                if attempt >= _MAX_FLOOD_RETRIES:
+                    raise
+                logger.warning("[Upload] Flood control: retry after %ss", exc.retry_after)
+        raise RuntimeError("unreachable")
+
+    async def send_video(self, message: Message, path: Path, caption: Optional[str] = None) -> bool:
+        """Видео с fallback на документ; False, если не ушло ни так, ни так."""
+        caption = path.name if caption is None else caption
+        async with self._sem:
+            started = time.monotonic()
+            try:
+                await self._call(lambda: message.answer_video(video=FSInputFile(path), caption=caption))
+            except Exception:
+                logger.exception("Failed to send video %s; fallback to document", path)
+                try:
+                    await self._call(lambda: message.answer_document(document=FSInputFile(path), caption=caption))
+                except Exception:
+                    self.stats.failures += 1
+                    logger.exception("Failed to send document %s", path)
+                    return False
+                self.stats.record([path], time.monotonic() - started, "document")
+                return True
+            self.stats.record([path], time.monotonic() - started, "video")
+            return True
+
+    async def send_document(self, message: Message, path: Path, caption: Optional[str] = None) -> bool:
+        async with self._sem:
+            started = time.monotonic()
+            try:
+                await self._call(lambda: message.answer_document(document=FSInputFile(path), caption=caption))
+            except Exception:
+                self.stats.failures += 1
+                logger.exception("Failed to send document %s", path)
+                return False
+            self.stats.record([path], time.monotonic() - started, "document")
+            return True
+
+    async def send_stream(self, message: Message, document: InputFile, caption: Optional[str] = None) -> bool:
+        """Документ из потокового InputFile (размер берётся из его stats после загрузки)."""
+        async with self._sem:
+            started = time.monotonic()
+            try:
+                await self._call(lambda: message.answer_document(document=document, caption=caption))
+            except Exception:
+                self.stats.failures += 1
+                logger.exception("Failed to send streamed document %s", document.filename)
+                return False
+            stats = getattr(document, "stats", None)
+            size = getattr(stats, "bytes_written", 0) or 0
+            self.stats.record_bytes(document.filename or "stream", 1, size, time.monotonic() - started, "stream")
+            return True
+
+    async def send_videos(self, message: Message, paths: Sequence[Path]) -> int:
+        """Отправляет видео альбомами по 10, а неподходящие/упавшие — параллельно по одному."""
+        groupable = [p for p in paths if _fits(p, _MEDIA_GROUP_VIDEO_LIMIT)]
+        single = [p for p in paths if p not in groupable]
+        sent = 0
+        for batch in _batches(groupable):
+            if len(batch) < 2:
+                single.extend(batch)
+                continue
+            media = [InputMediaVideo(media=FSInputFile(p), caption=p.name) for p in batch]
+            if await self._send_group(message, media, batch, "video_group"):
+                sent += len(batch)
+            else:
+                single.extend(batch)
+        results = await asyncio.gather(*(self.send_video(message, p) for p in single))
+        return sent + sum(1 for ok in results if ok)
+
+    async def send_photos(self, message: Message, paths: Sequence[Path], caption_prefix: str = "Preview") -> int:
+        groupable = [p for p in paths if _fits(p, _MEDIA_GROUP_PHOTO_LIMIT)]
+        sent = 0
+        for batch in _batches(groupable):
+            media = [InputMediaPhoto(media=FSInputFile(p), caption=f"{caption_prefix}: {p.name}") for p in batch]
+            if len(batch) > 1 and await self._send_group(message, media, batch, "photo_group"):
+                sent += len(batch)
+                continue
+            for preview in batch:
+                async with self._sem:
+                    started = time.monotonic()
+                    try:
+                        await self._call(
+                            lambda p=preview: message.answer_photo(photo=FSInputFile(p), caption=f"{caption_prefix}: {p.name}")
+                        )
+                    except Exception:
+                        self.stats.failures += 1
+                        logger.exception("Failed to send preview %s", preview)
+                        continue
+                    self.stats.record([preview], time.monotonic() - started, "photo")
+                    sent += 1
+        return sent
+
+    async def _send_group(self, message: Message, media: list, paths: Sequence[Path], kind: str) -> bool:
+        async with self._sem:
+            started = time.monotonic()
+            try:
+                await self._call(lambda: message.answer_media_group(media=media))
+            except Exception:
+                logger.exception("Failed to send media group of %s files; falling back to single uploads", len(paths))
+                return False
+            self.stats.record(list(paths), time.monotonic() - started, kind)
+            return True
+
+
+def _fits(path: Path, limit: int) -> bool:
+    try:
+        return path.stat().st_size <= limit
+    except OSError:
+        return False
+
+
+def _batches(paths: Sequence[Path]) -> List[List[Path]]:
+    return [list(paths[i:i + _MEDIA_GROUP_LIMIT]) for i in range(0, len(paths), _MEDIA_GROUP_LIMIT)]
+
+
+_SHARED_BUCKET = TokenBucket(UPLOAD_RATE_PER_SEC, UPLOAD_BURST)
+# END REGION AI